@@ -0,0 +1,210 @@
+"""
+Admission control for ``/predict``.
+
+Each request is admitted, degraded or rejected on arrival, by the number of
+requests already in flight (not counting itself):
+
+- in flight >= ``reject_in_flight``: rejected (429 with ``Retry-After``)
+- in flight >= ``degrade_in_flight``: scored by the rules only
+  (``RiskScorer.calculate_risk_score``), flagged ``degraded``
+- otherwise it waits for one of ``max_concurrent`` model slots. The expected
+  wait is estimated up front from the EWMA of recent inference latency and
+  the requests already waiting. If it exceeds ``max_queue_wait``, or no slot
+  frees up in time, the request is degraded instead of queueing behind
+  the model.
+
+So under a spike the model keeps serving at the rate it can sustain, the
+surplus gets a cheap rules decision, and only traffic far beyond capacity
+is turned away. Decision counts, degradation reasons and slot queue time
+are exported as metrics.
+
+Run ``python admission_control.py`` to replay a traffic spike above model
+capacity with and without admission control.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import ADMISSION_DECISIONS, ADMISSION_QUEUE_TIME
+from risk_scoring import RiskScorer
+
+
+class Admission:
+    """One admitted request; releases its in-flight slot on exit"""
+
+    def __init__(self, controller, rejected=False):
+        self.controller = controller
+        self.rejected = rejected
+        self.degraded = False
+        self.reason = None
+        self.queue_seconds = 0.0
+
+    @contextmanager
+    def model_slot(self):
+        """Yields True with a model slot held, or False when the request is degraded"""
+        acquired = self.controller._acquire(self)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.controller._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.controller._leave()
+        return False
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=None, degrade_in_flight=16, reject_in_flight=64,
+                 max_queue_wait=0.05, alpha=0.2, retry_after=1):
+        if reject_in_flight < degrade_in_flight:
+            raise ValueError('reject_in_flight must be >= degrade_in_flight')
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.degrade_in_flight = degrade_in_flight
+        self.reject_in_flight = reject_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.alpha = alpha
+        self.retry_after = retry_after
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.latency = None
+        self.counts = {'full': 0, 'degraded': 0, 'rejected': 0}
+
+    # -------- Request lifecycle --------
+    def admit(self):
+        """Admission for a new request (check ``.rejected`` before entering it)"""
+        with self._lock:
+            if self.in_flight >= self.reject_in_flight:
+                self.counts['rejected'] += 1
+                rejected = True
+            else:
+                self.in_flight += 1
+                rejected = False
+        if rejected:
+            ADMISSION_DECISIONS.labels(decision='rejected', reason='in_flight').inc()
+        return Admission(self, rejected=rejected)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _degrade(self, admission, reason):
+        admission.degraded = True
+        admission.reason = reason
+        with self._lock:
+            self.counts['degraded'] += 1
+        ADMISSION_DECISIONS.labels(decision='degraded', reason=reason).inc()
+        return False
+
+    def _acquire(self, admission):
+        with self._lock:
+            in_flight, waiting, latency = self.in_flight, self.waiting, self.latency
+        # ``in_flight`` includes this request: others >= degrade_in_flight
+        if in_flight - 1 >= self.degrade_in_flight:
+            return self._degrade(admission, 'in_flight')
+        # Requests ahead of this one, spread over the slots
+        if latency is not None and latency * (waiting + 1) / self.max_concurrent > self.max_queue_wait:
+            if not self._slots.acquire(blocking=False):
+                return self._degrade(admission, 'latency')
+        else:
+            start = time.perf_counter()
+            with self._lock:
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.max_queue_wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            admission.queue_seconds = time.perf_counter() - start
+            ADMISSION_QUEUE_TIME.observe(admission.queue_seconds)
+            if not acquired:
+                return self._degrade(admission, 'queue_timeout')
+        with self._lock:
+            self.counts['full'] += 1
+        ADMISSION_DECISIONS.labels(decision='full', reason='').inc()
+        return True
+
+    def observe(self, seconds):
+        """Fold one model inference latency into the EWMA"""
+        with self._lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.alpha * (seconds - self.latency)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'waiting_for_model': self.waiting,
+                'latency_ewma_ms': None if self.latency is None else round(self.latency * 1e3, 3),
+                'limits': {
+                    'max_concurrent': self.max_concurrent,
+                    'degrade_in_flight': self.degrade_in_flight,
+                    'reject_in_flight': self.reject_in_flight,
+                    'max_queue_wait_ms': self.max_queue_wait * 1e3
+                },
+                'decisions': dict(self.counts)
+            }
+
+
+def rules_decisions(records, risk_scorer=None):
+    """Rules-only decisions for degraded requests (one dict per transaction)"""
+    risk_scorer = risk_scorer or RiskScorer()
+    results = []
+    for i, record in enumerate(records):
+        rules = risk_scorer.calculate_risk_score(record, {
+            'avg_amount': record.get('User_Avg_Amount', 0),
+            'transaction_count': record.get('User_Transaction_Count', 1)
+        })
+        results.append({
+            'transaction_id': i,
+            'is_fraud': rules['risk_level'] == 'HIGH',
+            'fraud_probability': None,
+            'legit_probability': None,
+            'risk_level': rules['risk_level'],
+            'recommendation': rules['recommendation'],
+            'rule_risk_score': rules['risk_score'],
+            'risk_factors': rules['risk_factors'],
+            'degraded': True
+        })
+    return results
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', qps=150, duration=15, connections=64):
+    """An open-loop spike above model capacity, with and without admission control"""
+    import app as api
+    from load_generator import Workload, load_transactions, run_load, serve_in_thread
+
+    workload = Workload(load_transactions(data_path))
+    api.model_manager.cache.max_entries = 0
+    server, url = serve_in_thread(api.app)
+    controller = api.admission_controller
+    runs = (
+        # Every request waits for the model, as before admission control
+        ('no control', AdmissionController(10 ** 6, 10 ** 6, 10 ** 6, max_queue_wait=3600)),
+        ('admission', AdmissionController(controller.max_concurrent, 16, 48,
+                                          max_queue_wait=controller.max_queue_wait))
+    )
+    try:
+        for label, api.admission_controller in runs:
+            result = run_load(url, workload, qps=qps, concurrency=connections, duration=duration)
+            stats = result['endpoints']['predict']
+            latency = stats['latency_ms']
+            print(f"{label:>10}: {stats['requests']:,} requests | {stats['throughput']:.0f} ok/s | "
+                  f"p50 {latency['p50']:.0f}ms | p99 {latency['p99']:.0f}ms | "
+                  f"status {stats['status_codes']} | {api.admission_controller.stats()['decisions']}")
+    finally:
+        api.admission_controller = controller
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
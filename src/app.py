@@ -1,10 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
+import atexit
 import os
+import time
 from model_persistence import ModelManager
+from transaction_schema import (
+    TRANSACTION_SCHEMA, SchemaValidationError, decode_transactions, validate_frame
+)
+from columnar_io import file_format, iter_frames, require_arrow
+from batch_jobs import JobManager, JobQueueFull
+from drift_monitor import DriftMonitor
+from explanations import PredictionExplainer
+from shadow_scoring import ShadowScorer
+from segment_models import GLOBAL_SEGMENT, SegmentModels
+from admission_control import AdmissionController, rules_decisions
+from risk_scoring import RiskScorer
+from metrics import (
+    REGISTRY, CONTENT_TYPE, HTTP_REQUESTS, HTTP_LATENCY, IN_FLIGHT,
+    STAGE_LATENCY, BATCH_SIZE, MODEL_LATENCY
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -12,12 +29,22 @@ CORS(app)
 # Initialize model manager
 model_manager = ModelManager()
 models_loaded = False
+# Input drift against the training histograms in the model metadata
+drift_monitor = None
+# Top contributing features of flagged predictions
+explainer = None
+# Candidate model scoring the same traffic off the request path
+shadow_scorer = None
+SHADOW_MODEL_DIR = os.path.join('models', 'shadow')
+SEGMENT_MODEL_DIR = os.path.join('models', 'segments')
 
 def load_models_on_startup():
     """Attempt to load models when the API starts"""
-    global models_loaded
+    global models_loaded, drift_monitor, explainer
     try:
         models_loaded = model_manager.load_models()
+        drift_monitor = DriftMonitor.from_metadata(model_manager.metadata)
+        explainer = PredictionExplainer.from_manager(model_manager) if models_loaded else None
     except Exception as e:
         print(f"Failed to load models on startup: {str(e)}")
         models_loaded = False
@@ -25,14 +52,138 @@ def load_models_on_startup():
 # Load models when app starts
 load_models_on_startup()
 
+# Per-segment models (lazily loaded, LRU-bounded); the global model otherwise
+segment_models = SegmentModels(model_manager, SEGMENT_MODEL_DIR)
+
+# Sheds /predict load to rules-only scoring, then 429, under overload
+admission_controller = AdmissionController()
+risk_scorer = RiskScorer()
+
+# Sharded mode (FRAUD_SHARDS=<K>): uploads are scored in K shard processes
+# that own the per-user feature state, optionally built from the raw CSV
+# in FRAUD_SHARD_HISTORY (see sharding.py)
+shard_router = None
+
+def start_shard_router(n_shards, history_path=None):
+    """Start the shard processes and build their state from ``history_path``"""
+    global shard_router
+    from sharding import ShardRouter
+    router = ShardRouter(n_shards).start()
+    atexit.register(router.stop)
+    if history_path:
+        from data_utils import DataProcessor
+        users = router.build(DataProcessor().load_data(history_path))
+        print(f"✅ Shard state built for {users:,} users")
+    shard_router = router
+    return router
+
+if models_loaded and os.environ.get('FRAUD_SHARDS'):
+    try:
+        start_shard_router(int(os.environ['FRAUD_SHARDS']), os.environ.get('FRAUD_SHARD_HISTORY'))
+    except Exception as e:
+        print(f"Failed to start shard processes: {str(e)}")
+
+# Background batch jobs (one worker so real-time scoring keeps the CPU)
+job_manager = JobManager(model_manager, jobs_dir='jobs', max_workers=1,
+                         segment_models=segment_models, shard_router=shard_router).start()
+
+def start_shadow(model_dir):
+    """Score traffic with the bundle in ``model_dir`` alongside the primary model"""
+    global shadow_scorer
+    scorer = ShadowScorer.from_dir(model_dir, wait_for_idle=job_manager.wait_for_idle).start()
+    previous, shadow_scorer = shadow_scorer, scorer
+    if previous is not None:
+        previous.stop()
+    return scorer
+
+if os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), SHADOW_MODEL_DIR,
+                               'trained_detector.pkl')):
+    try:
+        start_shadow(os.path.join(os.path.dirname(os.path.abspath(__file__)), SHADOW_MODEL_DIR))
+    except Exception as e:
+        print(f"Failed to start shadow model: {str(e)}")
+
+# Prediction cache counters, read at scrape time
+for _stat in ('size', 'hits', 'misses', 'evictions'):
+    REGISTRY.gauge(
+        f'fraud_prediction_cache_{_stat}',
+        f'Prediction cache {_stat}'
+    ).set_function(lambda stat=_stat: model_manager.cache.stats()[stat])
+REGISTRY.gauge(
+    'fraud_model_loaded',
+    'Whether the model and preprocessor are loaded'
+).set_function(lambda: int(models_loaded))
+REGISTRY.gauge(
+    'fraud_admission_in_flight',
+    'Predict requests admitted and not yet answered'
+).set_function(lambda: admission_controller.in_flight)
+REGISTRY.gauge(
+    'fraud_admission_latency_ewma_seconds',
+    'Moving average of model inference latency used for admission'
+).set_function(lambda: admission_controller.latency or 0)
+REGISTRY.gauge(
+    'fraud_segment_models_loaded',
+    'Segment model bundles currently held in memory'
+).set_function(lambda: len(segment_models.stats()['loaded']))
+REGISTRY.gauge(
+    'fraud_segment_models_bytes',
+    'Approximate size of the segment model bundles held in memory'
+).set_function(lambda: segment_models.bytes)
+REGISTRY.gauge(
+    'fraud_shadow_queue_depth',
+    'Requests waiting to be scored by the shadow model'
+).set_function(lambda: shadow_scorer.queue_depth() if shadow_scorer is not None else 0)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.in_flight = True
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    HTTP_REQUESTS.labels(
+        endpoint=endpoint,
+        method=request.method,
+        status=response.status_code
+    ).inc()
+    if 'request_start' in g:
+        HTTP_LATENCY.labels(endpoint=endpoint).observe(
+            time.perf_counter() - g.request_start
+        )
+    return response
+
+@app.teardown_request
+def finish_request(exc=None):
+    if g.pop('in_flight', False):
+        IN_FLIGHT.dec()
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     status = {
         'api_status': 'running',
         'model_loaded': models_loaded,
-        'preprocessor_loaded': models_loaded
+        'preprocessor_loaded': models_loaded,
+        'model_version': model_manager.model_version,
+        'decision_thresholds': model_manager.decision_engine.to_dict(),
+        'prediction_cache': model_manager.cache.stats(),
+        'admission': admission_controller.stats(),
+        'segments': segment_models.stats(),
+        'shadow': None
     }
+    if shadow_scorer is not None:
+        status['shadow'] = {
+            'model_version': shadow_scorer.model_version,
+            'queue_depth': shadow_scorer.queue_depth(),
+            'dropped': shadow_scorer.dropped
+        }
     return jsonify(status), 200
 
 @app.route('/predict', methods=['POST'])
@@ -44,49 +195,116 @@ def predict():
             'instructions': 'Run: python train.py'
         }), 503
     
+    admission = admission_controller.admit()
+    if admission.rejected:
+        response = jsonify({'error': 'Too many requests in flight, retry later'})
+        response.headers['Retry-After'] = str(admission_controller.retry_after)
+        return response, 429
+    with admission:
+        return _predict(admission)
+
+def _predict(admission):
     try:
         # Get data from request
-        data = request.get_json()
+        with STAGE_LATENCY.labels(stage='parse').time():
+            data = request.get_json(silent=True)
         
+        if data is None:
+            return jsonify({'error': 'Request body must be valid JSON'}), 400
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Convert to DataFrame
-        if isinstance(data, dict):
-            # Single prediction
-            df = pd.DataFrame([data])
-        elif isinstance(data, list):
-            # Multiple predictions
-            df = pd.DataFrame(data)
-        else:
-            return jsonify({'error': 'Invalid data format'}), 400
-        
-        # Make prediction
-        predictions, probabilities = model_manager.predict(df)
-        
-        # Prepare response
-        results = []
-        for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
-            results.append({
-                'transaction_id': i,
-                'is_fraud': bool(pred),
-                'fraud_probability': float(prob[1]),
-                'legit_probability': float(prob[0]),
-                'risk_level': 'HIGH' if prob[1] > 0.7 else 'MEDIUM' if prob[1] > 0.3 else 'LOW'
+        # Validate and decode into typed columns
+        with STAGE_LATENCY.labels(stage='decode').time():
+            try:
+                batch = decode_transactions(data)
+            except SchemaValidationError as e:
+                return jsonify(e.to_dict()), 400
+            df = batch.to_frame()
+        BATCH_SIZE.labels(endpoint='predict').observe(len(df))
+        if drift_monitor is not None:
+            drift_monitor.observe(batch.columns)
+        
+        # Make prediction (batch jobs pause between chunks meanwhile), or
+        # fall back to the rules when no model slot frees up in time
+        with admission.model_slot() as full:
+            if full:
+                with job_manager.realtime():
+                    start = time.perf_counter()
+                    predictions, probabilities, segments = segment_models.predict(df)
+                    primary_seconds = time.perf_counter() - start
+        if not full:
+            with STAGE_LATENCY.labels(stage='rules').time():
+                results = rules_decisions(df.to_dict('records'), risk_scorer)
+            return jsonify({
+                'predictions': results,
+                'total_transactions': len(results),
+                'fraud_count': sum(r['is_fraud'] for r in results),
+                'degraded': True,
+                'degraded_reason': admission.reason
+            }), 200
+        admission_controller.observe(primary_seconds)
+        MODEL_LATENCY.labels(model='primary').observe(primary_seconds)
+        
+        # Only enqueues; dropped (and counted) when the shadow queue is full.
+        # The shadow is a global model: rows of segment models are not compared
+        compared = segments == GLOBAL_SEGMENT
+        if shadow_scorer is not None and compared.any():
+            shadow_scorer.submit(df[compared], probabilities[compared, 1], predictions[compared],
+                                 primary_seconds)
+        
+        # Prepare response (each row by the thresholds of the model that scored it)
+        risk_levels, recommendations = segment_models.decisions(probabilities[:, 1], segments)
+        
+        # Exact contributions for rows above the review threshold only; the
+        # explainer is the global model's, so rows of segment models are skipped
+        with STAGE_LATENCY.labels(stage='explain').time():
+            explanations = (explainer.explain(df, np.where(segments == GLOBAL_SEGMENT, probabilities[:, 1], 0.0))
+                            if explainer is not None else [None] * len(df))
+        
+        with STAGE_LATENCY.labels(stage='serialize').time():
+            results = []
+            for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
+                results.append({
+                    'transaction_id': i,
+                    'is_fraud': bool(pred),
+                    'fraud_probability': float(prob[1]),
+                    'legit_probability': float(prob[0]),
+                    'risk_level': str(risk_levels[i]),
+                    'recommendation': str(recommendations[i]),
+                    'model_segment': segments[i]
+                })
+                if explanations[i] is not None:
+                    results[-1]['explanation'] = explanations[i]
+            
+            response = jsonify({
+                'predictions': results,
+                'total_transactions': len(results),
+                'fraud_count': int(sum(predictions)),
+                'degraded': False
             })
         
-        return jsonify({
-            'predictions': results,
-            'total_transactions': len(results),
-            'fraud_count': int(sum(predictions))
-        }), 200
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+BATCH_COLUMNS = ['Transaction_ID'] + [field.name for field in TRANSACTION_SCHEMA]
+
+
+def _timed(iterable, stage):
+    """Yield from ``iterable``, timing each step under ``stage``"""
+    iterator = iter(iterable)
+    while True:
+        with STAGE_LATENCY.labels(stage=stage).time():
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
 @app.route('/batch_predict', methods=['POST'])
 def batch_predict():
-    """Predict for multiple transactions from a CSV file"""
+    """Predict for multiple transactions from a CSV, Parquet or Arrow IPC file"""
     if not models_loaded:
         return jsonify({
             'error': 'Models not loaded. Please train the model first.'
@@ -103,47 +321,209 @@ def batch_predict():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        if not file.filename.endswith('.csv'):
-            return jsonify({'error': 'Only CSV files are supported'}), 400
+        fmt = file_format(file.filename)
+        if fmt is None:
+            return jsonify({'error': 'Only CSV, Parquet and Arrow IPC files are supported'}), 400
         
-        # Read CSV
-        df = pd.read_csv(file)
+        if fmt == 'csv':
+            frames = pd.read_csv(file, chunksize=65536)
+        else:
+            try:
+                require_arrow()
+            except ImportError as e:
+                return jsonify({'error': str(e)}), 415
+            # Only the model columns (plus an ID) are read, batch by batch
+            frames = iter_frames(file.stream, fmt, columns=BATCH_COLUMNS)
         
-        # Make predictions
-        predictions, probabilities = model_manager.predict(df)
+        # Score each record batch as it is decoded
+        scored = []
+        for df in _timed(frames, stage='parse'):
+            if df.empty:
+                continue
+            try:
+                validate_frame(df)
+            except SchemaValidationError as e:
+                return jsonify(e.to_dict()), 400
+            
+            if drift_monitor is not None:
+                drift_monitor.observe(df)
+            if shard_router is not None:
+                try:
+                    predictions, probabilities, risk_levels = shard_router.predict_frame(df)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                segments = np.full(len(df), GLOBAL_SEGMENT, dtype=object)
+            else:
+                predictions, probabilities, segments = segment_models.predict(df)
+                risk_levels = segment_models.decisions(probabilities[:, 1], segments)[0]
+            df['is_fraud_predicted'] = predictions
+            df['fraud_probability'] = probabilities[:, 1]
+            df['legit_probability'] = probabilities[:, 0]
+            df['risk_level'] = risk_levels
+            df['model_segment'] = segments
+            scored.append(df)
         
-        # Add predictions to dataframe
-        df['is_fraud_predicted'] = predictions
-        df['fraud_probability'] = probabilities[:, 1]
-        df['legit_probability'] = probabilities[:, 0]
+        df = pd.concat(scored, ignore_index=True) if scored else pd.DataFrame()
+        BATCH_SIZE.labels(endpoint='batch_predict').observe(len(df))
+        if df.empty:
+            return jsonify({'error': 'Uploaded file contains no transactions'}), 400
+        predictions = df['is_fraud_predicted'].to_numpy()
         
         # Convert to JSON
-        results = df.to_dict('records')
+        with STAGE_LATENCY.labels(stage='serialize').time():
+            results = df.to_dict('records')
+            
+            response = jsonify({
+                'results': results,
+                'total_transactions': len(results),
+                'fraud_count': int(sum(predictions)),
+                'fraud_percentage': (sum(predictions) / len(predictions)) * 100
+            })
         
-        return jsonify({
-            'results': results,
-            'total_transactions': len(results),
-            'fraud_count': int(sum(predictions)),
-            'fraud_percentage': (sum(predictions) / len(predictions)) * 100
-        }), 200
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/drift', methods=['GET'])
+def drift():
+    """PSI / KS of recent traffic against the training distribution"""
+    if drift_monitor is None:
+        return jsonify({
+            'error': 'No drift reference in the model metadata',
+            'instructions': 'Retrain (python train.py) or run: python drift_monitor.py --data <csv>'
+        }), 404
+    windows = request.args.get('windows', type=int)
+    return jsonify(drift_monitor.report(windows)), 200
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an uploaded file for background scoring"""
+    if not models_loaded:
+        return jsonify({
+            'error': 'Models not loaded. Please train the model first.'
+        }), 503
+    
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    try:
+        job = job_manager.submit(file, file.filename)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ImportError as e:
+        return jsonify({'error': str(e)}), 415
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    
+    job['status_url'] = f"/jobs/{job['id']}"
+    job['results_url'] = f"/jobs/{job['id']}/results"
+    return jsonify(job), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """State and progress of a batch job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job), 200
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Scored rows as CSV: every completed chunk so far, or ?part=N"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    part = request.args.get('part', type=int)
+    if part is not None and not 0 <= part < job['parts_completed']:
+        return jsonify({'error': f"Part {part} is not available",
+                        'parts_completed': job['parts_completed']}), 404
+    if part is None and job['parts_completed'] == 0:
+        return jsonify({'error': 'No results yet', 'state': job['state']}), 409
+    
+    return Response(
+        job_manager.iter_results(job_id, part),
+        mimetype='text/csv',
+        headers={
+            'X-Job-State': job['state'],
+            'X-Parts-Completed': str(job['parts_completed'])
+        }
+    )
+
+@app.route('/shadow', methods=['GET'])
+def shadow_report():
+    """Agreement, score deltas and latency of the shadow vs. the primary model"""
+    if shadow_scorer is None:
+        return jsonify({'error': 'No shadow model loaded'}), 404
+    return jsonify(shadow_scorer.report()), 200
+
+@app.route('/shadow', methods=['POST'])
+def load_shadow():
+    """Start shadow scoring with the bundle in {"model_dir": ...} (default models/shadow).
+
+    Bundles are unpickled, so only directories inside models/ are accepted.
+    """
+    data = request.get_json(silent=True) or {}
+    model_dir = data.get('model_dir', SHADOW_MODEL_DIR)
+    models_root = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    if not isinstance(model_dir, str) or os.path.isabs(model_dir):
+        return jsonify({'error': 'model_dir must be a path relative to the API directory'}), 400
+    model_dir = os.path.realpath(os.path.join(os.path.dirname(models_root), model_dir))
+    if os.path.commonpath([model_dir, models_root]) != models_root:
+        return jsonify({'error': 'model_dir must be inside models/'}), 403
+    try:
+        scorer = start_shadow(model_dir)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify(scorer.report()), 200
+
+@app.route('/shadow', methods=['DELETE'])
+def stop_shadow():
+    """Stop shadow scoring; returns the final report"""
+    global shadow_scorer
+    if shadow_scorer is None:
+        return jsonify({'error': 'No shadow model loaded'}), 404
+    scorer, shadow_scorer = shadow_scorer, None
+    scorer.stop()
+    return jsonify(scorer.report()), 200
+
 @app.route('/reload_models', methods=['POST'])
 def reload_models():
     """Reload models from disk"""
-    global models_loaded
+    global models_loaded, drift_monitor, explainer
     try:
-        models_loaded = model_manager.load_models()
+        reloaded = model_manager.load_models()
+        # A failed reload leaves the previous bundle in memory, still serving
+        models_loaded = model_manager.model is not None
+        if reloaded:
+            drift_monitor = DriftMonitor.from_metadata(model_manager.metadata)
+            explainer = PredictionExplainer.from_manager(model_manager)
+            segment_models.reload()
+            if shard_router is not None:
+                # The shard processes score uploads with their own copy
+                shard_router.reload_models()
+            message = 'Models reloaded successfully'
+        elif models_loaded:
+            message = 'Failed to load models; still serving the previous model'
+        else:
+            message = 'Failed to load models'
         return jsonify({
-            'success': True,
+            'success': reloaded,
             'model_loaded': models_loaded,
-            'message': 'Models reloaded successfully' if models_loaded else 'Failed to load models'
-        }), 200
+            'model_version': model_manager.model_version,
+            'message': message
+        }), 200 if reloaded else 500
     except Exception as e:
+        models_loaded = model_manager.model is not None
         return jsonify({
             'success': False,
+            'model_loaded': models_loaded,
             'error': str(e)
         }), 500
 
@@ -168,6 +548,7 @@ if __name__ == '__main__':
     
     print("\nAPI running on http://localhost:5000")
     print("Health check: http://localhost:5000/health")
+    print("Metrics: http://localhost:5000/metrics")
     print("-" * 60)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
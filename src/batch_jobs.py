@@ -0,0 +1,321 @@
+"""
+Background batch scoring jobs.
+
+An uploaded file is saved under ``jobs_dir/<job_id>/`` and scored by a small
+pool of worker threads, one chunk at a time:
+
+- ``status.json`` holds the job state and progress, rewritten atomically
+  after every chunk
+- ``results/part-00000.csv``, ... hold one scored chunk each and can be
+  downloaded while the job is still running
+
+Jobs must not starve real-time scoring: requests wrapped in
+``JobManager.realtime()`` make the workers pause between chunks (for at most
+``max_yield`` seconds per chunk), batch rows bypass the prediction cache, and
+at most ``max_queued`` jobs may wait for a worker. Jobs left queued or running
+by a restart resume from their last completed chunk. Finished jobs (and
+their files) are deleted ``job_ttl`` seconds after they finished.
+"""
+import csv
+import io
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import count_rows, file_format, iter_frames, require_arrow
+from transaction_schema import TRANSACTION_SCHEMA, SchemaValidationError, validate_frame
+
+JOB_COLUMNS = ['Transaction_ID'] + [field.name for field in TRANSACTION_SCHEMA]
+ACTIVE_STATES = ('queued', 'running')
+FINISHED_STATES = ('completed', 'failed')
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _count_csv_rows(path):
+    """Data rows in a CSV, minus the header (quoted fields may span lines)"""
+    with io.open(path, newline='', encoding='utf-8', errors='replace') as f:
+        # Blank lines are skipped, like pd.read_csv does
+        records = sum(1 for record in csv.reader(f) if record)
+    return max(records - 1, 0)
+
+
+class JobManager:
+    def __init__(self, model_manager, jobs_dir='jobs', max_workers=1, max_queued=8,
+                 chunk_size=16384, max_yield=0.05, segment_models=None, shard_router=None,
+                 job_ttl=24 * 3600):
+        self.model_manager = model_manager
+        # Routes rows to per-segment models when given (see segment_models.py)
+        self.segment_models = segment_models
+        # Scores rows in the shard owning their user when given (see sharding.py)
+        self.shard_router = shard_router
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.chunk_size = chunk_size
+        self.max_yield = max_yield
+        # Seconds a finished job stays downloadable
+        self.job_ttl = job_ttl
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._workers = []
+        self._stopping = threading.Event()
+        # Real-time requests in flight; workers wait on it between chunks
+        self._realtime = 0
+        self._idle = threading.Condition()
+        self._recover()
+
+    # -------- Lifecycle --------
+    def _recover(self):
+        """Reload job statuses from disk and requeue unfinished jobs"""
+        if not os.path.isdir(self.jobs_dir):
+            return
+        unfinished = []
+        for job_id in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, job_id, 'status.json')
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                job = json.load(f)
+            self._jobs[job_id] = job
+            if job['state'] in ACTIVE_STATES:
+                unfinished.append(job)
+        for job in sorted(unfinished, key=lambda j: j['created_at']):
+            self._queue.put(job['id'])
+        if unfinished:
+            print(f"⚠️  Resuming {len(unfinished)} unfinished batch job(s)")
+        self.cleanup()
+
+    def cleanup(self, now=None):
+        """Delete jobs that finished more than ``job_ttl`` seconds ago; returns their IDs"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['state'] in FINISHED_STATES
+                       and (job['finished_at'] or job['updated_at']) + self.job_ttl <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for job_id in expired:
+            shutil.rmtree(self._dir(job_id), ignore_errors=True)
+        if expired:
+            print(f"ℹ️ Deleted {len(expired)} batch job(s) finished over {self.job_ttl:,}s ago")
+        return expired
+
+    def start(self):
+        if self._workers:
+            return self
+        self._stopping.clear()
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._run, name=f'batch-job-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the workers after their current chunk; running jobs resume on restart"""
+        self._stopping.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    # -------- Real-time priority --------
+    @contextmanager
+    def realtime(self):
+        """Mark a real-time request in flight; batch workers pause meanwhile"""
+        with self._idle:
+            self._realtime += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._realtime -= 1
+                if not self._realtime:
+                    self._idle.notify_all()
+
+    def wait_for_idle(self, timeout):
+        """Block while real-time requests are in flight, for at most ``timeout`` seconds"""
+        with self._idle:
+            if self._realtime:
+                self._idle.wait_for(lambda: not self._realtime, timeout=timeout)
+
+    def _yield_to_realtime(self):
+        self.wait_for_idle(self.max_yield)
+
+    # -------- Jobs --------
+    def _dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _part_path(self, job_id, part):
+        return os.path.join(self._dir(job_id), 'results', f'part-{part:05d}.csv')
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            job['updated_at'] = time.time()
+            snapshot = dict(job)
+        _write_json(os.path.join(self._dir(job_id), 'status.json'), snapshot)
+        return snapshot
+
+    def submit(self, upload, filename):
+        """Save an uploaded file and queue it; returns the job status"""
+        fmt = file_format(filename)
+        if fmt is None:
+            raise ValueError('Only CSV, Parquet and Arrow IPC files are supported')
+        if fmt != 'csv':
+            require_arrow()
+
+        self.cleanup()
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            queued = sum(job['state'] == 'queued' for job in self._jobs.values())
+            if queued >= self.max_queued:
+                raise JobQueueFull(f'{queued} batch jobs already queued, try again later')
+            self._jobs[job_id] = {
+                'id': job_id,
+                'state': 'queued',
+                'filename': filename,
+                'format': fmt,
+                'input': 'input' + os.path.splitext(filename)[1].lower(),
+                'created_at': now,
+                'started_at': None,
+                'finished_at': None,
+                'updated_at': now,
+                'total_rows': None,
+                'rows_processed': 0,
+                'parts_completed': 0,
+                'fraud_count': 0,
+                'error': None
+            }
+
+        os.makedirs(os.path.join(self._dir(job_id), 'results'), exist_ok=True)
+        with open(os.path.join(self._dir(job_id), self._jobs[job_id]['input']), 'wb') as f:
+            shutil.copyfileobj(getattr(upload, 'stream', upload), f)
+        job = self._update(job_id)
+        self._queue.put(job_id)
+        return job
+
+    def get(self, job_id):
+        """Status with progress, or None for an unknown job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if job['total_rows']:
+            job['progress'] = round(min(job['rows_processed'] / job['total_rows'], 1.0), 4)
+        else:
+            job['progress'] = 1.0 if job['state'] == 'completed' else None
+        return job
+
+    def iter_results(self, job_id, part=None):
+        """CSV text of the completed parts (or one part), header written once"""
+        job = self.get(job_id)
+        parts = range(job['parts_completed']) if part is None else [part]
+        for i, k in enumerate(parts):
+            with open(self._part_path(job_id, k)) as f:
+                if i:
+                    f.readline()
+                for block in iter(lambda: f.read(1 << 16), ''):
+                    yield block
+
+    # -------- Worker --------
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._process(job_id)
+            except Exception as e:
+                self._update(job_id, state='failed', finished_at=time.time(),
+                             error={'error': f'{type(e).__name__}: {e}'})
+            self.cleanup()
+
+    def _frames(self, path, fmt):
+        if fmt == 'csv':
+            return pd.read_csv(path, chunksize=self.chunk_size)
+        return iter_frames(path, fmt, columns=JOB_COLUMNS, batch_size=self.chunk_size)
+
+    def _process(self, job_id):
+        job = self.get(job_id)
+        path = os.path.join(self._dir(job_id), job['input'])
+        if job['state'] == 'queued':
+            total = _count_csv_rows(path) if job['format'] == 'csv' else count_rows(path, job['format'])
+            job = self._update(job_id, state='running', started_at=time.time(), total_rows=total)
+
+        # Chunk boundaries are deterministic, so a resumed job skips finished parts
+        done = job['parts_completed']
+        for part, df in enumerate(self._frames(path, job['format'])):
+            if self._stopping.is_set():
+                return
+            if part < done:
+                continue
+            self._yield_to_realtime()
+
+            offset = job['rows_processed']
+            try:
+                validate_frame(df)
+            except SchemaValidationError as e:
+                for error in e.errors:
+                    if error['index'] is not None:
+                        error['index'] += offset
+                self._update(job_id, state='failed', finished_at=time.time(), error=e.to_dict())
+                return
+
+            if df.empty:
+                predictions, probabilities = np.zeros(0, dtype=int), np.zeros((0, 2))
+                risk_levels = np.zeros(0, dtype=object)
+            elif self.shard_router is not None:
+                predictions, probabilities, risk_levels = self.shard_router.predict_frame(df)
+            elif self.segment_models is not None:
+                predictions, probabilities, segments = self.segment_models.predict(df, use_cache=False)
+                risk_levels = self.segment_models.decisions(probabilities[:, 1], segments)[0]
+            else:
+                predictions, probabilities = self.model_manager.predict(df, use_cache=False)
+                risk_levels = self.model_manager.decision_engine.risk_levels(probabilities[:, 1])
+            results = pd.DataFrame({
+                'Transaction_ID': df['Transaction_ID'] if 'Transaction_ID' in df
+                else pd.RangeIndex(offset, offset + len(df)),
+                'is_fraud_predicted': predictions,
+                'fraud_probability': probabilities[:, 1],
+                'legit_probability': probabilities[:, 0],
+                'risk_level': risk_levels
+            })
+            part_path = self._part_path(job_id, part)
+            results.to_csv(part_path + '.tmp', index=False)
+            os.replace(part_path + '.tmp', part_path)
+
+            job = self._update(
+                job_id,
+                parts_completed=part + 1,
+                rows_processed=offset + len(df),
+                fraud_count=job['fraud_count'] + int(predictions.sum())
+            )
+
+        self._update(job_id, state='completed', finished_at=time.time(),
+                     total_rows=job['rows_processed'])
+        print(f"✅ Batch job {job_id}: {job['rows_processed']:,} rows, "
+              f"{job['fraud_count']:,} flagged")
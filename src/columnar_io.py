@@ -0,0 +1,184 @@
+"""
+Parquet and Arrow IPC input (pyarrow is optional).
+
+- ``read_frame`` reads only the requested columns and converts them with
+  ``split_blocks``/``self_destruct`` so numeric columns without nulls reach
+  pandas without an extra copy
+- ``iter_frames`` yields one DataFrame per record batch, so large files can
+  be scored batch by batch instead of being materialized whole
+
+Run ``python columnar_io.py`` to compare read and scoring throughput of CSV,
+Parquet and Arrow IPC on the same data.
+"""
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'ipc',
+    '.feather': 'ipc',
+    '.ipc': 'ipc'
+}
+
+
+def file_format(filename):
+    """'csv', 'parquet', 'ipc' or None, from the file extension"""
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def require_arrow():
+    if pa is None:
+        raise ImportError("Parquet / Arrow IPC support requires pyarrow: pip install pyarrow")
+
+
+def _ipc_reader(source):
+    """Arrow IPC file (random access) or stream format"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    try:
+        return ipc.open_file(source)
+    except pa.ArrowInvalid:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return ipc.open_stream(source)
+
+
+def _present(schema_names, columns):
+    if columns is None:
+        return None
+    return [c for c in columns if c in schema_names]
+
+
+def _to_pandas(table_or_batch):
+    return table_or_batch.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_frame(source, fmt, columns=None):
+    """Whole file as a DataFrame, reading only ``columns`` that exist"""
+    require_arrow()
+    if fmt == 'parquet':
+        names = pq.ParquetFile(source).schema_arrow.names
+        table = pq.read_table(source, columns=_present(names, columns))
+    elif fmt == 'ipc':
+        reader = _ipc_reader(source)
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select(_present(table.schema.names, columns))
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+    return _to_pandas(table)
+
+
+def iter_frames(source, fmt, columns=None, batch_size=65536):
+    """One DataFrame per record batch, in file order"""
+    require_arrow()
+    if fmt == 'parquet':
+        parquet_file = pq.ParquetFile(source)
+        selected = _present(parquet_file.schema_arrow.names, columns)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=selected):
+            yield _to_pandas(batch)
+    elif fmt == 'ipc':
+        reader = _ipc_reader(source)
+        selected = _present(reader.schema.names, columns)
+        if isinstance(reader, ipc.RecordBatchFileReader):
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            batches = reader
+        for batch in batches:
+            if selected is not None:
+                batch = batch.select(selected)
+            yield _to_pandas(batch)
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+
+
+def count_rows(path, fmt):
+    """Row count from file metadata, without decoding the data (None if unknown)"""
+    require_arrow()
+    if fmt == 'parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == 'ipc':
+        reader = _ipc_reader(pa.memory_map(path))
+        if isinstance(reader, ipc.RecordBatchFileReader):
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return None
+
+
+def write_frame(df, path, fmt, row_group_size=65536):
+    """Write a DataFrame as Parquet or Arrow IPC (file format)"""
+    require_arrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == 'parquet':
+        pq.write_table(table, path, row_group_size=row_group_size)
+    elif fmt == 'ipc':
+        with ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+    return path
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', n_rows=500000):
+    """Read and read+score throughput of CSV vs Parquet vs Arrow IPC"""
+    from data_utils import DataProcessor
+    from model_persistence import ModelManager
+    from transaction_schema import TRANSACTION_SCHEMA
+
+    processor = DataProcessor()
+    raw = processor.load_data(data_path)
+    features = processor.feature_engineering(raw).drop(columns=['Is_Fraudulent'])
+    features = pd.concat([features] * (n_rows // len(features) + 1), ignore_index=True).head(n_rows)
+    model_columns = [field.name for field in TRANSACTION_SCHEMA]
+
+    manager = ModelManager(cache_size=0)
+    manager.load_models()
+
+    directory = tempfile.mkdtemp(prefix='columnar_bench_')
+    paths = {
+        'csv': os.path.join(directory, 'features.csv'),
+        'parquet': os.path.join(directory, 'features.parquet'),
+        'ipc': os.path.join(directory, 'features.arrow')
+    }
+    features.to_csv(paths['csv'], index=False)
+    write_frame(features, paths['parquet'], 'parquet')
+    write_frame(features, paths['ipc'], 'ipc')
+
+    print(f"\n{len(features):,} rows, {features.shape[1]} columns")
+    for fmt, path in paths.items():
+        size_mb = os.path.getsize(path) / 1e6
+
+        start = time.perf_counter()
+        if fmt == 'csv':
+            df = pd.read_csv(path, usecols=model_columns)
+        else:
+            df = read_frame(path, fmt, columns=model_columns)
+        read_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if fmt == 'csv':
+            for chunk in pd.read_csv(path, usecols=model_columns, chunksize=65536):
+                manager.predict(chunk[model_columns])
+        else:
+            for chunk in iter_frames(path, fmt, columns=model_columns):
+                manager.predict(chunk[model_columns])
+        score_seconds = time.perf_counter() - start
+
+        print(f"{fmt:>8}: {size_mb:7.1f} MB | read {read_seconds:6.2f}s "
+              f"({len(df) / read_seconds:,.0f} rows/s) | read+score {score_seconds:6.2f}s "
+              f"({len(df) / score_seconds:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    benchmark()
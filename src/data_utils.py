@@ -4,6 +4,69 @@ from sklearn.model_selection import train_test_split
 import warnings
 warnings.filterwarnings('ignore')
 
+from columnar_io import file_format, read_frame
+
+# Raw export column names -> names used throughout the pipeline
+COLUMN_RENAMES = {
+    'transaction_id': 'Transaction_ID',
+    'user_id': 'User_ID',
+    'transaction_datetime': 'Transaction_Time',
+    'amount': 'Transaction_Amount',
+    'merchant_category': 'Merchant_Category',
+    'transaction_channel': 'Transaction_Channel',
+    'device_type': 'Device_Type',
+    'location': 'Location',
+    'is_fraud': 'Is_Fraudulent'
+}
+
+
+def point_in_time_user_stats(user_ids, times, amounts):
+    """Expanding per-user mean / std / count as of each transaction.
+
+    Rows are ordered once by (User_ID, Transaction_Time), ties kept in input
+    order, and the statistics come from grouped cumulative sums over that
+    order, so the cost is one sort plus a few linear passes. Each row's
+    statistics include the row itself; the std of a user's first transaction
+    is 0. Results are returned in the input row order.
+    """
+    users = np.asarray(user_ids)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    n = len(amounts)
+    # np.lexsort is stable: equal (user, time) pairs keep their input order
+    order = np.lexsort((np.asarray(times, dtype='datetime64[ns]').view(np.int64), users))
+
+    sorted_users = users[order]
+    sorted_amounts = amounts[order]
+    first = np.ones(n, dtype=bool)
+    first[1:] = sorted_users[1:] != sorted_users[:-1]
+    positions = np.arange(n)
+    group_start = np.maximum.accumulate(np.where(first, positions, 0))
+    group_id = np.cumsum(first)
+
+    # Sums of deviations from the user's first amount keep the
+    # sum-of-squares formula well conditioned for large amounts
+    count = positions - group_start + 1
+    deviation = sorted_amounts - sorted_amounts[group_start]
+    grouped = pd.DataFrame({'d': deviation, 'd2': deviation * deviation}).groupby(group_id, sort=False)
+    sums = grouped.cumsum()
+    s1 = sums['d'].to_numpy()
+    s2 = sums['d2'].to_numpy()
+
+    mean = sorted_amounts[group_start] + s1 / count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.maximum(s2 - s1 * s1 / count, 0.0) / (count - 1)
+    std = np.where(count > 1, np.sqrt(var), 0.0)
+
+    stats = {
+        'User_Avg_Amount': np.empty(n),
+        'User_Std_Amount': np.empty(n),
+        'User_Transaction_Count': np.empty(n, dtype=np.int64)
+    }
+    stats['User_Avg_Amount'][order] = mean
+    stats['User_Std_Amount'][order] = std
+    stats['User_Transaction_Count'][order] = count
+    return stats
+
 
 class DataProcessor:
     def __init__(self, random_state=42):
@@ -11,23 +74,27 @@ class DataProcessor:
         self.categorical_cols = None
         self.numerical_cols = None
 
-    def load_data(self, filepath):
-        """Load and standardize the dataset"""
+    def load_data(self, filepath, columns=None):
+        """Load and standardize the dataset (CSV, Parquet or Arrow IPC)
+
+        ``columns`` (standardized names) limits which columns are read.
+        """
         print(f"Loading data from {filepath}")
-        df = pd.read_csv(filepath)
+        raw_columns = None
+        if columns is not None:
+            raw_names = {new: old for old, new in COLUMN_RENAMES.items()}
+            raw_columns = list(columns) + [raw_names[c] for c in columns if c in raw_names]
+
+        fmt = file_format(filepath)
+        if fmt in ('parquet', 'ipc'):
+            df = read_frame(filepath, fmt, columns=raw_columns)
+        elif raw_columns is not None:
+            df = pd.read_csv(filepath, usecols=lambda c: c in raw_columns)
+        else:
+            df = pd.read_csv(filepath)
 
         # -------- STANDARDIZE COLUMN NAMES --------
-        df.rename(columns={
-            'transaction_id': 'Transaction_ID',
-            'user_id': 'User_ID',
-            'transaction_datetime': 'Transaction_Time',
-            'amount': 'Transaction_Amount',
-            'merchant_category': 'Merchant_Category',
-            'transaction_channel': 'Transaction_Channel',
-            'device_type': 'Device_Type',
-            'location': 'Location',
-            'is_fraud': 'Is_Fraudulent'
-        }, inplace=True)
+        df.rename(columns=COLUMN_RENAMES, inplace=True)
         # ------------------------------------------
 
         print(f"Dataset shape: {df.shape}")
@@ -35,8 +102,9 @@ class DataProcessor:
         print(f"\nData types:\n{df.dtypes}")
         print(f"\nMissing values:\n{df.isnull().sum()}")
 
-        print("\nClass distribution:")
-        print(df['Is_Fraudulent'].value_counts(normalize=True))
+        if 'Is_Fraudulent' in df.columns:
+            print("\nClass distribution:")
+            print(df['Is_Fraudulent'].value_counts(normalize=True))
 
         return df
 
@@ -61,8 +129,15 @@ class DataProcessor:
 
         return categorical_cols, numerical_cols
 
-    def feature_engineering(self, df):
-        """Create ML-ready features"""
+    def feature_engineering(self, df, point_in_time=False, float32=False):
+        """Create ML-ready features
+
+        With ``point_in_time=True`` the user aggregates of each transaction
+        only cover that user's transactions up to and including it (see
+        ``point_in_time_user_stats``), matching what the streaming
+        ``FeatureEnricher`` computes online. ``float32=True`` returns
+        downcast columns (see ``downcast``).
+        """
         df_eng = df.copy()
 
         # -------- DATETIME PARSING (FIXED) --------
@@ -81,22 +156,30 @@ class DataProcessor:
         df_eng['Is_Weekend'] = df_eng['DayOfWeek'].isin([5, 6]).astype(int)
         df_eng['Is_Night'] = ((df_eng['Hour'] >= 0) & (df_eng['Hour'] <= 6)).astype(int)
 
-        # ⛔ IMPORTANT: REMOVE DATETIME COLUMN
-        df_eng = df_eng.drop(columns=['Transaction_Time'])
-
         # -------- USER BEHAVIOR FEATURES --------
-        user_stats = df_eng.groupby('User_ID').agg({
-            'Transaction_Amount': ['mean', 'std', 'count']
-        }).reset_index()
+        if point_in_time:
+            stats = point_in_time_user_stats(
+                df_eng['User_ID'], df_eng['Transaction_Time'], df_eng['Transaction_Amount']
+            )
+            df_eng = df_eng.drop(columns=['Transaction_Time'])
+            for col, values in stats.items():
+                df_eng[col] = values
+        else:
+            # ⛔ IMPORTANT: REMOVE DATETIME COLUMN
+            df_eng = df_eng.drop(columns=['Transaction_Time'])
+
+            user_stats = df_eng.groupby('User_ID').agg({
+                'Transaction_Amount': ['mean', 'std', 'count']
+            }).reset_index()
 
-        user_stats.columns = [
-            'User_ID',
-            'User_Avg_Amount',
-            'User_Std_Amount',
-            'User_Transaction_Count'
-        ]
+            user_stats.columns = [
+                'User_ID',
+                'User_Avg_Amount',
+                'User_Std_Amount',
+                'User_Transaction_Count'
+            ]
 
-        df_eng = pd.merge(df_eng, user_stats, on='User_ID', how='left')
+            df_eng = pd.merge(df_eng, user_stats, on='User_ID', how='left')
 
         # -------- AMOUNT FEATURES --------
         df_eng['Amount_Log'] = np.log1p(df_eng['Transaction_Amount'])
@@ -104,8 +187,24 @@ class DataProcessor:
             df_eng['Transaction_Amount'] / (df_eng['User_Avg_Amount'] + 1)
         )
 
+        if float32:
+            df_eng = self.downcast(df_eng)
+
         return df_eng
 
+    @staticmethod
+    def downcast(df):
+        """float64 columns to float32, integer columns to the smallest integer type
+
+        Features are computed in float64 and stored as float32 once, so the
+        training matrix is half the size.
+        """
+        floats = df.select_dtypes(include='float64').columns
+        integers = df.select_dtypes(include='integer').columns
+        converted = {col: df[col].astype(np.float32) for col in floats}
+        converted.update({col: pd.to_numeric(df[col], downcast='integer') for col in integers})
+        return df.assign(**converted)
+
     def prepare_data(self, df, test_size=0.2, validate_size=0.1):
         """Prepare train, validation, and test splits"""
         X = df.drop(['Transaction_ID', 'Is_Fraudulent'], axis=1)
@@ -135,3 +234,23 @@ class DataProcessor:
         print(y_train.value_counts(normalize=True))
 
         return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+def benchmark_point_in_time(sizes=(1_000_000, 4_000_000, 16_000_000), n_users=100_000):
+    """Point-in-time aggregates: wall time and ns/row for growing inputs"""
+    import time
+
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        user_ids = rng.integers(0, n_users, n)
+        times = np.datetime64('2024-01-01') + rng.integers(0, 86400 * 365, n).astype('timedelta64[s]')
+        amounts = rng.gamma(2.0, 600.0, n)
+
+        start = time.perf_counter()
+        point_in_time_user_stats(user_ids, times, amounts)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>12,} rows: {elapsed:6.2f}s ({elapsed / n * 1e9:5.0f} ns/row)")
+
+
+if __name__ == "__main__":
+    benchmark_point_in_time()
@@ -0,0 +1,140 @@
+"""
+Threshold optimization and cost-sensitive decisions on fraud probabilities.
+
+``DecisionEngine.fit`` evaluates every possible threshold on validation
+probabilities in a single sorted pass (see ``evaluate_model.threshold_curve``)
+and picks:
+
+- the review threshold: flags a transaction as fraud and minimizes the
+  expected cost ``fp * false_positive_cost + fn * false_negative_cost``
+- the block threshold: the lowest threshold whose precision reaches
+  ``block_precision``, kept at least ``min_review_band`` above the review
+  threshold so the REVIEW band does not vanish. When that would put it
+  above 1, review and block merge (everything flagged is blocked) and
+  ``fit`` says so.
+
+At serving time both are applied to whole probability arrays with one
+``np.searchsorted`` call.
+"""
+import numpy as np
+
+from evaluate_model import threshold_curve
+
+RISK_LEVELS = np.array(['LOW', 'MEDIUM', 'HIGH'])
+RECOMMENDATIONS = np.array([
+    'APPROVE - Low risk transaction',
+    'REVIEW - Manual verification required',
+    'BLOCK - High risk transaction'
+])
+
+
+def threshold_table(y_true, y_prob, false_positive_cost=1.0, false_negative_cost=1.0):
+    """Precision, recall and expected cost for every distinct threshold.
+
+    Row ``i`` describes flagging every transaction with probability
+    ``>= thresholds[i]``; thresholds are in descending order.
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    fps, tps, thresholds = threshold_curve(y_true, y_prob)
+    n_pos = int(y_true.sum())
+
+    fns = n_pos - tps
+    return {
+        'thresholds': thresholds,
+        'true_positives': tps,
+        'false_positives': fps,
+        'precision': tps / (tps + fps),
+        'recall': tps / n_pos if n_pos else np.zeros(len(tps)),
+        'expected_cost': fps * false_positive_cost + fns * false_negative_cost
+    }
+
+
+def _as_threshold(value):
+    return float('inf') if value is None else float(value)
+
+
+def _finite_or_none(value):
+    return value if np.isfinite(value) else None
+
+
+class DecisionEngine:
+    def __init__(self, review_threshold=0.3, block_threshold=0.7, decision_threshold=0.5,
+                 false_positive_cost=None, false_negative_cost=None):
+        # Defaults reproduce the previously hardcoded cutoffs: 0.3 / 0.7 for
+        # the risk level and the classifier's own 0.5 for is_fraud
+        self.review_threshold = _as_threshold(review_threshold)
+        self.block_threshold = _as_threshold(block_threshold)
+        self.decision_threshold = _as_threshold(decision_threshold)
+        self.false_positive_cost = false_positive_cost
+        self.false_negative_cost = false_negative_cost
+        self._cutoffs = np.array([self.review_threshold, self.block_threshold])
+
+    @classmethod
+    def fit(cls, y_true, y_prob, false_positive_cost=5.0, false_negative_cost=100.0,
+            block_precision=0.9, min_review_band=0.05):
+        """Choose thresholds from validation labels and probabilities"""
+        table = threshold_table(y_true, y_prob, false_positive_cost, false_negative_cost)
+        thresholds = table['thresholds']
+
+        # Option of flagging nothing: every fraud is missed
+        n_pos = int(np.asarray(y_true).sum())
+        best = int(np.argmin(table['expected_cost']))
+        if table['expected_cost'][best] < n_pos * false_negative_cost:
+            review_threshold = float(thresholds[best])
+        else:
+            review_threshold = float('inf')
+
+        precise = np.flatnonzero(table['precision'] >= block_precision)
+        # Thresholds are descending, so the last qualifying one is the lowest
+        block_threshold = float(thresholds[precise[-1]]) if len(precise) else float('inf')
+        merged = False
+        if block_threshold - review_threshold < min_review_band:
+            if review_threshold + min_review_band <= 1.0:
+                block_threshold = review_threshold + min_review_band
+            else:
+                block_threshold = review_threshold
+                merged = np.isfinite(review_threshold)
+
+        engine = cls(
+            review_threshold=review_threshold,
+            block_threshold=block_threshold,
+            decision_threshold=review_threshold,
+            false_positive_cost=false_positive_cost,
+            false_negative_cost=false_negative_cost
+        )
+
+        print(f"Review threshold (min expected cost): {review_threshold:.4f}")
+        print(f"Block threshold (precision >= {block_precision}): {block_threshold:.4f}")
+        if merged:
+            print("⚠️ Review and block thresholds merged: no room for a REVIEW band above "
+                  f"{review_threshold:.4f}, every flagged transaction is blocked")
+        return engine
+
+    def is_fraud(self, fraud_probabilities):
+        return np.asarray(fraud_probabilities) >= self.decision_threshold
+
+    def level_codes(self, fraud_probabilities):
+        """0 = LOW, 1 = MEDIUM, 2 = HIGH"""
+        return np.searchsorted(self._cutoffs, fraud_probabilities, side='right')
+
+    def risk_levels(self, fraud_probabilities):
+        return RISK_LEVELS[self.level_codes(fraud_probabilities)]
+
+    def recommendations(self, fraud_probabilities):
+        return RECOMMENDATIONS[self.level_codes(fraud_probabilities)]
+
+    def to_dict(self):
+        """JSON-safe configuration; an unreachable threshold is stored as None"""
+        return {
+            'review_threshold': _finite_or_none(self.review_threshold),
+            'block_threshold': _finite_or_none(self.block_threshold),
+            'decision_threshold': _finite_or_none(self.decision_threshold),
+            'false_positive_cost': self.false_positive_cost,
+            'false_negative_cost': self.false_negative_cost
+        }
+
+    @classmethod
+    def from_dict(cls, config):
+        if not config:
+            return cls()
+        return cls(**config)
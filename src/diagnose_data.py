@@ -4,7 +4,11 @@ Diagnose data issues and suggest fixes
 """
 import pandas as pd
 import numpy as np
+import argparse
+import io
+import multiprocessing
 import os
+from sketches import HyperLogLog, BloomFilter
 
 def diagnose_data(filepath):
     print("="*80)
@@ -77,18 +81,14 @@ def diagnose_data(filepath):
     # -------- RECOMMENDATIONS --------
     print(f"\n💡 RECOMMENDATIONS:")
     
-    constant_cols = [col for col in df.columns if df[col].nunique() == 1]
+    n_unique = df.nunique()
+    constant_cols = n_unique[n_unique == 1].index.tolist()
     if constant_cols:
         print(f"   1. Remove constant columns: {constant_cols}")
     
     if len(numeric_cols) > 1:
         corr_matrix = df[numeric_cols].corr().abs()
-        high_corr = [
-            (corr_matrix.columns[i], corr_matrix.columns[j])
-            for i in range(len(corr_matrix.columns))
-            for j in range(i+1, len(corr_matrix.columns))
-            if corr_matrix.iloc[i, j] > 0.95
-        ]
+        high_corr = high_correlation_pairs(corr_matrix.to_numpy(), list(numeric_cols))
         if high_corr:
             print(f"   2. Highly correlated features (sample): {high_corr[:5]}")
     
@@ -99,10 +99,280 @@ def diagnose_data(filepath):
     print(f"\n✅ DIAGNOSIS COMPLETE")
     print("="*80)
 
+def high_correlation_pairs(corr, columns, threshold=0.95):
+    """Column pairs above the threshold, from the upper triangle of |corr|"""
+    rows, cols = np.nonzero(np.triu(np.abs(corr) > threshold, k=1))
+    return [(columns[i], columns[j]) for i, j in zip(rows, cols)]
+
+
+# ----------------------------------------------------------------------
+# Streaming diagnostics for files that do not fit in memory
+# ----------------------------------------------------------------------
+def _byte_ranges(filepath, chunk_bytes):
+    """Split the data part of a CSV (after the header) into byte ranges"""
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+    size = os.path.getsize(filepath)
+    starts = range(data_start, size, chunk_bytes)
+    return header, [(start, min(start + chunk_bytes, size)) for start in starts]
+
+
+def _read_range(filepath, start, end, data_start):
+    """Read the lines that start inside [start, end)"""
+    with open(filepath, 'rb') as f:
+        if start > data_start:
+            # Skip the line that started in the previous range
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(start)
+        position = f.tell()
+        if position >= end:
+            return b''
+        block = f.read(end - position)
+        if block and not block.endswith(b'\n'):
+            block += f.readline()
+    return block
+
+
+def _diagnose_chunk(task):
+    """Partial, mergeable statistics for one byte range (runs in a worker)"""
+    filepath, start, end, data_start, columns, numeric_cols, target_col, hll_p = task
+    block = _read_range(filepath, start, end, data_start)
+    if not block:
+        return None
+
+    df = pd.read_csv(io.BytesIO(block), header=None, names=columns)
+    numeric = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+
+    hlls = {}
+    for col in columns:
+        hll = HyperLogLog(hll_p)
+        values = df[col].dropna()
+        if len(values):
+            hll.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+        hlls[col] = hll.registers
+
+    complete = numeric.dropna().to_numpy(dtype=np.float64)
+    # Centered per chunk; merged with ``_merge_moments``
+    complete_mean = complete.mean(axis=0) if len(complete) else np.zeros(len(numeric_cols))
+    centered = complete - complete_mean
+
+    return {
+        'rows': len(df),
+        'missing': df.isnull().sum().to_numpy(),
+        'min': numeric.min().to_numpy(),
+        'max': numeric.max().to_numpy(),
+        'sum': numeric.sum().to_numpy(),
+        'count': numeric.count().to_numpy(),
+        'complete_rows': len(complete),
+        'complete_mean': complete_mean,
+        'comoment': centered.T @ centered,
+        'target_counts': (
+            df[target_col].value_counts().to_dict() if target_col else {}
+        ),
+        'hll': hlls,
+        'row_hashes': pd.util.hash_pandas_object(df, index=False).to_numpy()
+    }
+
+
+def _merge_moments(n_a, mean_a, comoment_a, n_b, mean_b, comoment_b):
+    """Pairwise merge of (count, mean, co-moment matrix) (Chan et al.)"""
+    n = n_a + n_b
+    if n == 0:
+        return n, mean_a, comoment_a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    comoment = comoment_a + comoment_b + np.outer(delta, delta) * (n_a * n_b / n)
+    return n, mean, comoment
+
+
+def diagnose_data_streaming(filepath, chunk_bytes=64 * 1024 * 1024, n_workers=None,
+                            hll_precision=14, bloom_error_rate=0.001,
+                            max_bloom_bytes=128 * 1024 * 1024):
+    """Chunked, multi-process variant of ``diagnose_data`` for very large CSVs.
+    
+    Workers parse byte ranges of the file in parallel and return mergeable
+    partial statistics: missing counts, min/max/mean, class balance, the
+    means and co-moments needed for the Pearson correlation matrix (merged
+    pairwise, which stays accurate for large offsets), HyperLogLog registers
+    for approximate distinct counts and 64-bit row hashes. The main process
+    merges each chunk as it arrives and runs the row hashes through one
+    Bloom filter for approximate duplicate detection. The filter is capped
+    at ``max_bloom_bytes``; past that its false-positive rate grows instead
+    of its size, so memory stays bounded by the chunk size and the sketches,
+    not the file size.
+    """
+    print("="*80)
+    print("🔍 DATA DIAGNOSIS REPORT (STREAMING)")
+    print("="*80)
+    
+    if not os.path.exists(filepath):
+        print(f"❌ File not found: {filepath}")
+        return None
+    
+    sample = pd.read_csv(filepath, nrows=10000)
+    columns = list(sample.columns)
+    numeric_cols = list(sample.select_dtypes(include=[np.number]).columns)
+    fraud_cols = [c for c in columns if 'fraud' in c.lower()]
+    target_col = fraud_cols[0] if fraud_cols else None
+    
+    header, ranges = _byte_ranges(filepath, chunk_bytes)
+    data_start = len(header)
+    
+    # Size the Bloom filter from the average row length of the sample
+    sample_bytes = len(sample.to_csv(index=False, header=False).encode())
+    avg_row_bytes = max(sample_bytes / max(len(sample), 1), 1)
+    expected_rows = int(os.path.getsize(filepath) / avg_row_bytes * 1.1) + 1
+    bits_per_row = -np.log(bloom_error_rate) / np.log(2) ** 2
+    max_rows = max(int(max_bloom_bytes * 8 / bits_per_row), 1)
+    bloom = BloomFilter(min(expected_rows, max_rows), bloom_error_rate)
+    duplicate_error_rate = bloom_error_rate
+    if expected_rows > max_rows:
+        duplicate_error_rate = float(1 - np.exp(-bloom.n_bits / expected_rows * np.log(2) ** 2))
+        print(
+            f"⚠️ Bloom filter capped at {max_bloom_bytes / 1024 ** 2:.0f} MB for ~{expected_rows:,} rows, "
+            f"duplicate false-positive rate ~{duplicate_error_rate:.3g}"
+        )
+    
+    n_numeric = len(numeric_cols)
+    rows = 0
+    missing = np.zeros(len(columns), dtype=np.int64)
+    col_min = np.full(n_numeric, np.inf)
+    col_max = np.full(n_numeric, -np.inf)
+    col_sum = np.zeros(n_numeric)
+    col_count = np.zeros(n_numeric, dtype=np.int64)
+    complete_rows = 0
+    complete_mean = np.zeros(n_numeric)
+    comoment = np.zeros((n_numeric, n_numeric))
+    target_counts = {}
+    hlls = {col: HyperLogLog(hll_precision) for col in columns}
+    duplicates = 0
+    
+    tasks = [
+        (filepath, start, end, data_start, columns, numeric_cols, target_col, hll_precision)
+        for start, end in ranges
+    ]
+    
+    with multiprocessing.Pool(n_workers) as pool:
+        # imap hands chunks over one at a time, as they are merged
+        for part in pool.imap(_diagnose_chunk, tasks):
+            if part is None:
+                continue
+            rows += part['rows']
+            missing += part['missing']
+            col_min = np.fmin(col_min, part['min'])
+            col_max = np.fmax(col_max, part['max'])
+            col_sum += np.nan_to_num(part['sum'])
+            col_count += part['count']
+            complete_rows, complete_mean, comoment = _merge_moments(
+                complete_rows, complete_mean, comoment,
+                part['complete_rows'], part['complete_mean'], part['comoment']
+            )
+            for label, count in part['target_counts'].items():
+                target_counts[label] = target_counts.get(label, 0) + count
+            for col in columns:
+                np.maximum(hlls[col].registers, part['hll'][col], out=hlls[col].registers)
+            duplicates += bloom.add_and_count_duplicates(part['row_hashes'])
+    
+    print(f"\n📊 BASIC INFO:")
+    print(f"   Rows: {rows}")
+    print(f"   Columns: {columns}")
+    print(f"   Chunks processed: {len(tasks)}")
+    
+    print(f"\n📈 MISSING VALUES:")
+    if missing.sum() == 0:
+        print("   ✅ No missing values found")
+    else:
+        for col, count in zip(columns, missing):
+            if count > 0:
+                percentage = (count / rows) * 100
+                print(f"   ⚠️  {col:<30}: {count} ({percentage:.2f}%)")
+    
+    print(f"\n🎯 TARGET VARIABLE ANALYSIS:")
+    if target_col:
+        fraud_cases = target_counts.get(1, 0)
+        fraud_percentage = (fraud_cases / rows) * 100 if rows else 0
+        print(f"   Target column: {target_col}")
+        print(f"   Fraud cases: {fraud_cases}")
+        print(f"   Non-fraud cases: {target_counts.get(0, 0)}")
+        print(f"   Fraud percentage: {fraud_percentage:.2f}%")
+    else:
+        print("   ❌ No fraud label column detected")
+    
+    means = np.divide(col_sum, col_count, out=np.full(n_numeric, np.nan), where=col_count > 0)
+    print(f"\n📊 NUMERIC FEATURE SUMMARY:")
+    for col, lo, hi, mean in list(zip(numeric_cols, col_min, col_max, means))[:10]:
+        print(f"   {col:<30}: min={lo:.2f}, max={hi:.2f}, mean={mean:.2f}")
+    
+    distinct = {col: hlls[col].count() for col in columns}
+    print(f"\n🔢 APPROXIMATE DISTINCT VALUES (HyperLogLog, p={hll_precision}):")
+    for col in columns:
+        print(f"   {col:<30}: ~{distinct[col]:,.0f}")
+    
+    corr = np.full((n_numeric, n_numeric), np.nan)
+    if complete_rows > 1:
+        cov = comoment / complete_rows
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+    
+    print(f"\n💡 RECOMMENDATIONS:")
+    
+    constant_cols = [col for col in columns if 0 < distinct[col] < 1.5]
+    if constant_cols:
+        print(f"   1. Remove constant columns: {constant_cols}")
+    
+    high_corr = high_correlation_pairs(corr, numeric_cols) if n_numeric > 1 else []
+    if high_corr:
+        print(f"   2. Highly correlated features (sample): {high_corr[:5]}")
+    
+    if duplicates > 0:
+        print(
+            f"   3. Remove ~{duplicates} duplicate rows "
+            f"(Bloom filter, false-positive rate {duplicate_error_rate:.3g})"
+        )
+    
+    print(f"\n✅ DIAGNOSIS COMPLETE")
+    print("="*80)
+    
+    return {
+        'rows': rows,
+        'columns': columns,
+        'missing': dict(zip(columns, missing.tolist())),
+        'numeric_summary': {
+            col: {'min': float(lo), 'max': float(hi), 'mean': float(mean)}
+            for col, lo, hi, mean in zip(numeric_cols, col_min, col_max, means)
+        },
+        'target_counts': target_counts,
+        'approx_distinct': distinct,
+        'correlation': pd.DataFrame(corr, index=numeric_cols, columns=numeric_cols),
+        'high_correlation_pairs': high_corr,
+        'approx_duplicates': duplicates,
+        'duplicate_error_rate': duplicate_error_rate
+    }
+
+
 if __name__ == "__main__":
     # -------- FIXED DATA PATH --------
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = os.path.dirname(BASE_DIR)
-    data_file = os.path.join(PROJECT_ROOT, "data", "user_transaction_dataset.csv")
+    default_file = os.path.join(PROJECT_ROOT, "data", "user_transaction_dataset.csv")
+    
+    parser = argparse.ArgumentParser(description="Diagnose data issues")
+    parser.add_argument('data_file', nargs='?', default=default_file)
+    parser.add_argument('--streaming', action='store_true',
+                        help="Chunked multi-process mode for files larger than memory")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-mb', type=int, default=64)
+    args = parser.parse_args()
     
-    diagnose_data(data_file)
+    if args.streaming:
+        diagnose_data_streaming(
+            args.data_file,
+            chunk_bytes=args.chunk_mb * 1024 * 1024,
+            n_workers=args.workers
+        )
+    else:
+        diagnose_data(args.data_file)
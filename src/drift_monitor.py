@@ -0,0 +1,322 @@
+"""
+Input drift monitoring for served traffic.
+
+At training time ``build_reference`` bins the training features (quantile
+edges for numeric features, a vocabulary plus an ``__other__`` bucket for
+categorical ones) and the counts are saved in the model metadata as
+``drift_reference``.
+
+While serving, ``DriftMonitor.observe`` adds each scored batch to fixed-bin
+histograms. The histograms are striped: a fixed set of accumulators,
+picked by thread ID, each behind its own lock, so concurrent requests
+rarely wait on each other and nothing is allocated per request or per
+thread. Each accumulator keeps a ring of ``n_windows`` time windows of
+``window_seconds`` each. ``report()`` merges the accumulators over the
+most recent windows and compares them with the reference:
+
+- PSI (population stability index) for every feature
+- KS (max CDF distance over the bins) for numeric features
+
+Run ``python drift_monitor.py --data <csv>`` to add a reference to an
+existing model bundle, or ``--benchmark`` to measure the per-request overhead.
+"""
+import argparse
+import bisect
+import os
+import threading
+import time
+
+import numpy as np
+
+DRIFT_FEATURES = {
+    'Transaction_Amount': 'numeric',
+    'Hour': 'numeric',
+    'Location': 'categorical',
+    'Merchant_Category': 'categorical'
+}
+OTHER = '__other__'
+PSI_EPSILON = 1e-4
+# Common PSI rule of thumb
+PSI_THRESHOLDS = ((0.1, 'stable'), (0.25, 'moderate'))
+# Below this many rows per batch, bin and count in plain Python
+SMALL_BATCH = 32
+
+
+def build_reference(df, features=None, n_bins=20, max_categories=50):
+    """Histogram reference of the training features (JSON/joblib friendly)"""
+    features = features or DRIFT_FEATURES
+    reference = {'rows': int(len(df)), 'features': {}}
+    for name, kind in features.items():
+        if name not in df.columns:
+            continue
+        values = df[name]
+        if kind == 'numeric':
+            values = values.dropna().to_numpy(dtype=np.float64)
+            quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+            edges = np.unique(np.quantile(values, quantiles))
+            counts = np.bincount(np.searchsorted(edges, values, side='right'),
+                                 minlength=len(edges) + 1)
+            reference['features'][name] = {
+                'kind': kind, 'edges': edges.tolist(), 'counts': counts.tolist()
+            }
+        else:
+            frequencies = values.astype(str).value_counts()
+            categories = frequencies.index[:max_categories].tolist()
+            other = int(frequencies.iloc[max_categories:].sum())
+            reference['features'][name] = {
+                'kind': kind,
+                'categories': categories,
+                'counts': frequencies.iloc[:max_categories].astype(int).tolist() + [other]
+            }
+    return reference
+
+
+def psi(expected, actual):
+    """Population stability index of two count vectors"""
+    p = np.asarray(expected, dtype=np.float64)
+    q = np.asarray(actual, dtype=np.float64)
+    p = np.maximum(p / p.sum(), PSI_EPSILON)
+    q = np.maximum(q / q.sum(), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(expected, actual):
+    """Kolmogorov-Smirnov statistic over shared bins"""
+    p = np.cumsum(expected) / np.sum(expected)
+    q = np.cumsum(actual) / np.sum(actual)
+    return float(np.max(np.abs(p - q)))
+
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def _status(value):
+    for threshold, label in PSI_THRESHOLDS:
+        if value < threshold:
+            return label
+    return 'significant'
+
+
+class _FeatureBins:
+    """Maps raw values of one feature to bin indexes"""
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.kind = spec['kind']
+        if self.kind == 'numeric':
+            self.edges = np.asarray(spec['edges'], dtype=np.float64)
+            self.edge_list = self.edges.tolist()
+            self.labels = None
+        else:
+            self.index = {category: i for i, category in enumerate(spec['categories'])}
+            self.other = len(self.index)
+            self.labels = list(spec['categories']) + [OTHER]
+        self.reference = np.asarray(spec['counts'], dtype=np.int64)
+        self.n_bins = len(self.reference)
+
+    def bin(self, values):
+        """Bin indexes of a column (NumPy array, Series or list); NaNs are skipped"""
+        if self.kind == 'numeric':
+            if len(values) < SMALL_BATCH:
+                # bisect on a list beats NumPy call overhead for a few rows
+                edges = self.edge_list
+                return [bisect.bisect_right(edges, v) for v in _as_list(values) if v == v]
+            values = np.asarray(values, dtype=np.float64)
+            return np.searchsorted(self.edges, values[values == values], side='right')
+        get, other = self.index.get, self.other
+        return [get(value, other) for value in _as_list(values)]
+
+
+class _Accumulator:
+    """Ring of windowed histograms; hold ``lock`` to read or write it"""
+
+    def __init__(self, bins, n_windows):
+        self.lock = threading.Lock()
+        self.epochs = [-1] * n_windows
+        self.counts = [
+            {name: np.zeros(feature.n_bins, dtype=np.int64) for name, feature in bins.items()}
+            for _ in range(n_windows)
+        ]
+
+    def slot(self, epoch):
+        k = epoch % len(self.epochs)
+        if self.epochs[k] != epoch:
+            for counts in self.counts[k].values():
+                counts[:] = 0
+            self.epochs[k] = epoch
+        return self.counts[k]
+
+
+class DriftMonitor:
+    def __init__(self, reference, window_seconds=300, n_windows=12, min_rows=100,
+                 clock=time.time, n_stripes=None):
+        self.reference = reference
+        self.min_rows = min_rows
+        self.window_seconds = window_seconds
+        self.n_windows = n_windows
+        self.clock = clock
+        self.bins = {name: _FeatureBins(name, spec) for name, spec in reference['features'].items()}
+        n_stripes = n_stripes or 2 * (os.cpu_count() or 1)
+        self._stripes = [_Accumulator(self.bins, n_windows) for _ in range(n_stripes)]
+
+    @classmethod
+    def from_metadata(cls, metadata, **kwargs):
+        """Monitor for a loaded model bundle, or None without a reference"""
+        reference = (metadata or {}).get('drift_reference')
+        if not reference:
+            return None
+        return cls(reference, **kwargs)
+
+    def _epoch(self):
+        return int(self.clock() // self.window_seconds)
+
+    # -------- Hot path --------
+    def observe(self, columns):
+        """Add a scored batch (DataFrame or ``{name: array}``) to the current window"""
+        # Binning needs no lock; only the counting below does
+        binned = []
+        for name, feature in self.bins.items():
+            values = columns.get(name)
+            if values is not None:
+                binned.append((name, feature, feature.bin(values)))
+
+        # Native thread IDs are small consecutive integers on Linux, so
+        # they spread evenly over the stripes
+        stripe = self._stripes[threading.get_native_id() % len(self._stripes)]
+        epoch = self._epoch()
+        with stripe.lock:
+            slot = stripe.slot(epoch)
+            for name, feature, indexes in binned:
+                counts = slot[name]
+                if len(indexes) < SMALL_BATCH:
+                    for i in indexes:
+                        counts[i] += 1
+                else:
+                    counts += np.bincount(indexes, minlength=feature.n_bins)
+
+    # -------- Reporting --------
+    def window_counts(self, windows=None):
+        """Merged counts per feature over the most recent ``windows`` windows"""
+        windows = min(windows or self.n_windows, self.n_windows)
+        current = self._epoch()
+        oldest = current - windows + 1
+        merged = {name: np.zeros(feature.n_bins, dtype=np.int64) for name, feature in self.bins.items()}
+        for stripe in self._stripes:
+            with stripe.lock:
+                for epoch, counts in zip(stripe.epochs, stripe.counts):
+                    if oldest <= epoch <= current:
+                        for name, values in counts.items():
+                            merged[name] += values
+        return merged
+
+    def report(self, windows=None):
+        windows = min(windows or self.n_windows, self.n_windows)
+        merged = self.window_counts(windows)
+        features = {}
+        for name, feature in self.bins.items():
+            counts = merged[name]
+            n = int(counts.sum())
+            entry = {'kind': feature.kind, 'rows': n}
+            if n:
+                entry['psi'] = round(psi(feature.reference, counts), 6)
+                # PSI of a handful of rows is noise
+                entry['status'] = _status(entry['psi']) if n >= self.min_rows else 'insufficient_data'
+                if feature.kind == 'numeric':
+                    entry['ks'] = round(binned_ks(feature.reference, counts), 6)
+                else:
+                    share = counts / n
+                    expected = feature.reference / feature.reference.sum()
+                    shifts = np.argsort(-np.abs(share - expected))[:3]
+                    entry['top_shifts'] = [
+                        {'category': feature.labels[i],
+                         'expected': round(float(expected[i]), 4),
+                         'observed': round(float(share[i]), 4)}
+                        for i in shifts
+                    ]
+            features[name] = entry
+        return {
+            'window_seconds': self.window_seconds,
+            'windows': windows,
+            'reference_rows': self.reference['rows'],
+            'features': features
+        }
+
+
+def add_reference_to_bundle(data_path, metadata_path='models/model_metadata.pkl'):
+    """Build a reference from a raw dataset and store it in the model metadata"""
+    import joblib
+    from data_utils import DataProcessor
+
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(data_path))
+    metadata = joblib.load(metadata_path) if os.path.exists(metadata_path) else {}
+    metadata['drift_reference'] = build_reference(df)
+    joblib.dump(metadata, metadata_path)
+    print(f"✅ Drift reference ({len(df):,} rows) saved to {metadata_path}")
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', requests=2000, concurrency=8):
+    """/predict latency with and without the monitor, one new thread per request
+
+    Flask's threaded server handles every request on a fresh thread, so the
+    requests here do the same, ``concurrency`` at a time.
+    """
+    import json
+
+    import app as app_module
+    from data_utils import DataProcessor
+
+    if not app_module.models_loaded:
+        print("❌ Models not loaded, nothing to benchmark")
+        return None
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(data_path)).drop(columns=['Is_Fraudulent'])
+    monitor = app_module.drift_monitor or DriftMonitor(build_reference(df))
+    columns = list(app_module.model_manager.preprocessor.feature_names_in_)
+    payloads = json.loads(df[columns].head(requests).to_json(orient='records'))
+    payloads = [payloads[i % len(payloads)] for i in range(requests)]
+    client = app_module.app.test_client()
+    # Keep the prediction cache out of the measurement
+    app_module.model_manager.cache.max_entries = 0
+
+    def run(enabled):
+        app_module.drift_monitor = monitor if enabled else None
+        start = time.perf_counter()
+        for i in range(0, requests, concurrency):
+            threads = [threading.Thread(target=client.post, args=('/predict',), kwargs={'json': payload})
+                       for payload in payloads[i:i + concurrency]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return (time.perf_counter() - start) / requests
+
+    run(True)  # warm-up
+    timings = {True: [], False: []}
+    for _ in range(3):
+        for enabled in (True, False):
+            timings[enabled].append(run(enabled))
+    app_module.drift_monitor = monitor
+
+    with_monitor, without_monitor = min(timings[True]), min(timings[False])
+    print(f"/predict with monitor:    {with_monitor * 1e3:.3f} ms/request")
+    print(f"/predict without monitor: {without_monitor * 1e3:.3f} ms/request "
+          f"({(with_monitor - without_monitor) / without_monitor:.2%} overhead, "
+          f"{concurrency} threads in flight)")
+    start = time.perf_counter()
+    monitor.report()
+    print(f"report: {(time.perf_counter() - start) * 1e3:.2f} ms")
+    return with_monitor, without_monitor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Drift reference and overhead benchmark')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--metadata', default='models/model_metadata.pkl')
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.data)
+    else:
+        add_reference_to_bundle(args.data, args.metadata)
@@ -1,16 +1,172 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import json
+import os
+import multiprocessing
 import numpy as np
 import pandas as pd
 
 
+# ----------------------------------------------------------------------
+# Metrics (pure NumPy, no plotting libraries needed)
+# ----------------------------------------------------------------------
+def threshold_curve(y_true, y_prob):
+    """Cumulative false/true positives at every distinct threshold.
+
+    One descending sort of the probabilities; entry ``i`` holds the counts
+    when everything with probability >= ``thresholds[i]`` is flagged.
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    y_prob = np.asarray(y_prob, dtype=np.float64)
+
+    order = np.argsort(-y_prob, kind='mergesort')
+    y_sorted = y_true[order]
+    p_sorted = y_prob[order]
+
+    # Last index of each run of tied probabilities
+    distinct = np.flatnonzero(np.diff(p_sorted))
+    last = np.r_[distinct, len(y_sorted) - 1]
+
+    tps = np.cumsum(y_sorted)[last]
+    fps = (last + 1) - tps
+    return fps, tps, p_sorted[last]
+
+
+def _downsample(n, max_points):
+    if n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max_points).round().astype(int))
+
+
+def compute_evaluation_report(y_true, y_prob, threshold=0.5,
+                              n_calibration_bins=10, max_curve_points=1000):
+    """All evaluation metrics and curves as plain arrays/dicts"""
+    y_true = np.asarray(y_true).astype(np.int64)
+    y_prob = np.asarray(y_prob, dtype=np.float64)
+    y_pred = (y_prob >= threshold).astype(np.int64)
+
+    # -------- Confusion matrix --------
+    cm = np.bincount(y_true * 2 + y_pred, minlength=4).reshape(2, 2)
+    tn, fp, fn, tp = cm.ravel()
+    n_pos, n_neg = tp + fn, tn + fp
+
+    precision = tp / (tp + fp) if (tp + fp) else 0.0
+    recall = tp / n_pos if n_pos else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
+
+    # -------- ROC / PR curves from one sort --------
+    fps, tps, thresholds = threshold_curve(y_true, y_prob)
+    fpr = np.r_[0.0, fps / n_neg] if n_neg else np.zeros(len(fps) + 1)
+    tpr = np.r_[0.0, tps / n_pos] if n_pos else np.zeros(len(tps) + 1)
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    curve_precision = tps / (tps + fps)
+    curve_recall = tps / n_pos if n_pos else np.zeros(len(tps))
+    average_precision = float(np.sum(np.diff(np.r_[0.0, curve_recall]) * curve_precision))
+
+    # -------- Calibration --------
+    bins = np.linspace(0.0, 1.0, n_calibration_bins + 1)
+    bin_ids = np.clip(np.digitize(y_prob, bins[1:-1]), 0, n_calibration_bins - 1)
+    bin_counts = np.bincount(bin_ids, minlength=n_calibration_bins)
+    bin_prob_sum = np.bincount(bin_ids, weights=y_prob, minlength=n_calibration_bins)
+    bin_pos_sum = np.bincount(bin_ids, weights=y_true, minlength=n_calibration_bins)
+    nonempty = bin_counts > 0
+
+    roc_points = _downsample(len(fpr), max_points=max_curve_points)
+    pr_points = _downsample(len(thresholds), max_points=max_curve_points)
+
+    return {
+        'threshold': threshold,
+        'n_samples': int(len(y_true)),
+        'metrics': {
+            'accuracy': float((tp + tn) / len(y_true)) if len(y_true) else 0.0,
+            'precision': float(precision),
+            'recall': float(recall),
+            'f1_score': float(f1),
+            'roc_auc': roc_auc,
+            'average_precision': average_precision,
+            'brier_score': float(np.mean((y_prob - y_true) ** 2)) if len(y_true) else 0.0
+        },
+        'confusion_matrix': cm,
+        'roc_curve': {
+            'fpr': fpr[roc_points],
+            'tpr': tpr[roc_points],
+            'thresholds': np.r_[np.inf, thresholds][roc_points]
+        },
+        'pr_curve': {
+            'precision': curve_precision[pr_points],
+            'recall': curve_recall[pr_points],
+            'thresholds': thresholds[pr_points]
+        },
+        'calibration': {
+            'bin_edges': bins,
+            'mean_predicted': bin_prob_sum[nonempty] / bin_counts[nonempty],
+            'fraction_positive': bin_pos_sum[nonempty] / bin_counts[nonempty],
+            'count': bin_counts[nonempty]
+        }
+    }
+
+
+def _to_jsonable(obj):
+    if isinstance(obj, dict):
+        return {str(k): _to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _to_jsonable(obj.tolist())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    return obj
+
+
+def save_evaluation_report(report, path):
+    """Write the report as a JSON artifact"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(_to_jsonable(report), f, indent=2)
+    print(f"Evaluation report saved to: {path}")
+    return path
+
+
+def load_evaluation_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ----------------------------------------------------------------------
+# Plotting (matplotlib/seaborn imported only when a plot is requested)
+# ----------------------------------------------------------------------
 class ModelEvaluator:
     def __init__(self):
-        plt.style.use('seaborn-v0_8-darkgrid')
-        sns.set_palette("husl")
+        self._plt = None
+        self._sns = None
+
+    def _libs(self):
+        if self._plt is None:
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+            plt.style.use('seaborn-v0_8-darkgrid')
+            sns.set_palette("husl")
+            self._plt, self._sns = plt, sns
+        return self._plt, self._sns
+
+    def _finish(self, save_path, show, label):
+        plt, _ = self._libs()
+        plt.tight_layout()
+
+        if save_path:
+            plt.savefig(save_path, dpi=300, bbox_inches="tight")
+            print(f"{label} saved to: {save_path}")
+
+        if show:
+            plt.show()
+        else:
+            plt.close()
 
-    def plot_confusion_matrix(self, cm, save_path=None, show=True):
+    def plot_confusion_matrix(self, cm, save_path=None, show=False):
         """Plot enhanced confusion matrix"""
+        plt, sns = self._libs()
+        cm = np.asarray(cm)
         labels = ['Non-Fraud', 'Fraud']
 
         fig, ax = plt.subplots(figsize=(10, 8))
@@ -56,16 +212,7 @@ class ModelEvaluator:
             bbox=dict(boxstyle="round", facecolor="wheat", alpha=0.5)
         )
 
-        plt.tight_layout()
-
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches="tight")
-            print(f"Confusion matrix saved to: {save_path}")
-
-        if show:
-            plt.show()
-        else:
-            plt.close()
+        self._finish(save_path, show, "Confusion matrix")
 
     def plot_feature_importance(
         self,
@@ -73,7 +220,7 @@ class ModelEvaluator:
         feature_names,
         save_path=None,
         top_n=20,
-        show=True
+        show=False
     ):
         """Plot feature importance for tree-based models"""
 
@@ -81,6 +228,8 @@ class ModelEvaluator:
             print("⚠️ Feature importance not available.")
             return
 
+        plt, sns = self._libs()
+
         importance_df = pd.DataFrame({
             "feature": feature_names,
             "importance": importances
@@ -99,13 +248,88 @@ class ModelEvaluator:
         plt.title("Top Feature Importances", fontsize=14, fontweight="bold")
         plt.xlabel("Importance")
         plt.ylabel("Feature")
-        plt.tight_layout()
 
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches="tight")
-            print(f"Feature importance plot saved to: {save_path}")
+        self._finish(save_path, show, "Feature importance plot")
 
-        if show:
-            plt.show()
-        else:
-            plt.close()
+    def plot_roc_curve(self, roc_curve, roc_auc, save_path=None, show=False):
+        plt, _ = self._libs()
+        plt.figure(figsize=(8, 6))
+        plt.plot(roc_curve['fpr'], roc_curve['tpr'], label=f"AUC = {roc_auc:.4f}")
+        plt.plot([0, 1], [0, 1], linestyle="--", color="grey")
+        plt.title("ROC Curve", fontsize=14, fontweight="bold")
+        plt.xlabel("False Positive Rate")
+        plt.ylabel("True Positive Rate")
+        plt.legend(loc="lower right")
+        self._finish(save_path, show, "ROC curve")
+
+    def plot_precision_recall_curve(self, pr_curve, average_precision, save_path=None, show=False):
+        plt, _ = self._libs()
+        plt.figure(figsize=(8, 6))
+        plt.plot(pr_curve['recall'], pr_curve['precision'], label=f"AP = {average_precision:.4f}")
+        plt.title("Precision-Recall Curve", fontsize=14, fontweight="bold")
+        plt.xlabel("Recall")
+        plt.ylabel("Precision")
+        plt.legend(loc="lower left")
+        self._finish(save_path, show, "Precision-recall curve")
+
+    def plot_calibration(self, calibration, save_path=None, show=False):
+        plt, _ = self._libs()
+        plt.figure(figsize=(8, 6))
+        plt.plot(calibration['mean_predicted'], calibration['fraction_positive'], marker="o")
+        plt.plot([0, 1], [0, 1], linestyle="--", color="grey")
+        plt.title("Calibration", fontsize=14, fontweight="bold")
+        plt.xlabel("Mean Predicted Probability")
+        plt.ylabel("Fraction of Frauds")
+        self._finish(save_path, show, "Calibration plot")
+
+
+def render_plots(report_path, output_dir):
+    """Render every plot of a saved evaluation report with the Agg backend"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    report = load_evaluation_report(report_path)
+    evaluator = ModelEvaluator()
+    metrics = report['metrics']
+
+    evaluator.plot_confusion_matrix(
+        report['confusion_matrix'],
+        save_path=os.path.join(output_dir, 'confusion_matrix.png')
+    )
+    evaluator.plot_roc_curve(
+        report['roc_curve'],
+        metrics['roc_auc'],
+        save_path=os.path.join(output_dir, 'roc_curve.png')
+    )
+    evaluator.plot_precision_recall_curve(
+        report['pr_curve'],
+        metrics['average_precision'],
+        save_path=os.path.join(output_dir, 'precision_recall_curve.png')
+    )
+    evaluator.plot_calibration(
+        report['calibration'],
+        save_path=os.path.join(output_dir, 'calibration.png')
+    )
+
+    importance = report.get('feature_importance')
+    if importance:
+        evaluator.plot_feature_importance(
+            importance['importances'],
+            importance['feature_names'],
+            save_path=os.path.join(output_dir, 'feature_importance.png')
+        )
+
+
+def render_plots_async(report_path, output_dir):
+    """Render plots in a separate process; returns the started Process.
+
+    The caller does not wait for it, but the interpreter joins it on exit,
+    so the plots are complete when a training script finishes.
+    """
+    process = multiprocessing.get_context('spawn').Process(
+        target=render_plots,
+        args=(report_path, output_dir),
+        name='render-evaluation-plots'
+    )
+    process.start()
+    return process
@@ -0,0 +1,377 @@
+"""
+Per-transaction explanations for flagged predictions.
+
+Only transactions at or above the review threshold are explained. Their
+contributions are exact SHAP values of the served classifier:
+
+- XGBoost: the booster's native TreeSHAP (``pred_contribs``), one call per chunk of rows
+- RandomForest / GradientBoosting: TreeSHAP (Lundberg et al., Algorithm 2)
+  over the fitted sklearn trees
+- LogisticRegression: linear SHAP, ``coef * (x - training mean)``
+
+One-hot columns are summed back into their input feature (names from
+``preprocessed_feature_names``, which ``ModelTrainer.get_feature_names``
+also uses), so an explanation reads ``Merchant_Category = Crypto Exchange``
+rather than listing encoder columns. Results are cached by transaction
+fingerprint. Each request gets a time budget: after the first row (or
+XGBoost chunk), rows not finished in time are returned without an
+explanation instead of delaying the response.
+
+Run ``python explanations.py`` to time the explainer on flagged rows.
+"""
+import time
+
+import numpy as np
+
+from model_training import preprocessed_feature_names
+from prediction_cache import PredictionCache, transaction_fingerprints
+
+
+def _classifier(model):
+    """Final estimator of a (SMOTE) pipeline"""
+    return model.steps[-1][1] if hasattr(model, 'steps') else model
+
+
+def _smoothed(estimate, seconds, weight=0.3):
+    """Moving average of the per-row cost, so one slow row does not stick"""
+    return seconds if estimate == 0.0 else weight * seconds + (1 - weight) * estimate
+
+
+# ----------------------------------------------------------------------
+# TreeSHAP for sklearn trees
+# ----------------------------------------------------------------------
+class _Tree:
+    """sklearn tree arrays as Python lists (fast scalar access)"""
+
+    def __init__(self, tree, leaf_values):
+        self.left = tree.children_left.tolist()
+        self.right = tree.children_right.tolist()
+        self.feature = tree.feature.tolist()
+        self.threshold = tree.threshold.tolist()
+        self.weight = tree.weighted_n_node_samples.tolist()
+        self.values = leaf_values.tolist()
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        self.missing_left = missing_left.tolist() if missing_left is not None else [0] * len(self.left)
+        # Expected output: leaf values weighted by training coverage
+        leaves = tree.children_left == -1
+        weights = tree.weighted_n_node_samples[leaves]
+        self.expected_value = float(np.dot(leaf_values[leaves], weights) / weights.sum())
+
+
+def _extend(feat, zero, one, pw, depth, zero_fraction, one_fraction, feature):
+    feat.append(feature)
+    zero.append(zero_fraction)
+    one.append(one_fraction)
+    pw.append(1.0 if depth == 0 else 0.0)
+    for i in range(depth - 1, -1, -1):
+        pw[i + 1] += one_fraction * pw[i] * (i + 1) / (depth + 1)
+        pw[i] = zero_fraction * pw[i] * (depth - i) / (depth + 1)
+
+
+def _unwind(feat, zero, one, pw, depth, index):
+    one_fraction, zero_fraction = one[index], zero[index]
+    next_one = pw[depth]
+    for i in range(depth - 1, -1, -1):
+        if one_fraction != 0:
+            tmp = pw[i]
+            pw[i] = next_one * (depth + 1) / ((i + 1) * one_fraction)
+            next_one = tmp - pw[i] * zero_fraction * (depth - i) / (depth + 1)
+        else:
+            pw[i] = pw[i] * (depth + 1) / (zero_fraction * (depth - i))
+    for i in range(index, depth):
+        feat[i], zero[i], one[i] = feat[i + 1], zero[i + 1], one[i + 1]
+    del feat[depth], zero[depth], one[depth], pw[depth]
+
+
+def _unwound_sum(zero, one, pw, depth, index):
+    one_fraction, zero_fraction = one[index], zero[index]
+    next_one = pw[depth]
+    total = 0.0
+    for i in range(depth - 1, -1, -1):
+        if one_fraction != 0:
+            tmp = next_one * (depth + 1) / ((i + 1) * one_fraction)
+            total += tmp
+            next_one = pw[i] - tmp * zero_fraction * (depth - i) / (depth + 1)
+        else:
+            total += pw[i] / zero_fraction * (depth + 1) / (depth - i)
+    return total
+
+
+def _tree_shap(tree, x, phi, node=0, depth=0, feat=(), zero=(), one=(), pw=(),
+               zero_fraction=1.0, one_fraction=1.0, feature=-1):
+    """Add the SHAP values of one tree for row ``x`` to ``phi``"""
+    feat, zero, one, pw = list(feat), list(zero), list(one), list(pw)
+    _extend(feat, zero, one, pw, depth, zero_fraction, one_fraction, feature)
+
+    if tree.left[node] == -1:
+        value = tree.values[node]
+        for i in range(1, depth + 1):
+            weight = _unwound_sum(zero, one, pw, depth, i)
+            phi[feat[i]] += weight * (one[i] - zero[i]) * value
+        return
+
+    split = tree.feature[node]
+    left, right = tree.left[node], tree.right[node]
+    value = x[split]
+    if value != value:
+        hot = left if tree.missing_left[node] else right
+    else:
+        hot = left if value <= tree.threshold[node] else right
+    cold = right if hot == left else left
+
+    incoming_zero, incoming_one = 1.0, 1.0
+    if split in feat:
+        # Feature already on the path: undo that split and redo it here
+        index = feat.index(split)
+        incoming_zero, incoming_one = zero[index], one[index]
+        _unwind(feat, zero, one, pw, depth, index)
+        depth -= 1
+
+    weight = tree.weight[node]
+    _tree_shap(tree, x, phi, hot, depth + 1, feat, zero, one, pw,
+               incoming_zero * tree.weight[hot] / weight, incoming_one, split)
+    _tree_shap(tree, x, phi, cold, depth + 1, feat, zero, one, pw,
+               incoming_zero * tree.weight[cold] / weight, 0.0, split)
+
+
+class TreeEnsembleExplainer:
+    """Exact TreeSHAP for RandomForest (probability) and GradientBoosting (log-odds)"""
+
+    def __init__(self, classifier):
+        if hasattr(classifier, 'init_'):
+            # GradientBoosting: raw score = init + learning_rate * sum(trees)
+            self.output = 'log_odds'
+            scale = classifier.learning_rate
+            self.trees = [_Tree(est.tree_, est.tree_.value[:, 0, 0] * scale)
+                          for est in classifier.estimators_[:, 0]]
+            self.offset = None
+            self._classifier = classifier
+        else:
+            # RandomForest: probability = mean of per-tree class-1 fractions
+            self.output = 'probability'
+            trees = []
+            for est in classifier.estimators_:
+                value = est.tree_.value[:, 0, :]
+                fractions = value[:, 1] / value.sum(axis=1)
+                trees.append(_Tree(est.tree_, fractions / len(classifier.estimators_)))
+            self.trees = trees
+            self.offset = 0.0
+        self.n_features = classifier.n_features_in_
+        # Moving average of the cost per row, used to skip rows over budget
+        self.row_seconds = 0.0
+
+    def base_value(self, X):
+        expected = sum(tree.expected_value for tree in self.trees)
+        if self.offset is None:
+            # Log-odds of the prior the boosting started from
+            init = self._classifier._raw_predict_init(X[:1]).ravel()[0]
+            return float(init + expected)
+        return float(self.offset + expected)
+
+    def contributions(self, X, deadline=None):
+        """SHAP values per row; rows not finished by ``deadline`` are NaN
+
+        The first row always runs to completion, so every call refreshes the
+        cost estimate and explains at least one row.
+        """
+        phi = np.full((len(X), self.n_features), np.nan)
+        for r, row in enumerate(np.asarray(X, dtype=np.float64).tolist()):
+            start = time.perf_counter()
+            # Do not start a row that the last rows say cannot finish in time
+            if r and deadline is not None and start + self.row_seconds > deadline:
+                return phi
+            values = [0.0] * self.n_features
+            for k, tree in enumerate(self.trees):
+                if r and deadline is not None and time.perf_counter() > deadline:
+                    elapsed = (time.perf_counter() - start) * len(self.trees) / max(k, 1)
+                    self.row_seconds = _smoothed(self.row_seconds, elapsed)
+                    return phi
+                _tree_shap(tree, row, values)
+            phi[r] = values
+            self.row_seconds = _smoothed(self.row_seconds, time.perf_counter() - start)
+        return phi
+
+
+class XGBoostExplainer:
+    """Native TreeSHAP of an XGBoost booster (log-odds)"""
+
+    output = 'log_odds'
+
+    def __init__(self, classifier, chunk_size=64):
+        self.booster = classifier.get_booster()
+        # Rows per booster call; the deadline is checked between calls
+        self.chunk_size = chunk_size
+        # Moving average of the cost per row, used to skip chunks over budget
+        self.row_seconds = 0.0
+
+    def contributions_with_bias(self, X, deadline=None):
+        """(SHAP values, bias) per row; rows not finished by ``deadline`` are NaN
+
+        The first chunk always runs, so every call refreshes the cost estimate.
+        """
+        import xgboost as xgb
+        X = np.asarray(X, dtype=np.float32)
+        phi = np.full((len(X), X.shape[1]), np.nan)
+        bias = np.full(len(X), np.nan)
+        for begin in range(0, len(X), self.chunk_size):
+            chunk = X[begin:begin + self.chunk_size]
+            start = time.perf_counter()
+            # Do not start a chunk that the last ones say cannot finish in time
+            if begin and deadline is not None and start + self.row_seconds * len(chunk) > deadline:
+                break
+            contribs = self.booster.predict(xgb.DMatrix(chunk), pred_contribs=True)
+            phi[begin:begin + len(chunk)] = contribs[:, :-1]
+            bias[begin:begin + len(chunk)] = contribs[:, -1]
+            self.row_seconds = _smoothed(self.row_seconds, (time.perf_counter() - start) / len(chunk))
+        return phi, bias
+
+
+class LinearExplainer:
+    """Linear SHAP of a logistic regression (log-odds, independent features)"""
+
+    output = 'log_odds'
+
+    def __init__(self, classifier, background_mean=None):
+        self.coef = classifier.coef_[0]
+        self.mean = (np.asarray(background_mean, dtype=np.float64)
+                     if background_mean is not None else np.zeros_like(self.coef))
+        self.base = float(classifier.intercept_[0] + self.coef @ self.mean)
+
+    def contributions(self, X, deadline=None):
+        return (np.asarray(X, dtype=np.float64) - self.mean) * self.coef
+
+
+def make_explainer(model, metadata=None):
+    classifier = _classifier(model)
+    if hasattr(classifier, 'get_booster'):
+        return XGBoostExplainer(classifier)
+    if hasattr(classifier, 'estimators_'):
+        return TreeEnsembleExplainer(classifier)
+    if hasattr(classifier, 'coef_'):
+        return LinearExplainer(classifier, (metadata or {}).get('background_mean'))
+    raise ValueError(f"No explainer for {type(classifier).__name__}")
+
+
+# ----------------------------------------------------------------------
+# Serving
+# ----------------------------------------------------------------------
+class PredictionExplainer:
+    def __init__(self, model, preprocessor, decision_engine, metadata=None, model_version=None,
+                 top_k=5, time_budget=0.05, cache_size=5000, cache_ttl=3600):
+        self.explainer = make_explainer(model, metadata)
+        self.preprocessor = preprocessor
+        self.decision_engine = decision_engine
+        self.model_version = model_version
+        self.top_k = top_k
+        self.time_budget = time_budget
+        self.cache = PredictionCache(max_entries=cache_size, ttl_seconds=cache_ttl)
+
+        names, sources = preprocessed_feature_names(preprocessor)
+        self.feature_names = names
+        self.inputs = list(dict.fromkeys(sources))
+        # Sums one-hot contributions into their input column
+        position = {column: j for j, column in enumerate(self.inputs)}
+        self.grouping = np.zeros((len(sources), len(self.inputs)))
+        self.grouping[np.arange(len(sources)), [position[s] for s in sources]] = 1.0
+
+    @classmethod
+    def from_manager(cls, model_manager, **kwargs):
+        """Explainer for a loaded ModelManager, or None if the model is unsupported"""
+        try:
+            return cls(model_manager.model, model_manager.preprocessor,
+                       model_manager.decision_engine, model_manager.metadata,
+                       model_manager.model_version, **kwargs)
+        except ValueError as e:
+            print(f"⚠️  Explanations disabled: {e}")
+            return None
+
+    def _compute(self, df, deadline):
+        """(contributions per input column, base values) for every row of ``df``"""
+        X = self.preprocessor.transform(df)
+        if isinstance(self.explainer, XGBoostExplainer):
+            contributions, base = self.explainer.contributions_with_bias(X, deadline)
+        else:
+            contributions = self.explainer.contributions(X, deadline)
+            base_value = (self.explainer.base if isinstance(self.explainer, LinearExplainer)
+                          else self.explainer.base_value(X))
+            base = np.full(len(X), base_value)
+        return contributions @ self.grouping, base
+
+    def _format(self, row, contributions, base):
+        order = np.argsort(-np.abs(contributions))[:self.top_k]
+        features = []
+        for j in order:
+            value = row[self.inputs[j]]
+            features.append({
+                'feature': self.inputs[j],
+                'value': value.item() if hasattr(value, 'item') else value,
+                'contribution': round(float(contributions[j]), 6)
+            })
+        return {
+            'output': self.explainer.output,
+            'base_value': round(float(base), 6),
+            'top_features': features
+        }
+
+    def explain(self, df, fraud_probabilities):
+        """Explanation dicts for rows at/above the review threshold, None otherwise"""
+        explanations = [None] * len(df)
+        flagged = np.flatnonzero(np.asarray(fraud_probabilities) >= self.decision_engine.review_threshold)
+        if len(flagged) == 0:
+            return explanations
+
+        deadline = time.perf_counter() + self.time_budget
+        subset = df.iloc[flagged]
+        keys = transaction_fingerprints(subset, self.model_version)
+        cached = self.cache.get_many(keys)
+        missing = [k for k, entry in enumerate(cached) if entry is None]
+
+        if missing:
+            rows = subset.iloc[missing]
+            contributions, base = self._compute(rows, deadline)
+            records = rows.to_dict('records')
+            done_keys, done = [], []
+            for k, record, values, base_value in zip(missing, records, contributions, base):
+                if np.isnan(values).any():
+                    continue  # over the time budget
+                cached[k] = self._format(record, values, base_value)
+                done_keys.append(keys[k])
+                done.append(cached[k])
+            self.cache.put_many(done_keys, done)
+
+        for k, i in enumerate(flagged):
+            explanations[i] = cached[k]
+        return explanations
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', n_rows=2000, batch_size=1):
+    """Explain cost per flagged row: cold (computed) vs warm (cached)"""
+    from data_utils import DataProcessor
+    from model_persistence import ModelManager
+
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(data_path)).drop(columns=['Is_Fraudulent'])
+    manager = ModelManager(cache_size=0)
+    manager.load_models()
+    explainer = PredictionExplainer.from_manager(manager, time_budget=1.0)
+
+    probabilities = manager.predict_proba(df)[:, 1]
+    flagged = df[probabilities >= manager.decision_engine.review_threshold].head(n_rows)
+    print(f"{type(explainer.explainer).__name__}: {len(flagged)} flagged rows, batch size {batch_size}")
+
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        for i in range(0, len(flagged), batch_size):
+            batch = flagged.iloc[i:i + batch_size]
+            explainer.explain(batch, np.ones(len(batch)))
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {elapsed / len(flagged) * 1e3:.3f} ms/row")
+
+    start = time.perf_counter()
+    for i in range(0, min(len(flagged), 500)):
+        manager.predict(flagged.iloc[[i]])
+    print(f"predict: {(time.perf_counter() - start) / min(len(flagged), 500) * 1e3:.3f} ms/row")
+
+
+if __name__ == "__main__":
+    benchmark()
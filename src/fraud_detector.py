@@ -9,6 +9,13 @@ from imblearn.pipeline import Pipeline as ImbPipeline
 import warnings
 warnings.filterwarnings('ignore')
 
+MODEL_CLASSES = {
+    'XGBoost': XGBClassifier,
+    'RandomForest': RandomForestClassifier,
+    'LogisticRegression': LogisticRegression,
+    'GradientBoosting': GradientBoostingClassifier
+}
+
 class FraudDetector:
     def __init__(self, random_state=42):
         self.random_state = random_state
@@ -16,8 +23,8 @@ class FraudDetector:
         self.best_model = None
         self.feature_importance = None
         
-    def create_models(self):
-        """Create multiple models with regularization to prevent overfitting"""
+    def get_model_params(self):
+        """Default hyperparameters for every candidate model"""
         
         # XGBoost with strong regularization
         xgb_params = {
@@ -70,11 +77,26 @@ class FraudDetector:
             'random_state': self.random_state
         }
         
+        return {
+            'XGBoost': xgb_params,
+            'RandomForest': rf_params,
+            'LogisticRegression': lr_params,
+            'GradientBoosting': gb_params
+        }
+    
+    def create_models(self, param_overrides=None):
+        """Create multiple models with regularization to prevent overfitting
+        
+        ``param_overrides`` maps model name to hyperparameters replacing the
+        defaults, e.g. the best configurations found by HyperparameterSearch.
+        """
+        model_params = self.get_model_params()
+        for name, overrides in (param_overrides or {}).items():
+            model_params[name].update(overrides)
+        
         self.models = {
-            'XGBoost': XGBClassifier(**xgb_params),
-            'RandomForest': RandomForestClassifier(**rf_params),
-            'LogisticRegression': LogisticRegression(**lr_params),
-            'GradientBoosting': GradientBoostingClassifier(**gb_params)
+            name: MODEL_CLASSES[name](**params)
+            for name, params in model_params.items()
         }
         
         return self.models
@@ -0,0 +1,347 @@
+"""
+Hyperparameter search for the FraudDetector candidate models.
+
+Supports plain random search, successive halving and Hyperband. The budget
+of a trial is a fraction of the full resource: the number of trees for the
+ensemble models and the fraction of training rows for LogisticRegression.
+
+Trials run in parallel across processes on cross-validation folds that are
+preprocessed (SMOTE applied) once and cached on disk as memory-mapped
+arrays, keyed by a digest of the data; caches of other data sets are
+pruned to the ``max_cached_datasets`` most recently used. Every finished trial is appended to a JSONL log, so an interrupted
+search resumes without re-evaluating what is already known.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+
+import numpy as np
+from joblib import Parallel, delayed
+from imblearn.over_sampling import SMOTE
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from fraud_detector import FraudDetector, MODEL_CLASSES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (kind, low, high) for numeric ranges, ('choice', options) for categoricals
+SEARCH_SPACES = {
+    'XGBoost': {
+        'max_depth': ('int', 2, 8),
+        'learning_rate': ('log', 0.01, 0.3),
+        'subsample': ('float', 0.5, 1.0),
+        'colsample_bytree': ('float', 0.5, 1.0),
+        'min_child_weight': ('int', 1, 10),
+        'reg_alpha': ('log', 1e-3, 10.0),
+        'reg_lambda': ('log', 1e-3, 10.0)
+    },
+    'RandomForest': {
+        'max_depth': ('int', 4, 16),
+        'min_samples_split': ('int', 2, 30),
+        'min_samples_leaf': ('int', 1, 15),
+        'max_features': ('choice', ['sqrt', 'log2', 0.5])
+    },
+    'LogisticRegression': {
+        'C': ('log', 1e-3, 10.0)
+    },
+    'GradientBoosting': {
+        'learning_rate': ('log', 0.01, 0.3),
+        'max_depth': ('int', 2, 6),
+        'min_samples_leaf': ('int', 1, 30),
+        'subsample': ('float', 0.5, 1.0)
+    }
+}
+
+# Parameter scaled by the trial budget; None means "fraction of rows"
+RESOURCE_PARAMS = {
+    'XGBoost': 'n_estimators',
+    'RandomForest': 'n_estimators',
+    'LogisticRegression': None,
+    'GradientBoosting': 'n_estimators'
+}
+
+
+def sample_config(space, rng):
+    """Draw one configuration from a search space"""
+    config = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'int':
+            config[name] = int(rng.integers(spec[1], spec[2] + 1))
+        elif kind == 'float':
+            config[name] = float(rng.uniform(spec[1], spec[2]))
+        elif kind == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+        elif kind == 'choice':
+            config[name] = spec[1][int(rng.integers(len(spec[1])))]
+        else:
+            raise ValueError(f"Unknown parameter kind: {kind}")
+    return config
+
+
+def _trial_key(model_name, config, budget, data_key):
+    payload = json.dumps(
+        {'model': model_name, 'params': config, 'budget': round(budget, 6), 'data': data_key},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _evaluate_trial(model_name, params, resource_param, max_resource, budget,
+                    fold_dirs, random_state):
+    """Mean validation AUC of one configuration at one budget (runs in a worker)"""
+    params = dict(params)
+    if resource_param is not None:
+        params[resource_param] = max(1, int(round(max_resource * budget)))
+    # Parallelism comes from running trials side by side
+    if 'n_jobs' in params:
+        params['n_jobs'] = 1
+
+    scores = []
+    for fold_dir in fold_dirs:
+        X_train = np.load(os.path.join(fold_dir, 'X_train.npy'), mmap_mode='r')
+        y_train = np.load(os.path.join(fold_dir, 'y_train.npy'), mmap_mode='r')
+        X_val = np.load(os.path.join(fold_dir, 'X_val.npy'), mmap_mode='r')
+        y_val = np.load(os.path.join(fold_dir, 'y_val.npy'), mmap_mode='r')
+
+        if resource_param is None and budget < 1.0:
+            rng = np.random.default_rng(random_state)
+            n_rows = max(50, int(len(y_train) * budget))
+            rows = np.sort(rng.permutation(len(y_train))[:n_rows])
+            X_train, y_train = X_train[rows], y_train[rows]
+
+        model = MODEL_CLASSES[model_name](**params)
+        model.fit(X_train, y_train)
+        scores.append(roc_auc_score(y_val, model.predict_proba(X_val)[:, 1]))
+
+    return float(np.mean(scores))
+
+
+class HyperparameterSearch:
+    def __init__(self, strategy='successive_halving', n_candidates=27, eta=3,
+                 min_budget=1 / 9, cv_folds=3, n_jobs=-1, random_state=42,
+                 model_names=None, cache_dir='models/search_cache',
+                 trial_log='models/search_trials.jsonl', max_cached_datasets=1):
+        if strategy not in ('random', 'successive_halving', 'hyperband'):
+            raise ValueError(f"Unknown search strategy: {strategy}")
+
+        self.strategy = strategy
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_budget = min_budget
+        self.cv_folds = cv_folds
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.model_names = model_names or list(SEARCH_SPACES)
+        self.cache_dir = os.path.join(BASE_DIR, cache_dir)
+        self.max_cached_datasets = max_cached_datasets
+        self.trial_log = os.path.join(BASE_DIR, trial_log)
+
+        self.default_params = FraudDetector(random_state).get_model_params()
+        self.trials = self._load_trial_log()
+        self.best_params_ = {}
+        self.best_scores_ = {}
+        self._fold_dirs = None
+        self._data_key = None
+
+    # ------------------------------------------------------------------
+    # Trial log
+    # ------------------------------------------------------------------
+    def _load_trial_log(self):
+        trials = {}
+        if os.path.exists(self.trial_log):
+            with open(self.trial_log) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written last line of an interrupted run
+                        continue
+                    trials[record['key']] = record
+            print(f"Resuming search: {len(trials)} trials loaded from {self.trial_log}")
+        return trials
+
+    def _log_trial(self, record):
+        self.trials[record['key']] = record
+        os.makedirs(os.path.dirname(self.trial_log), exist_ok=True)
+        with open(self.trial_log, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    # ------------------------------------------------------------------
+    # Cached folds
+    # ------------------------------------------------------------------
+    def prepare_folds(self, X, y):
+        """Split, oversample and cache the CV folds once; returns fold dirs"""
+        X = np.ascontiguousarray(X)
+        y = np.asarray(y).astype(int)
+
+        digest = hashlib.sha1()
+        digest.update(f"{X.shape}:{X.dtype}".encode())
+        digest.update(X.tobytes())
+        digest.update(y.tobytes())
+        digest.update(f"{self.cv_folds}:{self.random_state}".encode())
+        self._data_key = digest.hexdigest()[:16]
+        root = os.path.join(self.cache_dir, self._data_key)
+
+        cv = StratifiedKFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
+        fold_dirs = []
+        for i, (train_idx, val_idx) in enumerate(cv.split(X, y)):
+            fold_dir = os.path.join(root, f'fold_{i}')
+            fold_dirs.append(fold_dir)
+            if os.path.exists(os.path.join(fold_dir, 'y_val.npy')):
+                continue
+
+            os.makedirs(fold_dir, exist_ok=True)
+            X_train, y_train = SMOTE(random_state=self.random_state).fit_resample(
+                X[train_idx], y[train_idx]
+            )
+            np.save(os.path.join(fold_dir, 'X_train.npy'), X_train)
+            np.save(os.path.join(fold_dir, 'y_train.npy'), y_train)
+            np.save(os.path.join(fold_dir, 'X_val.npy'), X[val_idx])
+            # Written last: its presence marks the fold as complete
+            np.save(os.path.join(fold_dir, 'y_val.npy'), y[val_idx])
+
+        # Mark as most recently used, then drop folds of other data sets
+        os.utime(root)
+        self._prune_cache()
+
+        self._fold_dirs = fold_dirs
+        return fold_dirs
+
+    def _prune_cache(self):
+        """Delete cached folds beyond the ``max_cached_datasets`` most recent"""
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)]
+        entries = sorted((e for e in entries if os.path.isdir(e)), key=os.path.getmtime, reverse=True)
+        for stale in entries[max(1, self.max_cached_datasets):]:
+            shutil.rmtree(stale, ignore_errors=True)
+            print(f"Removed cached folds {stale}")
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    def _evaluate(self, model_name, configs, budget):
+        """Score configs at a budget, in parallel, skipping logged trials"""
+        resource_param = RESOURCE_PARAMS[model_name]
+        max_resource = self.default_params[model_name].get(resource_param) if resource_param else None
+
+        scores = [None] * len(configs)
+        pending = []
+        for i, config in enumerate(configs):
+            record = self.trials.get(_trial_key(model_name, config, budget, self._data_key))
+            if record is not None:
+                scores[i] = record['score']
+            else:
+                pending.append(i)
+
+        if pending:
+            results = Parallel(n_jobs=self.n_jobs, return_as='generator')(
+                delayed(_evaluate_trial)(
+                    model_name,
+                    {**self.default_params[model_name], **configs[i]},
+                    resource_param,
+                    max_resource,
+                    budget,
+                    self._fold_dirs,
+                    self.random_state
+                )
+                for i in pending
+            )
+            for i, score in zip(pending, results):
+                scores[i] = score
+                self._log_trial({
+                    'key': _trial_key(model_name, configs[i], budget, self._data_key),
+                    'model': model_name,
+                    'params': configs[i],
+                    'budget': budget,
+                    'score': score
+                })
+
+        return scores
+
+    def _sample_configs(self, model_name, n, bracket=0):
+        seed = [self.random_state, self.model_names.index(model_name), bracket]
+        rng = np.random.default_rng(seed)
+        return [sample_config(SEARCH_SPACES[model_name], rng) for _ in range(n)]
+
+    def successive_halving(self, model_name, configs, min_budget):
+        """Keep the best 1/eta of the configs while multiplying the budget by eta"""
+        budget = min_budget
+        survivors = configs
+        while True:
+            scores = self._evaluate(model_name, survivors, budget)
+            ranked = sorted(zip(scores, range(len(survivors))), reverse=True)
+            print(
+                f"  {model_name}: {len(survivors)} configs at budget {budget:.3f}, "
+                f"best AUC {ranked[0][0]:.4f}"
+            )
+            if budget >= 1.0 or len(survivors) == 1:
+                best_score, best_index = ranked[0]
+                return survivors[best_index], best_score, budget
+
+            keep = max(1, len(survivors) // self.eta)
+            survivors = [survivors[i] for _, i in ranked[:keep]]
+            budget = min(1.0, budget * self.eta)
+
+    def _search_model(self, model_name):
+        if self.strategy == 'random':
+            configs = self._sample_configs(model_name, self.n_candidates)
+            return self.successive_halving(model_name, configs, 1.0)
+
+        if self.strategy == 'successive_halving':
+            configs = self._sample_configs(model_name, self.n_candidates)
+            return self.successive_halving(model_name, configs, self.min_budget)
+
+        # Hyperband: brackets trade off many cheap configs vs few full ones
+        s_max = int(math.floor(math.log(1 / self.min_budget, self.eta) + 1e-9))
+        best = None
+        for s in range(s_max, -1, -1):
+            n = int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s))
+            configs = self._sample_configs(model_name, n, bracket=s)
+            config, score, budget = self.successive_halving(model_name, configs, self.eta ** -s)
+            if budget < 1.0:
+                # Lone survivor stopped early: only full-budget scores compare across brackets
+                score, budget = self._evaluate(model_name, [config], 1.0)[0], 1.0
+            if best is None or score > best[1]:
+                best = (config, score, budget)
+        return best
+
+    def run(self, X, y):
+        """Search every model; returns {model_name: best hyperparameters}"""
+        print(f"Hyperparameter search ({self.strategy}, {self.cv_folds}-fold, n_jobs={self.n_jobs})")
+        self.prepare_folds(X, y)
+
+        for model_name in self.model_names:
+            config, score, budget = self._search_model(model_name)
+            if budget < 1.0:
+                # Single survivor stopped early: score it at full budget
+                score = self._evaluate(model_name, [config], 1.0)[0]
+
+            baseline = self._evaluate(model_name, [{}], 1.0)[0]
+            if score < baseline:
+                print(f"  {model_name}: defaults ({baseline:.4f}) beat search ({score:.4f})")
+                config, score = {}, baseline
+
+            self.best_params_[model_name] = config
+            self.best_scores_[model_name] = score
+            print(f"Best {model_name}: AUC {score:.4f} with {config}")
+
+        return self.best_params_
+
+    def save_best_params(self, path='models/best_params.json'):
+        path = os.path.join(BASE_DIR, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(
+                {'params': self.best_params_, 'cv_auc': self.best_scores_},
+                f, indent=2, default=str
+            )
+        print(f"Best hyperparameters saved to {path}")
+        return path
+
@@ -0,0 +1,441 @@
+"""
+Incremental refresh of a trained detector from newly labeled transactions.
+
+Instead of refitting the preprocessor and re-running cross-validation for
+every model, the saved artifacts are updated in place:
+
+- StandardScaler statistics are merged with the new rows (partial_fit)
+  and the one-hot vocabularies are extended with unseen categories.
+- The existing trees are re-expressed in the updated feature space (split
+  thresholds follow the new scaling, column indices follow the widened
+  one-hot layout). Rescaled thresholds are nudged so every reference row
+  (history plus new rows) takes the same branch as before: the old model
+  scores exactly as before on those rows, float32 rounding included.
+- XGBoost keeps boosting for extra rounds on the new rows; RandomForest and
+  GradientBoosting grow extra trees/stages via warm start.
+
+The refreshed model is only kept if its AUC on a hold-out slice of the new
+rows does not drop by more than ``max_auc_drop``.
+"""
+import copy
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
+from imblearn.pipeline import Pipeline as ImbPipeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class IncrementalTrainer:
+    def __init__(self, random_state=42, extra_boost_rounds=50, extra_trees=25,
+                 holdout_size=0.2, max_auc_drop=0.01):
+        self.random_state = random_state
+        self.extra_boost_rounds = extra_boost_rounds
+        self.extra_trees = extra_trees
+        self.holdout_size = holdout_size
+        self.max_auc_drop = max_auc_drop
+        self.model = None
+        self.preprocessor = None
+        self.holdout = None
+
+    def load(self, model_path='models/trained_detector.pkl',
+             preprocessor_path='models/preprocessor.pkl'):
+        """Load the artifacts to update"""
+        self.model = joblib.load(os.path.join(BASE_DIR, model_path))
+        self.preprocessor = joblib.load(os.path.join(BASE_DIR, preprocessor_path))
+        return self.model, self.preprocessor
+
+    # ------------------------------------------------------------------
+    # Preprocessor
+    # ------------------------------------------------------------------
+    def update_preprocessor(self, X_new, X_reference=None):
+        """Return an updated copy of the preprocessor plus the feature remapping.
+
+        The remapping is a dict with
+        - ``column_map``: new column index for every old column index
+        - ``n_features``: width of the updated feature matrix
+        - ``scale``/``shift``: per numeric column, a split threshold ``t`` on
+          the old scaling becomes about ``t * scale + shift`` on the new one
+        - ``reference``: per numeric column, the sorted old and new float32
+          values of ``X_reference`` (default ``X_new``), used to place each
+          rescaled threshold between the same rows as the old one
+        - ``added_categories``: unseen categories per categorical column
+        """
+        preprocessor = copy.deepcopy(self.preprocessor)
+        transformers = {name: (trans, cols) for name, trans, cols in preprocessor.transformers_}
+        num_pipeline, num_cols = transformers['num']
+        cat_pipeline, cat_cols = transformers['cat']
+
+        # -------- Scaler statistics --------
+        scaler = num_pipeline.named_steps['scaler']
+        old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+        if X_reference is None:
+            X_reference = X_new
+        # Models see float32 features, whatever the preprocessor emits
+        old_values = np.asarray(num_pipeline.transform(X_reference[num_cols]), dtype=np.float32)
+        numeric = X_new[num_cols]
+        # Pipelines built by create_preprocessor cast before scaling
+        if num_pipeline.steps[0][0] == 'float32':
+            numeric = num_pipeline.named_steps['float32'].transform(numeric)
+        scaler.partial_fit(numeric)
+        scale = old_scale / scaler.scale_
+        shift = (old_mean - scaler.mean_) / scaler.scale_
+        new_values = np.asarray(num_pipeline.transform(X_reference[num_cols]), dtype=np.float32)
+        reference = []
+        for j in range(len(num_cols)):
+            finite = np.isfinite(old_values[:, j]) & np.isfinite(new_values[:, j])
+            old, new = old_values[finite, j], new_values[finite, j]
+            # Both scalings are increasing, so sorting by (old, new) orders the rows
+            order = np.lexsort((new, old))
+            reference.append((old[order].astype(np.float64), new[order].astype(np.float64)))
+
+        # -------- Category vocabularies --------
+        encoder = cat_pipeline.named_steps['onehot']
+        categories = []
+        added_categories = {}
+        for col, known in zip(cat_cols, encoder.categories_):
+            known_set = set(known.tolist())
+            unseen = [v for v in pd.unique(X_new[col].dropna()) if v not in known_set]
+            if unseen:
+                added_categories[col] = unseen
+            # Appending keeps every existing one-hot column at its relative position
+            categories.append(np.array(list(known) + unseen, dtype=known.dtype))
+
+        n_num = len(num_cols)
+        old_widths = [len(c) for c in encoder.categories_]
+        new_widths = [len(c) for c in categories]
+
+        if added_categories:
+            new_encoder = OneHotEncoder(
+                categories=categories,
+                handle_unknown=encoder.handle_unknown,
+                sparse_output=False,
+                dtype=encoder.dtype
+            )
+            new_encoder.fit(X_new[cat_cols])
+            cat_pipeline.steps[-1] = ('onehot', new_encoder)
+
+        column_map = list(range(n_num))
+        old_offset, new_offset = n_num, n_num
+        for old_width, new_width in zip(old_widths, new_widths):
+            column_map.extend(range(new_offset, new_offset + old_width))
+            old_offset += old_width
+            new_offset += new_width
+
+        preprocessor.output_indices_ = {
+            'num': slice(0, n_num),
+            'cat': slice(n_num, new_offset),
+            'remainder': slice(0, 0)
+        }
+
+        remap = {
+            'column_map': np.array(column_map),
+            'n_features': new_offset,
+            'n_numeric': n_num,
+            'scale': scale,
+            'shift': shift,
+            'reference': reference,
+            'inexact_splits': 0,
+            'added_categories': added_categories
+        }
+        return preprocessor, remap
+
+    # ------------------------------------------------------------------
+    # Model remapping
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _remap_thresholds(thresholds, features, remap, strict):
+        """New-space thresholds that split every reference row as before
+
+        sklearn trees send ``x <= t`` left (``strict=False``), XGBoost sends
+        ``x < t`` left and stores float32 conditions (``strict=True``). The
+        affine image of ``t`` is clipped to the gap between the last
+        reference row going left and the first going right; splits whose
+        rows collide after rescaling are counted in ``inexact_splits``.
+        """
+        mapped = thresholds * remap['scale'][features] + remap['shift'][features]
+        if strict:
+            mapped = mapped.astype(np.float32).astype(np.float64)
+        for j in np.unique(features):
+            old, new = remap['reference'][j]
+            rows = features == j
+            n_left = np.searchsorted(old, thresholds[rows], side='left' if strict else 'right')
+            last_left = np.where(n_left > 0, new[np.maximum(n_left - 1, 0)], -np.inf)
+            first_right = np.where(n_left < len(new), new[np.minimum(n_left, len(new) - 1)], np.inf)
+            remap['inexact_splits'] += int(np.sum(last_left >= first_right))
+            if strict:
+                low = np.nextafter(last_left.astype(np.float32), np.float32(np.inf)).astype(np.float64)
+                high = first_right
+            else:
+                low, high = last_left, np.nextafter(first_right, -np.inf)
+            mapped[rows] = np.minimum(np.maximum(mapped[rows], low), high)
+        return mapped
+
+    @staticmethod
+    def _remap_sklearn_tree(estimator, remap):
+        """Rebuild a fitted sklearn tree in the updated feature space"""
+        tree = estimator.tree_
+        cls, args, state = tree.__reduce__()
+        nodes = state['nodes'].copy()
+
+        is_split = nodes['feature'] >= 0
+        old_features = nodes['feature'][is_split]
+        numeric = old_features < remap['n_numeric']
+        thresholds = nodes['threshold'][is_split]
+        thresholds[numeric] = IncrementalTrainer._remap_thresholds(
+            thresholds[numeric], old_features[numeric], remap, strict=False
+        )
+        nodes['threshold'][is_split] = thresholds
+        nodes['feature'][is_split] = remap['column_map'][old_features]
+
+        new_tree = cls(remap['n_features'], *args[1:])
+        state = dict(state, nodes=nodes)
+        new_tree.__setstate__(state)
+
+        estimator.tree_ = new_tree
+        estimator.n_features_in_ = remap['n_features']
+        if hasattr(estimator, 'max_features_'):
+            estimator.max_features_ = min(estimator.max_features_, remap['n_features'])
+        return estimator
+
+    @staticmethod
+    def _remap_xgboost_booster(classifier, remap):
+        """Rewrite split indices/conditions of every tree in the booster JSON"""
+        from xgboost import Booster
+
+        model = json.loads(classifier.get_booster().save_raw('json'))
+        learner = model['learner']
+        learner['learner_model_param']['num_feature'] = str(remap['n_features'])
+        learner['feature_names'] = []
+        learner['feature_types'] = []
+
+        for tree in learner['gradient_booster']['model']['trees']:
+            tree['tree_param']['num_feature'] = str(remap['n_features'])
+            left = np.asarray(tree['left_children'])
+            indices = np.asarray(tree['split_indices'])
+            # JSON holds the shortest decimal of each float32 condition
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+
+            is_split = left != -1
+            numeric = is_split & (indices < remap['n_numeric'])
+            conditions[numeric] = IncrementalTrainer._remap_thresholds(
+                conditions[numeric], indices[numeric], remap, strict=True
+            )
+            indices = np.where(is_split, remap['column_map'][indices], indices)
+
+            tree['split_indices'] = indices.tolist()
+            tree['split_conditions'] = conditions.tolist()
+
+        booster = Booster()
+        booster.load_model(bytearray(json.dumps(model).encode()))
+        return booster
+
+    # ------------------------------------------------------------------
+    # Update
+    # ------------------------------------------------------------------
+    def _resample(self, X, y):
+        """Apply the pipeline's SMOTE step to the new rows when feasible"""
+        smote = self.model.named_steps.get('smote') if hasattr(self.model, 'named_steps') else None
+        if smote is None:
+            return X, y, None
+
+        smote = clone(smote)
+        minority = np.bincount(np.asarray(y, dtype=int), minlength=2).min()
+        if minority <= smote.k_neighbors:
+            print(f"ℹ️ Only {minority} minority samples in new data, skipping SMOTE")
+            return X, y, smote
+        X_res, y_res = smote.fit_resample(X, y)
+        return X_res, y_res, smote
+
+    def update_model(self, X_new_processed, y_new, remap):
+        """Return an updated copy of the pipeline, extended on the new rows"""
+        classifier = self.model.named_steps['classifier']
+        name = type(classifier).__name__
+        X_fit, y_fit, smote = self._resample(X_new_processed, y_new)
+
+        if name == 'XGBClassifier':
+            booster = self._remap_xgboost_booster(classifier, remap)
+            updated = clone(classifier)
+            updated.set_params(n_estimators=self.extra_boost_rounds)
+            updated.fit(X_fit, y_fit, xgb_model=booster)
+
+        elif name == 'RandomForestClassifier':
+            updated = copy.deepcopy(classifier)
+            for estimator in updated.estimators_:
+                self._remap_sklearn_tree(estimator, remap)
+            updated.n_features_in_ = remap['n_features']
+            updated.set_params(
+                warm_start=True,
+                oob_score=False,
+                n_estimators=len(updated.estimators_) + self.extra_trees
+            )
+            updated.fit(X_fit, y_fit)
+
+        elif name == 'GradientBoostingClassifier':
+            updated = copy.deepcopy(classifier)
+            for estimator in updated.estimators_.ravel():
+                self._remap_sklearn_tree(estimator, remap)
+            updated.n_features_in_ = remap['n_features']
+            updated.max_features_ = remap['n_features']
+            updated.set_params(
+                warm_start=True,
+                n_estimators=updated.estimators_.shape[0] + self.extra_trees
+            )
+            updated.fit(X_fit, y_fit)
+
+        else:
+            raise ValueError(
+                f"Incremental update is not supported for {name}; "
+                "run the full training pipeline instead"
+            )
+
+        steps = [('classifier', updated)]
+        if smote is not None:
+            steps.insert(0, ('smote', smote))
+        return ImbPipeline(steps)
+
+    def _holdout_auc(self, model, preprocessor, X_holdout, y_holdout):
+        if y_holdout is None or len(np.unique(y_holdout)) < 2:
+            return None
+        prob = model.predict_proba(preprocessor.transform(X_holdout))[:, 1]
+        return roc_auc_score(y_holdout, prob)
+
+    def model_trainer(self, model, preprocessor, X_train, metadata=None):
+        """``ModelTrainer`` holding the updated artifacts, for ``save_model``
+
+        Drift reference and explanation baseline are rebuilt from
+        ``X_train``; decision thresholds are refit on the hold-out of the
+        last ``update`` (the current ones are kept if it has one class).
+        The updated model is not compacted, so no compaction report is kept.
+        """
+        from decision_engine import DecisionEngine
+        from drift_monitor import build_reference
+        from model_training import ModelTrainer
+
+        trainer = ModelTrainer(random_state=self.random_state)
+        trainer.model = model
+        trainer.preprocessor = preprocessor
+        trainer.drift_reference = build_reference(X_train)
+        trainer.background_mean = preprocessor.transform(X_train).mean(axis=0).tolist()
+
+        X_holdout, y_holdout = self.holdout
+        if len(np.unique(y_holdout)) == 2:
+            print("\nDecision thresholds:")
+            trainer.decision_engine = DecisionEngine.fit(
+                y_holdout, model.predict_proba(preprocessor.transform(X_holdout))[:, 1]
+            )
+        elif metadata and 'decision_thresholds' in metadata:
+            print("⚠️ Hold-out contains a single class, keeping the current decision thresholds")
+            trainer.decision_engine = DecisionEngine.from_dict(metadata['decision_thresholds'])
+        return trainer
+
+    def update(self, X_new, y_new, X_reference=None):
+        """Update preprocessor and model from new rows, validating on a hold-out.
+
+        ``X_reference`` (default ``X_new``) are the rows the remapped trees
+        must route exactly as before, normally history plus new rows.
+        Returns ``(model, preprocessor, report)``; the returned artifacts are
+        the original ones when the update was rejected.
+        """
+        if self.model is None or self.preprocessor is None:
+            raise ValueError("Artifacts not loaded. Call load() first.")
+
+        y_new = pd.Series(np.asarray(y_new, dtype=int), index=X_new.index)
+        stratify = y_new if y_new.value_counts().min() >= 2 else None
+        X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+            X_new, y_new,
+            test_size=self.holdout_size,
+            random_state=self.random_state,
+            stratify=stratify
+        )
+
+        preprocessor, remap = self.update_preprocessor(
+            X_fit, X_new if X_reference is None else X_reference
+        )
+        model = self.update_model(preprocessor.transform(X_fit), y_fit, remap)
+        if remap['inexact_splits']:
+            print(f"⚠️ {remap['inexact_splits']} rescaled splits cannot separate their "
+                  "reference rows in float32")
+
+        self.holdout = (X_holdout, y_holdout)
+        old_auc = self._holdout_auc(self.model, self.preprocessor, X_holdout, y_holdout)
+        new_auc = self._holdout_auc(model, preprocessor, X_holdout, y_holdout)
+
+        accepted = old_auc is None or new_auc >= old_auc - self.max_auc_drop
+        report = {
+            'new_rows': len(X_new),
+            'fit_rows': len(X_fit),
+            'holdout_rows': len(X_holdout),
+            'added_categories': remap['added_categories'],
+            'inexact_splits': remap['inexact_splits'],
+            'holdout_auc_before': old_auc,
+            'holdout_auc_after': new_auc,
+            'accepted': accepted
+        }
+
+        print(f"Hold-out AUC before update: {old_auc if old_auc is None else f'{old_auc:.4f}'}")
+        print(f"Hold-out AUC after update:  {new_auc if new_auc is None else f'{new_auc:.4f}'}")
+        if old_auc is None:
+            print("⚠️ Hold-out contains a single class, AUC check skipped")
+
+        if not accepted:
+            print("❌ Update rejected: hold-out AUC dropped, keeping the current model")
+            return self.model, self.preprocessor, report
+
+        print("✅ Update accepted")
+        return model, preprocessor, report
+
+
+def run_incremental_update(new_data_path, history_path=None,
+                           model_path='models/trained_detector.pkl',
+                           preprocessor_path='models/preprocessor.pkl',
+                           metadata_path='models/model_metadata.pkl',
+                           point_in_time=False, save=True, **trainer_kwargs):
+    """Refresh the saved model with the labeled transactions in ``new_data_path``
+
+    User aggregates are recomputed over ``history_path`` (the training CSV)
+    plus the new rows, the same way ``train.py`` computes them; pass the
+    ``point_in_time`` setting the model was trained with. An accepted update
+    is saved together with regenerated metadata.
+    """
+    from data_utils import DataProcessor
+
+    data_processor = DataProcessor(random_state=trainer_kwargs.get('random_state', 42))
+    new = data_processor.load_data(new_data_path).assign(_is_new=True)
+    if history_path is not None and os.path.exists(history_path):
+        history = data_processor.load_data(history_path).assign(_is_new=False)
+        new = pd.concat([history, new], ignore_index=True)
+    else:
+        print("⚠️ No transaction history given, user aggregates cover the new rows only")
+    df = data_processor.feature_engineering(new, point_in_time=point_in_time, float32=True)
+
+    is_new = df.pop('_is_new').to_numpy(dtype=bool)
+    X_all = df.drop(['Transaction_ID', 'Is_Fraudulent'], axis=1)
+    X_new = X_all[is_new]
+    y_new = df.loc[is_new, 'Is_Fraudulent']
+
+    trainer = IncrementalTrainer(**trainer_kwargs)
+    trainer.load(model_path, preprocessor_path)
+    model, preprocessor, report = trainer.update(X_new, y_new, X_reference=X_all)
+
+    if save and report['accepted']:
+        full_metadata_path = os.path.join(BASE_DIR, metadata_path)
+        metadata = joblib.load(full_metadata_path) if os.path.exists(full_metadata_path) else {}
+        model_trainer = trainer.model_trainer(model, preprocessor, X_all, metadata)
+        model_trainer.save_model(
+            os.path.join(BASE_DIR, model_path),
+            os.path.join(BASE_DIR, preprocessor_path),
+            full_metadata_path
+        )
+        # Segment bundles were chosen against the previous global model
+        from segment_models import clear_segment_models
+        clear_segment_models(os.path.join(BASE_DIR, os.path.dirname(model_path), 'segments'))
+
+    return report
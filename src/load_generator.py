@@ -0,0 +1,477 @@
+"""
+Traffic replay and load generation against the fraud API.
+
+Transactions from ``user_transaction_dataset.csv`` (optionally scaled up
+with jittered copies) are replayed against ``/predict`` (JSON bodies) and
+``/batch_predict`` (CSV uploads) by an asyncio client on the standard
+library only:
+
+- open loop (``--qps``): requests are scheduled at a fixed rate and latency
+  is measured from the scheduled send time, so a stalled server shows up as
+  queueing delay instead of silently lowering the offered load
+- closed loop (``--concurrency`` without ``--qps``): each connection sends
+  its next request as soon as the previous one returned
+
+A run records every request and reports latency percentiles, error rates
+and throughput, overall and per second. ``--out run.json`` saves it and
+``--compare base.json new.json`` prints the difference between two runs.
+
+The target is a running API (``--target``), an API process spawned for the
+run (``--spawn``) or the Flask app served from a thread of this process
+(``--in-process``). Everything stays on localhost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from transaction_schema import TRANSACTION_SCHEMA
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+ENDPOINTS = {'predict': '/predict', 'batch_predict': '/batch_predict'}
+# Relative change of a latency percentile reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+# -------- Workload --------
+def scale_dataset(df, factor, seed=0, amount_jitter=0.1):
+    """``factor`` times as many rows: resampled copies with jittered amounts"""
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    scaled = df.iloc[rng.integers(0, len(df), int(len(df) * factor))].reset_index(drop=True)
+    amount = scaled['Transaction_Amount'] * rng.lognormal(0, amount_jitter, len(scaled))
+    return scaled.assign(
+        Transaction_Amount=amount,
+        Amount_Log=np.log1p(amount),
+        Amount_to_Avg_Ratio=amount / (scaled['User_Avg_Amount'] + 1)
+    )
+
+
+def load_transactions(data_path='../user_transaction_dataset.csv', scale=1.0, seed=0):
+    """Model-ready transactions (Transaction_ID plus the schema columns)"""
+    from data_utils import DataProcessor
+
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(data_path))
+    columns = [field.name for field in TRANSACTION_SCHEMA]
+    df = scale_dataset(df[columns], scale, seed)
+    df.insert(0, 'Transaction_ID', np.arange(len(df)))
+    return df
+
+
+class Workload:
+    """Pre-encoded request bodies, replayed in order per endpoint"""
+
+    def __init__(self, transactions, mix=None, rows_per_request=1, batch_rows=1000, seed=0):
+        self.mix = mix or {'predict': 1.0}
+        unknown = set(self.mix) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+        self.rng = random.Random(seed)
+        self.bodies = {}
+        if 'predict' in self.mix:
+            features = transactions.drop(columns=['Transaction_ID'])
+            records = features.astype(object).where(features.notna(), None).to_dict('records')
+            self.bodies['predict'] = [
+                json.dumps(records[i] if rows_per_request == 1 else records[i:i + rows_per_request]).encode()
+                for i in range(0, len(records), rows_per_request)
+            ]
+        if 'batch_predict' in self.mix:
+            self.bodies['batch_predict'] = [
+                self._multipart(transactions.iloc[i:i + batch_rows])
+                for i in range(0, len(transactions), batch_rows)
+            ]
+        self.names = list(self.mix)
+        self.weights = [self.mix[name] for name in self.names]
+        self.position = dict.fromkeys(self.names, 0)
+
+    @staticmethod
+    def _multipart(df):
+        boundary = uuid.uuid4().hex
+        return boundary, (
+            f'--{boundary}\r\n'
+            'Content-Disposition: form-data; name="file"; filename="transactions.csv"\r\n'
+            'Content-Type: text/csv\r\n\r\n'
+            f'{df.to_csv(index=False)}\r\n'
+            f'--{boundary}--\r\n'
+        ).encode()
+
+    def next(self):
+        """(endpoint name, path, body, headers) of the next request"""
+        name = self.names[0] if len(self.names) == 1 else self.rng.choices(self.names, self.weights)[0]
+        bodies = self.bodies[name]
+        body = bodies[self.position[name] % len(bodies)]
+        self.position[name] += 1
+        if name == 'batch_predict':
+            boundary, body = body
+            headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        else:
+            headers = {'Content-Type': 'application/json'}
+        return name, ENDPOINTS[name], body, headers
+
+
+# -------- HTTP client --------
+class _Connection:
+    """One HTTP/1.1 connection, reopened when the server closes it"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Send a request and read the whole response; returns (status, body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                f'Content-Length: {len(body)}']
+        head += [f'{key}: {value}' for key, value in (headers or {}).items()]
+        try:
+            self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+            await self.writer.drain()
+            return await self._response()
+        except Exception:
+            self.close()
+            raise
+
+    async def _response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if not size:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            self.close()
+
+        if version == b'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+            self.close()
+        return int(status), body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+# -------- Runner --------
+async def _run(url, workload, qps=None, concurrency=8, duration=10.0, max_requests=None):
+    parts = urlsplit(url)
+    pool = asyncio.Queue()
+    for _ in range(concurrency):
+        pool.put_nowait(_Connection(parts.hostname, parts.port or 80))
+
+    records = []
+    start = time.perf_counter()
+
+    async def send(scheduled):
+        name, path, body, headers = workload.next()
+        connection = await pool.get()
+        try:
+            sent = time.perf_counter()
+            try:
+                status, _ = await connection.request('POST', path, body, headers)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                status = 0
+            done = time.perf_counter()
+        finally:
+            pool.put_nowait(connection)
+        # Open loop: latency includes the wait for a free connection
+        records.append((name, scheduled - start, done - scheduled, done - sent, status))
+
+    def more(issued):
+        if max_requests is not None and issued >= max_requests:
+            return False
+        return time.perf_counter() - start < duration
+
+    if qps:
+        tasks = []
+        issued = 0
+        while more(issued):
+            scheduled = start + issued / qps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(scheduled)))
+            issued += 1
+        await asyncio.gather(*tasks)
+    else:
+        counter = {'issued': 0}
+
+        async def closed_loop():
+            while more(counter['issued']):
+                counter['issued'] += 1
+                await send(time.perf_counter())
+
+        await asyncio.gather(*(closed_loop() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - start
+    while not pool.empty():
+        pool.get_nowait().close()
+    return records, elapsed
+
+
+def run_load(url, workload, qps=None, concurrency=8, duration=10.0, max_requests=None,
+             bucket_seconds=1.0):
+    """Replay ``workload`` against ``url`` and summarize the run"""
+    records, elapsed = asyncio.run(_run(url, workload, qps=qps, concurrency=concurrency,
+                                        duration=duration, max_requests=max_requests))
+    result = summarize(records, elapsed, bucket_seconds)
+    result['config'] = {
+        'url': url, 'qps': qps, 'concurrency': concurrency, 'duration': duration,
+        'max_requests': max_requests, 'mix': workload.mix
+    }
+    return result
+
+
+# -------- Reporting --------
+def _latency_ms(latencies):
+    if not len(latencies):
+        return {}
+    values = np.percentile(latencies, PERCENTILES) * 1e3
+    summary = {f'p{p:g}': round(float(v), 3) for p, v in zip(PERCENTILES, values)}
+    summary['mean'] = round(float(np.mean(latencies)) * 1e3, 3)
+    summary['max'] = round(float(np.max(latencies)) * 1e3, 3)
+    return summary
+
+
+def summarize(records, elapsed, bucket_seconds=1.0):
+    """Per-endpoint totals, latency percentiles and a per-bucket timeline
+
+    ``records`` are (endpoint, start offset, latency, service time, status)
+    tuples; status 0 is a connection error. Only 2xx responses count as
+    successes and only their latencies enter the percentiles.
+    """
+    frame = pd.DataFrame(records, columns=['endpoint', 'start', 'latency', 'service', 'status'])
+    endpoints = {}
+    for name, group in frame.groupby('endpoint'):
+        ok = group['status'].between(200, 299)
+        statuses = group['status'].value_counts().sort_index()
+        bucket = (group['start'] // bucket_seconds).astype(int)
+        timeline = []
+        for k, rows in group.groupby(bucket):
+            good = rows['latency'][rows['status'].between(200, 299)].to_numpy()
+            timeline.append({
+                't': round(k * bucket_seconds, 3),
+                'requests': int(len(rows)),
+                'errors': int(len(rows) - len(good)),
+                'throughput': round(len(good) / bucket_seconds, 2),
+                'p50_ms': round(float(np.percentile(good, 50)) * 1e3, 3) if len(good) else None,
+                'p99_ms': round(float(np.percentile(good, 99)) * 1e3, 3) if len(good) else None
+            })
+        endpoints[name] = {
+            'requests': int(len(group)),
+            'errors': int((~ok).sum()),
+            'error_rate': round(float((~ok).mean()), 6),
+            'status_codes': {str(code): int(count) for code, count in statuses.items()},
+            'throughput': round(float(ok.sum()) / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': _latency_ms(group['latency'][ok].to_numpy()),
+            'service_ms': _latency_ms(group['service'][ok].to_numpy()),
+            'timeline': timeline
+        }
+    return {'elapsed': round(elapsed, 3), 'requests': len(records), 'endpoints': endpoints}
+
+
+def print_summary(result):
+    print(f"\n{result['requests']:,} requests in {result['elapsed']:.2f}s")
+    for name, stats in result['endpoints'].items():
+        latency = stats['latency_ms']
+        print(f"{name:>14}: {stats['requests']:,} requests | {stats['throughput']:,.1f} ok/s | "
+              f"errors {stats['error_rate']:.2%} {stats['status_codes']}")
+        if latency:
+            print(' ' * 16 + ' | '.join(f"{key} {value:.1f}ms" for key, value in latency.items()))
+
+
+def compare(base, new, threshold=REGRESSION_THRESHOLD):
+    """Metric-by-metric difference of two runs, with regressions flagged"""
+    report = {}
+    for name in sorted(set(base['endpoints']) | set(new['endpoints'])):
+        a = base['endpoints'].get(name)
+        b = new['endpoints'].get(name)
+        if a is None or b is None:
+            report[name] = {'missing_in': 'base' if a is None else 'new'}
+            continue
+        metrics = {'throughput': (a['throughput'], b['throughput'], True),
+                   'error_rate': (a['error_rate'], b['error_rate'], False)}
+        for key in a['latency_ms']:
+            if key in b['latency_ms']:
+                metrics[f'latency_{key}_ms'] = (a['latency_ms'][key], b['latency_ms'][key], False)
+        rows = {}
+        for metric, (before, after, higher_is_better) in metrics.items():
+            change = (after - before) / before if before else None
+            if metric == 'error_rate':
+                regression = after > before
+            elif change is None:
+                regression = False
+            else:
+                regression = (-change if higher_is_better else change) > threshold
+            rows[metric] = {'base': before, 'new': after,
+                            'change': None if change is None else round(change, 4),
+                            'regression': bool(regression)}
+        report[name] = rows
+    return report
+
+
+def print_comparison(report):
+    for name, rows in report.items():
+        print(f"\n{name}")
+        if 'missing_in' in rows:
+            print(f"  ⚠️  not present in the {rows['missing_in']} run")
+            continue
+        for metric, row in rows.items():
+            change = '' if row['change'] is None else f"{row['change']:+.1%}"
+            flag = '  ❌ regression' if row['regression'] else ''
+            print(f"  {metric:>18}: {row['base']:>12,.3f} -> {row['new']:>12,.3f} {change:>8}{flag}")
+
+
+# -------- Targets --------
+def _serve(app, host, port):
+    from werkzeug.serving import make_server
+    return make_server(host, port, app, threaded=True)
+
+
+def serve_in_thread(app, host='127.0.0.1', port=0):
+    """Serve a WSGI app from a daemon thread; returns (server, url)"""
+    server = _serve(app, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def wait_until_healthy(url, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.25)
+    return False
+
+
+def spawn_server(port=5050, timeout=60.0):
+    """Start the API in a child process (no debug reloader); returns (process, url)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    url = f'http://127.0.0.1:{port}'
+    if not wait_until_healthy(url, timeout):
+        process.terminate()
+        raise RuntimeError(f'API did not become healthy on {url} within {timeout:.0f}s')
+    return process, url
+
+
+def _parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition(':')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay transactions against the fraud API')
+    parser.add_argument('--target', help='Base URL of a running API, e.g. http://127.0.0.1:5000')
+    parser.add_argument('--spawn', action='store_true', help='Start the API in a child process')
+    parser.add_argument('--in-process', action='store_true', help='Serve the Flask app from a thread')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--scale', type=float, default=1.0, help='Dataset size multiplier')
+    parser.add_argument('--mix', default='predict:1', help='e.g. predict:0.95,batch_predict:0.05')
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    parser.add_argument('--batch-rows', type=int, default=1000)
+    parser.add_argument('--qps', type=float, help='Open-loop request rate')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--requests', type=int, help='Stop after this many requests')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='Save the run as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Compare two saved runs')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        from app import app
+        _serve(app, '127.0.0.1', args.port).serve_forever()
+        return
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        differs = [key for key in ('qps', 'concurrency', 'mix')
+                   if base['config'].get(key) != new['config'].get(key)]
+        if differs:
+            print(f"⚠️  Runs differ in {', '.join(differs)}; throughput is not comparable")
+        print_comparison(compare(base, new))
+        return
+
+    transactions = load_transactions(args.data, args.scale, args.seed)
+    workload = Workload(transactions, _parse_mix(args.mix), args.rows_per_request,
+                        args.batch_rows, args.seed)
+    print(f"✅ {len(transactions):,} transactions loaded")
+
+    process = server = None
+    if args.spawn:
+        process, url = spawn_server(args.port)
+    elif args.in_process:
+        from app import app
+        server, url = serve_in_thread(app)
+    elif args.target:
+        url = args.target.rstrip('/')
+    else:
+        parser.error('one of --target, --spawn or --in-process is required')
+
+    try:
+        result = run_load(url, workload, qps=args.qps, concurrency=args.concurrency,
+                          duration=args.duration, max_requests=args.requests)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.shutdown()
+
+    print_summary(result)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Run saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
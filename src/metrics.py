@@ -0,0 +1,429 @@
+"""
+Minimal Prometheus-style instrumentation for the fraud API.
+
+Metrics are kept in process memory and rendered in the text exposition
+format by ``REGISTRY.render()`` (served on ``/metrics``). With
+``REGISTRY.enabled = False``, counters and histograms hand out a shared
+no-op child, so instrumented code does no label lookups, timing or
+locking.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 50000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _NullChild:
+    """Stands in for every counter/histogram child while metrics are disabled"""
+
+    _context = nullcontext()
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self._context
+
+
+_NULL_CHILD = _NullChild()
+
+
+class _Metric:
+    metric_type = None
+    # Returned by labels() while the registry is disabled (None: always record)
+    _disabled_child = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        if self._disabled_child is not None and not self.registry.enabled:
+            return self._disabled_child
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels: {self.labelnames}")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    def __init__(self, registry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+    _disabled_child = _NULL_CHILD
+
+    def _new_child(self):
+        return _CounterChild(self.registry)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '_total', _format_labels(self.labelnames, key), child.value
+
+
+class _GaugeChild:
+    def __init__(self, registry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set_function(self, function):
+        """Read the value from ``function()`` at render time"""
+        self._function = function
+
+    def get(self):
+        if self._function is not None:
+            return self._function()
+        return self.value
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild(self.registry)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '', _format_labels(self.labelnames, key), child.get()
+
+
+class _HistogramChild:
+    def __init__(self, registry, buckets):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        if not self._registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+    _disabled_child = _NULL_CHILD
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.registry, self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', _format_labels(
+                    self.labelnames, key, ('le', _format_value(bound))
+                ), cumulative
+            yield '_sum', _format_labels(self.labelnames, key), total
+            yield '_count', _format_labels(self.labelnames, key), cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = True
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'fraud_api_requests',
+    'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status')
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'fraud_api_request_duration_seconds',
+    'End-to-end request latency by endpoint',
+    ('endpoint',)
+)
+IN_FLIGHT = REGISTRY.gauge(
+    'fraud_api_in_flight_requests',
+    'Requests currently being handled'
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    'fraud_api_stage_duration_seconds',
+    'Latency of individual prediction stages',
+    ('stage',)
+)
+BATCH_SIZE = REGISTRY.histogram(
+    'fraud_api_batch_size',
+    'Transactions per prediction call',
+    ('endpoint',),
+    buckets=BATCH_SIZE_BUCKETS
+)
+MODEL_INFO = REGISTRY.gauge(
+    'fraud_model_info',
+    'Currently loaded model version (value is always 1)',
+    ('version',)
+)
+SHADOW_DROPPED = REGISTRY.counter(
+    'fraud_shadow_dropped_requests',
+    'Requests not shadow-scored because the shadow queue was full'
+)
+SHADOW_ROWS = REGISTRY.counter(
+    'fraud_shadow_scored_rows',
+    'Transactions scored by the shadow model'
+)
+SHADOW_DISAGREEMENTS = REGISTRY.counter(
+    'fraud_shadow_disagreements',
+    'Transactions where the shadow and primary fraud decisions differ'
+)
+SHADOW_SCORE_DELTA = REGISTRY.histogram(
+    'fraud_shadow_score_delta',
+    'Absolute difference of shadow and primary fraud probabilities',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+MODEL_LATENCY = REGISTRY.histogram(
+    'fraud_model_predict_duration_seconds',
+    'Scoring latency per call of the primary and shadow models',
+    ('model',)
+)
+ADMISSION_DECISIONS = REGISTRY.counter(
+    'fraud_admission_decisions',
+    'Predict requests scored by the model (full), by the rules only (degraded) or rejected',
+    ('decision', 'reason')
+)
+ADMISSION_QUEUE_TIME = REGISTRY.histogram(
+    'fraud_admission_queue_seconds',
+    'Time predict requests waited for a model slot'
+)
+SEGMENT_ROWS = REGISTRY.counter(
+    'fraud_segment_scored_rows',
+    'Transactions scored per segment model (global: no segment model)',
+    ('segment',)
+)
+SEGMENT_MODEL_CACHE = REGISTRY.counter(
+    'fraud_segment_model_cache',
+    'Segment model bundle cache hits, loads, evictions and failed loads',
+    ('event',)
+)
+
+
+def set_model_version(version):
+    MODEL_INFO.clear()
+    if version is not None:
+        MODEL_INFO.labels(version=version).set(1)
+
+
+def benchmark_overhead(n_requests=500, batch_size=1, rounds=9):
+    """Compare /predict latency with instrumentation enabled vs disabled.
+
+    Disabled counters and histograms return a shared no-op child, so the
+    disabled run pays one attribute check per metric call and stands in
+    for a build without the instrumentation.
+    """
+    # Import through the module name so that, when run as a script, we
+    # toggle the registry the app actually uses rather than __main__'s copy
+    from metrics import REGISTRY as registry, STAGE_LATENCY as stage_latency
+    from app import app, model_manager
+
+    if model_manager.model is None:
+        print("❌ Models not loaded, nothing to benchmark")
+        return None
+
+    feature_names = list(model_manager.preprocessor.feature_names_in_)
+    numeric = set(model_manager.preprocessor.transformers_[0][2])
+    row = {name: (1.0 if name in numeric else 'UPI') for name in feature_names}
+    payload = [dict(row, Transaction_Amount=100.0 + i) for i in range(batch_size)]
+    client = app.test_client()
+    # Keep the cache out of the measurement
+    model_manager.cache.max_entries = 0
+
+    def run(enabled):
+        registry.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            client.post('/predict', json=payload)
+        return (time.perf_counter() - start) / n_requests
+
+    run(True)  # warm-up
+    timings = {True: [], False: []}
+    # Alternate, and keep the fastest round of each, to damp machine noise
+    for _ in range(rounds):
+        for enabled in (True, False):
+            timings[enabled].append(run(enabled))
+    registry.enabled = True
+
+    with_metrics = min(timings[True])
+    without_metrics = min(timings[False])
+    overhead = (with_metrics - without_metrics) / without_metrics * 100
+    print(f"Per-request latency with metrics:    {with_metrics * 1000:.3f} ms")
+    print(f"Per-request latency without metrics: {without_metrics * 1000:.3f} ms")
+    print(f"Instrumentation overhead: {overhead:.2f}% "
+          f"({(with_metrics - without_metrics) * 1e6:.0f} us per request)")
+
+    # End-to-end differences are within machine noise; time one stage timer too
+    def stage():
+        with stage_latency.labels(stage='benchmark').time():
+            pass
+
+    costs = {}
+    for enabled in (True, False):
+        registry.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(100000):
+            stage()
+        costs[enabled] = (time.perf_counter() - start) / 100000
+    registry.enabled = True
+    stage_latency._children.pop(('benchmark',), None)
+    print(f"One stage timer: {costs[True] * 1e6:.2f} us enabled, {costs[False] * 1e6:.2f} us disabled")
+    return overhead
+
+
+if __name__ == "__main__":
+    benchmark_overhead()
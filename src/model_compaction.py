@@ -0,0 +1,437 @@
+"""
+Compact model artifacts for serving.
+
+``compact_model`` runs on the pipeline picked by ``select_best_model``:
+
+1. strip training-only steps: SMOTE only resamples during ``fit``, so the
+   served pipeline keeps just the ``classifier`` step (and no longer needs
+   imblearn to unpickle)
+2. prune ensemble members that contribute negligibly on the validation set.
+   RandomForest trees are tried weakest first (by their own validation AUC),
+   GradientBoosting / XGBoost stages smallest contribution first. A member
+   is dropped only while the validation AUC stays within ``auc_tolerance``
+   of the uncompacted model and no validation probability moves by more
+   than ``shift_tolerance``
+3. quantize split thresholds and leaf values to the float16 or float32 grid,
+   keeping the coarsest precision whose validation probabilities stay within
+   ``prob_tolerance`` of the pruned model. sklearn keeps float64 node arrays
+   and XGBoost float32 ones, so the rounding pays off in the compressed file
+   rather than in memory
+
+``save_bundle`` writes the result with joblib compression; ``joblib.load``
+(and so ``ModelManager``) reads it unchanged.
+
+    python model_compaction.py                      # compact each tree model, before/after
+    python model_compaction.py --bundle models --out models/compact
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+
+# About half the zlib size for a few ms more load time on the tree models
+COMPRESSION = ('xz', 6)
+
+TRAINING_ONLY_STEPS = ('smote',)
+
+_PRECISIONS = (
+    ('float16', 'float16'),
+    ('float32', 'float16'),
+    ('float16', 'float32'),
+    ('float32', 'float32')
+)
+
+
+def _classifier(model):
+    return model.steps[-1][1] if hasattr(model, 'steps') else model
+
+
+def _positive_proba(model, X):
+    return model.predict_proba(X)[:, 1]
+
+
+def _sigmoid(margin):
+    return 1.0 / (1.0 + np.exp(-margin))
+
+
+def _round(values, dtype, down=False):
+    """Round to the ``dtype`` grid, keeping the storage dtype (and values that overflow)
+
+    ``down=True`` rounds toward -inf: for a split ``x <= t`` on float32 inputs,
+    the largest float32 not above ``t`` sends every row the same way as ``t``.
+    """
+    values = np.asarray(values)
+    rounded = values.astype(dtype)
+    if down:
+        rounded = np.where(rounded.astype(values.dtype) > values, np.nextafter(rounded, -np.inf), rounded)
+    rounded = rounded.astype(values.dtype)
+    return np.where(np.isfinite(rounded), rounded, values)
+
+
+# -------- Training-only steps --------
+def strip_training_steps(model):
+    """Serving pipeline without resampling steps (a plain sklearn Pipeline)"""
+    if not hasattr(model, 'steps'):
+        return Pipeline([('classifier', model)])
+    steps = [(name, step) for name, step in model.steps if name not in TRAINING_ONLY_STEPS]
+    return Pipeline(steps)
+
+
+# -------- Pruning --------
+def _member_scores(clf, X):
+    """(kind, per-member validation outputs, base) for a tree ensemble, or None
+
+    ``kind='mean'``: probability = mean of members (RandomForest)
+    ``kind='margin'``: probability = sigmoid(base + sum of members)
+    """
+    name = type(clf).__name__
+    if name == 'RandomForestClassifier':
+        return 'mean', np.array([tree.predict_proba(X)[:, 1] for tree in clf.estimators_]), None
+    if name == 'GradientBoostingClassifier' and clf.estimators_.shape[1] == 1:
+        members = np.array([
+            clf.learning_rate * tree.predict(X) for tree in clf.estimators_[:, 0]
+        ])
+        return 'margin', members, clf.decision_function(X) - members.sum(axis=0)
+    if name == 'XGBClassifier':
+        from xgboost import DMatrix
+        booster = clf.get_booster()
+        trees = json.loads(booster.save_raw('json'))['learner']['gradient_booster']['model']['trees']
+        if len(trees) != booster.num_boosted_rounds():
+            return None
+        matrix = DMatrix(X)
+        leaves = booster.predict(matrix, pred_leaf=True).astype(np.int64).reshape(len(X), -1)
+        members = np.array([
+            np.asarray(tree['split_conditions'], dtype=np.float64)[leaves[:, i]]
+            for i, tree in enumerate(trees)
+        ])
+        margin = booster.predict(matrix, output_margin=True)
+        return 'margin', members, margin - members.sum(axis=0)
+    return None
+
+
+def _ensemble_proba(kind, total, count, base):
+    return total / count if kind == 'mean' else _sigmoid(base + total)
+
+
+def prune_members(kind, members, base, y_val, reference, auc_tolerance=0.001, shift_tolerance=0.02):
+    """Indices of the members to keep (greedy removal, least useful first)"""
+    if kind == 'mean':
+        order = np.argsort([
+            roc_auc_score(y_val, member) if np.ptp(member) > 0 else 0.5 for member in members
+        ])
+    else:
+        order = np.argsort(np.abs(members).mean(axis=1))
+
+    target_auc = roc_auc_score(y_val, reference) - auc_tolerance
+    keep = np.ones(len(members), dtype=bool)
+    total = members.sum(axis=0)
+    for i in order:
+        if keep.sum() == 1:
+            break
+        candidate = total - members[i]
+        proba = _ensemble_proba(kind, candidate, keep.sum() - 1, base)
+        if (roc_auc_score(y_val, proba) >= target_auc
+                and np.abs(proba - reference).max() <= shift_tolerance):
+            keep[i] = False
+            total = candidate
+    return np.flatnonzero(keep)
+
+
+def _keep_members(clf, keep):
+    """Copy of ``clf`` with only the ensemble members in ``keep``"""
+    import copy
+
+    name = type(clf).__name__
+    if name == 'RandomForestClassifier':
+        pruned = copy.copy(clf)
+        pruned.estimators_ = [clf.estimators_[i] for i in keep]
+        pruned.n_estimators = len(keep)
+        # Out-of-bag estimates describe the unpruned forest
+        for attr in ('oob_score_', 'oob_decision_function_'):
+            pruned.__dict__.pop(attr, None)
+        return pruned
+
+    if name == 'GradientBoostingClassifier':
+        pruned = copy.copy(clf)
+        pruned.estimators_ = clf.estimators_[keep]
+        pruned.train_score_ = clf.train_score_[keep]
+        if getattr(clf, 'oob_improvement_', None) is not None:
+            pruned.oob_improvement_ = clf.oob_improvement_[keep]
+        pruned.n_estimators = pruned.n_estimators_ = len(keep)
+        return pruned
+
+    def drop_trees(model):
+        booster = model['learner']['gradient_booster']['model']
+        booster['trees'] = [booster['trees'][i] for i in keep]
+        for new_id, tree in enumerate(booster['trees']):
+            tree['id'] = new_id
+        booster['tree_info'] = [booster['tree_info'][i] for i in keep]
+        booster['iteration_indptr'] = list(range(len(keep) + 1))
+        booster['gbtree_model_param']['num_trees'] = str(len(keep))
+        # Early-stopping round from training, would index past the kept trees
+        for attr in ('best_iteration', 'best_score'):
+            model['learner'].get('attributes', {}).pop(attr, None)
+
+    pruned = _rewrite_booster(clf, drop_trees)
+    pruned.n_estimators = len(keep)
+    return pruned
+
+
+def _rewrite_booster(clf, rewrite):
+    """Copy of an XGBClassifier whose booster JSON went through ``rewrite``"""
+    import copy
+    from xgboost import Booster
+
+    model = json.loads(clf.get_booster().save_raw('json'))
+    rewrite(model)
+    booster = Booster()
+    booster.load_model(bytearray(json.dumps(model).encode()))
+    updated = copy.copy(clf)
+    updated._Booster = booster
+    return updated
+
+
+# -------- Quantization --------
+def _quantize_sklearn_tree(estimator, thresholds, leaves):
+    """Copy of a fitted sklearn tree with rounded thresholds and node values"""
+    import copy
+
+    tree = estimator.tree_
+    cls, args, state = tree.__reduce__()
+    nodes = state['nodes'].copy()
+    is_split = nodes['feature'] >= 0
+    nodes['threshold'][is_split] = _round(nodes['threshold'][is_split], thresholds, down=True)
+    nodes['impurity'] = _round(nodes['impurity'], np.float32)
+
+    new_tree = cls(*args)
+    new_tree.__setstate__(dict(state, nodes=nodes, values=_round(state['values'], leaves)))
+    quantized = copy.copy(estimator)
+    quantized.tree_ = new_tree
+    return quantized
+
+
+def quantize(clf, thresholds='float32', leaves='float32'):
+    """Copy of a tree ensemble with thresholds and leaf values on a coarser grid"""
+    import copy
+
+    name = type(clf).__name__
+    if name == 'RandomForestClassifier':
+        quantized = copy.copy(clf)
+        quantized.estimators_ = [
+            _quantize_sklearn_tree(tree, thresholds, leaves) for tree in clf.estimators_
+        ]
+        return quantized
+
+    if name == 'GradientBoostingClassifier':
+        quantized = copy.copy(clf)
+        quantized.estimators_ = np.array([
+            [_quantize_sklearn_tree(tree, thresholds, leaves) for tree in stage]
+            for stage in clf.estimators_
+        ], dtype=object)
+        return quantized
+
+    if name == 'XGBClassifier':
+        def round_trees(model):
+            for tree in model['learner']['gradient_booster']['model']['trees']:
+                is_leaf = np.asarray(tree['left_children']) == -1
+                conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+                tree['split_conditions'] = np.where(
+                    is_leaf, _round(conditions, leaves), _round(conditions, thresholds, down=True)
+                ).astype(np.float64).tolist()
+                tree['base_weights'] = _round(
+                    np.asarray(tree['base_weights'], dtype=np.float32), leaves
+                ).astype(np.float64).tolist()
+
+        return _rewrite_booster(clf, round_trees)
+
+    return clf
+
+
+def quantize_within_tolerance(clf, X_val, reference, prob_tolerance=1e-3):
+    """Coarsest (thresholds, leaves) precision whose probabilities stay within tolerance"""
+    for thresholds, leaves in _PRECISIONS:
+        quantized = quantize(clf, thresholds, leaves)
+        delta = np.abs(_positive_proba(quantized, X_val) - reference).max()
+        if delta <= prob_tolerance:
+            return quantized, {'thresholds': thresholds, 'leaves': leaves,
+                               'max_abs_delta': float(delta)}
+    return clf, {'thresholds': 'float64', 'leaves': 'float64', 'max_abs_delta': 0.0}
+
+
+# -------- Compaction --------
+def compact_model(model, X_val, y_val, auc_tolerance=0.001, shift_tolerance=0.02,
+                  prob_tolerance=1e-3):
+    """Serving-only copy of a trained pipeline and a report of what changed"""
+    y_val = np.asarray(y_val)
+    reference = _positive_proba(model, X_val)
+    served = strip_training_steps(model)
+    clf = _classifier(served)
+    report = {
+        'model': type(clf).__name__,
+        'dropped_steps': [name for name, _ in getattr(model, 'steps', []) if name in TRAINING_ONLY_STEPS],
+        'val_auc_before': float(roc_auc_score(y_val, reference))
+    }
+
+    scores = _member_scores(clf, X_val)
+    if scores is not None:
+        kind, members, base = scores
+        keep = prune_members(kind, members, base, y_val, reference,
+                             auc_tolerance=auc_tolerance, shift_tolerance=shift_tolerance)
+        report['members'] = {'before': len(members), 'after': len(keep)}
+        if len(keep) < len(members):
+            clf = _keep_members(clf, keep)
+        clf, report['quantization'] = quantize_within_tolerance(
+            clf, X_val, _positive_proba(clf, X_val), prob_tolerance=prob_tolerance
+        )
+
+    served.steps[-1] = (served.steps[-1][0], clf)
+    compacted = _positive_proba(served, X_val)
+    report['val_auc_after'] = float(roc_auc_score(y_val, compacted))
+    report['max_abs_delta'] = float(np.abs(compacted - reference).max())
+    report['mean_abs_delta'] = float(np.abs(compacted - reference).mean())
+    return served, report
+
+
+def print_report(report):
+    print(f"Compaction ({report['model']}):")
+    if report['dropped_steps']:
+        print(f"  dropped training-only steps: {', '.join(report['dropped_steps'])}")
+    if 'members' in report:
+        print(f"  ensemble members: {report['members']['before']} -> {report['members']['after']}")
+        q = report['quantization']
+        print(f"  quantized thresholds to {q['thresholds']}, leaf values to {q['leaves']} "
+              f"(max |dp| {q['max_abs_delta']:.1e})")
+    print(f"  validation AUC: {report['val_auc_before']:.4f} -> {report['val_auc_after']:.4f} | "
+          f"|dp| max {report['max_abs_delta']:.4f}, mean {report['mean_abs_delta']:.5f}")
+
+
+def save_bundle(model, path, compress=COMPRESSION):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    joblib.dump(model, path, compress=compress)
+    return path
+
+
+# -------- Artifact measurement --------
+_MEASURE = """
+import json, os, sys, time
+import joblib
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+before = rss()
+start = time.perf_counter()
+model = joblib.load(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({'load_seconds': seconds, 'rss_bytes': rss() - before}))
+"""
+
+
+def measure_artifact(path):
+    """File size, cold load time and resident memory added by loading (fresh process)"""
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', _MEASURE, os.path.abspath(path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    stats = json.loads(output.strip().splitlines()[-1])
+    stats['size_bytes'] = os.path.getsize(path)
+    return stats
+
+
+def compare_artifacts(before_path, after_path):
+    """Print size, load time and RSS of two model artifacts"""
+    results = {'before': measure_artifact(before_path), 'after': measure_artifact(after_path)}
+    for label, stats in results.items():
+        print(f"  {label:>6}: {stats['size_bytes'] / 1e3:9.1f} KB on disk | "
+              f"load {stats['load_seconds'] * 1e3:7.1f} ms | RSS +{stats['rss_bytes'] / 1e6:6.1f} MB")
+    return results
+
+
+# -------- Benchmark --------
+def _splits(data_path):
+    from data_utils import DataProcessor
+
+    processor = DataProcessor(random_state=42)
+    df = processor.feature_engineering(processor.load_data(data_path), float32=True)
+    categorical_cols, numerical_cols = processor.analyze_features(df)
+    return processor.prepare_data(df), categorical_cols, numerical_cols
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', models=('RandomForest', 'GradientBoosting', 'XGBoost')):
+    """Train each tree model as ``select_best_model`` would, compact it and compare artifacts"""
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline as ImbPipeline
+    from fraud_detector import MODEL_CLASSES, FraudDetector
+    from model_training import ModelTrainer
+
+    (X_train, X_val, X_test, y_train, y_val, y_test), categorical_cols, numerical_cols = _splits(data_path)
+    trainer = ModelTrainer(random_state=42)
+    preprocessor = trainer.create_preprocessor(categorical_cols, numerical_cols)
+    X_train = preprocessor.fit_transform(X_train)
+    X_val, X_test = preprocessor.transform(X_val), preprocessor.transform(X_test)
+    params = FraudDetector(random_state=42).get_model_params()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in models:
+            pipeline = ImbPipeline([
+                ('smote', SMOTE(random_state=42)),
+                ('classifier', MODEL_CLASSES[name](**params[name]))
+            ]).fit(X_train, y_train)
+            start = time.perf_counter()
+            compacted, report = compact_model(pipeline, X_val, y_val)
+            print(f"\n{name}: compacted in {time.perf_counter() - start:.1f}s")
+            print_report(report)
+            test_before = roc_auc_score(y_test, _positive_proba(pipeline, X_test))
+            test_after = roc_auc_score(y_test, _positive_proba(compacted, X_test))
+            print(f"  test AUC: {test_before:.4f} -> {test_after:.4f}")
+
+            before = os.path.join(tmp, f'{name}_full.pkl')
+            joblib.dump(pipeline, before)
+            compare_artifacts(before, save_bundle(compacted, os.path.join(tmp, f'{name}_compact.pkl')))
+
+
+def compact_bundle(model_dir, out_dir, data_path='../user_transaction_dataset.csv'):
+    """Compact a saved bundle against the validation split and copy its preprocessor/metadata"""
+    import shutil
+
+    (_, X_val, _, _, y_val, _), _, _ = _splits(data_path)
+    model_path = os.path.join(model_dir, 'trained_detector.pkl')
+    preprocessor = joblib.load(os.path.join(model_dir, 'preprocessor.pkl'))
+    compacted, report = compact_model(joblib.load(model_path), preprocessor.transform(X_val), y_val)
+    print_report(report)
+
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.abspath(out_dir) != os.path.abspath(model_dir):
+        for name in ('preprocessor.pkl', 'model_metadata.pkl'):
+            if os.path.exists(os.path.join(model_dir, name)):
+                shutil.copy(os.path.join(model_dir, name), out_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        original = shutil.copy(model_path, tmp)
+        compacted_path = save_bundle(compacted, os.path.join(out_dir, 'trained_detector.pkl'))
+        compare_artifacts(original, compacted_path)
+    print(f"✅ Compacted model saved to {compacted_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compact model artifacts for serving')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--bundle', help='Compact the model in this directory instead of benchmarking')
+    parser.add_argument('--out', help='Output directory for --bundle (default: the bundle directory)')
+    parser.add_argument('--models', nargs='+', default=['RandomForest', 'GradientBoosting', 'XGBoost'])
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    if args.bundle:
+        compact_bundle(args.bundle, args.out or args.bundle, data_path=args.data)
+    else:
+        benchmark(args.data, models=args.models)
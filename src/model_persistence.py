@@ -1,39 +1,91 @@
 import joblib
+import hashlib
 import numpy as np
 import pandas as pd
 import os
+from prediction_cache import PredictionCache, transaction_fingerprints
+from metrics import STAGE_LATENCY, set_model_version
+from decision_engine import DecisionEngine
+from model_training import float32_preprocessor
 
 class ModelManager:
-    def __init__(self):
+    def __init__(self, cache_size=10000, cache_ttl=300, float32=True):
         self.model = None
+        # Serve float32 features (older float64 preprocessors are converted)
+        self.float32 = float32
         self.preprocessor = None
+        self.model_version = None
+        self.metadata = {}
+        self.decision_engine = DecisionEngine()
+        self.cache = PredictionCache(max_entries=cache_size, ttl_seconds=cache_ttl)
         
     def load_models(self,
                     model_path='models/trained_detector.pkl',
-                    preprocessor_path='models/preprocessor.pkl'):
-        """Load trained model and preprocessor"""
+                    preprocessor_path='models/preprocessor.pkl',
+                    metadata_path='models/model_metadata.pkl',
+                    publish_version=True):
+        """Load trained model, preprocessor and (optional) serving metadata
+
+        ``publish_version=False`` leaves the ``fraud_model_info`` metric alone
+        (for bundles that are not the one serving decisions).
+        """
 
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         model_path = os.path.join(BASE_DIR, model_path)
         preprocessor_path = os.path.join(BASE_DIR, preprocessor_path)
+        metadata_path = os.path.join(BASE_DIR, metadata_path)
 
+        # Everything is loaded into locals first: a bundle that fails halfway
+        # leaves the current model, version and cache untouched
         try:
-            self.model = joblib.load(model_path)
+            model = joblib.load(model_path)
             print(f"✅ Model loaded from {model_path}")
         except FileNotFoundError:
             print(f"❌ Model file not found at {model_path}")
             return False
         
         try:
-            self.preprocessor = joblib.load(preprocessor_path)
+            preprocessor = joblib.load(preprocessor_path)
+            if self.float32:
+                preprocessor = float32_preprocessor(preprocessor)
             print(f"✅ Preprocessor loaded from {preprocessor_path}")
         except FileNotFoundError:
             print(f"❌ Preprocessor file not found at {preprocessor_path}")
             return False
         
+        version_paths = [model_path, preprocessor_path]
+        if os.path.exists(metadata_path):
+            metadata = joblib.load(metadata_path)
+            version_paths.append(metadata_path)
+            print(f"✅ Model metadata loaded from {metadata_path}")
+        else:
+            # Older bundles: fall back to the default thresholds
+            metadata = {}
+        decision_engine = DecisionEngine.from_dict(metadata.get('decision_thresholds'))
+        model_version = self._compute_model_version(*version_paths)
+        
+        self.model = model
+        self.preprocessor = preprocessor
+        self.metadata = metadata
+        self.decision_engine = decision_engine
+        self.model_version = model_version
+        # Cached results belong to the previous model, never serve them again
+        self.cache.clear()
+        if publish_version:
+            set_model_version(self.model_version)
+        
         return True
     
-    def predict(self, data):
+    @staticmethod
+    def _compute_model_version(*paths):
+        """Short identifier of the artifacts on disk (size + mtime)"""
+        digest = hashlib.sha1()
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+    
+    def predict(self, data, use_cache=True):
         """Make predictions on batch data"""
         if self.model is None or self.preprocessor is None:
             raise ValueError("Models not loaded. Call load_models() first.")
@@ -41,13 +93,41 @@ class ModelManager:
         if not isinstance(data, pd.DataFrame):
             raise ValueError("Input data must be a pandas DataFrame")
         
+        probabilities = self.predict_proba(data, use_cache=use_cache)
+        # Thresholds come from the bundle's decision engine, not a fixed 0.5
+        predictions = self.decision_engine.is_fraud(probabilities[:, 1]).astype(int)
+        
+        return predictions, probabilities
+    
+    def predict_proba(self, data, use_cache=True):
+        """Class probabilities, served from the cache where possible"""
+        if not use_cache or self.cache.max_entries <= 0 or len(data) == 0:
+            return self._predict_proba_uncached(data)
+        
+        with STAGE_LATENCY.labels(stage='cache_lookup').time():
+            keys = transaction_fingerprints(data, self.model_version)
+            cached = self.cache.get_many(keys)
+        missing = [i for i, entry in enumerate(cached) if entry is None]
+        
+        if missing:
+            new_probabilities = self._predict_proba_uncached(data.iloc[missing])
+            new_entries = [row.copy() for row in new_probabilities]
+            self.cache.put_many([keys[i] for i in missing], new_entries)
+            for i, entry in zip(missing, new_entries):
+                cached[i] = entry
+        
+        return np.vstack(cached)
+    
+    def _predict_proba_uncached(self, data):
+        """Run preprocessing and inference for every row"""
         # Preprocess
-        processed_data = self.preprocessor.transform(data)
+        with STAGE_LATENCY.labels(stage='transform').time():
+            processed_data = self.preprocessor.transform(data)
         
-        predictions = self.model.predict(processed_data)
-        probabilities = self.model.predict_proba(processed_data)
+        with STAGE_LATENCY.labels(stage='predict_proba').time():
+            probabilities = self.model.predict_proba(processed_data)
         
-        return predictions, probabilities
+        return probabilities
     
     def predict_single(self, transaction_data):
         """Predict for a single transaction"""
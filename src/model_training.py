@@ -1,26 +1,84 @@
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, FunctionTransformer
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+import copy
 import joblib
+import numpy as np
 import os
 
+
+def to_float32(X):
+    """Numeric block as a float32 array (no copy if it already is one)"""
+    return np.asarray(X, dtype=np.float32)
+
+
+def _float32_step():
+    return FunctionTransformer(to_float32, feature_names_out='one-to-one')
+
+
+def float32_preprocessor(preprocessor):
+    """Copy of a fitted float64 preprocessor that emits float32
+
+    The scaler output is cast to float32 (the scaler was fitted on named
+    float64 columns and keeps computing in float64) and one-hot columns are
+    encoded as uint8, so the stacked matrix is float32. Used to serve
+    bundles trained before the float32 pipeline.
+    """
+    converted = copy.deepcopy(preprocessor)
+    for name, transformer, _ in converted.transformers_:
+        if name == 'num' and 'float32' not in transformer.named_steps:
+            transformer.steps.append(('float32', _float32_step()))
+        elif name == 'cat':
+            transformer.named_steps['onehot'].dtype = np.uint8
+    return converted
+
+
+def preprocessed_feature_names(preprocessor):
+    """Names of the preprocessed columns and the input column each comes from
+
+    Numeric features keep their names; one-hot columns are named
+    ``<column>_<category>`` and map back to ``<column>``.
+    """
+    names, sources = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder':
+            continue
+        if name == 'cat':
+            ohe = transformer.named_steps['onehot']
+            names.extend(ohe.get_feature_names_out(columns))
+            for column, categories in zip(columns, ohe.categories_):
+                sources.extend([column] * len(categories))
+        else:
+            names.extend(columns)
+            sources.extend(columns)
+    return list(names), sources
+
+
 class ModelTrainer:
     def __init__(self, random_state=42):
         self.random_state = random_state
         self.preprocessor = None
         self.model = None
+        self.decision_engine = None
+        self.drift_reference = None
+        self.background_mean = None
+        self.full_model = None
+        self.compaction = None
         
     def create_preprocessor(self, categorical_cols, numerical_cols):
         """Create preprocessing pipeline"""
         self.categorical_cols = categorical_cols
         self.numerical_cols = numerical_cols
 
+        # float32 scaled numerics + uint8 one-hot stack into one float32
+        # matrix, which SMOTE, the tree models and XGBoost use without a copy
         numeric_transformer = Pipeline(steps=[
+            ('float32', _float32_step()),
             ('scaler', StandardScaler())
         ])
         
         categorical_transformer = Pipeline(steps=[
-            ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+            ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False, dtype=np.uint8))
         ])
         
         self.preprocessor = ColumnTransformer(
@@ -32,7 +90,14 @@ class ModelTrainer:
         
         return self.preprocessor
     
-    def train(self, X_train, y_train, X_val=None, y_val=None):
+    def train(self, X_train, y_train, X_val=None, y_val=None, search=None, compact=False):
+        """Train all candidates and keep the best one
+        
+        If a ``HyperparameterSearch`` is given it is run on the preprocessed
+        training data first and its best configurations replace the defaults.
+        With ``compact=True`` the selected pipeline is compacted for serving
+        (see model_compaction.py) before thresholds are fit on it.
+        """
         from fraud_detector import FraudDetector
         
         detector = FraudDetector(random_state=self.random_state)
@@ -46,8 +111,16 @@ class ModelTrainer:
             X_val_processed = self.preprocessor.transform(X_val)
         
         feature_names = self.get_feature_names()
+        # Baseline for linear explanations (see explanations.py)
+        self.background_mean = X_train_processed.mean(axis=0).tolist()
         print(f"Number of features after preprocessing: {len(feature_names)}")
         
+        if search is not None:
+            print("\nHyperparameter search:")
+            best_params = search.run(X_train_processed, y_train)
+            search.save_best_params()
+            detector.create_models(param_overrides=best_params)
+        
         print("\nCross-validation results:")
         cv_scores = detector.cross_validate_models(X_train_processed, y_train)
         
@@ -63,8 +136,23 @@ class ModelTrainer:
         
         self.model = detector.best_model
         
+        if X_val is not None and compact:
+            from model_compaction import compact_model, print_report
+            print()
+            self.full_model = self.model
+            self.model, self.compaction = compact_model(self.model, X_val_processed, y_val)
+            detector.best_model = self.model
+            print_report(self.compaction)
+        
         if X_val is not None:
             self.check_overfitting(X_train_processed, y_train, X_val_processed, y_val)
+            
+            from decision_engine import DecisionEngine
+            print("\nDecision thresholds:")
+            self.decision_engine = DecisionEngine.fit(
+                y_val,
+                self.model.predict_proba(X_val_processed)[:, 1]
+            )
         
         return detector
     
@@ -72,18 +160,7 @@ class ModelTrainer:
         """Correct feature name extraction"""
         if self.preprocessor is None:
             return []
-
-        feature_names = []
-
-        # Numeric features (names stay same)
-        feature_names.extend(self.numerical_cols)
-
-        # Categorical feature names from OneHotEncoder
-        ohe = self.preprocessor.named_transformers_['cat'].named_steps['onehot']
-        cat_feature_names = ohe.get_feature_names_out(self.categorical_cols)
-        feature_names.extend(cat_feature_names)
-
-        return feature_names
+        return preprocessed_feature_names(self.preprocessor)[0]
     
     def check_overfitting(self, X_train, y_train, X_val, y_val):
         from sklearn.metrics import roc_auc_score
@@ -108,12 +185,96 @@ class ModelTrainer:
         else:
             print("✅ Good generalization")
     
+    def get_metadata(self):
+        """Serving configuration stored next to the model"""
+        metadata = {}
+        if self.decision_engine is not None:
+            metadata['decision_thresholds'] = self.decision_engine.to_dict()
+        if self.drift_reference is not None:
+            metadata['drift_reference'] = self.drift_reference
+        if self.background_mean is not None:
+            metadata['background_mean'] = self.background_mean
+        if self.compaction is not None:
+            metadata['compaction'] = self.compaction
+        return metadata
+    
     def save_model(self, model_path='models/trained_detector.pkl',
-                  preprocessor_path='models/preprocessor.pkl'):
+                  preprocessor_path='models/preprocessor.pkl',
+                  metadata_path='models/model_metadata.pkl'):
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         
-        joblib.dump(self.model, model_path)
+        if self.compaction is not None:
+            from model_compaction import save_bundle
+            save_bundle(self.model, model_path)
+        else:
+            joblib.dump(self.model, model_path)
         print(f"Model saved to {model_path}")
         
         joblib.dump(self.preprocessor, preprocessor_path)
         print(f"Preprocessor saved to {preprocessor_path}")
+        
+        joblib.dump(self.get_metadata(), metadata_path)
+        print(f"Model metadata saved to {metadata_path}")
+    
+    def report_compaction(self, model_path='models/trained_detector.pkl'):
+        """Size, load time and RSS of the saved model vs the uncompacted pipeline"""
+        import tempfile
+        from model_compaction import compare_artifacts
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            full_path = os.path.join(tmp, 'trained_detector.pkl')
+            joblib.dump(self.full_model, full_path)
+            print("Model artifact before/after compaction:")
+            return compare_artifacts(full_path, model_path)
+
+
+def benchmark_float32(data_path='../user_transaction_dataset.csv', n_rows=500000):
+    """float64 vs float32 pipeline: prediction equivalence, memory and throughput"""
+    import time
+    import tracemalloc
+    import pandas as pd
+    from data_utils import DataProcessor
+    from model_persistence import ModelManager
+
+    processor = DataProcessor()
+    features = processor.feature_engineering(processor.load_data(data_path))
+    features = pd.concat([features] * (n_rows // len(features) + 1), ignore_index=True).head(n_rows)
+    X64 = features.drop(columns=['Transaction_ID', 'Is_Fraudulent'])
+    X32 = DataProcessor.downcast(X64)
+
+    legacy = ModelManager(cache_size=0, float32=False)
+    legacy.load_models()
+    served = ModelManager(cache_size=0)
+    served.load_models()
+
+    print(f"\n{len(X64):,} rows")
+    print(f"feature frame: {X64.memory_usage(deep=True).sum() / 1e6:8.1f} MB -> "
+          f"{X32.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+
+    results = {}
+    for label, manager, X in (('float64', legacy, X64), ('float32', served, X32)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        matrix = manager.preprocessor.transform(X)
+        transform_seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        probabilities = manager.model.predict_proba(matrix)[:, 1]
+        predict_seconds = time.perf_counter() - start
+        results[label] = probabilities
+        print(f"{label}: matrix {matrix.nbytes / 1e6:7.1f} MB (transform peak {peak / 1e6:7.1f} MB) | "
+              f"transform {transform_seconds:5.2f}s | predict_proba {predict_seconds:5.2f}s "
+              f"({len(X) / (transform_seconds + predict_seconds):,.0f} rows/s)")
+
+    delta = np.abs(results['float64'] - results['float32'])
+    agree = (legacy.decision_engine.is_fraud(results['float64']) ==
+             served.decision_engine.is_fraud(results['float32'])).mean()
+    print(f"max |p64 - p32| = {delta.max():.2e}, mean = {delta.mean():.2e}, "
+          f"decision agreement {agree:.4%}")
+    return delta.max(), agree
+
+
+if __name__ == "__main__":
+    benchmark_float32()
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _combine_hashes(hashes):
+    """Row hash from per-column hashes (same mixing as pd.util.hash_pandas_object)"""
+    n = len(hashes)
+    mult = np.uint64(1000003)
+    out = np.zeros_like(hashes[0]) + np.uint64(0x345678)
+    for i, h in enumerate(hashes):
+        out ^= h
+        out *= mult
+        mult += np.uint64(82520 + 2 * (n - i))
+    out += np.uint64(97531)
+    return out
+
+
+def transaction_fingerprints(df, model_version=None):
+    """Stable per-row hash of the canonicalized transaction fields.
+
+    Columns are sorted by name and numeric values are compared as float64,
+    so ``{"Hour": 6}`` and ``{"Hour": 6.0}`` map to the same key regardless
+    of field order in the request payload. Text is hashed as sent: the
+    one-hot encoder tells ``'UPI '`` from ``'UPI'``, so the cache must too. Cells are hashed as
+    NumPy arrays, without building an intermediate DataFrame, so single-row
+    requests stay cheap.
+    """
+    columns = sorted(df.columns)
+    signature = (model_version, tuple(columns))
+    if not columns:
+        return []
+
+    dtypes = df.dtypes
+    numeric = [
+        col for col in columns
+        if pd.api.types.is_numeric_dtype(dtypes[col]) or pd.api.types.is_bool_dtype(dtypes[col])
+    ]
+    text = [col for col in columns if col not in set(numeric)]
+    # Hashing is elementwise: hash all numeric / all text cells in one call each
+    column_hashes = {}
+    if numeric:
+        values = df[numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        hashed = pd.util.hash_array(values.ravel(order='F')).reshape(len(numeric), len(df))
+        column_hashes.update(zip(numeric, hashed))
+    if text:
+        cells = [str(v) for v in df[text].to_numpy(dtype=object).ravel(order='F').tolist()]
+        hashed = pd.util.hash_array(np.array(cells, dtype=object)).reshape(len(text), len(df))
+        column_hashes.update(zip(text, hashed))
+
+    with np.errstate(over='ignore'):
+        row_hashes = _combine_hashes([column_hashes[col] for col in columns])
+    return [(signature, h) for h in row_hashes.tolist()]
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl_seconds=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None"""
+        with self._lock:
+            return self._get(key, self._clock())
+
+    def get_many(self, keys):
+        """Look up several keys under one lock acquisition"""
+        with self._lock:
+            now = self._clock()
+            return [self._get(key, now) for key in keys]
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if self.ttl_seconds is not None and now >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.put_many([key], [value])
+
+    def put_many(self, keys, values):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            expires_at = self._clock() + (self.ttl_seconds or 0)
+            for key, value in zip(keys, values):
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the underlying model was swapped"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
@@ -0,0 +1,770 @@
+"""
+Compact, bounded-memory storage for user behavioral profiles.
+
+Profiles are kept as struct-of-arrays NumPy columns instead of one Python
+dict per user:
+
+- amounts and the fraud rate as float32, transaction counts as uint32
+- the hour-of-day distribution as a uint8 histogram (share of the user's
+  transactions per hour, scaled to 0-255) plus an exact bitmask of the
+  usual hours
+- the most common merchant categories, channels and locations as small
+  integer codes into per-field vocabularies (-1 = empty slot)
+
+A dict maps each user ID to its row. When ``max_resident`` is set, the
+least recently used profiles beyond that limit are spilled to
+memory-mapped column files in ``spill_dir`` and promoted back on access.
+
+For fast restarts, ``snapshot()`` writes every column as a ``.npy`` file
+and ``ProfileStore.restore()`` memory-maps them copy-on-write, so lookups
+work immediately and pages are read on demand. Changes made after a
+snapshot go to an append-only delta log that ``restore()`` replays.
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+TOP_K = 3
+MAX_USUAL_HOURS = 5
+USUAL_HOUR_SHARE = 0.1
+
+# column name -> (dtype, per-row shape)
+PROFILE_COLUMNS = {
+    'total_transactions': (np.uint32, ()),
+    'avg_amount': (np.float32, ()),
+    'max_amount': (np.float32, ()),
+    'fraud_rate': (np.float32, ()),
+    'hour_hist': (np.uint8, (24,)),
+    'usual_hours_mask': (np.uint32, ()),
+    'top_merchants': (np.int16, (TOP_K,)),
+    'top_channels': (np.int16, (TOP_K,)),
+    'top_locations': (np.int32, (TOP_K,)),
+    'last_update': (np.uint32, ())
+}
+
+# code column -> (transaction column, profile dict key)
+CATEGORY_FIELDS = {
+    'top_merchants': ('Merchant_Category', 'common_merchant_categories'),
+    'top_channels': ('Transaction_Channel', 'common_transaction_channels'),
+    'top_locations': ('Location', 'usual_locations')
+}
+
+_HOUR_BITS = np.uint32(1) << np.arange(24, dtype=np.uint32)
+
+
+def hours_to_mask(hours):
+    mask = 0
+    for hour in hours:
+        mask |= 1 << int(hour)
+    return mask
+
+
+def mask_to_hours(mask):
+    return [hour for hour in range(24) if mask >> hour & 1]
+
+
+def hour_histogram(counts, totals):
+    """Per-hour transaction counts as shares scaled to 0-255 (``hour_hist``)"""
+    return np.minimum(counts * 255 // totals, 255).astype(np.uint8)
+
+
+class _ColumnBlock:
+    """One tier of profile rows: in-memory arrays or memory-mapped files"""
+
+    def __init__(self, capacity, directory=None):
+        self.directory = directory
+        self.capacity = 0
+        self.columns = {}
+        # Snapshot files are mapped, never deleted or written through
+        self.owns_files = True
+        self.grow(max(capacity, 1))
+
+    @classmethod
+    def from_arrays(cls, columns, directory):
+        block = cls.__new__(cls)
+        block.directory = directory
+        block.columns = dict(columns)
+        block.capacity = len(next(iter(columns.values())))
+        block.owns_files = False
+        return block
+
+    def _allocate(self, name, capacity):
+        dtype, shape = PROFILE_COLUMNS[name]
+        if self.directory is None:
+            return np.zeros((capacity,) + shape, dtype=dtype)
+        path = os.path.join(self.directory, f'{name}.{capacity}.bin')
+        return np.memmap(path, dtype=dtype, mode='w+', shape=(capacity,) + shape)
+
+    def grow(self, capacity):
+        old_capacity = self.capacity
+        for name in PROFILE_COLUMNS:
+            new = self._allocate(name, capacity)
+            old = self.columns.get(name)
+            if old is not None:
+                new[:old_capacity] = old[:old_capacity]
+                if isinstance(old, np.memmap) and self.owns_files:
+                    old_path = old.filename
+                    del old
+                    os.remove(old_path)
+            self.columns[name] = new
+        self.capacity = capacity
+        self.owns_files = True
+
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+
+class ProfileStore:
+    def __init__(self, max_resident=None, spill_dir=None, initial_capacity=1024):
+        self.max_resident = max_resident
+        if max_resident is not None and spill_dir is None:
+            spill_dir = tempfile.mkdtemp(prefix='profile_spill_')
+        self.spill_dir = spill_dir
+
+        capacity = initial_capacity if max_resident is None else min(initial_capacity, max_resident)
+        self._resident = _ColumnBlock(capacity)
+        self._spill = None
+
+        # user_id -> row; spilled rows are stored as -(row + 1)
+        self.index = {}
+        self._lru = OrderedDict()
+        self._resident_rows = 0
+        self._spill_rows = 0
+        self._free_resident = []
+        self._free_spill = []
+
+        self.vocabularies = {field: [] for field in CATEGORY_FIELDS}
+        self._codes = {field: {} for field in CATEGORY_FIELDS}
+
+        self.spills = 0
+        self.promotions = 0
+        self.delta_log = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, user_id):
+        return user_id in self.index
+
+    # ------------------------------------------------------------------
+    # Vocabularies
+    # ------------------------------------------------------------------
+    def encode(self, field, value):
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = len(self.vocabularies[field])
+            self.vocabularies[field].append(value)
+            codes[value] = code
+        return code
+
+    def encode_many(self, field, values):
+        return np.array([self.encode(field, v) for v in values], dtype=np.int64)
+
+    def lookup_code(self, field, value):
+        """Code of a known value, or -2 (never matches a stored slot)"""
+        return self._codes[field].get(value, -2)
+
+    def decode(self, field, codes):
+        vocabulary = self.vocabularies[field]
+        return [vocabulary[c] for c in codes if c >= 0]
+
+    # ------------------------------------------------------------------
+    # Row management
+    # ------------------------------------------------------------------
+    def _new_resident_row(self):
+        if self._free_resident:
+            return self._free_resident.pop()
+        if self.max_resident is not None and self._resident_rows >= self.max_resident:
+            self._evict_lru()
+            return self._free_resident.pop()
+        return int(self._allocate_rows(1, spill=False)[0])
+
+    def _new_spill_row(self):
+        return int(self._allocate_rows(1, spill=True)[0])
+
+    @staticmethod
+    def _copy_row(src, src_row, dst, dst_row):
+        for name, column in src.columns.items():
+            dst.columns[name][dst_row] = column[src_row]
+
+    def _evict_lru(self):
+        user_id, _ = self._lru.popitem(last=False)
+        row = self.index[user_id]
+        spill_row = self._new_spill_row()
+        self._copy_row(self._resident, row, self._spill, spill_row)
+        self.index[user_id] = -(spill_row + 1)
+        self._free_resident.append(row)
+        self.spills += 1
+
+    def _resident_row(self, user_id):
+        """Row of a user in the resident tier, promoting from spill if needed"""
+        row = self.index.get(user_id)
+        if row is None:
+            return None
+        if row < 0:
+            spill_row = -row - 1
+            row = self._new_resident_row()
+            self._copy_row(self._spill, spill_row, self._resident, row)
+            self._free_spill.append(spill_row)
+            self.index[user_id] = row
+            self.promotions += 1
+        self._lru[user_id] = None
+        self._lru.move_to_end(user_id)
+        return row
+
+    def _row_for_write(self, user_id):
+        row = self._resident_row(user_id)
+        if row is None:
+            row = self._new_resident_row()
+            self.index[user_id] = row
+            self._lru[user_id] = None
+        return row
+
+    # ------------------------------------------------------------------
+    # Profile access
+    # ------------------------------------------------------------------
+    def put(self, user_id, profile):
+        """Store a profile given as the dict produced by UserProfiler"""
+        if self.delta_log is not None:
+            self.delta_log.append_put(user_id, profile)
+        row = self._row_for_write(user_id)
+        columns = self._resident.columns
+
+        columns['total_transactions'][row] = profile['total_transactions']
+        columns['avg_amount'][row] = profile['avg_transaction_amount']
+        columns['max_amount'][row] = profile['max_transaction_amount']
+        columns['fraud_rate'][row] = profile.get('fraud_rate', 0.0)
+        columns['usual_hours_mask'][row] = hours_to_mask(profile.get('usual_hours', []))
+        columns['hour_hist'][row] = profile.get('hour_hist', np.zeros(24, dtype=np.uint8))
+
+        for field, (_, key) in CATEGORY_FIELDS.items():
+            codes = np.full(TOP_K, -1)
+            values = list(profile.get(key, []))[:TOP_K]
+            codes[:len(values)] = [self.encode(field, v) for v in values]
+            columns[field][row] = codes
+
+        last_update = profile.get('last_update')
+        columns['last_update'][row] = (
+            int(datetime.fromisoformat(last_update).timestamp()) if last_update else int(time.time())
+        )
+
+    def get(self, user_id):
+        """Materialize a profile dict (same keys as UserProfiler), or None"""
+        row = self._resident_row(user_id)
+        if row is None:
+            return None
+        columns = self._resident.columns
+
+        profile = {
+            'user_id': user_id,
+            'total_transactions': int(columns['total_transactions'][row]),
+            'avg_transaction_amount': float(columns['avg_amount'][row]),
+            'max_transaction_amount': float(columns['max_amount'][row]),
+            'usual_hours': mask_to_hours(int(columns['usual_hours_mask'][row])),
+            'fraud_rate': float(columns['fraud_rate'][row]),
+            'last_update': datetime.fromtimestamp(int(columns['last_update'][row])).isoformat()
+        }
+        for field, (_, key) in CATEGORY_FIELDS.items():
+            profile[key] = self.decode(field, columns[field][row])
+        return profile
+
+    def gather(self, user_ids, columns=None):
+        """Column values for many users at once, without building dicts.
+
+        Returns ``(found, {column: array})`` aligned with ``user_ids``; unknown
+        users get zeros (category codes -1). Spilled users are read in place
+        and not promoted, so a large batch does not churn the LRU.
+        """
+        missing = np.iinfo(np.int64).min
+        lookup = self.index.get
+        rows = np.fromiter((lookup(uid, missing) for uid in user_ids), dtype=np.int64,
+                           count=len(user_ids))
+        found = rows != missing
+        resident = rows >= 0
+        spilled = found & ~resident
+
+        values = {}
+        for name in columns or PROFILE_COLUMNS:
+            dtype, shape = PROFILE_COLUMNS[name]
+            column = np.full((len(rows),) + shape, -1 if name in CATEGORY_FIELDS else 0, dtype=dtype)
+            column[resident] = self._resident.columns[name][rows[resident]]
+            if spilled.any():
+                column[spilled] = self._spill.columns[name][-rows[spilled] - 1]
+            values[name] = column
+        return found, values
+
+    def remove(self, user_id):
+        """Drop a user's profile and free its row"""
+        row = self.index.pop(user_id, None)
+        if row is None:
+            return False
+        if self.delta_log is not None:
+            self.delta_log.append_remove(user_id)
+        if row >= 0:
+            self._lru.pop(user_id, None)
+            self._free_resident.append(row)
+        else:
+            self._free_spill.append(-row - 1)
+        return True
+
+    def update_amount(self, user_id, amount, timestamp=None):
+        """Fold one new transaction amount into the running statistics"""
+        row = self._resident_row(user_id)
+        if row is None:
+            return False
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        if self.delta_log is not None:
+            self.delta_log.append_update(user_id, amount, timestamp)
+        columns = self._resident.columns
+
+        total = int(columns['total_transactions'][row])
+        avg = float(columns['avg_amount'][row])
+        columns['avg_amount'][row] = (avg * total + amount) / (total + 1)
+        columns['max_amount'][row] = max(float(columns['max_amount'][row]), amount)
+        columns['total_transactions'][row] = total + 1
+        columns['last_update'][row] = timestamp
+        return True
+
+    # ------------------------------------------------------------------
+    # Vectorized bulk build
+    # ------------------------------------------------------------------
+    def build_from_transactions(self, transactions_df):
+        """Create profiles for every user in one vectorized pass.
+
+        Produces the same values as ``UserProfiler.create_user_profile``
+        called for each user, without a scan of the frame per user.
+        """
+        df = transactions_df
+        grouped = df.groupby('User_ID', sort=True)
+        stats = grouped['Transaction_Amount'].agg(['size', 'mean', 'max'])
+        user_ids = stats.index.to_numpy()
+        n_users = len(user_ids)
+        position = pd.Series(np.arange(n_users), index=stats.index)
+
+        columns = {
+            'total_transactions': stats['size'].to_numpy(np.uint32),
+            'avg_amount': stats['mean'].to_numpy(np.float32),
+            'max_amount': stats['max'].to_numpy(np.float32),
+            'fraud_rate': (
+                grouped['Is_Fraudulent'].mean().to_numpy(np.float32)
+                if 'Is_Fraudulent' in df.columns else np.zeros(n_users, dtype=np.float32)
+            ),
+            'hour_hist': np.zeros((n_users, 24), dtype=np.uint8),
+            'usual_hours_mask': np.zeros(n_users, dtype=np.uint32),
+            'last_update': np.full(n_users, int(time.time()), dtype=np.uint32)
+        }
+
+        if 'Hour' in df.columns:
+            rows = position[df['User_ID']].to_numpy()
+            hours = df['Hour'].to_numpy().astype(np.int64)
+            counts = np.bincount(rows * 24 + hours, minlength=n_users * 24).reshape(n_users, 24)
+            totals = columns['total_transactions'][:, None]
+            columns['hour_hist'] = hour_histogram(counts, totals)
+
+            # First MAX_USUAL_HOURS hours (ascending) above the share cutoff
+            usual = counts > totals * USUAL_HOUR_SHARE
+            usual &= np.cumsum(usual, axis=1) <= MAX_USUAL_HOURS
+            columns['usual_hours_mask'] = (usual * _HOUR_BITS).sum(axis=1).astype(np.uint32)
+
+        for field, (source_col, _) in CATEGORY_FIELDS.items():
+            columns[field] = self._top_modes(df, field, source_col, position, n_users)
+
+        self._bulk_insert(user_ids, columns)
+        return n_users
+
+    def _top_modes(self, df, field, source_col, position, n_users):
+        """Up to TOP_K most frequent values per user, ties in sorted order"""
+        codes = np.full((n_users, TOP_K), -1, dtype=PROFILE_COLUMNS[field][0])
+        if source_col not in df.columns:
+            return codes
+
+        counts = df.groupby(['User_ID', source_col]).size().rename('n').reset_index()
+        counts = counts[counts['n'] == counts.groupby('User_ID')['n'].transform('max')]
+        counts = counts.sort_values(['User_ID', source_col])
+        slot = counts.groupby('User_ID').cumcount().to_numpy()
+        counts = counts[slot < TOP_K]
+        slot = slot[slot < TOP_K]
+
+        rows = position[counts['User_ID']].to_numpy()
+        codes[rows, slot] = self.encode_many(field, counts[source_col].tolist())
+        return codes
+
+    def _allocate_rows(self, n, spill):
+        """``n`` free rows of one tier: recycled rows first, then appended"""
+        free = self._free_spill if spill else self._free_resident
+        recycled = [free.pop() for _ in range(min(n, len(free)))]
+        n_append = n - len(recycled)
+
+        if spill:
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='profile_spill_')
+            if self._spill is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill = _ColumnBlock(max(self.max_resident or 0, 1024), self.spill_dir)
+            block, start = self._spill, self._spill_rows
+            self._spill_rows += n_append
+        else:
+            block, start = self._resident, self._resident_rows
+            self._resident_rows += n_append
+
+        capacity = block.capacity
+        while capacity < start + n_append:
+            capacity *= 2
+        if not spill and self.max_resident is not None:
+            capacity = min(capacity, self.max_resident)
+        if capacity > block.capacity:
+            block.grow(capacity)
+        return np.r_[np.array(recycled, dtype=np.int64), np.arange(start, start + n_append)]
+
+    def _bulk_insert(self, user_ids, columns):
+        is_new = np.fromiter((uid not in self.index for uid in user_ids), bool, len(user_ids))
+
+        for i in np.flatnonzero(~is_new):
+            row = self._row_for_write(user_ids[i])
+            for name, values in columns.items():
+                self._resident.columns[name][row] = values[i]
+
+        new = np.flatnonzero(is_new)
+        room = len(new) if self.max_resident is None else self.max_resident - len(self._lru)
+        to_resident, to_spill = new[:max(room, 0)], new[max(room, 0):]
+
+        for positions, spill in [(to_resident, False), (to_spill, True)]:
+            if not len(positions):
+                continue
+            rows = self._allocate_rows(len(positions), spill)
+            block = self._spill if spill else self._resident
+            for name, values in columns.items():
+                block.columns[name][rows] = values[positions]
+
+            ids = user_ids[positions].tolist()
+            if spill:
+                self.index.update(zip(ids, (-rows - 1).tolist()))
+            else:
+                self.index.update(zip(ids, rows.tolist()))
+                self._lru.update(dict.fromkeys(ids))
+
+    # ------------------------------------------------------------------
+    # Snapshot / restore
+    # ------------------------------------------------------------------
+    def snapshot(self, directory):
+        """Write all profiles to ``directory`` and start a new delta log.
+
+        Profiles created with ``build_from_transactions`` are not logged, so
+        take a snapshot right after a bulk build.
+        """
+        manifest = _read_manifest(directory)
+        # Past every segment, including ones left by a snapshot that crashed
+        # before its manifest was written
+        sequence = max([manifest['sequence'] if manifest else 0] +
+                       [_segment_sequence(p) for p in _segment_paths(directory)]) + 1
+
+        # New changes go to the next segment; older segments become obsolete
+        # once the manifest below names the new snapshot
+        if self.delta_log is not None:
+            self.delta_log.close()
+        self.delta_log = DeltaLog(_segment_path(directory, sequence))
+
+        user_ids = list(self.index.keys())
+        rows = np.fromiter(self.index.values(), dtype=np.int64, count=len(user_ids))
+        resident = rows >= 0
+
+        snapshot_name = f'snapshot-{sequence:06d}'
+        snapshot_dir = os.path.join(directory, snapshot_name)
+        tmp_dir = f'{snapshot_dir}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name, (dtype, shape) in PROFILE_COLUMNS.items():
+            column = np.empty((len(rows),) + shape, dtype=dtype)
+            column[resident] = self._resident.columns[name][rows[resident]]
+            if not resident.all():
+                column[~resident] = self._spill.columns[name][-rows[~resident] - 1]
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), column)
+
+        if all(isinstance(uid, (int, np.integer)) for uid in user_ids):
+            np.save(os.path.join(tmp_dir, 'user_ids.npy'), np.array(user_ids, dtype=np.int64))
+        else:
+            with open(os.path.join(tmp_dir, 'user_ids.json'), 'w') as f:
+                json.dump([_jsonable(uid) for uid in user_ids], f)
+
+        with open(os.path.join(tmp_dir, 'vocabularies.json'), 'w') as f:
+            json.dump(self.vocabularies, f)
+
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(tmp_dir, snapshot_dir)
+
+        # The manifest is the commit point: until it is replaced, restore()
+        # still reads the previous snapshot and replays every segment since
+        _write_manifest(directory, {
+            'sequence': sequence,
+            'snapshot': snapshot_name,
+            'users': len(user_ids),
+            'created': datetime.now().isoformat()
+        })
+        for path in glob.glob(os.path.join(directory, 'snapshot*')):
+            if os.path.basename(path) != snapshot_name:
+                shutil.rmtree(path, ignore_errors=True)
+        for path in _segment_paths(directory):
+            if _segment_sequence(path) < sequence:
+                os.remove(path)
+
+        print(f"✅ Profile snapshot saved: {len(user_ids):,} users -> {snapshot_dir}")
+        return snapshot_dir
+
+    @classmethod
+    def restore(cls, directory, max_resident=None, spill_dir=None):
+        """Open the latest snapshot memory-mapped and replay the delta log.
+
+        The returned store keeps logging to ``directory``.
+        """
+        store = cls(max_resident=max_resident, spill_dir=spill_dir)
+        manifest = _read_manifest(directory)
+        # Manifests written before snapshots were versioned name no directory
+        snapshot_dir = os.path.join(directory, (manifest or {}).get('snapshot', 'snapshot'))
+        sequence = manifest['sequence'] if manifest else 0
+
+        if manifest:
+            columns = {
+                name: np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode='c')
+                for name in PROFILE_COLUMNS
+            }
+            ids_path = os.path.join(snapshot_dir, 'user_ids.npy')
+            if os.path.exists(ids_path):
+                user_ids = np.load(ids_path).tolist()
+            else:
+                with open(os.path.join(snapshot_dir, 'user_ids.json')) as f:
+                    user_ids = json.load(f)
+
+            with open(os.path.join(snapshot_dir, 'vocabularies.json')) as f:
+                store.vocabularies = json.load(f)
+            store._codes = {
+                field: {value: code for code, value in enumerate(values)}
+                for field, values in store.vocabularies.items()
+            }
+
+            # Every snapshot row starts out in the (read-mostly) spill tier
+            # and is promoted into resident memory on first access
+            if user_ids:
+                store.spill_dir = store.spill_dir or tempfile.mkdtemp(prefix='profile_spill_')
+                store._spill = _ColumnBlock.from_arrays(columns, store.spill_dir)
+                store._spill_rows = len(user_ids)
+                store.index = dict(zip(user_ids, range(-1, -len(user_ids) - 1, -1)))
+
+        replayed = 0
+        segments = [p for p in _segment_paths(directory) if _segment_sequence(p) >= sequence]
+        for path in segments:
+            replayed += DeltaLog.replay(path, store)
+
+        latest = segments[-1] if segments else _segment_path(directory, max(sequence, 1))
+        store.delta_log = DeltaLog(latest)
+        print(f"✅ Profiles restored: {len(store):,} users, {replayed:,} log entries replayed")
+        return store
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def memory_usage(self):
+        """Bytes used by the resident arrays, spill files and the index"""
+        index_bytes = sys.getsizeof(self.index) + sys.getsizeof(self._lru) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.index.items()
+        )
+        resident_bytes = self._resident.nbytes()
+        spill_bytes = self._spill.nbytes() if self._spill is not None else 0
+        n_users = max(len(self.index), 1)
+        return {
+            'users': len(self.index),
+            'resident_users': len(self._lru),
+            'resident_array_bytes': resident_bytes,
+            'spill_file_bytes': spill_bytes,
+            'index_bytes': index_bytes,
+            'in_memory_bytes_per_user': (resident_bytes + index_bytes) / n_users,
+            'spills': self.spills,
+            'promotions': self.promotions
+        }
+
+
+# ----------------------------------------------------------------------
+# Delta log
+# ----------------------------------------------------------------------
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def _segment_path(directory, sequence):
+    return os.path.join(directory, f'deltas-{sequence:06d}.log')
+
+
+def _segment_sequence(path):
+    return int(os.path.basename(path)[len('deltas-'):-len('.log')])
+
+
+def _segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, 'deltas-*.log')), key=_segment_sequence)
+
+
+def _read_manifest(directory):
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, 'manifest.json'))
+
+
+class DeltaLog:
+    """Append-only JSON-lines log of profile changes since a snapshot"""
+
+    def __init__(self, path, fsync=False):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.fsync = fsync
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, default=_jsonable) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append_update(self, user_id, amount, timestamp):
+        self._append({'op': 'update', 'user_id': user_id, 'amount': amount, 'ts': timestamp})
+
+    def append_put(self, user_id, profile):
+        self._append({'op': 'put', 'user_id': user_id, 'profile': profile})
+
+    def append_remove(self, user_id):
+        self._append({'op': 'remove', 'user_id': user_id})
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def replay(path, store):
+        """Apply a log segment to ``store``; a torn final line is ignored"""
+        applied = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if record['op'] == 'update':
+                    store.update_amount(record['user_id'], record['amount'], record['ts'])
+                elif record['op'] == 'put':
+                    store.put(record['user_id'], record['profile'])
+                else:
+                    store.remove(record['user_id'])
+                applied += 1
+        return applied
+
+
+def _deep_sizeof(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(v) for v in obj)
+    return size
+
+
+def benchmark_memory(n_users=100000, transactions_per_user=5, max_resident=None, seed=0):
+    """Memory per user: dict-of-dicts profiles vs ProfileStore"""
+    rng = np.random.default_rng(seed)
+    n = n_users * transactions_per_user
+    df = pd.DataFrame({
+        'User_ID': np.repeat(np.arange(n_users), transactions_per_user),
+        'Transaction_Amount': rng.gamma(2.0, 600.0, n).round(2),
+        'Hour': rng.integers(0, 24, n),
+        'Merchant_Category': rng.choice(['Grocery', 'Travel', 'Online Store', 'Pharmacy'], n),
+        'Transaction_Channel': rng.choice(['UPI', 'Card Swipe', 'Mobile Banking'], n),
+        'Location': rng.choice(['Mumbai', 'Pune', 'Delhi', 'Chennai'], n),
+        'Is_Fraudulent': (rng.random(n) < 0.05).astype(int)
+    })
+
+    store = ProfileStore(max_resident=max_resident)
+    start = time.perf_counter()
+    store.build_from_transactions(df)
+    build_seconds = time.perf_counter() - start
+
+    # Dict profiles as UserProfiler builds them, measured on a sample
+    sample_ids = rng.choice(n_users, size=min(n_users, 1000), replace=False)
+    dict_bytes = np.mean([_deep_sizeof(store.get(int(uid))) for uid in sample_ids])
+    dict_bytes += sys.getsizeof({}) / n_users + 100  # index entry
+
+    usage = store.memory_usage()
+    print(f"Users: {n_users:,}")
+    print(f"Bulk build: {build_seconds:.2f}s")
+    print(f"dict-of-dicts profile:   ~{dict_bytes:,.0f} bytes/user")
+    print(f"ProfileStore (in memory): {usage['in_memory_bytes_per_user']:,.0f} bytes/user")
+    print(f"Spill file: {usage['spill_file_bytes']:,} bytes")
+    return usage
+
+
+def benchmark_restore(n_users=1000000, n_updates=50000, directory=None, seed=0):
+    """Time snapshot, restore + log replay and the first lookups"""
+    directory = directory or tempfile.mkdtemp(prefix='profile_snapshot_')
+    rng = np.random.default_rng(seed)
+    n = n_users * 3
+    df = pd.DataFrame({
+        'User_ID': np.repeat(np.arange(n_users), 3),
+        'Transaction_Amount': rng.gamma(2.0, 600.0, n).round(2),
+        'Hour': rng.integers(0, 24, n),
+        'Merchant_Category': rng.choice(['Grocery', 'Travel', 'Online Store'], n),
+        'Transaction_Channel': rng.choice(['UPI', 'Card Swipe'], n),
+        'Location': rng.choice(['Mumbai', 'Pune', 'Delhi'], n),
+        'Is_Fraudulent': (rng.random(n) < 0.05).astype(int)
+    })
+
+    store = ProfileStore()
+    start = time.perf_counter()
+    store.build_from_transactions(df)
+    rebuild_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.snapshot(directory)
+    snapshot_seconds = time.perf_counter() - start
+
+    for user_id, amount in zip(rng.integers(0, n_users, n_updates).tolist(),
+                               rng.gamma(2.0, 600.0, n_updates).tolist()):
+        store.update_amount(user_id, amount)
+    store.delta_log.close()
+
+    start = time.perf_counter()
+    restored = ProfileStore.restore(directory)
+    restore_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id in rng.integers(0, n_users, 1000).tolist():
+        restored.get(user_id)
+    lookup_ms = (time.perf_counter() - start)
+
+    print(f"Rebuild from transactions: {rebuild_seconds:.2f}s")
+    print(f"Snapshot:                  {snapshot_seconds:.2f}s")
+    print(f"Restore + replay {n_updates:,}:   {restore_seconds:.2f}s")
+    print(f"1,000 lookups after restore: {lookup_ms * 1000:.1f}ms")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark_memory()
+    benchmark_restore()
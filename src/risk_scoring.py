@@ -1,8 +1,16 @@
 import numpy as np
 
+from decision_engine import DecisionEngine
+
+# Rule scores (0-100) are cut like probabilities: score / 100
+RULE_THRESHOLDS = {'review_threshold': 0.4, 'block_threshold': 0.7, 'decision_threshold': 0.7}
+
 class RiskScorer:
-    def __init__(self):
-        pass
+    def __init__(self, decision_engine=None, monitor_threshold=0.2):
+        # Same ladder (and config format) as the model's decisions
+        self.decision_engine = decision_engine or DecisionEngine(**RULE_THRESHOLDS)
+        # Low-risk scores at/above this get MONITOR instead of APPROVE
+        self.monitor_threshold = monitor_threshold
         
     def calculate_risk_score(self, transaction, user_history=None):
         """Calculate comprehensive risk score"""
@@ -52,12 +60,7 @@ class RiskScorer:
         risk_score = min(100, risk_score)
         
         # -------- Risk level --------
-        if risk_score >= 70:
-            risk_level = 'HIGH'
-        elif risk_score >= 40:
-            risk_level = 'MEDIUM'
-        else:
-            risk_level = 'LOW'
+        risk_level = str(self.decision_engine.risk_levels([risk_score / 100])[0])
         
         return {
             'risk_score': risk_score,
@@ -67,11 +70,7 @@ class RiskScorer:
         }
     
     def get_recommendation(self, risk_score):
-        if risk_score >= 70:
-            return 'BLOCK - High risk transaction'
-        elif risk_score >= 40:
-            return 'REVIEW - Manual verification required'
-        elif risk_score >= 20:
+        score = risk_score / 100
+        if self.decision_engine.level_codes([score])[0] == 0 and score >= self.monitor_threshold:
             return 'MONITOR - Additional checks recommended'
-        else:
-            return 'APPROVE - Low risk transaction'
+        return str(self.decision_engine.recommendations([score])[0])
@@ -0,0 +1,415 @@
+"""
+Per-segment fraud models with a global fallback.
+
+Training (``train.py --segment-by Transaction_Channel``) splits the global
+train/validation sets by the values of the segment columns and trains one
+bundle per segment with ``ModelTrainer`` in a pool of processes. Every
+bundle is a complete model directory (model, preprocessor, metadata with its
+own decision thresholds). A segment is only trained when it has enough rows
+of both classes, and it is only served when its validation AUC is at least
+the global model's on the same rows. ``segments.json`` in the output
+directory records every segment and the reason a segment was skipped.
+
+Serving (``SegmentModels``) groups a batch by segment and scores each group
+with one vectorized call to its segment model, or to the global model when
+the segment has none. Bundles are loaded on first use into an LRU cache
+bounded by ``max_models`` and by ``max_bytes`` (the pickled size of model
+and preprocessor), so rarely seen segments do not pin memory.
+
+    python segment_models.py                            # stand-in bundles per channel
+    python segment_models.py --segments-dir models/segments
+"""
+import argparse
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+from metrics import SEGMENT_MODEL_CACHE, SEGMENT_ROWS
+from model_persistence import ModelManager
+
+GLOBAL_SEGMENT = 'global'
+INDEX_FILE = 'segments.json'
+BUNDLE_FILES = ('trained_detector.pkl', 'preprocessor.pkl', 'model_metadata.pkl')
+
+
+def segment_groups(df, columns):
+    """Row positions of each segment key ('UPI', or 'UPI|Grocery' for two columns)"""
+    groups = df.groupby(list(columns), sort=False, dropna=False).indices
+    return {'|'.join(str(value) for value in (key if isinstance(key, tuple) else (key,))): rows
+            for key, rows in groups.items()}
+
+
+def _segment_dir(key):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', key)
+
+
+# -------- Training --------
+def _train_segment(task):
+    """Train and save one segment bundle (runs in a worker process)"""
+    from model_training import ModelTrainer
+
+    key, directory, (X_train, y_train, X_val, y_val), categorical_cols, numerical_cols, \
+        compact, random_state, cpus = task
+    # joblib inside ModelTrainer (cross-validation) shares the CPUs with the other workers
+    os.environ['LOKY_MAX_CPU_COUNT'] = str(cpus)
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'training.log'), 'w') as log, redirect_stdout(log):
+        trainer = ModelTrainer(random_state=random_state)
+        trainer.create_preprocessor(categorical_cols, numerical_cols)
+        trainer.train(X_train, y_train, X_val, y_val, compact=compact)
+        trainer.save_model(*(os.path.join(directory, name) for name in BUNDLE_FILES))
+        val_proba = trainer.model.predict_proba(trainer.preprocessor.transform(X_val))[:, 1]
+    return key, {
+        'model': type(trainer.model.steps[-1][1]).__name__,
+        'val_auc': float(roc_auc_score(y_val, val_proba)),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def _skip_reason(y_train, y_val, min_rows, min_class_rows):
+    if len(y_train) < min_rows:
+        return f'{len(y_train)} training rows (< {min_rows})'
+    frauds = int(np.sum(y_train))
+    if min(frauds, len(y_train) - frauds) < min_class_rows:
+        return f'{frauds} fraud / {len(y_train) - frauds} legit training rows (< {min_class_rows} of a class)'
+    if len(np.unique(y_val)) < 2:
+        return 'validation rows of one class only'
+    return None
+
+
+def train_segment_models(X_train, y_train, X_val, y_val, categorical_cols, numerical_cols,
+                         segment_by=('Transaction_Channel',), out_dir='models/segments',
+                         global_val_proba=None, n_workers=None, min_rows=500, min_class_rows=20,
+                         compact=False, random_state=42):
+    """Train a bundle per segment in parallel and write the segment index
+
+    ``global_val_proba`` (the global model on ``X_val``) decides which
+    segments are served: only those whose own model does at least as well.
+    """
+    segment_by = list(segment_by)
+    y_train, y_val = np.asarray(y_train), np.asarray(y_val)
+    val_groups = segment_groups(X_val, segment_by)
+    index = {'segment_by': segment_by, 'segments': {}, 'skipped': {}}
+
+    tasks = []
+    for key, rows in segment_groups(X_train, segment_by).items():
+        val_rows = val_groups.get(key, np.array([], dtype=int))
+        reason = _skip_reason(y_train[rows], y_val[val_rows], min_rows, min_class_rows)
+        if reason is not None:
+            index['skipped'][key] = reason
+            continue
+        frames = (X_train.iloc[rows], y_train[rows], X_val.iloc[val_rows], y_val[val_rows])
+        index['segments'][key] = {
+            'dir': _segment_dir(key),
+            'train_rows': len(rows),
+            'val_rows': len(val_rows)
+        }
+        if global_val_proba is not None:
+            index['segments'][key]['global_val_auc'] = float(
+                roc_auc_score(y_val[val_rows], np.asarray(global_val_proba)[val_rows])
+            )
+        tasks.append((key, os.path.join(out_dir, _segment_dir(key)), frames,
+                      categorical_cols, numerical_cols, compact, random_state))
+
+    for key, reason in index['skipped'].items():
+        print(f"ℹ️ Segment {key}: skipped, {reason}")
+
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(tasks) or 1))
+    cpus = max(1, (os.cpu_count() or 1) // n_workers)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_train_segment, task + (cpus,)) for task in tasks]
+        for future in as_completed(futures):
+            key, result = future.result()
+            info = index['segments'][key]
+            info.update(result)
+            info['serving'] = info['val_auc'] >= info.get('global_val_auc', -1)
+            status = '✅' if info['serving'] else '⚠️ not served,'
+            global_auc = f" (global {info['global_val_auc']:.4f})" if 'global_val_auc' in info else ''
+            print(f"{status} Segment {key}: {info['model']} val AUC {info['val_auc']:.4f}{global_auc} "
+                  f"| {info['train_rows']:,} rows | {info['seconds']:.1f}s")
+    index['seconds'] = time.perf_counter() - start
+
+    # Index last (and atomically): servers never see a half-written set of segments
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = os.path.join(out_dir, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, INDEX_FILE))
+    served = sum(info.get('serving', False) for info in index['segments'].values())
+    print(f"✅ {served}/{len(index['segments'])} segment models served "
+          f"({len(index['skipped'])} segments skipped), trained in {index['seconds']:.1f}s "
+          f"with {n_workers} processes -> {out_dir}")
+    return index
+
+
+def clear_segment_models(out_dir='models/segments'):
+    """Remove the segment index and its bundles; returns the number of bundles
+
+    Called when the global model is retrained without segments: the
+    ``serving`` flags were decided against the previous global model.
+    """
+    path = os.path.join(out_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        index = json.load(f)
+    # Index first, so servers stop routing before the bundles disappear
+    os.remove(path)
+    for info in index.get('segments', {}).values():
+        shutil.rmtree(os.path.join(out_dir, info['dir']), ignore_errors=True)
+    print(f"ℹ️ Removed {len(index.get('segments', {}))} segment models trained against the previous "
+          f"global model ({out_dir})")
+    return len(index.get('segments', {}))
+
+
+# -------- Serving --------
+class SegmentModels:
+    """Routes transactions to segment bundles, falling back to the global ``ModelManager``"""
+
+    def __init__(self, global_manager, segments_dir=None, max_bytes=256 * 2 ** 20, max_models=8):
+        self.global_manager = global_manager
+        # Relative paths resolve like ModelManager's: against this directory
+        self.segments_dir = (os.path.join(os.path.dirname(os.path.abspath(__file__)), segments_dir)
+                             if segments_dir else None)
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the segment index and drop every loaded bundle"""
+        index = {}
+        path = os.path.join(self.segments_dir, INDEX_FILE) if self.segments_dir else None
+        if path and os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+        with self._lock:
+            self.segment_by = index.get('segment_by', [])
+            self.segments = {key: info['dir'] for key, info in index.get('segments', {}).items()
+                             if info.get('serving')}
+            self._bundles = OrderedDict()
+            self._loading = {}
+            self._engines = {}
+            self._failed = set()
+            self.bytes = 0
+            self.counts = {'hits': 0, 'loads': 0, 'evictions': 0, 'failed': 0}
+        if self.segments:
+            print(f"✅ {len(self.segments)} segment models indexed by {', '.join(self.segment_by)}")
+        return self
+
+    # -------- Bundle cache --------
+    def _load(self, key):
+        directory = os.path.join(self.segments_dir, self.segments[key])
+        manager = ModelManager(cache_size=0, float32=self.global_manager.float32)
+        if not manager.load_models(*(os.path.join(directory, name) for name in BUNDLE_FILES),
+                                   publish_version=False):
+            return None, 0
+        # Cache keys include the bundle version, so all bundles can share one cache
+        manager.cache = self.global_manager.cache
+        size = len(pickle.dumps((manager.model, manager.preprocessor), protocol=pickle.HIGHEST_PROTOCOL))
+        return manager, size
+
+    def bundle(self, key):
+        """Loaded ModelManager of a segment, or None (no model: use the global one)"""
+        with self._lock:
+            if key not in self.segments or key in self._failed:
+                return None
+            if key in self._bundles:
+                self._bundles.move_to_end(key)
+                self.counts['hits'] += 1
+                SEGMENT_MODEL_CACHE.labels(event='hit').inc()
+                return self._bundles[key][0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # One load per segment; other segments keep being served meanwhile
+        with load_lock:
+            with self._lock:
+                if key in self._failed:
+                    return None
+                if key in self._bundles:
+                    self._bundles.move_to_end(key)
+                    return self._bundles[key][0]
+            try:
+                manager, size = self._load(key)
+            except Exception as e:
+                print(f"❌ Failed to load segment model {key}: {str(e)}")
+                manager, size = None, 0
+            with self._lock:
+                if manager is None:
+                    self._failed.add(key)
+                    self.counts['failed'] += 1
+                    SEGMENT_MODEL_CACHE.labels(event='failed').inc()
+                    return None
+                self._bundles[key] = (manager, size)
+                self._engines[key] = manager.decision_engine
+                self.bytes += size
+                self.counts['loads'] += 1
+                SEGMENT_MODEL_CACHE.labels(event='load').inc()
+                # Least recently used first; the bundle just loaded always stays
+                while len(self._bundles) > 1 and (self.bytes > self.max_bytes
+                                                  or len(self._bundles) > self.max_models):
+                    _, (_, evicted_size) = self._bundles.popitem(last=False)
+                    self.bytes -= evicted_size
+                    self.counts['evictions'] += 1
+                    SEGMENT_MODEL_CACHE.labels(event='eviction').inc()
+            return manager
+
+    # -------- Scoring --------
+    def predict(self, data, use_cache=True):
+        """(predictions, probabilities, segment per row) with one model call per segment"""
+        n = len(data)
+        if not self.segments or n == 0:
+            predictions, probabilities = self.global_manager.predict(data, use_cache=use_cache)
+            SEGMENT_ROWS.labels(segment=GLOBAL_SEGMENT).inc(n)
+            return predictions, probabilities, np.full(n, GLOBAL_SEGMENT, dtype=object)
+
+        predictions = np.empty(n, dtype=int)
+        probabilities = np.empty((n, 2))
+        segments = np.full(n, GLOBAL_SEGMENT, dtype=object)
+        fallback = []
+        for key, rows in segment_groups(data, self.segment_by).items():
+            manager = self.bundle(key)
+            if manager is None:
+                fallback.append(rows)
+                continue
+            predictions[rows], probabilities[rows] = manager.predict(data.iloc[rows], use_cache=use_cache)
+            segments[rows] = key
+            SEGMENT_ROWS.labels(segment=key).inc(len(rows))
+        if fallback:
+            rows = np.sort(np.concatenate(fallback))
+            predictions[rows], probabilities[rows] = self.global_manager.predict(data.iloc[rows],
+                                                                              use_cache=use_cache)
+            SEGMENT_ROWS.labels(segment=GLOBAL_SEGMENT).inc(len(rows))
+        return predictions, probabilities, segments
+
+    def decisions(self, fraud_probabilities, segments):
+        """Risk levels and recommendations, each row by its own model's thresholds"""
+        fraud_probabilities = np.asarray(fraud_probabilities)
+        risk_levels = np.empty(len(segments), dtype=object)
+        recommendations = np.empty(len(segments), dtype=object)
+        for key in set(segments):
+            rows = segments == key
+            engine = self._engines.get(key, self.global_manager.decision_engine)
+            risk_levels[rows] = engine.risk_levels(fraud_probabilities[rows])
+            recommendations[rows] = engine.recommendations(fraud_probabilities[rows])
+        return risk_levels, recommendations
+
+    def stats(self):
+        with self._lock:
+            return {
+                'segment_by': self.segment_by,
+                'segments': len(self.segments),
+                'loaded': list(self._bundles),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'max_models': self.max_models,
+                'failed_segments': sorted(self._failed),
+                **self.counts
+            }
+
+
+# -------- Benchmark --------
+def _stand_in_segments(model_dir, out_dir, df, segment_by):
+    """Segment index whose bundles are copies of the global one (routing cost only)"""
+    segments = {}
+    for key in segment_groups(df, segment_by):
+        directory = os.path.join(out_dir, _segment_dir(key))
+        os.makedirs(directory, exist_ok=True)
+        for name in BUNDLE_FILES:
+            if os.path.exists(os.path.join(model_dir, name)):
+                shutil.copy(os.path.join(model_dir, name), directory)
+        segments[key] = {'dir': _segment_dir(key), 'serving': True}
+    with open(os.path.join(out_dir, INDEX_FILE), 'w') as f:
+        json.dump({'segment_by': list(segment_by), 'segments': segments}, f)
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', segments_dir=None,
+              segment_by=('Transaction_Channel',), batch_size=256, n_batches=40, max_models=3):
+    """Grouped vs per-transaction routing, and bundle loads under a bounded cache"""
+    import tempfile
+    from data_utils import DataProcessor
+
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(data_path)).drop(
+        columns=['Transaction_ID', 'Is_Fraudulent'])
+    manager = ModelManager(cache_size=0)
+    manager.load_models()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if segments_dir is None:
+            segments_dir = tmp
+            _stand_in_segments(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'),
+                               tmp, df, segment_by)
+        router = SegmentModels(manager, segments_dir, max_models=10 ** 6)
+        rng = np.random.default_rng(0)
+        batches = [df.iloc[rng.choice(len(df), batch_size)] for _ in range(n_batches)]
+
+        start = time.perf_counter()
+        router.predict(batches[0])
+        print(f"\n{len(router.segments)} segments by {', '.join(router.segment_by)} | "
+              f"first batch (cold loads): {(time.perf_counter() - start) * 1e3:.0f} ms, "
+              f"{router.stats()['bytes'] / 1e6:.1f} MB of bundles")
+
+        start = time.perf_counter()
+        for batch in batches:
+            router.predict(batch)
+        grouped = time.perf_counter() - start
+
+        per_row = batches[:max(1, n_batches // 10)]
+        start = time.perf_counter()
+        for batch in per_row:
+            for i in range(len(batch)):
+                row = batch.iloc[i:i + 1]
+                key = next(iter(segment_groups(row, router.segment_by)))
+                (router.bundle(key) or manager).predict(row)
+        per_transaction = (time.perf_counter() - start) * n_batches / len(per_row)
+
+        start = time.perf_counter()
+        for batch in batches:
+            manager.predict(batch)
+        global_only = time.perf_counter() - start
+
+        rows = batch_size * n_batches
+        print(f"grouped by segment : {rows / grouped:10,.0f} rows/s")
+        print(f"per transaction    : {rows / per_transaction:10,.0f} rows/s")
+        print(f"global model only  : {rows / global_only:10,.0f} rows/s")
+
+        # Single transactions in random segment order, with a cache smaller than the segments
+        singles = df.iloc[rng.choice(len(df), 500)]
+        for limit in (max_models, len(router.segments)):
+            bounded = SegmentModels(manager, segments_dir, max_models=limit)
+            start = time.perf_counter()
+            for i in range(len(singles)):
+                bounded.predict(singles.iloc[i:i + 1])
+            elapsed = time.perf_counter() - start
+            stats = bounded.stats()
+            print(f"max_models={limit}: {len(singles)} single transactions in {elapsed:.2f}s | "
+                  f"{stats['hits']} hits, {stats['loads']} loads, {stats['evictions']} evictions, "
+                  f"{stats['bytes'] / 1e6:.1f} MB resident")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark segment model routing')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--segments-dir', help='Trained segment models (default: stand-in copies of the global bundle)')
+    parser.add_argument('--segment-by', nargs='+', default=['Transaction_Channel'])
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--max-models', type=int, default=3)
+    args = parser.parse_args()
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    benchmark(args.data, segments_dir=args.segments_dir, segment_by=args.segment_by,
+              batch_size=args.batch_size, max_models=args.max_models)
@@ -0,0 +1,411 @@
+"""
+Champion/challenger shadow scoring.
+
+A ``ShadowScorer`` holds a candidate model bundle and scores the same
+transactions as the primary model, off the request path:
+
+- ``/predict`` hands the scored frame and the primary results to
+  ``submit``, which only enqueues them. When the bounded queue is full the
+  request is dropped and counted, so a slow candidate never backs up
+  real-time scoring.
+- Background threads drain the queue, coalesce queued requests into one
+  ``predict_proba`` call and wait (up to ``max_yield`` seconds) while
+  real-time requests are in flight. The call itself runs in a child process
+  at the lowest CPU priority, so the shadow model holds neither the API's
+  GIL nor CPU time that request threads could use.
+- Each scored request updates the decision agreement, the score deltas
+  and the per-call latency of both models. ``report()`` summarizes them and
+  the ``fraud_shadow_*`` metrics export them.
+
+The candidate bundle lives in a directory with the usual three files
+(``trained_detector.pkl``, ``preprocessor.pkl``, ``model_metadata.pkl``).
+Run ``python shadow_scoring.py`` to measure the primary ``/predict`` latency
+with and without a shadow model.
+"""
+import argparse
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from metrics import (
+    MODEL_LATENCY, SHADOW_DISAGREEMENTS, SHADOW_DROPPED, SHADOW_ROWS, SHADOW_SCORE_DELTA
+)
+from model_persistence import ModelManager
+
+BUNDLE_FILES = ('trained_detector.pkl', 'preprocessor.pkl', 'model_metadata.pkl')
+# Recent samples kept for percentiles
+RESERVOIR_SIZE = 10000
+
+
+def _percentiles_ms(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1e3
+    return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+
+
+class _ShadowStats:
+    """Counters and recent samples, updated by the shadow workers under a lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.agree = 0
+        self.shadow_only_fraud = 0
+        self.primary_only_fraud = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.abs_deltas = deque(maxlen=RESERVOIR_SIZE)
+        self.primary_seconds = deque(maxlen=RESERVOIR_SIZE)
+        self.shadow_seconds = deque(maxlen=RESERVOIR_SIZE)
+        self.primary_total = [0.0, 0]
+        self.shadow_total = [0.0, 0]
+
+
+def _score_frames(manager, frames):
+    """Fraud probabilities of the concatenated frames and the seconds it took"""
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    # Not ModelManager.predict: the primary's stage metrics stay untouched
+    start = time.perf_counter()
+    probabilities = manager.model.predict_proba(manager.preprocessor.transform(df))[:, 1]
+    return probabilities, time.perf_counter() - start
+
+
+def _load_bundle(model_dir):
+    paths = [os.path.abspath(os.path.join(model_dir, name)) for name in BUNDLE_FILES]
+    manager = ModelManager(cache_size=0)
+    if not manager.load_models(*paths, publish_version=False):
+        raise FileNotFoundError(f'No model bundle in {model_dir}')
+    return manager
+
+
+def _serve_model(model_dir, nice):
+    """Child process: score pickled frame lists from stdin, answer on stdout"""
+    channel_in = sys.stdin.buffer
+    channel_out = os.fdopen(os.dup(1), 'wb')
+    # Model loading messages go to stderr, stdout carries the protocol
+    os.dup2(2, 1)
+    os.nice(nice)
+    manager = _load_bundle(model_dir)
+    pickle.dump('ready', channel_out)
+    channel_out.flush()
+    while True:
+        try:
+            frames = pickle.load(channel_in)
+        except EOFError:
+            return
+        try:
+            result = _score_frames(manager, frames)
+        except Exception as e:
+            result = e
+        pickle.dump(result, channel_out, protocol=pickle.HIGHEST_PROTOCOL)
+        channel_out.flush()
+
+
+class _ChildScorer:
+    """Shadow model in a child process (one per worker thread)"""
+
+    def __init__(self, model_dir, nice):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve-model', model_dir, '--nice', str(nice)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        if pickle.load(self.process.stdout) != 'ready':
+            raise RuntimeError('Shadow model process failed to start')
+
+    def __call__(self, frames):
+        pickle.dump(frames, self.process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        self.process.stdin.flush()
+        result = pickle.load(self.process.stdout)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class ShadowScorer:
+    def __init__(self, manager, model_dir=None, max_queue=256, max_batch=64, n_workers=1,
+                 wait_for_idle=None, max_yield=0.05, nice=19):
+        self.manager = manager
+        # Set: score in child processes loading this bundle; None: in the worker threads
+        self.model_dir = model_dir
+        self.nice = nice
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.n_workers = n_workers
+        self.wait_for_idle = wait_for_idle
+        self.max_yield = max_yield
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+        self._stats = _ShadowStats()
+        self._counter_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_dir(cls, model_dir, isolate=True, **kwargs):
+        """Shadow scorer for the bundle in ``model_dir``
+
+        The bundle is loaded here too, to fail early and for its version and
+        decision thresholds.
+        """
+        manager = _load_bundle(model_dir)
+        return cls(manager, model_dir=os.path.abspath(model_dir) if isolate else None, **kwargs)
+
+    @property
+    def model_version(self):
+        return self.manager.model_version
+
+    # -------- Lifecycle --------
+    def start(self):
+        if self._workers:
+            return self
+        for i in range(self.n_workers):
+            worker = threading.Thread(target=self._run, name=f'shadow-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the workers; requests still queued are discarded"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    # -------- Request path --------
+    def submit(self, df, fraud_probabilities, predictions, primary_seconds):
+        """Queue a scored request for the shadow model; False if it was dropped"""
+        try:
+            self._queue.put_nowait((df, fraud_probabilities, predictions, primary_seconds))
+            accepted = True
+        except queue.Full:
+            accepted = False
+            SHADOW_DROPPED.inc()
+        with self._counter_lock:
+            self.submitted += 1
+            self.dropped += not accepted
+        return accepted
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # -------- Workers --------
+    def _scorer(self):
+        if self.model_dir is None:
+            return lambda frames: _score_frames(self.manager, frames)
+        return _ChildScorer(self.model_dir, self.nice)
+
+    def _run(self):
+        # Linux schedules threads as tasks: a niced worker only gets the
+        # CPU time request threads leave idle
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError):
+            pass
+        try:
+            score = self._scorer()
+        except Exception as e:
+            print(f"❌ Shadow model process failed to start: {e}")
+            return
+        try:
+            self._loop(score)
+        finally:
+            if isinstance(score, _ChildScorer):
+                score.close()
+
+    def _loop(self, score):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            stop = False
+            while len(items) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+            if self.wait_for_idle is not None:
+                self.wait_for_idle(self.max_yield)
+            try:
+                self._record(items, *score([item[0] for item in items]))
+            except Exception as e:
+                with self._stats.lock:
+                    self._stats.errors += len(items)
+                print(f"⚠️  Shadow scoring failed: {type(e).__name__}: {e}")
+                if isinstance(score, _ChildScorer) and not score.alive():
+                    score.close()
+                    try:
+                        score = self._scorer()
+                    except Exception as e:
+                        print(f"❌ Shadow model process failed to restart: {e}")
+                        return
+            if stop:
+                return
+
+    def _record(self, items, shadow, seconds):
+        n_rows = len(shadow)
+        MODEL_LATENCY.labels(model='shadow').observe(seconds)
+
+        primary = np.concatenate([np.asarray(item[1], dtype=np.float64) for item in items])
+        primary_fraud = np.concatenate([np.asarray(item[2]) for item in items]).astype(bool)
+        shadow_fraud = self.manager.decision_engine.is_fraud(shadow).astype(bool)
+        delta = shadow - primary
+        abs_delta = np.abs(delta)
+        disagree = int((shadow_fraud != primary_fraud).sum())
+
+        SHADOW_ROWS.inc(n_rows)
+        if disagree:
+            SHADOW_DISAGREEMENTS.inc(disagree)
+        for value in abs_delta:
+            SHADOW_SCORE_DELTA.observe(value)
+
+        stats = self._stats
+        with stats.lock:
+            stats.requests += len(items)
+            stats.rows += n_rows
+            stats.agree += n_rows - disagree
+            stats.shadow_only_fraud += int((shadow_fraud & ~primary_fraud).sum())
+            stats.primary_only_fraud += int((primary_fraud & ~shadow_fraud).sum())
+            stats.delta_sum += float(delta.sum())
+            stats.abs_delta_sum += float(abs_delta.sum())
+            stats.max_abs_delta = max(stats.max_abs_delta, float(abs_delta.max(initial=0.0)))
+            stats.abs_deltas.extend(abs_delta.tolist())
+            stats.shadow_seconds.append(seconds)
+            stats.shadow_total[0] += seconds
+            stats.shadow_total[1] += n_rows
+            for item in items:
+                stats.primary_seconds.append(item[3])
+                stats.primary_total[0] += item[3]
+                stats.primary_total[1] += len(item[0])
+
+    # -------- Reporting --------
+    def report(self):
+        stats = self._stats
+        with stats.lock:
+            rows = stats.rows
+            abs_deltas = list(stats.abs_deltas)
+            primary_seconds = list(stats.primary_seconds)
+            shadow_seconds = list(stats.shadow_seconds)
+            summary = {
+                'model_version': self.model_version,
+                'queue_depth': self.queue_depth(),
+                'max_queue': self.max_queue,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'scored_requests': stats.requests,
+                'scored_rows': rows,
+                'errors': stats.errors,
+                'decision_agreement': round(stats.agree / rows, 6) if rows else None,
+                'shadow_only_fraud': stats.shadow_only_fraud,
+                'primary_only_fraud': stats.primary_only_fraud,
+                'score_delta': {
+                    'mean': round(stats.delta_sum / rows, 6) if rows else None,
+                    'mean_abs': round(stats.abs_delta_sum / rows, 6) if rows else None,
+                    'max_abs': round(stats.max_abs_delta, 6)
+                },
+                'us_per_row': {
+                    'primary': round(stats.primary_total[0] / stats.primary_total[1] * 1e6, 2)
+                    if stats.primary_total[1] else None,
+                    'shadow': round(stats.shadow_total[0] / stats.shadow_total[1] * 1e6, 2)
+                    if stats.shadow_total[1] else None
+                }
+            }
+        if abs_deltas:
+            p50, p95, p99 = np.percentile(abs_deltas, [50, 95, 99])
+            summary['score_delta'].update(
+                p50_abs=round(float(p50), 6), p95_abs=round(float(p95), 6), p99_abs=round(float(p99), 6))
+        # Primary: per request (may be cache hits); shadow: per coalesced call
+        summary['latency_ms'] = {
+            'primary': _percentiles_ms(primary_seconds),
+            'shadow': _percentiles_ms(shadow_seconds)
+        }
+        return summary
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', requests=900, qps=30):
+    """Primary /predict latency with and without a shadow model (same bundle)
+
+    Open loop at a fixed rate, runs interleaved to average out drift.
+    """
+    import app as api
+    from load_generator import Workload, load_transactions, run_load, serve_in_thread
+
+    workload = Workload(load_transactions(data_path))
+    api.model_manager.cache.max_entries = 0
+    server, url = serve_in_thread(api.app)
+    try:
+        results = {}
+        for label in ('baseline', 'shadow', 'baseline ', 'shadow '):
+            if label.strip() == 'shadow':
+                api.shadow_scorer = ShadowScorer.from_dir(
+                    'models', wait_for_idle=api.job_manager.wait_for_idle).start()
+            result = run_load(url, workload, qps=qps, concurrency=8, duration=600,
+                              max_requests=requests)
+            results[label] = result['endpoints']['predict']
+            if api.shadow_scorer is not None:
+                report = api.shadow_scorer.report()
+                api.shadow_scorer.stop()
+                api.shadow_scorer = None
+                print(f"shadow: scored {report['scored_requests']:,}/{report['submitted']:,} requests, "
+                      f"dropped {report['dropped']:,}, agreement {report['decision_agreement']}, "
+                      f"max |delta| {report['score_delta']['max_abs']}")
+    finally:
+        server.shutdown()
+
+    # Cost added to the request path: one enqueue
+    scorer = ShadowScorer(None, max_queue=requests)
+    workload_frame = load_transactions(data_path).head(1)
+    start = time.perf_counter()
+    for _ in range(requests):
+        scorer.submit(workload_frame, np.zeros(1), np.zeros(1), 0.0)
+    print(f"submit: {(time.perf_counter() - start) / requests * 1e6:.1f} us/request")
+
+    for label, stats in results.items():
+        latency = stats['latency_ms']
+        print(f"{label.strip():>9}: {stats['throughput']:7.1f} req/s | p50 {latency['p50']:.2f}ms | "
+              f"p95 {latency['p95']:.2f}ms | p99 {latency['p99']:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Shadow scoring overhead benchmark')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--serve-model', help=argparse.SUPPRESS)
+    parser.add_argument('--nice', type=int, default=19, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve_model:
+        _serve_model(args.serve_model, args.nice)
+    else:
+        benchmark(args.data)
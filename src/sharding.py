@@ -0,0 +1,453 @@
+"""
+User-partitioned sharding of scoring and per-user state.
+
+``HashRing`` consistent-hashes User_IDs onto K shards (each shard owns
+``vnodes`` points on the ring), so changing K only moves the users whose
+arc changed owner, roughly 1/K of them.
+
+Each shard is a separate process that owns its slice of:
+- user profiles (``UserProfiler`` backed by a ``ProfileStore``)
+- the running per-user amount statistics used as features (``FeatureEnricher``)
+
+``ShardRouter`` splits transactions and uploaded batches by shard, scores
+the parts in parallel and reassembles decisions in input order. Single
+transactions (``score``) advance the per-user state; uploaded batches
+(``score_frame`` / ``predict_frame``) only read it, so scoring a file
+twice gives the same result. Each shard connection has its own lock, so
+requests for different shards do not wait for each other.
+``resize()`` starts/stops shard processes and moves the state of every user
+whose owner changed. The API scores /batch_predict uploads and batch jobs
+through it when ``FRAUD_SHARDS`` is set, and ``stream_worker`` partitions
+by the same ring. Only uploads are sharded: real-time /predict requests
+are still scored in the API process and do not update the shards' state,
+and sharded uploads are scored by the global model (segment models are
+not used in this mode). ``/reload_models`` reloads the shards' model too.
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from model_persistence import ModelManager
+from profile_store import ProfileStore
+from stream_worker import FeatureEnricher, StreamWorker
+from user_profiling import UserProfiler
+
+
+def _hash_keys(keys):
+    return pd.util.hash_array(np.array([str(k) for k in keys], dtype=object))
+
+
+class HashRing:
+    def __init__(self, n_shards, vnodes=64):
+        self.n_shards = n_shards
+        self.vnodes = vnodes
+        # Point names do not depend on n_shards, so existing shards keep
+        # their arcs when shards are added or removed
+        points = _hash_keys([f'shard-{s}-vnode-{v}' for s in range(n_shards) for v in range(vnodes)])
+        owners = np.repeat(np.arange(n_shards), vnodes)
+        order = np.argsort(points, kind='stable')
+        self.points = points[order]
+        self.owners = owners[order]
+
+    def shards_for(self, user_ids):
+        """Owning shard of every user ID (vectorized)"""
+        if len(user_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self.points, _hash_keys(user_ids), side='right')
+        return self.owners[positions % len(self.points)]
+
+    def shard_for(self, user_id):
+        return int(self.shards_for([user_id])[0])
+
+
+# ----------------------------------------------------------------------
+# Shard process
+# ----------------------------------------------------------------------
+class Shard:
+    """State and operations of one shard (runs inside the shard process)"""
+
+    def __init__(self, shard_id, model_manager, profile_dir=None, max_resident=None):
+        self.shard_id = shard_id
+        self.profile_dir = profile_dir
+        if profile_dir and os.path.exists(os.path.join(profile_dir, 'manifest.json')):
+            store = ProfileStore.restore(profile_dir, max_resident=max_resident)
+        else:
+            store = ProfileStore(max_resident=max_resident)
+        self.profiler = UserProfiler(store=store)
+        self.enricher = FeatureEnricher()
+        if profile_dir and os.path.exists(self._enricher_path()):
+            self.enricher.load([self._enricher_path()])
+        self.worker = StreamWorker(None, None, model_manager, enricher=self.enricher,
+                                   partition=shard_id, profiler=self.profiler)
+
+    def reload_models(self, model_paths):
+        """Swap in the bundle at ``model_paths``; the old one stays if it fails"""
+        if not self.worker.model_manager.load_models(*model_paths):
+            raise RuntimeError('Models not loaded')
+        return self.worker.model_manager.model_version
+
+    def _enricher_path(self):
+        return os.path.join(self.profile_dir, 'enricher.pkl')
+
+    def score(self, transactions, observe=True):
+        if isinstance(transactions, pd.DataFrame):
+            transactions = transactions.to_dict('records')
+        return self.worker.score(transactions, observe=observe)
+
+    def build(self, transactions_df):
+        """Profiles and feature state from historical transactions"""
+        self.enricher.seed(transactions_df)
+        return self.profiler.build_profiles(transactions_df)
+
+    def export_moved(self, ring):
+        """Remove users this shard no longer owns under ``ring``.
+
+        Returns ``{destination shard: {'profiles': ..., 'stats': ...}}``.
+        """
+        store = self.profiler.store
+        user_ids = list(set(store.index) | set(self.enricher.user_ids()))
+        owners = ring.shards_for(user_ids).tolist()
+        moved = {uid: owner for uid, owner in zip(user_ids, owners) if owner != self.shard_id}
+
+        transfers = {owner: {'profiles': {}, 'stats': {}} for owner in set(moved.values())}
+        for user_id, owner in moved.items():
+            profile = store.get(user_id)
+            if profile is not None:
+                transfers[owner]['profiles'][user_id] = profile
+                store.remove(user_id)
+        for user_id, stats in self.enricher.export_stats(list(moved)).items():
+            transfers[moved[user_id]]['stats'][user_id] = stats
+        return transfers
+
+    def import_state(self, transfer):
+        for user_id, profile in transfer['profiles'].items():
+            self.profiler.store.put(user_id, profile)
+        self.enricher.import_stats(transfer['stats'])
+        return len(transfer['profiles'])
+
+    def snapshot(self):
+        if not self.profile_dir:
+            return None
+        snapshot_dir = self.profiler.store.snapshot(self.profile_dir)
+        self.enricher.save(self._enricher_path())
+        return snapshot_dir
+
+    def stats(self):
+        return {
+            'shard': self.shard_id,
+            'pid': os.getpid(),
+            'profiles': len(self.profiler.store),
+            'feature_users': len(self.enricher.user_ids()),
+            'processed': self.worker.stats['processed'],
+            'errors': self.worker.stats['errors']
+        }
+
+
+def _shard_main(shard_id, conn, model_paths, profile_dir, max_resident):
+    manager = ModelManager(cache_size=0)
+    if not manager.load_models(*model_paths):
+        conn.send(('error', 'Models not loaded'))
+        return
+    shard = Shard(shard_id, manager, profile_dir=profile_dir, max_resident=max_resident)
+    conn.send(('ok', os.getpid()))
+
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        if command == 'stop':
+            conn.send(('ok', shard.snapshot()))
+            break
+        try:
+            conn.send(('ok', getattr(shard, command)(*args)))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+
+# ----------------------------------------------------------------------
+# Router
+# ----------------------------------------------------------------------
+class _TopologyLock:
+    """Any number of scatter/gathers at once, or one resize/stop alone"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            while self._writer:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            while self._writer:
+                self._condition.wait()
+            # Claimed before draining readers, so new ones queue behind it
+            self._writer = True
+            while self._readers:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class ShardRouter:
+    def __init__(self, n_shards=None, vnodes=64,
+                 model_path='models/trained_detector.pkl',
+                 preprocessor_path='models/preprocessor.pkl',
+                 metadata_path='models/model_metadata.pkl',
+                 profile_dir=None, max_resident=None):
+        self.n_shards = n_shards or os.cpu_count() or 1
+        self.vnodes = vnodes
+        self.ring = HashRing(self.n_shards, vnodes)
+        self.model_paths = (model_path, preprocessor_path, metadata_path)
+        self.profile_dir = profile_dir
+        self.max_resident = max_resident
+        self._ctx = multiprocessing.get_context('spawn')
+        self._shards = {}
+        # One request/response exchange per shard connection at a time
+        self._locks = {}
+        # The ring and shard set do not change under a scatter/gather
+        self._topology = _TopologyLock()
+
+    # -------- Process management --------
+    def _start_shard(self, shard_id):
+        parent_conn, child_conn = self._ctx.Pipe()
+        profile_dir = os.path.join(self.profile_dir, f'shard-{shard_id}') if self.profile_dir else None
+        process = self._ctx.Process(
+            target=_shard_main,
+            args=(shard_id, child_conn, self.model_paths, profile_dir, self.max_resident),
+            name=f'fraud-shard-{shard_id}'
+        )
+        process.start()
+        self._shards[shard_id] = (process, parent_conn)
+        self._locks[shard_id] = threading.Lock()
+        return parent_conn
+
+    def start(self):
+        conns = [self._start_shard(s) for s in range(self.n_shards)]
+        for shard_id, conn in enumerate(conns):
+            status, result = conn.recv()
+            if status != 'ok':
+                self.stop()
+                raise RuntimeError(f'Shard {shard_id} failed to start: {result}')
+        print(f"✅ {self.n_shards} shard processes started")
+        return self
+
+    def stop(self):
+        with self._topology.exclusive():
+            for shard_id in list(self._shards):
+                self._stop_shard(shard_id)
+
+    def _stop_shard(self, shard_id):
+        process, conn = self._shards.pop(shard_id)
+        self._locks.pop(shard_id)
+        try:
+            conn.send(('stop', ()))
+            conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            pass
+        process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------- Scatter / gather --------
+    def _call(self, requests):
+        """Send ``{shard: (command, args)}`` to all shards, then collect"""
+        # Locks are taken in shard order, so two calls cannot deadlock
+        shard_ids = sorted(requests)
+        for shard_id in shard_ids:
+            self._locks[shard_id].acquire()
+        try:
+            for shard_id in shard_ids:
+                self._shards[shard_id][1].send(requests[shard_id])
+            results, errors = {}, []
+            for shard_id in shard_ids:
+                # Every reply is read, even after an error, to keep the pipes in step
+                status, result = self._shards[shard_id][1].recv()
+                if status != 'ok':
+                    errors.append(f'Shard {shard_id}: {result}')
+                results[shard_id] = result
+        finally:
+            for shard_id in shard_ids:
+                self._locks[shard_id].release()
+        if errors:
+            raise RuntimeError(errors[0])
+        return results
+
+    def _split(self, user_ids):
+        owners = self.ring.shards_for(user_ids)
+        order = np.argsort(owners, kind='stable')
+        bounds = np.flatnonzero(np.diff(owners[order])) + 1
+        return {int(owners[group[0]]): group for group in np.split(order, bounds) if len(group)}
+
+    def score(self, transactions):
+        """Decisions for a list of transaction dicts, in input order.
+
+        Each transaction updates its user's running statistics and profile.
+        """
+        with self._topology.shared():
+            groups = self._split([t.get('User_ID') for t in transactions])
+            results = self._call({
+                shard: ('score', ([transactions[i] for i in positions],))
+                for shard, positions in groups.items()
+            })
+        decisions = [None] * len(transactions)
+        for shard, positions in groups.items():
+            for i, decision in zip(positions, results[shard]):
+                decisions[i] = decision
+        return decisions
+
+    def score_frame(self, df):
+        """Decisions for an uploaded batch, split by shard.
+
+        The shards read their users' statistics but do not update them.
+        """
+        with self._topology.shared():
+            groups = self._split(df['User_ID'].tolist())
+            results = self._call({
+                shard: ('score', (df.iloc[positions], False))
+                for shard, positions in groups.items()
+            })
+        parts = [
+            pd.DataFrame(results[shard], index=positions)
+            for shard, positions in groups.items()
+        ]
+        return pd.concat(parts).sort_index() if parts else pd.DataFrame()
+
+    def predict_frame(self, df):
+        """``(predictions, probabilities, risk_levels)`` of a batch of feature rows.
+
+        Same outputs as ``ModelManager.predict`` for /batch_predict and batch
+        jobs, but the per-user amount statistics come from the owning shard
+        (read-only, see ``score_frame``). Raises ValueError when a row cannot
+        be scored.
+        """
+        if df.empty:
+            return np.zeros(0, dtype=int), np.zeros((0, 2)), np.zeros(0, dtype=object)
+        decisions = self.score_frame(df.reset_index(drop=True))
+        if 'error' in decisions.columns:
+            errors = decisions['error'].dropna()
+            if len(errors):
+                raise ValueError(f'Row {errors.index[0]}: {errors.iloc[0]}')
+        fraud = decisions['fraud_probability'].to_numpy(dtype=float)
+        return (decisions['is_fraud'].to_numpy(dtype=int), np.column_stack([1 - fraud, fraud]),
+                decisions['risk_level'].to_numpy(dtype=object))
+
+    def build(self, transactions_df):
+        """Distribute historical transactions so each shard builds its users"""
+        with self._topology.shared():
+            groups = self._split(transactions_df['User_ID'].tolist())
+            results = self._call({
+                shard: ('build', (transactions_df.iloc[positions],))
+                for shard, positions in groups.items()
+            })
+        return sum(results.values())
+
+    def stats(self):
+        with self._topology.shared():
+            return [self._call({s: ('stats', ())})[s] for s in sorted(self._shards)]
+
+    def snapshot(self):
+        with self._topology.shared():
+            return self._call({s: ('snapshot', ()) for s in self._shards})
+
+    def reload_models(self):
+        """Reload the model bundle in every shard; returns their model versions"""
+        with self._topology.exclusive():
+            return self._call({s: ('reload_models', (self.model_paths,)) for s in self._shards})
+
+    # -------- Rebalancing --------
+    def resize(self, n_shards):
+        """Change the shard count and move state to the new owners"""
+        with self._topology.exclusive():
+            start = time.perf_counter()
+            new_ring = HashRing(n_shards, self.vnodes)
+
+            added = list(range(self.n_shards, n_shards))
+            conns = [self._start_shard(s) for s in added]
+            failed = None
+            for shard_id, conn in zip(added, conns):
+                status, result = conn.recv()
+                if status != 'ok' and failed is None:
+                    failed = f'Shard {shard_id} failed to start: {result}'
+            if failed is not None:
+                # Leave the topology as it was: the ring does not know these shards
+                for shard_id in added:
+                    self._stop_shard(shard_id)
+                raise RuntimeError(failed)
+
+            old_shards = [s for s in self._shards if s not in added]
+            exports = self._call({s: ('export_moved', (new_ring,)) for s in old_shards})
+
+            incoming = {}
+            for transfers in exports.values():
+                for destination, transfer in transfers.items():
+                    merged = incoming.setdefault(destination, {'profiles': {}, 'stats': {}})
+                    merged['profiles'].update(transfer['profiles'])
+                    merged['stats'].update(transfer['stats'])
+            moved = self._call({d: ('import_state', (t,)) for d, t in incoming.items()})
+
+            for shard_id in [s for s in self._shards if s >= n_shards]:
+                self._stop_shard(shard_id)
+
+            self.ring = new_ring
+            self.n_shards = n_shards
+            n_moved = sum(moved.values())
+            print(f"✅ Resharded to {n_shards} shards: {n_moved:,} profiles moved "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return n_moved
+
+
+def benchmark(data_path='../user_transaction_dataset.csv', n_transactions=40000,
+              shard_counts=None, batch_size=512):
+    """Throughput of the router for several shard counts"""
+    from data_utils import DataProcessor
+
+    df = DataProcessor().load_data(data_path).drop(columns=['Is_Fraudulent'])
+    df = pd.concat([df] * (n_transactions // len(df) + 1), ignore_index=True).head(n_transactions)
+    shard_counts = shard_counts or sorted({1, os.cpu_count() or 1})
+
+    for n_shards in shard_counts:
+        with ShardRouter(n_shards) as router:
+            router.build(df.head(len(df) // 2).assign(Is_Fraudulent=0))
+            start = time.perf_counter()
+            for i in range(0, len(df), batch_size):
+                router.score_frame(df.iloc[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"{n_shards} shard(s): {len(df) / elapsed:,.0f} transactions/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark sharded scoring')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv')
+    parser.add_argument('--transactions', type=int, default=40000)
+    parser.add_argument('--shards', type=int, nargs='*')
+    args = parser.parse_args()
+    benchmark(args.data, args.transactions, args.shards)
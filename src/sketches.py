@@ -0,0 +1,116 @@
+"""
+Mergeable, vectorized probabilistic sketches over 64-bit hashes.
+
+Hashes are expected as ``uint64`` NumPy arrays, e.g. from
+``pd.util.hash_pandas_object(values, index=False).to_numpy()``.
+"""
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(h):
+    """SplitMix64 finalizer, used to derive independent hashes from one"""
+    with np.errstate(over='ignore'):
+        z = (h + _GOLDEN).astype(np.uint64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(x):
+    """Exact bit length of every element of a uint64 array"""
+    x = x.astype(np.uint64, copy=True)
+    length = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    length += (x > 0).astype(np.uint8)
+    return length
+
+
+class HyperLogLog:
+    """Approximate distinct counter (standard error ~ 1.04 / sqrt(2**p))"""
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 18:
+            raise ValueError("p must be between 4 and 18")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        shift = np.uint64(64 - self.p)
+        index = (hashes >> shift).astype(np.intp)
+        rest = hashes & ((np.uint64(1) << shift) - np.uint64(1))
+        # Position of the leftmost 1-bit in the remaining 64 - p bits
+        rank = (64 - self.p) - _bit_length(rest).astype(np.int16) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+class BloomFilter:
+    """Bit-array Bloom filter with double hashing, sized for an error rate"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        n_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.n_bits = max(64, n_bits)
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * np.log(2))))
+        self.error_rate = error_rate
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        h1 = hashes
+        h2 = _mix64(hashes) | np.uint64(1)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            combined = h1[:, None] + steps[None, :] * h2[:, None]
+        return (combined % np.uint64(self.n_bits)).astype(np.int64)
+
+    def _test(self, positions):
+        bytes_ = self.bits[positions >> 3]
+        return ((bytes_ >> (positions & 7).astype(np.uint8)) & 1).astype(bool).all(axis=1)
+
+    def _set(self, positions):
+        positions = positions.ravel()
+        np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    def contains(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        return self._test(self._positions(hashes))
+
+    def add_and_count_duplicates(self, hashes):
+        """Insert hashes in order; return how many were (probably) seen before.
+
+        Repeats inside the batch are counted exactly, repeats of earlier
+        batches are subject to the filter's false-positive rate.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return 0
+        unique = np.unique(hashes)
+        in_batch = hashes.size - unique.size
+        positions = self._positions(unique)
+        seen_before = int(np.count_nonzero(self._test(positions)))
+        self._set(positions)
+        return in_batch + seen_before
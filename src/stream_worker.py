@@ -0,0 +1,957 @@
+"""
+Streaming transaction scoring.
+
+A ``StreamWorker`` pulls transactions from a source, groups them into
+batches (by size or by time, whichever comes first), enriches them into
+model features, scores them with ``ModelManager.predict`` and
+``RiskScorer`` and writes one decision per transaction to a sink.
+
+Delivery is at-least-once: a batch's offsets are committed to the source
+only after the sink write returned, so a crash replays the uncommitted
+tail and may emit a decision twice but never drops one.
+
+Sources:
+- ``FileTailSource``: follows a JSON-lines file, offsets kept in a side file
+- ``UnixSocketSource``: JSON lines over a Unix stream socket, acked per line
+- ``QueueSource``: in-memory queue stand-in for tests
+
+``run_workers`` starts N processes; each owns the User_IDs that the
+``sharding.HashRing`` of N shards maps to its partition (the same ring as
+``ShardRouter``), so per-user running statistics stay in one process. Workers
+start their statistics from the state saved by the previous run (keeping
+the users they own now, so state follows users when N changes) or, on the
+first run, from a CSV of historical transactions. Each batch appends the
+statistics it changed to a ``StateLog`` just before its offsets are
+committed, and a restart resumes the source from the last logged batch,
+so the statistics always match the committed offsets. When N changes, each
+new partition skips the lines that the old partitions had logged.
+"""
+import argparse
+import functools
+import glob
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import selectors
+import socket
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model_persistence import ModelManager
+from risk_scoring import RiskScorer
+
+
+@functools.lru_cache(maxsize=8)
+def _ring(n_partitions):
+    # sharding imports this module
+    from sharding import HashRing
+    return HashRing(n_partitions)
+
+
+def partition_for(user_id, n_partitions):
+    """Stable partition of a User_ID (same in every process and as ShardRouter)"""
+    if n_partitions <= 1:
+        return 0
+    return _ring(n_partitions).shard_for(user_id)
+
+
+_USER_ID = re.compile(rb'"User_ID"\s*:\s*("(?:[^"\\]|\\.)*"|[^\s,}\]]+)')
+
+
+def _line_user_id(line):
+    """User_ID of a JSON line without parsing the whole line, or None"""
+    match = _USER_ID.search(line)
+    if match is None:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+def partitions_for(user_ids, n_partitions):
+    """``partition_for`` of every user ID, as an array"""
+    if n_partitions <= 1:
+        return np.zeros(len(user_ids), dtype=np.int64)
+    return _ring(n_partitions).shards_for(user_ids).astype(np.int64)
+
+
+def _parse_line(line):
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return {'_error': f'Invalid JSON: {e}'}
+    if not isinstance(record, dict):
+        return {'_error': 'Transaction must be a JSON object'}
+    return record
+
+
+# ----------------------------------------------------------------------
+# Sources: poll(max_items, timeout) -> [(offset, transaction)], commit()
+# ----------------------------------------------------------------------
+class QueueSource:
+    """In-memory source; put transactions on the queue, ``None`` ends it.
+
+    Offsets are sequence numbers. Nothing is redelivered after a crash, so
+    this is a stand-in for tests and local experiments only.
+    """
+
+    def __init__(self, transactions_queue, partition=0, n_partitions=1):
+        if isinstance(transactions_queue, (list, tuple)):
+            transactions_queue = transactions_queue[partition]
+        self.queue = transactions_queue
+        self.partition = partition
+        self.exhausted = False
+        self.committed = -1
+        self._next_offset = 0
+
+    def poll(self, max_items, timeout):
+        records = []
+        deadline = time.monotonic() + timeout
+        while len(records) < max_items and not self.exhausted:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=max(remaining, 0)) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.exhausted = True
+                break
+            records.append((self._next_offset, item))
+            self._next_offset += 1
+        return records
+
+    def commit(self, offsets):
+        self.committed = max(offsets)
+
+    def close(self):
+        pass
+
+
+class FileTailSource:
+    """Follow a JSON-lines file, resuming from the last committed byte offset.
+
+    With several partitions every worker reads the whole file but only
+    parses the lines of its own users (found by the User_ID field alone)
+    and tracks its own offset file. Lines without a readable User_ID,
+    invalid JSON included, belong to partition 0, so each gets one error.
+    """
+
+    def __init__(self, path, offset_path=None, partition=0, n_partitions=1,
+                 follow=True, poll_interval=0.05):
+        self.path = path
+        self.partition = partition
+        self.n_partitions = n_partitions
+        self.follow = follow
+        self.poll_interval = poll_interval
+        # Offsets of one partition count mean nothing under another
+        self.offset_path = offset_path or f'{path}.offset{partition}of{n_partitions}'
+        self.exhausted = False
+        self._eras = []
+
+        self.committed = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as f:
+                self.committed = int(f.read().strip() or 0)
+
+        self._file = open(path, 'rb')
+        self._file.seek(self.committed)
+
+    def _skip(self, line, end):
+        """Whether the line ending at ``end`` is another partition's or was scored already"""
+        if self.n_partitions <= 1 and not self._eras:
+            return False
+        user_id = _line_user_id(line)
+
+        def owner(n_partitions):
+            return 0 if user_id is None else partition_for(user_id, n_partitions)
+
+        if self.n_partitions > 1 and owner(self.n_partitions) != self.partition:
+            return True
+        # Scored before the partition count changed, by the partition owning it then
+        return any(end <= offsets.get(owner(n_partitions), 0) for n_partitions, offsets in self._eras)
+
+    def poll(self, max_items, timeout):
+        records = []
+        deadline = time.monotonic() + timeout
+        while len(records) < max_items:
+            start = self._file.tell()
+            line = self._file.readline()
+
+            if not line.endswith(b'\n'):
+                # EOF or a partially written line: wait for the writer
+                self._file.seek(start)
+                if not self.follow:
+                    if line.strip():
+                        # Final line without newline in a finished file
+                        self._file.seek(start + len(line))
+                        if not self._skip(line, start + len(line)):
+                            records.append((start + len(line), _parse_line(line)))
+                    self.exhausted = True
+                    break
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+                continue
+
+            if not line.strip() or self._skip(line, self._file.tell()):
+                continue
+            records.append((self._file.tell(), _parse_line(line)))
+
+            if time.monotonic() >= deadline:
+                break
+        return records
+
+    def commit(self, offsets):
+        self.committed = max(offsets)
+        tmp_path = f'{self.offset_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(self.committed))
+        os.replace(tmp_path, self.offset_path)
+
+    def resume(self, offset=None, eras=()):
+        """Skip what was scored already, as recorded by ``compact_state``.
+
+        ``offset`` is this partition's last logged offset; it is ahead of the
+        committed one after a crash between logging and committing. ``eras``
+        are the last logged offsets of every earlier partition count: lines
+        they cover are skipped, and a partition with nothing committed yet
+        starts at the lowest offset of the most recent one.
+        """
+        self._eras = [(era['n_partitions'], {int(p): o for p, o in era['offsets'].items()})
+                      for era in eras]
+        if offset is None and self.committed == 0 and self._eras:
+            n_partitions, offsets = self._eras[-1]
+            offset = min(offsets.get(p, 0) for p in range(n_partitions))
+        if offset is not None and offset > self.committed:
+            self.commit([offset])
+            self._file.seek(offset)
+
+    def close(self):
+        self._file.close()
+
+
+class UnixSocketSource:
+    """JSON lines over a Unix stream socket.
+
+    Producers connect and send one transaction per line. After a line's
+    decision is written, ``{"ack": <line number>}`` is sent back on the same
+    connection (line numbers start at 1 per connection); producers resend
+    unacknowledged lines after a reconnect.
+    """
+
+    def __init__(self, path, partition=0, n_partitions=1, backlog=64):
+        self.path = f'{path}.{partition}' if n_partitions > 1 else path
+        self.partition = partition
+        self.exhausted = False
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen(backlog)
+        self._server.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._connections = {}
+        self._next_connection_id = 0
+
+    def _accept(self):
+        conn, _ = self._server.accept()
+        conn.setblocking(False)
+        connection_id = self._next_connection_id
+        self._next_connection_id += 1
+        self._connections[connection_id] = {'socket': conn, 'buffer': b'', 'seq': 0}
+        self._selector.register(conn, selectors.EVENT_READ, connection_id)
+
+    def _drop(self, connection_id):
+        state = self._connections.pop(connection_id, None)
+        if state is not None:
+            self._selector.unregister(state['socket'])
+            state['socket'].close()
+
+    def poll(self, max_items, timeout):
+        records = []
+        deadline = time.monotonic() + timeout
+        while len(records) < max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in self._selector.select(timeout=remaining):
+                if key.data is None:
+                    self._accept()
+                    continue
+                state = self._connections.get(key.data)
+                if state is None:
+                    continue
+                try:
+                    chunk = state['socket'].recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    self._drop(key.data)
+                    continue
+
+                *lines, state['buffer'] = (state['buffer'] + chunk).split(b'\n')
+                for line in lines:
+                    if line.strip():
+                        state['seq'] += 1
+                        records.append(((key.data, state['seq']), _parse_line(line)))
+        return records
+
+    def commit(self, offsets):
+        acked = {}
+        for connection_id, seq in offsets:
+            acked[connection_id] = max(seq, acked.get(connection_id, 0))
+        for connection_id, seq in acked.items():
+            state = self._connections.get(connection_id)
+            if state is None:
+                continue
+            try:
+                state['socket'].sendall(json.dumps({'ack': seq}).encode('utf-8') + b'\n')
+            except OSError:
+                self._drop(connection_id)
+
+    def close(self):
+        for connection_id in list(self._connections):
+            self._drop(connection_id)
+        self._selector.close()
+        self._server.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ----------------------------------------------------------------------
+# Sinks: write(decisions) must return only once decisions are durable
+# ----------------------------------------------------------------------
+class JsonlSink:
+    def __init__(self, path, partition=None, fsync=True):
+        if partition is not None:
+            root, ext = os.path.splitext(path)
+            path = f'{root}.part{partition}{ext or ".jsonl"}'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.fsync = fsync
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, decisions):
+        self._file.write(''.join(json.dumps(d) + '\n' for d in decisions))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class QueueSink:
+    def __init__(self, decisions_queue, partition=None):
+        self.queue = decisions_queue
+
+    def write(self, decisions):
+        self.queue.put(decisions)
+
+    def close(self):
+        pass
+
+
+# ----------------------------------------------------------------------
+# Feature enrichment
+# ----------------------------------------------------------------------
+REQUIRED_FIELDS = [
+    'User_ID', 'Transaction_Amount', 'Merchant_Category',
+    'Transaction_Channel', 'Device_Type', 'Location'
+]
+
+
+def validate_transaction(transaction):
+    """Error message for a transaction that cannot be scored, else None"""
+    if '_error' in transaction:
+        return transaction['_error']
+    missing = [field for field in REQUIRED_FIELDS if transaction.get(field) is None]
+    if 'Transaction_Time' not in transaction and not ('Hour' in transaction and 'DayOfWeek' in transaction):
+        missing.append('Transaction_Time')
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    try:
+        float(transaction['Transaction_Amount'])
+    except (TypeError, ValueError):
+        return 'Transaction_Amount must be numeric'
+    return None
+
+
+class FeatureEnricher:
+    """Raw transactions -> model feature rows.
+
+    User_Avg_Amount / User_Std_Amount / User_Transaction_Count are running
+    statistics per user (Welford), including the transaction being scored.
+    """
+
+    def __init__(self):
+        self._stats = {}  # user_id -> [count, mean, m2]
+        self._changed = None  # users observed since take_changes(), if tracked
+
+    def seed(self, transactions_df):
+        """Start the running statistics from historical transactions"""
+        grouped = transactions_df.groupby('User_ID')['Transaction_Amount']
+        stats = grouped.agg(['count', 'mean', 'var']).fillna(0.0)
+        for user_id, row in stats.iterrows():
+            self._stats[user_id] = [int(row['count']), row['mean'], row['var'] * (row['count'] - 1)]
+
+    def export_stats(self, user_ids):
+        """Remove and return the running statistics of ``user_ids``"""
+        return {uid: self._stats.pop(uid) for uid in user_ids if uid in self._stats}
+
+    def import_stats(self, stats):
+        self._stats.update(stats)
+
+    def track_changes(self):
+        """Start recording which users ``take_changes`` has to return"""
+        if self._changed is None:
+            self._changed = set()
+
+    def take_changes(self):
+        """Running statistics of the users observed since the last call"""
+        changes = {uid: list(self._stats[uid]) for uid in self._changed or ()}
+        if self._changed is not None:
+            self._changed.clear()
+        return changes
+
+    def save(self, path):
+        """Write the running statistics (atomically)"""
+        tmp_path = f'{path}.tmp'
+        joblib.dump(self._stats, tmp_path)
+        os.replace(tmp_path, path)
+
+    def load(self, paths, owns=None):
+        """Import statistics saved by ``save``; returns the number of users.
+
+        ``owns(user_ids)`` -> bool mask keeps only some users. Files are read
+        oldest first, so the newest state of a user wins.
+        """
+        loaded = 0
+        for path in sorted(paths, key=os.path.getmtime):
+            stats = joblib.load(path)
+            user_ids = list(stats)
+            keep = owns(user_ids) if owns is not None else np.ones(len(user_ids), dtype=bool)
+            for user_id, kept in zip(user_ids, keep):
+                if kept:
+                    self._stats[user_id] = stats[user_id]
+            loaded += int(np.sum(keep))
+        return loaded
+
+    def user_ids(self):
+        return list(self._stats)
+
+    @staticmethod
+    def _summary(stats):
+        count, mean, m2 = stats
+        std = math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+        return count, mean, std
+
+    def user_stats(self, user_id):
+        return self._summary(self._stats.get(user_id, (0, 0.0, 0.0)))
+
+    @staticmethod
+    def _add(stats, amount):
+        stats[0] += 1
+        delta = amount - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (amount - stats[1])
+
+    def _observe(self, user_id, amount):
+        if self._changed is not None:
+            self._changed.add(user_id)
+        self._add(self._stats.setdefault(user_id, [0, 0.0, 0.0]), amount)
+
+    def enrich(self, transactions, observe=True):
+        """DataFrame of model features indexed by position in ``transactions``.
+
+        Rows whose Transaction_Time cannot be parsed are left out (and do
+        not update the running statistics). With ``observe=False`` the
+        statistics are read, not updated: each row still counts itself and
+        the rows before it in ``transactions``, so scoring the same batch
+        twice gives the same features.
+        """
+        df = pd.DataFrame(transactions)
+
+        if 'Transaction_Time' in df.columns:
+            times = pd.to_datetime(df['Transaction_Time'], dayfirst=True, errors='coerce')
+            given = df['Transaction_Time'].notna()
+            df['Hour'] = times.dt.hour.where(given, df.get('Hour'))
+            df['DayOfWeek'] = times.dt.dayofweek.where(given, df.get('DayOfWeek'))
+            df = df.drop(columns=['Transaction_Time'])
+            df = df[df['Hour'].notna() & df['DayOfWeek'].notna()]
+            df['Hour'] = df['Hour'].astype(int)
+            df['DayOfWeek'] = df['DayOfWeek'].astype(int)
+
+        df['Is_Weekend'] = df['DayOfWeek'].isin([5, 6]).astype(int)
+        df['Is_Night'] = ((df['Hour'] >= 0) & (df['Hour'] <= 6)).astype(int)
+
+        amounts = df['Transaction_Amount'].astype(float).to_numpy()
+        user_ids = df['User_ID'].tolist()
+        stats = np.empty((len(df), 3))
+        if observe:
+            for i, (user_id, amount) in enumerate(zip(user_ids, amounts)):
+                self._observe(user_id, amount)
+                stats[i] = self.user_stats(user_id)
+        else:
+            batch = {}
+            for i, (user_id, amount) in enumerate(zip(user_ids, amounts)):
+                if user_id not in batch:
+                    batch[user_id] = list(self._stats.get(user_id, (0, 0.0, 0.0)))
+                self._add(batch[user_id], amount)
+                stats[i] = self._summary(batch[user_id])
+
+        df['Transaction_Amount'] = amounts
+        df['User_Transaction_Count'] = stats[:, 0].astype(int)
+        df['User_Avg_Amount'] = stats[:, 1]
+        df['User_Std_Amount'] = stats[:, 2]
+        df['Amount_Log'] = np.log1p(amounts)
+        df['Amount_to_Avg_Ratio'] = amounts / (df['User_Avg_Amount'] + 1)
+        return df
+
+
+class StateLog:
+    """Append-only log of the running statistics each committed batch changed.
+
+    One JSON line per batch: the batch's highest source offset and the new
+    (count, mean, m2) of every user it touched. Values are absolute, so
+    replaying a line twice is harmless; a torn last line is ignored.
+    """
+
+    def __init__(self, path, partition=0, n_partitions=1, fsync=True):
+        self.path = path
+        self.partition = partition
+        self.n_partitions = n_partitions
+        self.fsync = fsync
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, offsets, changes):
+        offset = max(offsets) if all(isinstance(o, int) for o in offsets) else None
+        record = {
+            'partition': self.partition,
+            'n_partitions': self.n_partitions,
+            'offset': offset,
+            'stats': [[uid, int(c), float(mean), float(m2)] for uid, (c, mean, m2) in changes.items()]
+        }
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def read(path):
+        records = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # torn write of the last batch, which was never committed
+        return records
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+class StreamWorker:
+    def __init__(self, source, sink, model_manager, enricher=None, risk_scorer=None,
+                 batch_size=256, max_wait=0.05, partition=0, max_sink_retries=3,
+                 profiler=None, state_log=None):
+        self.source = source
+        self.sink = sink
+        self.model_manager = model_manager
+        self.enricher = enricher or FeatureEnricher()
+        # Optional StateLog: the statistics a batch changed are logged with
+        # its offsets, so a restart never applies a batch twice or loses one
+        self.state_log = state_log
+        if state_log is not None:
+            self.enricher.track_changes()
+        self.risk_scorer = risk_scorer or RiskScorer()
+        # Optional UserProfiler: adds behavioral anomalies and keeps the
+        # profiles of known users up to date
+        self.profiler = profiler
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.partition = partition
+        self.max_sink_retries = max_sink_retries
+        self.stats = {'processed': 0, 'batches': 0, 'errors': 0, 'sink_retries': 0, 'seconds': 0.0}
+
+    def next_batch(self):
+        """Up to batch_size records, or whatever arrived within max_wait"""
+        return self.source.poll(self.batch_size, self.max_wait)
+
+    def score(self, transactions, observe=True):
+        """One decision dict per transaction, in input order.
+
+        ``observe=False`` scores without updating the running statistics or
+        profiles (uploaded batches, what-if requests).
+        """
+        decisions = [None] * len(transactions)
+        valid = []
+        for i, transaction in enumerate(transactions):
+            error = validate_transaction(transaction)
+            if error is None:
+                valid.append(i)
+            else:
+                decisions[i] = {'error': error}
+
+        if valid:
+            rows = [transactions[i] for i in valid]
+            try:
+                features = self.enricher.enrich(rows, observe=observe)
+                kept = set(features.index)
+                for j, i in enumerate(valid):
+                    if j not in kept:
+                        decisions[i] = {'error': 'Invalid Transaction_Time'}
+                valid = [valid[j] for j in features.index]
+                columns = getattr(self.model_manager.preprocessor, 'feature_names_in_', None)
+                model_input = features[list(columns)] if columns is not None else features
+                predictions, probabilities = self.model_manager.predict(model_input)
+            except Exception as e:
+                # Keep consuming the stream; the failed rows are reported
+                for i in valid:
+                    decisions[i] = {'error': str(e)}
+                return self._finish(transactions, decisions)
+
+            engine = self.model_manager.decision_engine
+            fraud_probabilities = probabilities[:, 1]
+            risk_levels = engine.risk_levels(fraud_probabilities)
+            recommendations = engine.recommendations(fraud_probabilities)
+            records = features.to_dict('records')
+
+            for j, i in enumerate(valid):
+                record = records[j]
+                rules = self.risk_scorer.calculate_risk_score(record, {
+                    'avg_amount': record['User_Avg_Amount'],
+                    'transaction_count': record['User_Transaction_Count']
+                })
+                decisions[i] = {
+                    'is_fraud': bool(predictions[j]),
+                    'fraud_probability': float(fraud_probabilities[j]),
+                    'risk_level': str(risk_levels[j]),
+                    'recommendation': str(recommendations[j]),
+                    'rule_risk_score': rules['risk_score'],
+                    'rule_risk_level': rules['risk_level'],
+                    'risk_factors': rules['risk_factors']
+                }
+
+            if self.profiler is not None:
+                anomalies = self.profiler.detect_behavioral_anomalies_batch(features)
+                for j in np.flatnonzero(anomalies.has_profile):
+                    decisions[valid[j]]['behavioral_anomalies'] = anomalies.messages(j)
+                    if observe:
+                        self.profiler.update_profile(records[j]['User_ID'], records[j])
+
+        return self._finish(transactions, decisions)
+
+    def _finish(self, transactions, decisions):
+        self.stats['errors'] += sum('error' in d for d in decisions)
+        scored_at = datetime.now().isoformat()
+        for transaction, decision in zip(transactions, decisions):
+            decision['transaction_id'] = transaction.get('Transaction_ID')
+            decision['user_id'] = transaction.get('User_ID')
+            decision['partition'] = self.partition
+            decision['scored_at'] = scored_at
+        return decisions
+
+    def _write(self, decisions):
+        for attempt in range(self.max_sink_retries + 1):
+            try:
+                self.sink.write(decisions)
+                return
+            except Exception:
+                if attempt == self.max_sink_retries:
+                    raise
+                self.stats['sink_retries'] += 1
+                time.sleep(0.1 * 2 ** attempt)
+
+    def process_batch(self, batch):
+        offsets = [offset for offset, _ in batch]
+        decisions = self.score([transaction for _, transaction in batch])
+        self._write(decisions)
+        if self.state_log is not None:
+            # A crash after this line is resumed from here (see FileTailSource.resume)
+            self.state_log.append(offsets, self.enricher.take_changes())
+        # Only now is the batch safe to acknowledge
+        self.source.commit(offsets)
+        self.stats['processed'] += len(batch)
+        self.stats['batches'] += 1
+        return decisions
+
+    def run(self, max_batches=None, stop_event=None):
+        """Consume until the source is exhausted, stopped or max_batches"""
+        start = time.perf_counter()
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                if max_batches is not None and self.stats['batches'] >= max_batches:
+                    break
+                batch = self.next_batch()
+                if batch:
+                    self.process_batch(batch)
+                elif self.source.exhausted:
+                    break
+        finally:
+            self.stats['seconds'] += time.perf_counter() - start
+        return self.stats
+
+
+# ----------------------------------------------------------------------
+# Multi-process runner
+# ----------------------------------------------------------------------
+def _enricher_state_path(state_dir, partition):
+    return os.path.join(state_dir, f'enricher.part{partition}.pkl')
+
+
+def _state_log_path(state_dir, partition):
+    return os.path.join(state_dir, f'enricher.part{partition}.log')
+
+
+def _snapshot_paths(state_dir):
+    return glob.glob(os.path.join(state_dir, 'enricher*.pkl'))
+
+
+def _load_resume(state_dir):
+    resume = {'n_partitions': None, 'offsets': {}, 'eras': []}
+    path = os.path.join(state_dir, 'resume.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            resume.update(json.load(f))
+    resume['offsets'] = {int(p): offset for p, offset in resume['offsets'].items()}
+    return resume
+
+
+def _save_resume(state_dir, resume):
+    path = os.path.join(state_dir, 'resume.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(resume, f)
+    os.replace(tmp_path, path)
+
+
+def _start_era(resume, n_partitions):
+    """Switch ``resume`` to a new partition count, keeping the old offsets as an era"""
+    if resume['n_partitions'] is not None and resume['offsets']:
+        resume['eras'].append({'n_partitions': resume['n_partitions'],
+                               'offsets': resume['offsets']})
+    resume['n_partitions'] = n_partitions
+    resume['offsets'] = {}
+
+
+def compact_state(state_dir, seed_path=None):
+    """Fold the statistics logs into one snapshot; returns the resume offsets.
+
+    The result holds the current partition count, the offset of the last
+    logged batch of each of its partitions, and the same offsets of every
+    earlier partition count (``eras``, see ``FileTailSource.resume``).
+    Every step can be repeated after a crash: the offsets are saved first,
+    then the snapshot, and the files they replace are deleted last.
+    """
+    resume = _load_resume(state_dir)
+    logs = glob.glob(_state_log_path(state_dir, '*'))
+    if not logs:
+        return resume
+
+    enricher = FeatureEnricher()
+    snapshots = _snapshot_paths(state_dir)
+    if snapshots:
+        enricher.load(snapshots)
+    elif seed_path:
+        from data_utils import COLUMN_RENAMES
+        enricher.seed(pd.read_csv(seed_path).rename(columns=COLUMN_RENAMES))
+
+    latest = {}
+    for path in logs:
+        for record in StateLog.read(path):
+            enricher.import_stats({uid: [count, mean, m2] for uid, count, mean, m2 in record['stats']})
+            if record['offset'] is not None:
+                latest[record['partition']] = (record['n_partitions'], record['offset'])
+    if latest:
+        n_partitions = next(iter(latest.values()))[0]
+        if n_partitions != resume['n_partitions']:
+            _start_era(resume, n_partitions)
+        resume['offsets'].update((p, offset) for p, (_, offset) in latest.items())
+
+    _save_resume(state_dir, resume)
+    snapshot_path = os.path.join(state_dir, 'enricher.pkl')
+    enricher.save(snapshot_path)
+    for path in snapshots:
+        if path != snapshot_path:
+            os.remove(path)
+    for path in logs:
+        os.remove(path)
+    return resume
+
+
+def init_enricher(partition, n_partitions, state_dir=None, seed_path=None):
+    """Running statistics of the users ``partition`` owns.
+
+    Taken from every worker's saved state in ``state_dir`` (whatever the
+    partition count that saved it), or else seeded from the historical
+    transactions CSV ``seed_path``.
+    """
+    enricher = FeatureEnricher()
+
+    def owns(user_ids):
+        return partitions_for(user_ids, n_partitions) == partition
+
+    paths = _snapshot_paths(state_dir) if state_dir else []
+    if paths:
+        restored = enricher.load(paths, owns)
+        print(f"Worker {partition}: running statistics of {restored:,} users restored")
+    elif seed_path:
+        from data_utils import COLUMN_RENAMES
+        history = pd.read_csv(seed_path).rename(columns=COLUMN_RENAMES)
+        enricher.seed(history[owns(history['User_ID'].tolist())])
+        print(f"Worker {partition}: running statistics of {len(enricher.user_ids()):,} users "
+              f"seeded from {seed_path}")
+    return enricher
+
+
+def _worker_main(partition, n_partitions, source_factory, sink_factory, model_paths,
+                 batch_size, max_wait, results, stop_event, state_dir=None, seed_path=None,
+                 resume_offset=None, eras=()):
+    # Enriched stream rows carry running user statistics and almost never
+    # repeat, so fingerprinting for the prediction cache is pure overhead
+    manager = ModelManager(cache_size=0)
+    if not manager.load_models(*model_paths):
+        results.put((partition, {'error': 'Models not loaded'}))
+        return
+
+    enricher = init_enricher(partition, n_partitions, state_dir, seed_path)
+    source = source_factory(partition=partition, n_partitions=n_partitions)
+    if (resume_offset is not None or eras) and hasattr(source, 'resume'):
+        source.resume(resume_offset, eras)
+    sink = sink_factory(partition=partition)
+    state_log = (StateLog(_state_log_path(state_dir, partition), partition, n_partitions)
+                 if state_dir else None)
+    worker = StreamWorker(source, sink, manager, enricher=enricher, batch_size=batch_size,
+                          max_wait=max_wait, partition=partition, state_log=state_log)
+    try:
+        stats = worker.run(stop_event=stop_event)
+    finally:
+        source.close()
+        sink.close()
+        if state_log is not None:
+            state_log.close()
+    results.put((partition, stats))
+
+
+def run_workers(source_factory, sink_factory, n_workers=None,
+                model_path='models/trained_detector.pkl',
+                preprocessor_path='models/preprocessor.pkl',
+                metadata_path='models/model_metadata.pkl',
+                batch_size=256, max_wait=0.05, stop_event=None, state_dir=None, seed_path=None):
+    """Run one worker process per partition and return their stats.
+
+    ``source_factory(partition=, n_partitions=)`` and
+    ``sink_factory(partition=)`` must be picklable (e.g. functools.partial).
+    Per-user running statistics are restored from ``state_dir``, or seeded
+    from the CSV ``seed_path`` (see ``init_enricher``). Workers log every
+    batch's changes to ``state_dir``; the logs are folded into a snapshot
+    (``compact_state``) before the workers start and after they exit,
+    whether or not they exited cleanly.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    stop_event = stop_event or ctx.Event()
+    model_paths = (model_path, preprocessor_path, metadata_path)
+
+    resume = {'offsets': {}, 'eras': []}
+    if state_dir:
+        os.makedirs(state_dir, exist_ok=True)
+        resume = compact_state(state_dir, seed_path)
+        if resume['n_partitions'] != n_workers:
+            # Saved before any worker logs under the new count
+            _start_era(resume, n_workers)
+            _save_resume(state_dir, resume)
+
+    processes = [
+        ctx.Process(
+            target=_worker_main,
+            args=(i, n_workers, source_factory, sink_factory, model_paths,
+                  batch_size, max_wait, results, stop_event, state_dir, seed_path,
+                  resume['offsets'].get(i), resume['eras']),
+            name=f'stream-worker-{i}'
+        )
+        for i in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    stats = {}
+    try:
+        while len(stats) < n_workers and any(p.is_alive() for p in processes):
+            try:
+                partition, worker_stats = results.get(timeout=0.5)
+                stats[partition] = worker_stats
+            except queue.Empty:
+                continue
+    except KeyboardInterrupt:
+        stop_event.set()
+    for process in processes:
+        process.join()
+    while not results.empty():
+        partition, worker_stats = results.get()
+        stats[partition] = worker_stats
+
+    if state_dir:
+        compact_state(state_dir, seed_path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a transaction stream')
+    parser.add_argument('source', help='JSON-lines file to tail, or unix:/path/to/socket')
+    parser.add_argument('--sink', default='decisions.jsonl', help='Decision output (one file per worker)')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=50)
+    parser.add_argument('--no-follow', action='store_true', help='Stop at end of file')
+    parser.add_argument('--state-dir', default='models/stream_state',
+                        help='Per-user running statistics, restored at start and logged per batch')
+    parser.add_argument('--seed', metavar='HISTORY_CSV',
+                        help='Historical transactions to start the statistics from when no state is saved')
+    args = parser.parse_args()
+
+    if args.source.startswith('unix:'):
+        source_factory = functools.partial(UnixSocketSource, args.source[len('unix:'):])
+    else:
+        source_factory = functools.partial(FileTailSource, args.source, follow=not args.no_follow)
+    sink_factory = functools.partial(JsonlSink, args.sink)
+
+    start = time.perf_counter()
+    stats = run_workers(source_factory, sink_factory, n_workers=args.workers,
+                        batch_size=args.batch_size, max_wait=args.max_wait_ms / 1000,
+                        state_dir=args.state_dir, seed_path=args.seed)
+    elapsed = time.perf_counter() - start
+
+    total = 0
+    for partition in sorted(stats):
+        worker_stats = stats[partition]
+        if 'error' in worker_stats:
+            print(f"❌ Worker {partition}: {worker_stats['error']}")
+            continue
+        total += worker_stats['processed']
+        print(f"Worker {partition}: {worker_stats['processed']:,} transactions "
+              f"in {worker_stats['batches']:,} batches ({worker_stats['errors']} errors)")
+    print(f"✅ {total:,} transactions in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
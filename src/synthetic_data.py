@@ -0,0 +1,295 @@
+"""
+Deterministic synthetic transactions at any scale.
+
+``fit_profile`` learns from the real dataset, per user:
+- the legitimate amount distribution (log-normal)
+- hour, merchant, channel, device and location frequencies (smoothed
+  toward the global ones)
+- the fraud rate
+
+It also learns the global amount and category distributions of fraudulent
+rows. Synthetic users are mapped to a real user's profile by a hash of
+their ID.
+
+``generate`` writes ``n_rows`` transactions in fixed-size chunks from a
+pool of processes. Chunk ``k`` is drawn from ``SeedSequence(seed,
+spawn_key=(k,))`` and covers fixed row positions, so the output depends
+only on the seed, the row count and the chunk size, never on the number of
+workers. Each worker holds one chunk at a time, so memory is flat in the
+output size.
+
+The columns are the raw CSV schema, so ``DataProcessor.load_data`` reads
+the output unchanged:
+
+    python synthetic_data.py --rows 10000000 --out synthetic.parquet --workers 4
+"""
+import argparse
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_utils import COLUMN_RENAMES
+
+CATEGORICAL = ['Merchant_Category', 'Transaction_Channel', 'Device_Type', 'Location']
+RAW_NAMES = {new: old for old, new in COLUMN_RENAMES.items()}
+# Pseudo-counts pulling each user's frequencies toward the global ones
+SMOOTHING = 20.0
+
+
+def _frequencies(codes, n_categories, groups=None, n_groups=1):
+    """Counts of ``codes`` per group (one row per group)"""
+    groups = np.zeros(len(codes), dtype=np.int64) if groups is None else groups
+    counts = np.zeros((n_groups, n_categories))
+    np.add.at(counts, (groups, codes), 1)
+    return counts
+
+
+def _smoothed_cdf(counts, prior):
+    """Cumulative distribution per row of ``counts`` with ``SMOOTHING`` prior counts"""
+    prior = prior / prior.sum()
+    probabilities = counts + SMOOTHING * prior
+    cdf = np.cumsum(probabilities / probabilities.sum(axis=1, keepdims=True), axis=1)
+    cdf[:, -1] = 1.0
+    return cdf
+
+
+def fit_profile(df):
+    """Generator parameters learned from a ``DataProcessor.load_data`` frame"""
+    times = pd.to_datetime(df['Transaction_Time'], dayfirst=True, errors='coerce')
+    # Rows with an unparsable time are left out of every statistic
+    df = df.assign(Transaction_Time=times).dropna(subset=['Transaction_Time'])
+    times = df['Transaction_Time']
+    users, user_index = np.unique(df['User_ID'].to_numpy(), return_inverse=True)
+    n_users = len(users)
+    fraud = df['Is_Fraudulent'].to_numpy().astype(bool)
+    log_amount = np.log(df['Transaction_Amount'].to_numpy(dtype=np.float64).clip(0.01))
+
+    # -------- Amounts --------
+    legit_counts = np.bincount(user_index[~fraud], minlength=n_users)
+    legit_sum = np.bincount(user_index[~fraud], weights=log_amount[~fraud], minlength=n_users)
+    legit_sq = np.bincount(user_index[~fraud], weights=log_amount[~fraud] ** 2, minlength=n_users)
+    global_mu, global_sigma = log_amount[~fraud].mean(), log_amount[~fraud].std()
+    mu = np.where(legit_counts > 0, legit_sum / np.maximum(legit_counts, 1), global_mu)
+    var = legit_sq / np.maximum(legit_counts, 1) - mu ** 2
+    sigma = np.where(legit_counts > 1, np.sqrt(np.maximum(var, 0)), global_sigma)
+
+    # -------- Fraud rate --------
+    fraud_rate = fraud.mean()
+    user_fraud = (np.bincount(user_index, weights=fraud, minlength=n_users) + SMOOTHING * fraud_rate) / (
+        np.bincount(user_index, minlength=n_users) + SMOOTHING)
+
+    # -------- Categories and hours --------
+    categories, legit_cdf, fraud_cdf = {}, {}, {}
+    for column in CATEGORICAL + ['Hour']:
+        if column == 'Hour':
+            labels = np.arange(24)
+            codes = times.dt.hour.to_numpy()
+        else:
+            labels, codes = np.unique(df[column].astype(str).to_numpy(), return_inverse=True)
+        categories[column] = labels
+        global_legit = _frequencies(codes[~fraud], len(labels))[0]
+        per_user = _frequencies(codes[~fraud], len(labels), user_index[~fraud], n_users)
+        legit_cdf[column] = _smoothed_cdf(per_user, global_legit + 1e-9)
+        global_all = _frequencies(codes, len(labels))[0]
+        fraud_cdf[column] = _smoothed_cdf(_frequencies(codes[fraud], len(labels)), global_all + 1e-9)[0]
+
+    days = times.dt.normalize()
+    return {
+        'n_template_users': n_users,
+        'rows_per_user': len(df) / n_users,
+        'start': days.min(),
+        'n_days': int((days.max() - days.min()).days) + 1,
+        'fraud_rate': float(fraud_rate),
+        'user_fraud_rate': user_fraud,
+        'amount_mu': mu,
+        'amount_sigma': sigma,
+        'fraud_amount_mu': float(log_amount[fraud].mean()) if fraud.any() else global_mu,
+        'fraud_amount_sigma': float(log_amount[fraud].std()) if fraud.sum() > 1 else global_sigma,
+        'categories': categories,
+        'legit_cdf': legit_cdf,
+        'fraud_cdf': fraud_cdf
+    }
+
+
+def _template(user_ids, seed, n_templates):
+    """Real-user profile of each synthetic user (splitmix64 hash of the ID)"""
+    with np.errstate(over='ignore'):
+        z = user_ids.astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    return (z % np.uint64(n_templates)).astype(np.int64)
+
+
+def _sample(cdf, u):
+    """Index of the first CDF entry above ``u`` (one CDF row per sample)"""
+    return (u[:, None] > cdf).sum(axis=1)
+
+
+def generate_chunk(profile, seed, chunk_index, start_row, n_rows, n_total, n_users,
+                   timestamps=False):
+    """Rows ``start_row`` .. ``start_row + n_rows`` of the synthetic dataset"""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    rows = np.arange(start_row, start_row + n_rows, dtype=np.int64)
+
+    user_ids = rng.integers(1, n_users + 1, n_rows)
+    template = _template(user_ids, seed, profile['n_template_users'])
+    fraud = rng.random(n_rows) < profile['user_fraud_rate'][template]
+
+    columns = {}
+    for column in CATEGORICAL + ['Hour']:
+        cdf = profile['legit_cdf'][column][template]
+        cdf[fraud] = profile['fraud_cdf'][column]
+        codes = np.minimum(_sample(cdf, rng.random(n_rows)), cdf.shape[1] - 1)
+        columns[column] = profile['categories'][column][codes] if column != 'Hour' else codes
+
+    mu = np.where(fraud, profile['fraud_amount_mu'], profile['amount_mu'][template])
+    sigma = np.where(fraud, profile['fraud_amount_sigma'], profile['amount_sigma'][template])
+    amount = np.round(np.exp(rng.normal(mu, sigma)), 2)
+
+    # Rows are in time order: row position sets the day, the profile the hour
+    day = rows * profile['n_days'] // n_total
+    minutes = day * 1440 + columns['Hour'] * 60
+    if timestamps:
+        when = profile['start'] + pd.to_timedelta(minutes, unit='min')
+    else:
+        # Format each distinct (day, hour) once
+        unique, inverse = np.unique(minutes, return_inverse=True)
+        labels = (profile['start'] + pd.to_timedelta(unique, unit='min')).strftime('%d-%m-%Y %H:%M')
+        when = np.asarray(labels, dtype=object)[inverse]
+
+    frame = pd.DataFrame({
+        'Transaction_ID': rows + 1,
+        'User_ID': user_ids,
+        'Transaction_Time': when,
+        'Transaction_Amount': amount,
+        'Merchant_Category': columns['Merchant_Category'],
+        'Transaction_Channel': columns['Transaction_Channel'],
+        'Device_Type': columns['Device_Type'],
+        'Location': columns['Location'],
+        'Is_Fraudulent': fraud.astype(np.int8)
+    })
+    return frame.rename(columns=RAW_NAMES)
+
+
+# -------- Parallel writer --------
+_PROFILE = None
+
+
+def _init_worker(profile):
+    global _PROFILE
+    _PROFILE = profile
+
+
+def _write_chunk(task):
+    chunk_index, start_row, n_rows, n_total, n_users, seed, path, fmt = task
+    df = generate_chunk(_PROFILE, seed, chunk_index, start_row, n_rows, n_total, n_users,
+                        timestamps=fmt == 'parquet')
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return n_rows, int(df['is_fraud'].sum())
+
+
+def _merge(parts, out_path, fmt):
+    """Concatenate part files in order into one file, one part in memory at a time"""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = None
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(out_path, table.schema)
+            writer.write_table(table)
+            del table
+        if writer is not None:
+            writer.close()
+        return
+    with open(out_path, 'wb') as out:
+        for i, part in enumerate(parts):
+            with open(part, 'rb') as f:
+                if i:
+                    f.readline()
+                shutil.copyfileobj(f, out, 1 << 20)
+
+
+def generate(profile, n_rows, out_path, seed=0, chunk_size=1_000_000, n_workers=None,
+             n_users=None):
+    """Write ``n_rows`` synthetic transactions to ``out_path``
+
+    A ``.csv`` / ``.parquet`` path gets one file (parts are written in
+    parallel and merged in order); any other path is a directory of
+    ``part-00000.<ext>`` files. Returns a summary dict.
+    """
+    ext = os.path.splitext(out_path)[1].lower()
+    fmt = 'parquet' if ext in ('.parquet', '.pq') else 'csv'
+    single_file = ext in ('.csv', '.parquet', '.pq')
+    part_dir = out_path + '.parts' if single_file else out_path
+    os.makedirs(part_dir, exist_ok=True)
+    n_users = n_users or max(profile['n_template_users'], round(n_rows / profile['rows_per_user']))
+
+    suffix = 'parquet' if fmt == 'parquet' else 'csv'
+    tasks = [
+        (k, start, min(chunk_size, n_rows - start), n_rows, n_users, seed,
+         os.path.join(part_dir, f'part-{k:05d}.{suffix}'), fmt)
+        for k, start in enumerate(range(0, n_rows, chunk_size))
+    ]
+
+    start_time = time.perf_counter()
+    if n_workers == 1:
+        _init_worker(profile)
+        results = [_write_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(profile,)) as pool:
+            results = list(pool.map(_write_chunk, tasks))
+    if single_file:
+        _merge([task[6] for task in tasks], out_path, fmt)
+        shutil.rmtree(part_dir)
+    elapsed = time.perf_counter() - start_time
+
+    rows = sum(r[0] for r in results)
+    frauds = sum(r[1] for r in results)
+    return {
+        'rows': rows,
+        'users': n_users,
+        'fraud_rate': frauds / max(rows, 1),
+        'chunks': len(tasks),
+        'seconds': elapsed,
+        'path': out_path
+    }
+
+
+def _peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic transactions')
+    parser.add_argument('--data', default='../user_transaction_dataset.csv', help='Real dataset to learn from')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--out', default='synthetic_transactions.csv',
+                        help='.csv / .parquet file, or a directory for part files')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--users', type=int, default=None, help='Synthetic users (default: scaled with rows)')
+    args = parser.parse_args()
+
+    from data_utils import DataProcessor
+    profile = fit_profile(DataProcessor().load_data(args.data))
+    summary = generate(profile, args.rows, args.out, seed=args.seed, chunk_size=args.chunk_size,
+                       n_workers=args.workers, n_users=args.users)
+    parent_mb, worker_mb = _peak_rss_mb()
+    print(f"\n✅ {summary['rows']:,} rows ({summary['users']:,} users, "
+          f"{summary['fraud_rate']:.2%} fraud) -> {summary['path']}")
+    print(f"   {summary['seconds']:.1f}s ({summary['rows'] / summary['seconds']:,.0f} rows/s), "
+          f"{summary['chunks']} chunks | peak RSS: parent {parent_mb:.0f} MB, worker {worker_mb:.0f} MB")
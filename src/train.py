@@ -1,15 +1,21 @@
 import sys
 import os
+import argparse
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from data_utils import DataProcessor
 from model_training import ModelTrainer
-from evaluate_model import ModelEvaluator
+from evaluate_model import (
+    compute_evaluation_report,
+    save_evaluation_report,
+    render_plots_async
+)
 
 
-def main():
+def main(tune=None, plots=True, point_in_time=False, compact=False, segment_by=None,
+         segment_workers=None):
     print("=" * 60)
     print("FRAUD DETECTION MODEL TRAINING")
     print("=" * 60)
@@ -41,7 +47,7 @@ def main():
     print("\n" + "=" * 60)
     print("FEATURE ENGINEERING")
     print("=" * 60)
-    df = data_processor.feature_engineering(df)
+    df = data_processor.feature_engineering(df, point_in_time=point_in_time, float32=True)
     
     # Feature analysis
     categorical_cols, numerical_cols = data_processor.analyze_features(df)
@@ -52,6 +58,10 @@ def main():
     print("=" * 60)
     X_train, X_val, X_test, y_train, y_val, y_test = data_processor.prepare_data(df)
     
+    # Feature histograms the serving drift monitor compares traffic against
+    from drift_monitor import build_reference
+    model_trainer.drift_reference = build_reference(X_train)
+    
     # ---------------- MODEL TRAINING ----------------
     print("\n" + "=" * 60)
     print("MODEL TRAINING")
@@ -62,11 +72,18 @@ def main():
         numerical_cols
     )
     
+    search = None
+    if tune:
+        from hyperparameter_search import HyperparameterSearch
+        search = HyperparameterSearch(strategy=tune, random_state=42)
+    
     detector = model_trainer.train(
         X_train,
         y_train,
         X_val,
-        y_val
+        y_val,
+        search=search,
+        compact=compact
     )
     
     # ---------------- SAVE MODEL ----------------
@@ -74,6 +91,30 @@ def main():
     print("SAVING MODEL")
     print("=" * 60)
     model_trainer.save_model()
+    if model_trainer.compaction is not None:
+        model_trainer.report_compaction()
+    
+    # ---------------- SEGMENT MODELS ----------------
+    if segment_by:
+        from segment_models import train_segment_models
+        print("\n" + "=" * 60)
+        print("SEGMENT MODELS")
+        print("=" * 60)
+        train_segment_models(
+            X_train,
+            y_train,
+            X_val,
+            y_val,
+            categorical_cols,
+            numerical_cols,
+            segment_by=segment_by,
+            global_val_proba=model_trainer.model.predict_proba(preprocessor.transform(X_val))[:, 1],
+            n_workers=segment_workers,
+            compact=compact
+        )
+    else:
+        from segment_models import clear_segment_models
+        clear_segment_models()
     
     # ---------------- FINAL EVALUATION ----------------
     print("\n" + "=" * 60)
@@ -86,40 +127,117 @@ def main():
         y_test
     )
     
-    evaluator = ModelEvaluator()
-    
-    # Confusion Matrix
-    evaluator.plot_confusion_matrix(
-        cm,
-        save_path=os.path.join(BASE_DIR, 'plots', 'confusion_matrix.png')
-    )
+    y_test_prob = detector.best_model.predict_proba(X_test_processed)[:, 1]
+    # Report the confusion matrix at the threshold the API flags fraud at
+    threshold = (model_trainer.decision_engine.decision_threshold
+                 if model_trainer.decision_engine is not None else 0.5)
+    evaluation_report = compute_evaluation_report(y_test, y_test_prob, threshold=threshold)
     
     # Feature Importance (SAFE CHECK)
     if (
         hasattr(detector, "feature_importance")
         and detector.feature_importance is not None
     ):
-        feature_names = model_trainer.get_feature_names()
-        evaluator.plot_feature_importance(
-            detector.feature_importance,
-            feature_names,
-            save_path=os.path.join(BASE_DIR, 'plots', 'feature_importance.png')
-        )
+        evaluation_report['feature_importance'] = {
+            'feature_names': list(model_trainer.get_feature_names()),
+            'importances': detector.feature_importance
+        }
     else:
         print("ℹ️ Feature importance not available for this model.")
     
+    plots_dir = os.path.join(BASE_DIR, 'plots')
+    report_path = save_evaluation_report(
+        evaluation_report,
+        os.path.join(plots_dir, 'evaluation_report.json')
+    )
+    
+    if plots:
+        # Rendered in the background with a non-interactive backend
+        render_plots_async(report_path, plots_dir)
+    
     print("\n" + "=" * 60)
     print("✅ TRAINING COMPLETE!")
     print("=" * 60)
     print("📁 Model & preprocessor saved in: backend/models/")
-    print("📊 Evaluation plots saved in: backend/plots/")
+    print("📊 Evaluation report saved in: backend/plots/evaluation_report.json")
+    if plots:
+        print("📊 Evaluation plots are being rendered to: backend/plots/")
     
     return True
 
 
+def incremental_main(new_data_path, point_in_time=False):
+    from incremental_training import run_incremental_update
+    
+    print("=" * 60)
+    print("INCREMENTAL MODEL UPDATE")
+    print("=" * 60)
+    
+    if not os.path.exists(new_data_path):
+        print(f"❌ Data file not found at {new_data_path}")
+        return False
+    
+    # User aggregates are rebuilt over the training history plus the new rows
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    history_path = os.path.join(os.path.dirname(BASE_DIR), 'data', 'user_transaction_dataset.csv')
+    report = run_incremental_update(new_data_path, history_path=history_path,
+                                    point_in_time=point_in_time)
+    return report['accepted']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the fraud detection model")
+    parser.add_argument(
+        '--incremental',
+        metavar='NEW_DATA_CSV',
+        help="Update the saved model with newly labeled transactions instead of retraining from scratch"
+    )
+    parser.add_argument(
+        '--tune',
+        nargs='?',
+        const='successive_halving',
+        choices=['random', 'successive_halving', 'hyperband'],
+        help="Run a hyperparameter search before model selection (default strategy: successive_halving)"
+    )
+    parser.add_argument(
+        '--point-in-time',
+        action='store_true',
+        help="Compute user aggregates as of each transaction (no future data, same as the streaming scorer)"
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help="Prune, quantize and compress the selected model for serving (see model_compaction.py)"
+    )
+    parser.add_argument(
+        '--segment-by',
+        nargs='+',
+        metavar='COLUMN',
+        help="Also train a model per value of these columns (e.g. Transaction_Channel), served "
+             "instead of the global model where it does at least as well on validation"
+    )
+    parser.add_argument(
+        '--segment-workers',
+        type=int,
+        help="Processes training segment models in parallel (default: one per CPU)"
+    )
+    parser.add_argument(
+        '--no-plots',
+        action='store_true',
+        help="Only write the JSON evaluation report, skip rendering plots"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        success = main()
+        if args.incremental:
+            success = incremental_main(args.incremental, point_in_time=args.point_in_time)
+        else:
+            success = main(tune=args.tune, plots=not args.no_plots, point_in_time=args.point_in_time,
+                           compact=args.compact, segment_by=args.segment_by,
+                           segment_workers=args.segment_workers)
         if success:
             print("\n🎉 Training completed successfully!")
             sys.exit(0)
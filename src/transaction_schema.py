@@ -0,0 +1,268 @@
+"""
+Declarative schema for scoring requests and a fast decoder.
+
+``TRANSACTION_SCHEMA`` lists the model input columns produced by
+``DataProcessor.feature_engineering``. ``decode_transactions`` validates a
+JSON payload (one object or a list of objects) field by field and writes
+the values straight into typed NumPy columns, so the DataFrame handed to the
+model is built without per-request dtype inference. Malformed input raises
+``SchemaValidationError`` listing every offending row and field.
+"""
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+MAX_REPORTED_ERRORS = 20
+
+
+class SchemaValidationError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors[:MAX_REPORTED_ERRORS]
+        self.total_errors = len(errors)
+        first = errors[0]
+        super().__init__(f"{first['field']}: {first['message']}" if first.get('field') else first['message'])
+
+    def to_dict(self):
+        return {
+            'error': 'Invalid transaction data',
+            'details': self.errors,
+            'total_errors': self.total_errors
+        }
+
+
+class Field:
+    def __init__(self, name, kind, minimum=None, maximum=None, nullable=False):
+        self.name = name
+        self.kind = kind  # 'int', 'float' or 'str'
+        self.minimum = minimum
+        self.maximum = maximum
+        self.nullable = nullable
+
+    @property
+    def dtype(self):
+        return {'int': np.int64, 'float': np.float64, 'str': object}[self.kind]
+
+    def describe(self):
+        if self.minimum is not None and self.maximum is not None:
+            return f'must be between {self.minimum} and {self.maximum}'
+        if self.minimum is not None:
+            return f'must be >= {self.minimum}'
+        return f'must be <= {self.maximum}'
+
+
+TRANSACTION_SCHEMA = [
+    Field('User_ID', 'int'),
+    Field('Transaction_Amount', 'float', minimum=0),
+    Field('Merchant_Category', 'str'),
+    Field('Transaction_Channel', 'str'),
+    Field('Device_Type', 'str'),
+    Field('Location', 'str'),
+    Field('Hour', 'int', 0, 23),
+    Field('DayOfWeek', 'int', 0, 6),
+    Field('Is_Weekend', 'int', 0, 1),
+    Field('Is_Night', 'int', 0, 1),
+    Field('User_Avg_Amount', 'float', minimum=0),
+    # Undefined for users with a single transaction in the training data
+    Field('User_Std_Amount', 'float', minimum=0, nullable=True),
+    Field('User_Transaction_Count', 'int', minimum=1),
+    Field('Amount_Log', 'float', minimum=0),
+    Field('Amount_to_Avg_Ratio', 'float', minimum=0)
+]
+
+_MISSING = object()
+_NUMBER = (int, float)
+
+
+def _error(index, field, message):
+    return {'index': index, 'field': field, 'message': message}
+
+
+def _type_error(field, value):
+    if value is _MISSING:
+        return 'is required'
+    if value is None:
+        return 'must not be null'
+    expected = {'int': 'an integer', 'float': 'a number', 'str': 'a non-empty string'}[field.kind]
+    return f'must be {expected}, got {type(value).__name__}'
+
+
+def _valid(field, value):
+    kind = type(value)
+    if field.kind == 'str':
+        return kind is str and value != ''
+    if kind is bool or kind not in _NUMBER:
+        return field.nullable and value is None
+    if field.kind == 'int':
+        return kind is int or value.is_integer()
+    return math.isfinite(value)
+
+
+class TransactionBatch:
+    """Decoded transactions as typed NumPy columns"""
+
+    def __init__(self, columns, n_rows):
+        self.columns = columns
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return self.n_rows
+
+    def to_frame(self):
+        # Arrays already have their final dtypes; pandas wraps them as is
+        return pd.DataFrame(self.columns, copy=False)
+
+
+def _rows(payload):
+    if isinstance(payload, dict):
+        return [payload]
+    if isinstance(payload, list):
+        if not payload:
+            raise SchemaValidationError([_error(None, None, 'Expected at least one transaction')])
+        bad = [_error(i, None, 'Transaction must be a JSON object')
+               for i, row in enumerate(payload) if not isinstance(row, dict)]
+        if bad:
+            raise SchemaValidationError(bad)
+        return payload
+    raise SchemaValidationError([
+        _error(None, None, 'Expected a transaction object or a list of transactions')
+    ])
+
+
+def decode_transactions(payload, schema=TRANSACTION_SCHEMA):
+    """Validate a JSON payload and return a TransactionBatch"""
+    rows = _rows(payload)
+    n = len(rows)
+    columns = {}
+    errors = []
+
+    for field in schema:
+        name = field.name
+        values = [row.get(name, _MISSING) for row in rows]
+
+        invalid = [i for i, value in enumerate(values) if not _valid(field, value)]
+        if invalid:
+            errors.extend(_error(i, name, _type_error(field, values[i])) for i in invalid)
+            continue
+
+        if field.kind == 'str':
+            column = np.empty(n, dtype=object)
+            column[:] = values
+            columns[name] = column
+            continue
+
+        if field.nullable:
+            values = [np.nan if v is None else v for v in values]
+            present = [v for v in values if v == v]
+        else:
+            present = values
+        # min()/max() over the list is cheaper than NumPy on tiny batches;
+        # rows are only located when a bound is actually violated
+        if present and ((field.minimum is not None and min(present) < field.minimum) or
+                        (field.maximum is not None and max(present) > field.maximum)):
+            errors.extend(
+                _error(i, name, field.describe()) for i, v in enumerate(values)
+                if (field.minimum is not None and v < field.minimum) or
+                   (field.maximum is not None and v > field.maximum)
+            )
+            continue
+
+        columns[name] = np.array(values, dtype=field.dtype)
+
+    if errors:
+        order = {field.name: k for k, field in enumerate(schema)}
+        errors.sort(key=lambda e: (e['index'], order[e['field']]))
+        raise SchemaValidationError(errors)
+    return TransactionBatch(columns, n)
+
+
+def validate_frame(df, schema=TRANSACTION_SCHEMA):
+    """Column-level checks for an uploaded batch (missing columns, types, ranges)"""
+    missing = [field.name for field in schema if field.name not in df.columns]
+    if missing:
+        raise SchemaValidationError([_error(None, name, 'column is required') for name in missing])
+
+    errors = []
+    for field in schema:
+        column = df[field.name]
+        if field.kind == 'str':
+            if pd.api.types.is_numeric_dtype(column):
+                errors.append(_error(None, field.name, f'column must be text, got {column.dtype}'))
+                continue
+            empty = (column.isna() | (column.astype(str) == '')).to_numpy()
+            errors.extend(_error(int(i), field.name, 'must be a non-empty string') for i in np.flatnonzero(empty))
+            continue
+        if field.nullable and column.isna().all():
+            continue
+        if not pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            errors.append(_error(None, field.name, f'column must be numeric, got {column.dtype}'))
+            continue
+
+        values = column.to_numpy(dtype=np.float64)
+        bad = np.isnan(values) if not field.nullable else np.zeros(len(values), dtype=bool)
+        if field.kind == 'int':
+            bad |= ~np.isnan(values) & (values != np.round(values))
+        if field.minimum is not None:
+            bad |= values < field.minimum
+        if field.maximum is not None:
+            bad |= values > field.maximum
+        errors.extend(_error(int(i), field.name, f'invalid value {values[i]!r}') for i in np.flatnonzero(bad))
+
+    if errors:
+        raise SchemaValidationError(errors)
+
+
+def benchmark_decode(batch_sizes=(1, 10, 100, 1000), repeats=200):
+    """Per-row cost: decode_transactions + to_frame vs pd.DataFrame(payload)"""
+    rng = np.random.default_rng(0)
+
+    def transaction():
+        amount = float(rng.gamma(2.0, 600.0))
+        avg = float(rng.gamma(2.0, 600.0))
+        hour = int(rng.integers(0, 24))
+        day = int(rng.integers(0, 7))
+        return {
+            'User_ID': int(rng.integers(1, 1000)),
+            'Transaction_Amount': amount,
+            'Merchant_Category': 'Grocery',
+            'Transaction_Channel': 'UPI',
+            'Device_Type': 'Android',
+            'Location': 'Mumbai',
+            'Hour': hour,
+            'DayOfWeek': day,
+            'Is_Weekend': int(day >= 5),
+            'Is_Night': int(hour <= 6),
+            'User_Avg_Amount': avg,
+            'User_Std_Amount': float(rng.gamma(2.0, 200.0)),
+            'User_Transaction_Count': int(rng.integers(1, 50)),
+            'Amount_Log': math.log1p(amount),
+            'Amount_to_Avg_Ratio': amount / (avg + 1)
+        }
+
+    for batch_size in batch_sizes:
+        payload = [transaction() for _ in range(batch_size)]
+        single = payload[0] if batch_size == 1 else payload
+        runs = max(1, repeats // max(1, batch_size // 100))
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            pd.DataFrame([single]) if batch_size == 1 else pd.DataFrame(single)
+        frame_us = (time.perf_counter() - start) / runs / batch_size * 1e6
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            batch = decode_transactions(single)
+        decode_us = (time.perf_counter() - start) / runs / batch_size * 1e6
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            batch.to_frame()
+        wrap_us = (time.perf_counter() - start) / runs / batch_size * 1e6
+
+        print(f"batch={batch_size:>5}: pd.DataFrame(payload) {frame_us:7.1f} us/row | "
+              f"decode {decode_us:6.1f} + to_frame {wrap_us:6.1f} us/row")
+
+
+if __name__ == "__main__":
+    benchmark_decode()
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import threading
+
+from admission_control import AdmissionController, rules_decisions
+
+
+def test_full_path_when_idle():
+    controller = AdmissionController(max_concurrent=1, degrade_in_flight=2, reject_in_flight=4)
+    with controller.admit() as admission:
+        assert not admission.rejected
+        with admission.model_slot() as full:
+            assert full
+    assert controller.in_flight == 0
+    assert controller.stats()['decisions'] == {'full': 1, 'degraded': 0, 'rejected': 0}
+
+
+def test_degrades_then_rejects_by_in_flight():
+    controller = AdmissionController(max_concurrent=8, degrade_in_flight=2, reject_in_flight=3)
+    held = [controller.admit().__enter__() for _ in range(3)]
+    rejected = controller.admit()
+    assert rejected.rejected
+    assert controller.in_flight == 3
+
+    with held[-1].model_slot() as full:
+        assert not full
+    assert held[-1].degraded and held[-1].reason == 'in_flight'
+
+    for admission in held:
+        admission.__exit__(None, None, None)
+    assert controller.stats()['decisions'] == {'full': 0, 'degraded': 1, 'rejected': 1}
+
+
+def test_degrades_when_model_slot_does_not_free_up():
+    controller = AdmissionController(max_concurrent=1, max_queue_wait=0.02)
+    busy = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        with controller.admit() as admission, admission.model_slot():
+            busy.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    busy.wait(5)
+    with controller.admit() as admission, admission.model_slot() as full:
+        assert not full
+    assert admission.reason == 'queue_timeout'
+    assert admission.queue_seconds >= 0.015
+
+    # A slow model makes later requests skip the wait altogether
+    controller.observe(0.5)
+    with controller.admit() as admission, admission.model_slot() as full:
+        assert not full
+    assert admission.reason == 'latency' and admission.queue_seconds == 0
+    release.set()
+    holder.join()
+
+    with controller.admit() as admission, admission.model_slot() as full:
+        assert full
+
+
+def test_rules_decisions_flag_degraded_rows():
+    results = rules_decisions([
+        {'Transaction_Amount': 12000.0, 'Hour': 3, 'Location': 'Mumbai', 'Device_Type': 'Android',
+         'User_Avg_Amount': 900.0, 'User_Transaction_Count': 40},
+        {'Transaction_Amount': 500.0, 'Hour': 14, 'Location': 'Pune', 'Device_Type': 'iPhone',
+         'User_Avg_Amount': 600.0, 'User_Transaction_Count': 5}
+    ])
+    assert [r['is_fraud'] for r in results] == [True, False]
+    assert all(r['degraded'] and r['fraud_probability'] is None for r in results)
+    assert results[0]['risk_level'] == 'HIGH' and results[1]['risk_level'] == 'LOW'
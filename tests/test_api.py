@@ -3,6 +3,7 @@ import json
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import app as app_module
 from app import app
 
 
@@ -39,3 +40,24 @@ def test_predict_and_process():
     assert rv2.status_code == 200
     resp = rv2.get_json()
     assert 'success' in resp
+
+
+def test_shadow_model_dir_must_be_inside_models():
+    client = app.test_client()
+    assert client.post('/shadow', json={'model_dir': '/tmp'}).status_code == 400
+    assert client.post('/shadow', json={'model_dir': 'models/../../tests'}).status_code == 403
+    assert client.post('/shadow', json={'model_dir': 'models/no-such-bundle'}).status_code == 404
+
+
+def test_failed_reload_keeps_serving_the_loaded_model(monkeypatch):
+    assert app_module.models_loaded
+    explainer, version = app_module.explainer, app_module.model_manager.model_version
+    monkeypatch.setattr(app_module.model_manager, 'load_models', lambda: False)
+
+    client = app.test_client()
+    rv = client.post('/reload_models')
+    assert rv.status_code == 500
+    assert rv.get_json()['success'] is False and rv.get_json()['model_loaded'] is True
+    assert app_module.models_loaded
+    assert app_module.explainer is explainer
+    assert app_module.model_manager.model_version == version
@@ -0,0 +1,120 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_jobs import JobManager, JobQueueFull, _count_csv_rows
+from data_utils import DataProcessor
+from model_persistence import ModelManager
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+@pytest.fixture(scope='module')
+def manager():
+    manager = ModelManager(cache_size=0)
+    assert manager.load_models(
+        os.path.join(MODEL_DIR, 'trained_detector.pkl'),
+        os.path.join(MODEL_DIR, 'preprocessor.pkl'),
+        os.path.join(MODEL_DIR, 'model_metadata.pkl')
+    )
+    return manager
+
+
+def _features(tmp_path, n=50):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        'transaction_id': np.arange(n),
+        'user_id': rng.integers(1, 10, n),
+        'transaction_datetime': '01-01-2024 10:00',
+        'amount': rng.gamma(2.0, 500.0, n).round(2),
+        'merchant_category': 'Grocery',
+        'transaction_channel': 'UPI',
+        'device_type': 'Android',
+        'location': 'Mumbai',
+        'is_fraud': 0
+    }).to_csv(tmp_path / 'raw.csv', index=False)
+    processor = DataProcessor()
+    features = processor.feature_engineering(processor.load_data(str(tmp_path / 'raw.csv')))
+    return features.drop(columns=['Is_Fraudulent'])
+
+
+def _wait(jobs, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while jobs.get(job_id)['state'] in ('queued', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    return jobs.get(job_id)
+
+
+def test_job_scores_in_chunks_and_resumes_after_restart(tmp_path, manager):
+    features = _features(tmp_path)
+    body = features.to_csv(index=False).encode()
+    jobs_dir = str(tmp_path / 'jobs')
+
+    # Submitted but never picked up: the next manager resumes it
+    job = JobManager(manager, jobs_dir=jobs_dir, chunk_size=16).submit(io.BytesIO(body), 'batch.csv')
+    jobs = JobManager(manager, jobs_dir=jobs_dir, chunk_size=16).start()
+    status = _wait(jobs, job['id'])
+    jobs.stop()
+
+    assert status['state'] == 'completed'
+    assert status['parts_completed'] == 4
+    assert status['rows_processed'] == status['total_rows'] == 50
+    assert status['progress'] == 1.0
+
+    results = pd.read_csv(io.StringIO(''.join(jobs.iter_results(job['id']))))
+    _, probabilities = manager.predict(features)
+    assert results['Transaction_ID'].tolist() == features['Transaction_ID'].tolist()
+    assert np.allclose(results['fraud_probability'], probabilities[:, 1])
+    assert len(pd.read_csv(io.StringIO(''.join(jobs.iter_results(job['id'], part=3))))) == 2
+
+
+def test_invalid_rows_fail_job_with_absolute_index(tmp_path, manager):
+    features = _features(tmp_path)
+    features.loc[20, 'Hour'] = 30
+    jobs = JobManager(manager, jobs_dir=str(tmp_path / 'jobs'), chunk_size=16).start()
+    job = jobs.submit(io.BytesIO(features.to_csv(index=False).encode()), 'batch.csv')
+    status = _wait(jobs, job['id'])
+    jobs.stop()
+
+    assert status['state'] == 'failed'
+    assert status['parts_completed'] == 1
+    assert status['error']['details'][0]['index'] == 20
+    assert status['error']['details'][0]['field'] == 'Hour'
+
+
+def test_queue_limit_and_format_check(tmp_path, manager):
+    jobs = JobManager(manager, jobs_dir=str(tmp_path / 'jobs'), max_queued=1)
+    jobs.submit(io.BytesIO(b'User_ID\n1\n'), 'a.csv')
+    with pytest.raises(JobQueueFull):
+        jobs.submit(io.BytesIO(b'User_ID\n1\n'), 'b.csv')
+    with pytest.raises(ValueError):
+        jobs.submit(io.BytesIO(b'x'), 'c.xlsx')
+
+
+def test_csv_row_count_handles_quoted_newlines(tmp_path):
+    path = tmp_path / 'quoted.csv'
+    path.write_text('Transaction_ID,Location\n1,"Mumbai\nWest"\n\n2,"Pune, ""MH"""\n3,Delhi')
+    assert _count_csv_rows(str(path)) == len(pd.read_csv(path)) == 3
+
+
+def test_finished_jobs_expire(tmp_path, manager):
+    features = _features(tmp_path)
+    jobs_dir = str(tmp_path / 'jobs')
+    jobs = JobManager(manager, jobs_dir=jobs_dir, job_ttl=60).start()
+    job = jobs.submit(io.BytesIO(features.to_csv(index=False).encode()), 'batch.csv')
+    finished_at = _wait(jobs, job['id'])['finished_at']
+    jobs.stop()
+
+    assert jobs.cleanup(now=finished_at + 30) == []
+    assert jobs.get(job['id'])['state'] == 'completed'
+    assert jobs.cleanup(now=finished_at + 61) == [job['id']]
+    assert jobs.get(job['id']) is None
+    assert os.listdir(jobs_dir) == []
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from columnar_io import file_format, iter_frames, read_frame, write_frame
+from data_utils import DataProcessor
+
+
+def _raw(n=50):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'transaction_id': np.arange(n),
+        'user_id': rng.integers(1, 10, n),
+        'transaction_datetime': '01-01-2024 10:00',
+        'amount': rng.gamma(2.0, 500.0, n).round(2),
+        'merchant_category': 'Grocery',
+        'transaction_channel': 'UPI',
+        'device_type': 'Android',
+        'location': 'Mumbai',
+        'is_fraud': rng.integers(0, 2, n)
+    })
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow'])
+def test_read_prunes_columns_and_streams_batches(tmp_path, suffix):
+    path = str(tmp_path / f'data{suffix}')
+    fmt = file_format(path)
+    write_frame(_raw(), path, fmt, row_group_size=16)
+
+    df = read_frame(path, fmt, columns=['amount', 'user_id', 'not_there'])
+    assert list(df.columns) == ['amount', 'user_id']
+
+    batches = list(iter_frames(path, fmt, columns=['amount'], batch_size=16))
+    assert [len(b) for b in batches] == [16, 16, 16, 2]
+    assert pd.concat(batches)['amount'].tolist() == _raw()['amount'].tolist()
+
+    loaded = DataProcessor().load_data(path, columns=['User_ID', 'Transaction_Amount', 'Is_Fraudulent'])
+    assert sorted(loaded.columns) == ['Is_Fraudulent', 'Transaction_Amount', 'User_ID']
+
+
+def test_batch_predict_accepts_parquet_like_csv(tmp_path):
+    from app import app
+
+    processor = DataProcessor()
+    raw = _raw()
+    raw.to_csv(tmp_path / 'raw.csv', index=False)
+    features = processor.feature_engineering(processor.load_data(str(tmp_path / 'raw.csv')))
+    features = features.drop(columns=['Is_Fraudulent'])
+
+    csv_bytes = features.to_csv(index=False).encode()
+    write_frame(features, str(tmp_path / 'features.parquet'), 'parquet', row_group_size=16)
+    parquet_bytes = (tmp_path / 'features.parquet').read_bytes()
+
+    client = app.test_client()
+    responses = [
+        client.post('/batch_predict', data={'file': (io.BytesIO(body), name)},
+                    content_type='multipart/form-data').get_json()
+        for body, name in [(csv_bytes, 'batch.csv'), (parquet_bytes, 'batch.parquet')]
+    ]
+
+    assert responses[0]['total_transactions'] == responses[1]['total_transactions'] == 50
+    csv_probs = [r['fraud_probability'] for r in responses[0]['results']]
+    parquet_probs = [r['fraud_probability'] for r in responses[1]['results']]
+    assert np.allclose(csv_probs, parquet_probs)
+
+    rv = client.post('/batch_predict', data={'file': (io.BytesIO(b'x'), 'batch.xlsx')},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 400
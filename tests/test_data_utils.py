@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+
+from data_utils import DataProcessor
+from stream_worker import FeatureEnricher
+
+STAT_COLUMNS = ['User_Avg_Amount', 'User_Std_Amount', 'User_Transaction_Count']
+
+
+def _raw(n=400):
+    rng = np.random.default_rng(1)
+    minutes = rng.integers(0, 60 * 24 * 30, n)
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(minutes, unit='min')
+    return pd.DataFrame({
+        'Transaction_ID': np.arange(n),
+        'User_ID': rng.integers(1, 25, n),
+        'Transaction_Time': times.strftime('%d-%m-%Y %H:%M'),
+        'Transaction_Amount': rng.gamma(2.0, 5000.0, n).round(2) + 1e6,
+        'Merchant_Category': 'Grocery',
+        'Transaction_Channel': 'UPI',
+        'Device_Type': 'Android',
+        'Location': 'Mumbai',
+        'Is_Fraudulent': 0
+    })
+
+
+def test_point_in_time_matches_online_enricher():
+    raw = _raw()
+    batch = DataProcessor().feature_engineering(raw, point_in_time=True)
+
+    # Replay the same transactions through the streaming enricher in time order
+    times = pd.to_datetime(raw['Transaction_Time'], dayfirst=True)
+    replay = raw.iloc[np.argsort(times.to_numpy(), kind='stable')]
+    online = FeatureEnricher().enrich(replay.drop(columns=['Is_Fraudulent']).to_dict('records'))
+    online.index = replay.index
+    online = online.sort_index()
+
+    assert list(batch.index) == list(raw.index)
+    assert (batch['User_Transaction_Count'] == online['User_Transaction_Count']).all()
+    assert np.allclose(batch['User_Avg_Amount'], online['User_Avg_Amount'], rtol=0, atol=1e-6)
+    assert np.allclose(batch['User_Std_Amount'], online['User_Std_Amount'], rtol=0, atol=1e-6)
+
+
+def test_point_in_time_uses_no_future_rows():
+    raw = _raw()
+    full = DataProcessor().feature_engineering(raw)
+    pit = DataProcessor().feature_engineering(raw, point_in_time=True)
+
+    assert list(pit.columns) == list(full.columns)
+    times = pd.to_datetime(raw['Transaction_Time'], dayfirst=True)
+    last = times.groupby(raw['User_ID']).transform('max') == times
+    # A user's latest transaction sees the whole history; earlier ones see less
+    assert np.allclose(pit.loc[last, 'User_Avg_Amount'], full.loc[last, 'User_Avg_Amount'])
+    assert (pit['User_Transaction_Count'] <= full['User_Transaction_Count']).all()
+    assert (pit.loc[pit['User_Transaction_Count'] == 1, 'User_Std_Amount'] == 0).all()
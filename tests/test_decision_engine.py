@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from decision_engine import DecisionEngine, threshold_table
+
+
+def _data(seed=0, n=2000):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    p = np.clip(y * 0.4 + rng.random(n) * 0.6, 0, 1).round(3)
+    return y, p
+
+
+def test_threshold_table_matches_brute_force():
+    y, p = _data()
+    table = threshold_table(y, p, false_positive_cost=5, false_negative_cost=100)
+
+    for i in [0, len(table['thresholds']) // 2, len(table['thresholds']) - 1]:
+        flagged = p >= table['thresholds'][i]
+        tp = np.sum(flagged & (y == 1))
+        fp = np.sum(flagged & (y == 0))
+        fn = np.sum(~flagged & (y == 1))
+        assert table['precision'][i] == tp / (tp + fp)
+        assert table['recall'][i] == tp / y.sum()
+        assert table['expected_cost'][i] == fp * 5 + fn * 100
+
+
+def test_fit_picks_minimum_cost_threshold():
+    y, p = _data(seed=1)
+    engine = DecisionEngine.fit(y, p, false_positive_cost=5, false_negative_cost=100)
+
+    costs = {
+        t: np.sum((p >= t) & (y == 0)) * 5 + np.sum((p < t) & (y == 1)) * 100
+        for t in np.unique(p)
+    }
+    assert costs[engine.review_threshold] == min(costs.values())
+    assert engine.block_threshold >= engine.review_threshold
+
+
+def test_risk_levels_vectorized_lookup():
+    engine = DecisionEngine(review_threshold=0.3, block_threshold=0.7)
+    levels = engine.risk_levels(np.array([0.1, 0.3, 0.5, 0.7, 0.99]))
+
+    assert levels.tolist() == ['LOW', 'MEDIUM', 'MEDIUM', 'HIGH', 'HIGH']
+    assert engine.is_fraud([0.49, 0.5]).tolist() == [False, True]
+    assert DecisionEngine.from_dict(engine.to_dict()).to_dict() == engine.to_dict()
+
+
+def test_fit_keeps_a_review_band(capsys):
+    y, p = _data(seed=2)
+    engine = DecisionEngine.fit(y, p, false_positive_cost=1, false_negative_cost=1,
+                                block_precision=0.0, min_review_band=0.1)
+    assert engine.block_threshold - engine.review_threshold >= 0.1 - 1e-12
+
+    # A perfectly separated tail leaves no room above the review threshold
+    y = np.array([0] * 50 + [1] * 50)
+    p = np.concatenate([np.linspace(0, 0.5, 50), np.full(50, 0.99)])
+    engine = DecisionEngine.fit(y, p, min_review_band=0.05)
+    assert engine.block_threshold == engine.review_threshold == 0.99
+    assert 'merged' in capsys.readouterr().out
+
+
+def test_rule_scorer_uses_the_same_ladder():
+    from risk_scoring import RiskScorer
+
+    scorer = RiskScorer()
+    assert [scorer.get_recommendation(s).split(' ')[0] for s in (0, 20, 40, 70)] == \
+        ['APPROVE', 'MONITOR', 'REVIEW', 'BLOCK']
+    strict = RiskScorer(DecisionEngine(review_threshold=0.1, block_threshold=0.2))
+    result = strict.calculate_risk_score({'Transaction_Amount': 6000, 'Hour': 12, 'Location': 'Pune'})
+    assert (result['risk_score'], result['risk_level']) == (20, 'HIGH')
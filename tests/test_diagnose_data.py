@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+
+from diagnose_data import diagnose_data_streaming
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+
+
+def test_streaming_matches_in_memory_diagnosis(tmp_path):
+    df = pd.read_csv(DATA_PATH, nrows=2000)
+    # A large offset that E[xx] - E[x]^2 cannot resolve in float64
+    df['offset_amount'] = 1e9 + df['amount'] / 1000
+    df.loc[::97, 'location'] = np.nan
+    df = pd.concat([df, df.iloc[:25]], ignore_index=True)
+    path = tmp_path / 'transactions.csv'
+    df.to_csv(path, index=False)
+
+    report = diagnose_data_streaming(str(path), chunk_bytes=16 * 1024, n_workers=1)
+    # Compared with the file as diagnose_data reads it
+    df = pd.read_csv(path)
+
+    numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+    assert report['rows'] == len(df)
+    assert report['missing'] == df.isnull().sum().to_dict()
+    assert report['target_counts'] == df['is_fraud'].value_counts().to_dict()
+    assert report['approx_duplicates'] == df.duplicated().sum()
+    for col in numeric_cols:
+        summary = report['numeric_summary'][col]
+        assert summary['min'] == df[col].min() and summary['max'] == df[col].max()
+        np.testing.assert_allclose(summary['mean'], df[col].mean(), rtol=1e-12)
+    np.testing.assert_allclose(report['correlation'].to_numpy(),
+                               df[numeric_cols].corr().to_numpy(), atol=1e-5)
+    assert ('amount', 'offset_amount') in report['high_correlation_pairs']
+
+
+def test_bloom_filter_is_capped(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    pd.read_csv(DATA_PATH, nrows=3000).to_csv(path, index=False)
+
+    report = diagnose_data_streaming(str(path), n_workers=1, max_bloom_bytes=1024)
+
+    assert report['duplicate_error_rate'] > 0.001
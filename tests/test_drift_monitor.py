@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from drift_monitor import DriftMonitor, build_reference, psi
+
+
+def _traffic(n, rng, amount_scale=600.0, locations=('Mumbai', 'Pune', 'Delhi')):
+    return pd.DataFrame({
+        'Transaction_Amount': rng.gamma(2.0, amount_scale, n),
+        'Hour': rng.integers(0, 24, n),
+        'Location': rng.choice(list(locations), n),
+        'Merchant_Category': rng.choice(['Grocery', 'Travel'], n)
+    })
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_distribution_is_stable_and_shift_is_flagged():
+    rng = np.random.default_rng(0)
+    clock = _Clock()
+    monitor = DriftMonitor(build_reference(_traffic(20000, rng)), window_seconds=60, n_windows=3, clock=clock)
+
+    # Single-row requests from several threads
+    rows = _traffic(3000, rng)
+    threads = [
+        threading.Thread(target=lambda part=part: [monitor.observe(rows.iloc[[i]]) for i in part])
+        for part in np.array_split(np.arange(len(rows)), 4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = monitor.report()
+    assert report['features']['Transaction_Amount']['rows'] == 3000
+    assert all(f['status'] == 'stable' for f in report['features'].values())
+
+    # Next window: amounts 3x larger and an unseen city
+    clock.now = 60
+    monitor.observe(_traffic(5000, rng, amount_scale=1800.0, locations=('Nagpur',)))
+    latest = monitor.report(windows=1)['features']
+    assert latest['Transaction_Amount']['rows'] == 5000
+    assert latest['Transaction_Amount']['status'] == 'significant'
+    assert latest['Transaction_Amount']['ks'] > 0.3
+    assert latest['Location']['top_shifts'][0]['category'] == '__other__'
+    assert latest['Hour']['status'] == 'stable'
+
+    # Old windows slide out of the ring
+    clock.now = 60 * 5
+    assert monitor.report()['features']['Hour']['rows'] == 0
+
+
+def test_psi_is_zero_for_identical_distributions():
+    assert psi([10, 20, 30], [1, 2, 3]) == 0.0
+    assert DriftMonitor.from_metadata({'decision_thresholds': {}}) is None
+
+
+def test_thread_per_request_traffic_uses_a_fixed_set_of_stripes():
+    rng = np.random.default_rng(1)
+    monitor = DriftMonitor(build_reference(_traffic(5000, rng)), n_stripes=4)
+    stripes = list(monitor._stripes)
+
+    # A fresh thread per request, as Flask's threaded server does
+    rows = _traffic(400, rng)
+    for start in range(0, len(rows), 8):
+        threads = [threading.Thread(target=monitor.observe, args=(rows.iloc[[i]],))
+                   for i in range(start, start + 8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert monitor._stripes == stripes
+    counts = monitor.window_counts()
+    assert all(int(c.sum()) == len(rows) for c in counts.values())
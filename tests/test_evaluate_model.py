@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+from sklearn import metrics
+
+from evaluate_model import compute_evaluation_report, threshold_curve
+
+
+def _data(seed=0, n=3000):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.1).astype(int)
+    # Rounded so many probabilities tie
+    p = np.clip(0.3 * y + rng.beta(2, 5, n), 0, 1).round(2)
+    return y, p
+
+
+def test_threshold_curve_matches_sklearn():
+    y, p = _data()
+    fps, tps, thresholds = threshold_curve(y, p)
+    fpr, tpr, sk_thresholds = metrics.roc_curve(y, p, drop_intermediate=False)
+
+    np.testing.assert_array_equal(thresholds, sk_thresholds[1:])
+    np.testing.assert_allclose(fps / (y == 0).sum(), fpr[1:])
+    np.testing.assert_allclose(tps / y.sum(), tpr[1:])
+
+
+def test_evaluation_report_matches_sklearn():
+    y, p = _data(seed=1)
+    threshold = 0.62
+    report = compute_evaluation_report(y, p, threshold=threshold)
+    y_pred = (p >= threshold).astype(int)
+
+    expected = {
+        'accuracy': metrics.accuracy_score(y, y_pred),
+        'precision': metrics.precision_score(y, y_pred),
+        'recall': metrics.recall_score(y, y_pred),
+        'f1_score': metrics.f1_score(y, y_pred),
+        'roc_auc': metrics.roc_auc_score(y, p),
+        'average_precision': metrics.average_precision_score(y, p),
+        'brier_score': metrics.brier_score_loss(y, p)
+    }
+    assert report['threshold'] == threshold
+    for name, value in expected.items():
+        np.testing.assert_allclose(report['metrics'][name], value, rtol=1e-12, err_msg=name)
+    np.testing.assert_array_equal(report['confusion_matrix'], metrics.confusion_matrix(y, y_pred))
@@ -0,0 +1,160 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import itertools
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from xgboost import XGBClassifier
+
+import explanations
+from explanations import PredictionExplainer, TreeEnsembleExplainer, make_explainer
+from model_persistence import ModelManager
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+def _data(n=400, d=4):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n, d))
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=n)) > 0).astype(int)
+    return X, y
+
+
+def _expected_value(tree, x, subset, node=0):
+    """E[f(x) | x_S] with the tree's training coverage (brute force)"""
+    if tree.children_left[node] == -1:
+        value = tree.value[node, 0]
+        return value[1] / value.sum()
+    left, right = tree.children_left[node], tree.children_right[node]
+    if tree.feature[node] in subset:
+        child = left if x[tree.feature[node]] <= tree.threshold[node] else right
+        return _expected_value(tree, x, subset, child)
+    weights = tree.weighted_n_node_samples
+    return (weights[left] * _expected_value(tree, x, subset, left) +
+            weights[right] * _expected_value(tree, x, subset, right)) / weights[node]
+
+
+def test_tree_shap_matches_brute_force_shapley_values():
+    X, y = _data()
+    forest = RandomForestClassifier(n_estimators=3, max_depth=4, random_state=0).fit(X, y)
+    explainer = TreeEnsembleExplainer(forest)
+    d = X.shape[1]
+
+    for x in X[:3]:
+        exact = np.zeros(d)
+        for tree in (est.tree_ for est in forest.estimators_):
+            for i in range(d):
+                others = [j for j in range(d) if j != i]
+                for size in range(d):
+                    for subset in itertools.combinations(others, size):
+                        weight = math.factorial(size) * math.factorial(d - size - 1) / math.factorial(d)
+                        exact[i] += weight * (_expected_value(tree, x, set(subset) | {i}) -
+                                              _expected_value(tree, x, set(subset)))
+        exact /= len(forest.estimators_)
+        assert np.allclose(explainer.contributions(x[None, :])[0], exact)
+
+
+def test_contributions_add_up_to_model_output():
+    X, y = _data()
+    boosting = GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0).fit(X, y)
+    forest = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    linear = LogisticRegression().fit(X, y)
+
+    gb = make_explainer(boosting)
+    assert np.allclose(gb.contributions(X[:5]).sum(axis=1) + gb.base_value(X),
+                       boosting.decision_function(X[:5]))
+    rf = make_explainer(forest)
+    assert np.allclose(rf.contributions(X[:5]).sum(axis=1) + rf.base_value(X),
+                       forest.predict_proba(X[:5])[:, 1])
+    lr = make_explainer(linear, {'background_mean': X.mean(axis=0)})
+    assert np.allclose(lr.contributions(X[:5]).sum(axis=1) + lr.base,
+                       linear.decision_function(X[:5]))
+
+
+def test_served_model_explains_only_flagged_rows_with_input_names():
+    manager = ModelManager(cache_size=0)
+    assert manager.load_models(
+        os.path.join(MODEL_DIR, 'trained_detector.pkl'),
+        os.path.join(MODEL_DIR, 'preprocessor.pkl'),
+        os.path.join(MODEL_DIR, 'model_metadata.pkl')
+    )
+    explainer = PredictionExplainer.from_manager(manager, top_k=3)
+    df = pd.DataFrame([{
+        'User_ID': 7, 'Transaction_Amount': amount, 'Merchant_Category': 'Crypto Exchange',
+        'Transaction_Channel': 'UPI', 'Device_Type': 'Android', 'Location': 'Mumbai',
+        'Hour': 3, 'DayOfWeek': 2, 'Is_Weekend': 0, 'Is_Night': 1,
+        'User_Avg_Amount': 1200.0, 'User_Std_Amount': 300.0, 'User_Transaction_Count': 12,
+        'Amount_Log': math.log1p(amount), 'Amount_to_Avg_Ratio': amount / 1201.0
+    } for amount in (50.0, 90000.0)])
+
+    explanations = explainer.explain(df, np.array([0.01, 0.95]))
+    assert explanations[0] is None
+    top = explanations[1]['top_features']
+    assert len(top) == 3
+    assert all(f['feature'] in df.columns for f in top)
+
+    margin = manager.model.predict_proba(manager.preprocessor.transform(df.iloc[[1]]))[0, 1]
+    contributions, base = explainer._compute(df.iloc[[1]], None)
+    assert np.isclose(1 / (1 + np.exp(-(contributions.sum() + base[0]))), margin, atol=1e-4)
+
+    # Second call is served from the cache
+    explainer.explain(df, np.array([0.01, 0.95]))
+    assert explainer.cache.stats()['hits'] == 1
+
+
+def test_xgboost_contributions_respect_the_deadline():
+    X, y = _data()
+    booster = XGBClassifier(n_estimators=20, max_depth=3, verbosity=0).fit(X, y)
+    xgb_explainer = make_explainer(booster)
+    xgb_explainer.chunk_size = 100
+
+    phi, bias = xgb_explainer.contributions_with_bias(X)
+    assert np.allclose(phi.sum(axis=1) + bias, booster.predict(X, output_margin=True), atol=1e-5)
+
+    # Only the first chunk runs after the deadline; rows not explained in time are NaN
+    phi, bias = xgb_explainer.contributions_with_bias(X, deadline=time.perf_counter() - 1)
+    assert not np.isnan(phi[:100]).any() and np.isnan(phi[100:]).all() and np.isnan(bias[100:]).all()
+    xgb_explainer.row_seconds = 1.0
+    phi, _ = xgb_explainer.contributions_with_bias(X, deadline=time.perf_counter() + 50)
+    assert not np.isnan(phi[:100]).any() and np.isnan(phi[100:]).all()
+
+    # A chunk that overruns the budget stops the following ones
+    predict = xgb_explainer.booster.predict
+    xgb_explainer.booster.predict = lambda *args, **kwargs: time.sleep(0.2) or predict(*args, **kwargs)
+    xgb_explainer.row_seconds = 0.0
+    phi, _ = xgb_explainer.contributions_with_bias(X, deadline=time.perf_counter() + 0.1)
+    assert not np.isnan(phi[:100]).any() and np.isnan(phi[100:]).all()
+
+
+def test_one_slow_row_does_not_disable_later_explanations(monkeypatch):
+    X, y = _data()
+    forest = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    explainer = TreeEnsembleExplainer(forest)
+
+    tree_shap = explanations._tree_shap
+    slow = [True]
+
+    def first_row_slow(*args, **kwargs):
+        if slow[0]:
+            slow[0] = False
+            time.sleep(0.2)
+        return tree_shap(*args, **kwargs)
+
+    monkeypatch.setattr(explanations, '_tree_shap', first_row_slow)
+    phi = explainer.contributions(X[:4], deadline=time.perf_counter() + 0.05)
+    assert not np.isnan(phi[0]).any() and np.isnan(phi[1:]).all()
+    assert explainer.row_seconds >= 0.2
+
+    # Each call still explains its first row, and the estimate decays back
+    for _ in range(20):
+        phi = explainer.contributions(X[:4], deadline=time.perf_counter() + 0.05)
+        assert not np.isnan(phi[0]).any()
+        if not np.isnan(phi).any():
+            break
+    assert not np.isnan(phi).any()
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from data_utils import DataProcessor
+from model_persistence import ModelManager
+from model_training import ModelTrainer, preprocessed_feature_names
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+def _features(n=2000):
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(DATA_PATH).head(n))
+    return df.drop(columns=['Transaction_ID', 'Is_Fraudulent'])
+
+
+def test_downcast_halves_float_columns():
+    X = _features()
+    X32 = DataProcessor.downcast(X)
+    assert not (X32.dtypes == np.float64).any()
+    assert X32['Transaction_Amount'].dtype == np.float32
+    assert X32.memory_usage(deep=True).sum() < X.memory_usage(deep=True).sum()
+    np.testing.assert_allclose(X32['Transaction_Amount'], X['Transaction_Amount'], rtol=1e-6)
+
+
+def test_new_preprocessor_emits_float32():
+    X = DataProcessor.downcast(_features())
+    trainer = ModelTrainer()
+    preprocessor = trainer.create_preprocessor(
+        X.select_dtypes(include='object').columns.tolist(),
+        X.select_dtypes(exclude='object').columns.tolist()
+    )
+    matrix = preprocessor.fit_transform(X)
+    assert matrix.dtype == np.float32
+    names, _ = preprocessed_feature_names(preprocessor)
+    assert len(names) == matrix.shape[1]
+
+
+def test_served_model_float32_matches_float64():
+    paths = [os.path.join(MODEL_DIR, name)
+             for name in ('trained_detector.pkl', 'preprocessor.pkl', 'model_metadata.pkl')]
+    legacy = ModelManager(cache_size=0, float32=False)
+    assert legacy.load_models(*paths)
+    served = ModelManager(cache_size=0)
+    assert served.load_models(*paths)
+
+    X = _features()
+    assert served.preprocessor.transform(X).dtype == np.float32
+    p64 = legacy.predict_proba(X)[:, 1]
+    p32 = served.predict_proba(DataProcessor.downcast(X))[:, 1]
+    np.testing.assert_allclose(p32, p64, atol=1e-4)
+    assert (legacy.decision_engine.is_fraud(p64) == served.decision_engine.is_fraud(p32)).all()
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+import hyperparameter_search
+from hyperparameter_search import HyperparameterSearch
+
+
+def _search(tmp_path, **kwargs):
+    return HyperparameterSearch(model_names=['LogisticRegression'], n_jobs=1,
+                                cache_dir=str(tmp_path / 'cache'),
+                                trial_log=str(tmp_path / 'trials.jsonl'), **kwargs)
+
+
+def _fake_evaluate(search, scores):
+    """Replace trial evaluation by a score per config, recording (C, budget)"""
+    calls = []
+
+    def evaluate(model_name, configs, budget):
+        calls.extend((config['C'], budget) for config in configs)
+        return [scores(config) for config in configs]
+
+    search._evaluate = evaluate
+    return calls
+
+
+def test_successive_halving_keeps_the_best_third(tmp_path):
+    search = _search(tmp_path, eta=3)
+    calls = _fake_evaluate(search, lambda config: config['C'])
+    configs = search._sample_configs('LogisticRegression', 9)
+
+    config, score, budget = search.successive_halving('LogisticRegression', configs, 1 / 9)
+
+    best = max(c['C'] for c in configs)
+    assert (config['C'], score, budget) == (best, best, 1.0)
+    budgets = [b for _, b in calls]
+    assert [budgets.count(b) for b in sorted(set(budgets))] == [9, 3, 1]
+    assert {c for c, b in calls if b == 1.0} == {best}
+
+
+def test_hyperband_rescores_lone_survivors_at_full_budget(tmp_path):
+    # eta=3, min_budget=1/9: the 5-config bracket stops with one survivor at 1/3
+    search = _search(tmp_path, strategy='hyperband', eta=3, min_budget=1 / 9)
+    lone_bracket = search._sample_configs('LogisticRegression', 5, bracket=1)
+    winner = lone_bracket[0]['C']
+    calls = _fake_evaluate(search, lambda config: 1.0 if config['C'] == winner else config['C'] / 100)
+
+    config, score, budget = search._search_model('LogisticRegression')
+
+    assert (config['C'], score, budget) == (winner, 1.0, 1.0)
+    assert (winner, 1.0) in calls
+
+
+def test_folds_are_cached_per_data_set(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = (X[:, 0] > 0.8).astype(int)
+
+    resamples = []
+    smote = hyperparameter_search.SMOTE
+    monkeypatch.setattr(hyperparameter_search, 'SMOTE',
+                        lambda **kwargs: resamples.append(1) or smote(**kwargs))
+
+    search = _search(tmp_path)
+    first = search.prepare_folds(X, y)
+    assert len(resamples) == 3
+    assert _search(tmp_path).prepare_folds(X, y) == first
+    assert len(resamples) == 3
+
+    # Same bytes in another shape is another data set; the old cache is pruned
+    second = search.prepare_folds(X.reshape(600, 2), np.repeat(y, 2))
+    assert os.path.dirname(second[0]) != os.path.dirname(first[0])
+    assert os.listdir(tmp_path / 'cache') == [os.path.basename(os.path.dirname(second[0]))]
+
+    search._evaluate('LogisticRegression', [{}], 1.0)
+    assert len(search.trials) == 1
@@ -0,0 +1,120 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from imblearn.pipeline import Pipeline as ImbPipeline
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+from incremental_training import IncrementalTrainer
+from model_training import ModelTrainer
+
+NUMERIC = ['Transaction_Amount', 'Hour', 'User_Avg_Amount']
+CATEGORICAL = ['Transaction_Channel']
+
+
+def _frame(n, seed, channels=('UPI', 'Card Swipe'), drift=0.0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Transaction_Amount': rng.lognormal(8 + drift, 1.2, n).astype(np.float32),
+        'Hour': rng.integers(0, 24, n).astype(np.float32),
+        'User_Avg_Amount': rng.normal(5000 * (1 + drift), 1500, n).astype(np.float32),
+        'Transaction_Channel': rng.choice(list(channels), n),
+    })
+    score = np.log(df['Transaction_Amount']) - 8 + (df['Hour'] < 6) + rng.normal(0, 0.5, n)
+    return df, (score > 1.2).astype(int)
+
+
+def _trainer(classifier, seed=0):
+    X, y = _frame(3000, seed)
+    model_trainer = ModelTrainer()
+    preprocessor = model_trainer.create_preprocessor(CATEGORICAL, NUMERIC)
+    model = ImbPipeline([('classifier', classifier)]).fit(preprocessor.fit_transform(X), y)
+    trainer = IncrementalTrainer(extra_boost_rounds=5, extra_trees=3)
+    trainer.model, trainer.preprocessor = model, preprocessor
+    return trainer, X
+
+
+def _remapped_classifier(trainer, remap):
+    classifier = trainer.model.named_steps['classifier']
+    if isinstance(classifier, XGBClassifier):
+        return trainer._remap_xgboost_booster(classifier, remap)
+    remapped = copy.deepcopy(classifier)
+    estimators = remapped.estimators_
+    for estimator in np.ravel(estimators):
+        trainer._remap_sklearn_tree(estimator, remap)
+    remapped.n_features_in_ = remap['n_features']
+    return remapped
+
+
+@pytest.mark.parametrize('classifier', [
+    RandomForestClassifier(n_estimators=20, random_state=0),
+    GradientBoostingClassifier(n_estimators=30, random_state=0),
+    XGBClassifier(n_estimators=30, max_depth=6, verbosity=0),
+], ids=['rf', 'gb', 'xgb'])
+def test_remapped_trees_predict_identically(classifier):
+    trainer, X_history = _trainer(classifier)
+    X_new, _ = _frame(2000, seed=1, channels=('UPI', 'Net Banking'), drift=0.5)
+    X_reference = pd.concat([X_history, X_new], ignore_index=True)
+
+    preprocessor, remap = trainer.update_preprocessor(X_new, X_reference)
+    remapped = _remapped_classifier(trainer, remap)
+    old_X = trainer.preprocessor.transform(X_reference)
+    new_X = preprocessor.transform(X_reference)
+
+    if isinstance(remapped, xgb.Booster):
+        before = trainer.model.named_steps['classifier'].get_booster().inplace_predict(old_X)
+        after = remapped.inplace_predict(new_X)
+    else:
+        before = trainer.model.predict_proba(old_X)
+        after = remapped.predict_proba(new_X)
+    assert remap['inexact_splits'] == 0
+    np.testing.assert_array_equal(after, before)
+
+
+def test_preprocessor_update_merges_statistics_and_vocabulary():
+    trainer, X_history = _trainer(RandomForestClassifier(n_estimators=5, random_state=0))
+    X_new, _ = _frame(500, seed=2, channels=('UPI', 'Net Banking'), drift=0.5)
+
+    preprocessor, remap = trainer.update_preprocessor(X_new)
+
+    scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    merged = StandardScaler().fit(pd.concat([X_history, X_new])[NUMERIC].to_numpy(np.float32))
+    np.testing.assert_allclose(scaler.mean_, merged.mean_, rtol=1e-6)
+    np.testing.assert_allclose(scaler.scale_, merged.scale_, rtol=1e-6)
+
+    # Net Banking is appended after the known channels
+    assert remap['added_categories'] == {'Transaction_Channel': ['Net Banking']}
+    assert remap['n_features'] == len(NUMERIC) + 3
+    assert remap['column_map'].tolist() == [0, 1, 2, 3, 4]
+    old = trainer.preprocessor.transform(X_new)
+    new = preprocessor.transform(X_new)
+    np.testing.assert_array_equal(new[:, 3:5], old[:, 3:5])
+    assert (new[:, 5] == (X_new['Transaction_Channel'] == 'Net Banking')).all()
+    # The loaded preprocessor is left untouched
+    assert trainer.preprocessor.named_transformers_['cat'].named_steps['onehot'].categories_[0].tolist() == \
+        ['Card Swipe', 'UPI']
+
+
+def test_auc_gate_keeps_the_current_model():
+    X_new, y_new = _frame(1000, seed=3, drift=0.2)
+
+    trainer, _ = _trainer(XGBClassifier(n_estimators=30, verbosity=0))
+    trainer.max_auc_drop = -1.0  # demand an impossible improvement
+    model, preprocessor, report = trainer.update(X_new, y_new)
+    assert not report['accepted']
+    assert model is trainer.model and preprocessor is trainer.preprocessor
+
+    trainer.max_auc_drop = 1.0
+    model, preprocessor, report = trainer.update(X_new, y_new)
+    assert report['accepted'] and report['holdout_rows'] == 200
+    assert model is not trainer.model
+    assert model.named_steps['classifier'].get_booster().num_boosted_rounds() == 35
+    assert model.predict_proba(preprocessor.transform(X_new)).shape == (1000, 2)
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+
+from load_generator import Workload, compare, run_load, scale_dataset, serve_in_thread, summarize
+from transaction_schema import decode_transactions
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+
+
+def _transactions(n=40):
+    from load_generator import load_transactions
+    return load_transactions(DATA_PATH).head(n)
+
+
+def _stub_app():
+    """Echoes row counts; rejects every 10th /predict call"""
+    app = Flask(__name__)
+    calls = {'predict': 0}
+
+    @app.route('/predict', methods=['POST'])
+    def predict():
+        calls['predict'] += 1
+        batch = decode_transactions(request.get_json())
+        if calls['predict'] % 10 == 0:
+            return jsonify({'error': 'overloaded'}), 503
+        return jsonify({'total_transactions': len(batch.to_frame())})
+
+    @app.route('/batch_predict', methods=['POST'])
+    def batch_predict():
+        df = pd.read_csv(request.files['file'])
+        return jsonify({'total_transactions': len(df)})
+
+    return app
+
+
+def test_scale_dataset_keeps_derived_features_consistent():
+    df = _transactions(200).drop(columns=['Transaction_ID'])
+    scaled = scale_dataset(df, 3, seed=1)
+    assert len(scaled) == 600
+    np.testing.assert_allclose(scaled['Amount_Log'], np.log1p(scaled['Transaction_Amount']))
+    np.testing.assert_allclose(scaled['Amount_to_Avg_Ratio'],
+                               scaled['Transaction_Amount'] / (scaled['User_Avg_Amount'] + 1))
+
+
+def test_replay_records_latency_errors_and_both_endpoints():
+    server, url = serve_in_thread(_stub_app())
+    try:
+        workload = Workload(_transactions(), {'predict': 0.8, 'batch_predict': 0.2}, batch_rows=10)
+        result = run_load(url, workload, concurrency=4, duration=30, max_requests=100)
+    finally:
+        server.shutdown()
+
+    endpoints = result['endpoints']
+    assert result['requests'] == 100
+    assert set(endpoints) == {'predict', 'batch_predict'}
+    predict = endpoints['predict']
+    assert predict['status_codes'].get('503', 0) == predict['errors'] > 0
+    assert endpoints['batch_predict']['errors'] == 0
+    assert predict['latency_ms']['p50'] <= predict['latency_ms']['p99']
+    assert sum(bucket['requests'] for bucket in predict['timeline']) == predict['requests']
+
+
+def test_open_loop_paces_requests():
+    server, url = serve_in_thread(_stub_app())
+    try:
+        result = run_load(url, Workload(_transactions()), qps=50, concurrency=2,
+                          duration=30, max_requests=25)
+    finally:
+        server.shutdown()
+    # 25 requests at 50/s are scheduled over ~0.5s
+    assert 0.45 < result['elapsed'] < 5
+
+
+def test_compare_flags_regressions():
+    base = summarize([('predict', i / 100, 0.010, 0.010, 200) for i in range(100)], 1.0)
+    slower = summarize([('predict', i / 100, 0.020, 0.020, 200) for i in range(99)] +
+                       [('predict', 0.99, 0.020, 0.020, 500)], 1.0)
+    report = compare(base, slower)['predict']
+    assert report['latency_p99_ms']['regression']
+    assert report['error_rate']['regression']
+    assert not compare(base, base)['predict']['latency_p99_ms']['regression']
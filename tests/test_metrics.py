@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import MetricsRegistry
+
+
+def test_render_counter_gauge_and_histogram():
+    registry = MetricsRegistry()
+    requests = registry.counter('api_requests', 'Requests', ('endpoint', 'status'))
+    in_flight = registry.gauge('api_in_flight', 'In flight')
+    latency = registry.histogram('api_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+    requests.labels(endpoint='predict', status=200).inc()
+    requests.labels(endpoint='predict', status=200).inc()
+    in_flight.set_function(lambda: 3)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert '# TYPE api_requests counter' in text
+    assert 'api_requests_total{endpoint="predict",status="200"} 2' in text
+    assert 'api_in_flight 3' in text
+    assert 'api_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'api_latency_seconds_bucket{le="1"} 2' in text
+    assert 'api_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'api_latency_seconds_count 3' in text
+
+
+def test_disabled_registry_skips_observations():
+    registry = MetricsRegistry()
+    counter = registry.counter('events', 'Events')
+    registry.enabled = False
+    counter.inc()
+    registry.enabled = True
+    counter.inc()
+
+    assert 'events_total 1' in registry.render()
+
+
+def test_disabled_metrics_hand_out_a_shared_no_op_child():
+    registry = MetricsRegistry()
+    latency = registry.histogram('stage_seconds', 'Latency', ('stage',))
+    counter = registry.counter('events', 'Events', ('kind',))
+    registry.enabled = False
+
+    child = latency.labels(stage='parse')
+    assert child is counter.labels(kind='a')
+    with child.time():
+        pass
+    counter.labels(kind='a').inc()
+    # Nothing was created, so nothing is rendered
+    assert 'stage_seconds_count' not in registry.render()
+    assert 'events_total' not in registry.render()
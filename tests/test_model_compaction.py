@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import joblib
+import numpy as np
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline as ImbPipeline
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from xgboost import XGBClassifier
+
+from model_compaction import compact_model, quantize, save_bundle
+from model_persistence import ModelManager
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+def _data(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 6)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.7, size=n) > 1.5).astype(int)
+    return X[:2000], y[:2000], X[2000:], y[2000:]
+
+
+def test_compaction_prunes_and_stays_within_tolerance():
+    X_train, y_train, X_val, y_val = _data()
+    for clf in (RandomForestClassifier(n_estimators=60, max_depth=6, random_state=0),
+                GradientBoostingClassifier(n_estimators=150, learning_rate=0.05, max_depth=3, random_state=0),
+                XGBClassifier(n_estimators=150, learning_rate=0.05, max_depth=3, verbosity=0)):
+        pipeline = ImbPipeline([('smote', SMOTE(random_state=0)), ('classifier', clf)])
+        pipeline.fit(X_train, y_train)
+        compacted, report = compact_model(pipeline, X_val, y_val, shift_tolerance=0.02)
+
+        assert [name for name, _ in compacted.steps] == ['classifier']
+        assert report['dropped_steps'] == ['smote']
+        assert report['members']['after'] < report['members']['before']
+        assert report['val_auc_after'] >= report['val_auc_before'] - 0.001
+        delta = np.abs(compacted.predict_proba(X_val)[:, 1] - pipeline.predict_proba(X_val)[:, 1])
+        # Pruning bound plus the quantization tolerance
+        assert delta.max() <= 0.02 + 1e-3 + 1e-6
+
+
+def test_float32_thresholds_are_exact_for_sklearn_trees():
+    X_train, y_train, X_val, _ = _data()
+    forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(X_train, y_train)
+    quantized = quantize(forest, thresholds='float32', leaves='float32')
+    np.testing.assert_array_equal(quantized.apply(X_val), forest.apply(X_val))
+
+
+def test_compressed_bundle_serves_through_model_manager(tmp_path):
+    X_train, y_train, X_val, y_val = _data()
+    pipeline = ImbPipeline([('smote', SMOTE(random_state=0)),
+                            ('classifier', XGBClassifier(n_estimators=40, verbosity=0))])
+    pipeline.fit(X_train, y_train)
+    compacted, _ = compact_model(pipeline, X_val, y_val)
+
+    model_path = save_bundle(compacted, str(tmp_path / 'trained_detector.pkl'))
+    joblib.dump(pipeline, tmp_path / 'full.pkl')
+    assert os.path.getsize(model_path) < os.path.getsize(tmp_path / 'full.pkl')
+
+    manager = ModelManager(cache_size=0)
+    assert manager.load_models(model_path, os.path.join(MODEL_DIR, 'preprocessor.pkl'),
+                               str(tmp_path / 'model_metadata.pkl'))
+    np.testing.assert_allclose(manager.model.predict_proba(X_val), compacted.predict_proba(X_val))
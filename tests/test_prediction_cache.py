@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+
+from model_persistence import ModelManager
+from prediction_cache import PredictionCache, transaction_fingerprints
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fingerprint_ignores_field_order_and_numeric_type():
+    a = pd.DataFrame([{'Location': 'Pune', 'Hour': 6, 'Transaction_Amount': 120.5}])
+    b = pd.DataFrame([{'Transaction_Amount': 120.5, 'Hour': 6.0, 'Location': 'Pune'}])
+
+    assert transaction_fingerprints(a, 'v1') == transaction_fingerprints(b, 'v1')
+    assert transaction_fingerprints(a, 'v1') != transaction_fingerprints(a, 'v2')
+    # The encoder sees 'Pune ' as a different category, so the key differs too
+    padded = a.assign(Location='Pune ')
+    assert transaction_fingerprints(a, 'v1') != transaction_fingerprints(padded, 'v1')
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_entries=2, ttl_seconds=None)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_ttl_expiry_and_invalidation():
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.put('a', 1)
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    clock.now = 5.0
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+    cache.put('b', 2)
+    cache.clear()
+    assert cache.get('b') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_failed_reload_keeps_current_bundle(tmp_path):
+    manager = ModelManager()
+    paths = [os.path.join(MODEL_DIR, name)
+             for name in ('trained_detector.pkl', 'preprocessor.pkl', 'model_metadata.pkl')]
+    assert manager.load_models(*paths)
+    model, version = manager.model, manager.model_version
+    manager.cache.put('key', 1)
+
+    # The model file loads, the preprocessor is missing
+    assert not manager.load_models(paths[0], str(tmp_path / 'missing.pkl'), paths[2])
+    assert manager.model is model
+    assert manager.model_version == version
+    assert manager.cache.get('key') == 1
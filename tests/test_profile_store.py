@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import profile_store
+from profile_store import ProfileStore
+from user_profiling import UserProfiler
+
+
+def _transactions(n_users=40, per_user=12, seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_users * per_user
+    return pd.DataFrame({
+        'User_ID': rng.integers(0, n_users, n),
+        'Transaction_Amount': rng.gamma(2.0, 500.0, n).round(2),
+        'Hour': rng.integers(0, 24, n),
+        'Merchant_Category': rng.choice(['Grocery', 'Travel', 'Online Store'], n),
+        'Transaction_Channel': rng.choice(['UPI', 'Card Swipe'], n),
+        'Location': rng.choice(['Mumbai', 'Pune', 'Delhi', 'Chennai'], n),
+        'Is_Fraudulent': (rng.random(n) < 0.1).astype(int)
+    })
+
+
+def test_bulk_build_matches_per_user_profiles():
+    df = _transactions()
+    reference = UserProfiler()
+    compact = UserProfiler(store=ProfileStore())
+    compact.build_profiles(df)
+
+    for user_id in df['User_ID'].unique():
+        expected = reference.create_user_profile(user_id, df)
+        actual = compact.get_profile(user_id)
+        for key in ['total_transactions', 'usual_hours', 'common_merchant_categories',
+                    'common_transaction_channels', 'usual_locations']:
+            assert actual[key] == expected[key]
+        for key in ['avg_transaction_amount', 'max_transaction_amount', 'fraud_rate']:
+            assert np.isclose(actual[key], expected[key], rtol=1e-6)
+
+
+def test_per_user_profiles_fill_the_hour_histogram():
+    df = _transactions()
+    bulk = ProfileStore()
+    bulk.build_from_transactions(df)
+    profiler = UserProfiler(store=ProfileStore())
+
+    for user_id in df['User_ID'].unique():
+        profiler.create_user_profile(user_id, df)
+        expected = bulk._resident.columns['hour_hist'][bulk.index[user_id]]
+        actual = profiler.store._resident.columns['hour_hist'][profiler.store.index[user_id]]
+        assert actual.any()
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_cold_users_spill_and_promote(tmp_path):
+    df = _transactions(n_users=50)
+    store = ProfileStore(max_resident=10, spill_dir=str(tmp_path), initial_capacity=4)
+    store.build_from_transactions(df)
+    reference = ProfileStore()
+    reference.build_from_transactions(df)
+
+    usage = store.memory_usage()
+    assert usage['users'] == 50
+    assert usage['resident_users'] == 10
+    assert sum(row < 0 for row in store.index.values()) == 40
+
+    for user_id in df['User_ID'].unique():
+        store.update_amount(user_id, 10.0)
+        reference.update_amount(user_id, 10.0)
+        spilled, resident = store.get(user_id), reference.get(user_id)
+        spilled.pop('last_update'), resident.pop('last_update')
+        assert spilled == resident
+
+    assert store.memory_usage()['resident_users'] == 10
+    assert store.promotions >= 40
+
+
+def test_snapshot_restore_replays_delta_log(tmp_path):
+    df = _transactions()
+    profiler = UserProfiler(store=ProfileStore(max_resident=15, spill_dir=str(tmp_path / 'spill')))
+    profiler.build_profiles(df)
+    profiler.save_snapshot(str(tmp_path / 'profiles'))
+
+    user_ids = df['User_ID'].unique()
+    for user_id in user_ids[:20]:
+        profiler.update_profile(user_id, {'Transaction_Amount': 25000})
+    profiler.create_user_profile(999, df.assign(User_ID=999))
+
+    restored = UserProfiler.restore(str(tmp_path / 'profiles'))
+    for user_id in list(user_ids) + [999]:
+        assert restored.get_profile(user_id) == profiler.get_profile(user_id)
+
+    # A second snapshot drops the replayed log segment
+    restored.save_snapshot(str(tmp_path / 'profiles'))
+    logs = sorted(p.name for p in (tmp_path / 'profiles').glob('deltas-*.log'))
+    assert logs == ['deltas-000002.log']
+
+
+def test_snapshot_that_crashes_before_its_manifest_is_not_used(tmp_path, monkeypatch):
+    df = _transactions()
+    directory = str(tmp_path / 'profiles')
+    profiler = UserProfiler(store=ProfileStore())
+    profiler.build_profiles(df)
+    profiler.save_snapshot(directory)
+
+    user_ids = df['User_ID'].unique()
+    for user_id in user_ids[:10]:
+        profiler.update_profile(user_id, {'Transaction_Amount': 25000})
+
+    def crash(*args):
+        raise OSError('killed before the manifest was written')
+
+    write_manifest = profile_store._write_manifest
+    monkeypatch.setattr(profile_store, '_write_manifest', crash)
+    with pytest.raises(OSError):
+        profiler.save_snapshot(directory)
+    profiler.update_profile(user_ids[0], {'Transaction_Amount': 10})
+    profiler.store.delta_log.close()
+    monkeypatch.setattr(profile_store, '_write_manifest', write_manifest)
+
+    # The old snapshot plus every segment since; no update is applied twice
+    restored = UserProfiler.restore(directory)
+    for user_id in user_ids:
+        assert restored.get_profile(user_id) == profiler.get_profile(user_id)
+
+    restored.save_snapshot(directory)
+    assert sorted(p.name for p in tmp_path.joinpath('profiles').glob('snapshot*')) == ['snapshot-000003']
+    again = UserProfiler.restore(directory)
+    for user_id in user_ids:
+        assert again.get_profile(user_id) == profiler.get_profile(user_id)
+
+
+def test_batch_anomalies_match_per_transaction_check():
+    history = _transactions(seed=1)
+    batch = _transactions(n_users=50, per_user=4, seed=2)
+    batch.loc[:5, 'Transaction_Amount'] = 1e6
+    batch.loc[6:9, 'Location'] = 'Goa'
+
+    reference = UserProfiler()
+    reference.build_profiles(history)
+    compact = UserProfiler(store=ProfileStore(max_resident=10))
+    compact.build_profiles(history)
+
+    for profiler in [reference, compact]:
+        anomalies = profiler.detect_behavioral_anomalies_batch(batch)
+        for i, record in enumerate(batch.to_dict('records')):
+            profile = reference.get_profile(record['User_ID'])
+            expected = reference.detect_behavioral_anomalies(record, profile) if profile else []
+            assert anomalies.messages(i) == expected
+            assert anomalies.has_profile[i] == (profile is not None)
+        assert anomalies.any().sum() > 0
@@ -0,0 +1,133 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.dummy import DummyClassifier
+from sklearn.pipeline import Pipeline
+
+from data_utils import DataProcessor
+from decision_engine import DecisionEngine
+from model_persistence import ModelManager
+from segment_models import (GLOBAL_SEGMENT, SegmentModels, clear_segment_models, segment_groups,
+                            train_segment_models)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+SEGMENT_PROBABILITIES = {'UPI': 0.2, 'Card Swipe': 0.6, 'Net Banking': 0.9}
+
+
+@pytest.fixture(scope='module')
+def features():
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(DATA_PATH).head(600))
+    return df.drop(columns=['Transaction_ID', 'Is_Fraudulent'])
+
+
+@pytest.fixture(scope='module')
+def global_manager():
+    manager = ModelManager(cache_size=0)
+    assert manager.load_models(*(os.path.join(MODEL_DIR, name) for name in
+                                 ('trained_detector.pkl', 'preprocessor.pkl', 'model_metadata.pkl')))
+    return manager
+
+
+@pytest.fixture
+def segments_dir(tmp_path):
+    """Constant-probability bundles for three channels; Net Banking is not served"""
+    segments = {}
+    for key, probability in SEGMENT_PROBABILITIES.items():
+        directory = tmp_path / key.replace(' ', '_')
+        directory.mkdir()
+        y = (np.arange(100) < probability * 100).astype(int)
+        model = Pipeline([('classifier', DummyClassifier(strategy='prior').fit(np.zeros((100, 1)), y))])
+        joblib.dump(model, directory / 'trained_detector.pkl')
+        shutil.copy(os.path.join(MODEL_DIR, 'preprocessor.pkl'), directory)
+        engine = DecisionEngine(review_threshold=0.1, block_threshold=0.5, decision_threshold=0.5)
+        joblib.dump({'decision_thresholds': engine.to_dict()}, directory / 'model_metadata.pkl')
+        segments[key] = {'dir': directory.name, 'serving': key != 'Net Banking'}
+    with open(tmp_path / 'segments.json', 'w') as f:
+        json.dump({'segment_by': ['Transaction_Channel'], 'segments': segments}, f)
+    return str(tmp_path)
+
+
+def test_segment_groups_keys():
+    df = pd.DataFrame({'Transaction_Channel': ['UPI', 'UPI', 'POS Machine'],
+                       'Merchant_Category': ['Grocery', 'Travel', 'Grocery']})
+    assert {k: list(v) for k, v in segment_groups(df, ['Transaction_Channel']).items()} == \
+        {'UPI': [0, 1], 'POS Machine': [2]}
+    assert set(segment_groups(df, ['Transaction_Channel', 'Merchant_Category'])) == \
+        {'UPI|Grocery', 'UPI|Travel', 'POS Machine|Grocery'}
+
+
+def test_routes_by_segment_with_global_fallback(features, global_manager, segments_dir):
+    router = SegmentModels(global_manager, segments_dir)
+    calls = []
+    original = global_manager.predict
+    global_manager.predict = lambda data, **kwargs: calls.append(len(data)) or original(data, **kwargs)
+    try:
+        predictions, probabilities, segments = router.predict(features)
+    finally:
+        global_manager.predict = original
+
+    channels = features['Transaction_Channel'].to_numpy()
+    for key in ('UPI', 'Card Swipe'):
+        rows = channels == key
+        assert (segments[rows] == key).all()
+        np.testing.assert_allclose(probabilities[rows, 1], SEGMENT_PROBABILITIES[key])
+
+    # Every other channel (Net Banking included) in one call to the global model
+    fallback = ~np.isin(channels, ['UPI', 'Card Swipe'])
+    assert calls == [fallback.sum()]
+    assert (segments[fallback] == GLOBAL_SEGMENT).all()
+    _, expected = global_manager.predict(features[fallback])
+    np.testing.assert_allclose(probabilities[fallback], expected)
+
+    # Segment thresholds: 0.6 is a block for Card Swipe, 0.2 a review for UPI
+    risk_levels, _ = router.decisions(probabilities[:, 1], segments)
+    assert set(risk_levels[channels == 'Card Swipe']) == {'HIGH'}
+    assert set(risk_levels[channels == 'UPI']) == {'MEDIUM'}
+    assert predictions[channels == 'Card Swipe'].all()
+
+
+def test_lru_cache_is_bounded(features, global_manager, segments_dir):
+    router = SegmentModels(global_manager, segments_dir, max_models=1)
+    upi = features[features['Transaction_Channel'] == 'UPI']
+    card = features[features['Transaction_Channel'] == 'Card Swipe']
+    for df in (upi, card, card, upi):
+        router.predict(df)
+    stats = router.stats()
+    assert stats['loaded'] == ['UPI']
+    assert (stats['loads'], stats['hits'], stats['evictions']) == (3, 1, 2)
+
+    # A bundle that fails to load is served by the global model from then on
+    shutil.rmtree(os.path.join(segments_dir, 'Card_Swipe'))
+    router.reload()
+    _, _, segments = router.predict(card)
+    assert (segments == GLOBAL_SEGMENT).all()
+    assert router.stats()['failed_segments'] == ['Card Swipe']
+
+
+def test_single_class_segments_are_skipped(features, tmp_path):
+    y = (features['Transaction_Channel'] == 'Unknown API').astype(int)
+    index = train_segment_models(features, y, features, y, [], [], segment_by=['Transaction_Channel'],
+                                 out_dir=str(tmp_path), min_rows=1)
+    assert index['segments'] == {}
+    assert set(index['skipped']) == set(features['Transaction_Channel'])
+    with open(tmp_path / 'segments.json') as f:
+        assert json.load(f)['skipped'] == index['skipped']
+
+
+def test_clearing_segments_falls_back_to_global(features, global_manager, segments_dir):
+    assert clear_segment_models(segments_dir) == len(SEGMENT_PROBABILITIES)
+    assert os.listdir(segments_dir) == []
+    assert clear_segment_models(segments_dir) == 0
+
+    _, _, segments = SegmentModels(global_manager, segments_dir).predict(features)
+    assert (segments == GLOBAL_SEGMENT).all()
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from data_utils import DataProcessor
+from shadow_scoring import ShadowScorer
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'models')
+
+
+@pytest.fixture(scope='module')
+def features():
+    processor = DataProcessor()
+    df = processor.feature_engineering(processor.load_data(DATA_PATH).head(500))
+    return df.drop(columns=['Transaction_ID', 'Is_Fraudulent'])
+
+
+def _wait(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_same_bundle_agrees_with_primary(features):
+    scorer = ShadowScorer.from_dir(MODEL_DIR).start()
+    try:
+        primary = scorer.manager
+        for i in range(0, 200, 20):
+            df = features.iloc[i:i + 20]
+            predictions, probabilities = primary.predict(df, use_cache=False)
+            assert scorer.submit(df, probabilities[:, 1], predictions, 0.001)
+        assert _wait(lambda: scorer.report()['scored_requests'] == 10)
+    finally:
+        scorer.stop()
+
+    report = scorer.report()
+    assert report['scored_rows'] == 200
+    assert report['decision_agreement'] == 1.0
+    assert report['score_delta']['max_abs'] < 1e-6
+    assert report['dropped'] == 0 and report['errors'] == 0
+    assert report['latency_ms']['primary']['p50'] == pytest.approx(1.0)
+    assert report['latency_ms']['shadow'] is not None
+
+
+def test_counts_disagreements_and_drops_when_full(features):
+    scorer = ShadowScorer.from_dir(MODEL_DIR, isolate=False, max_queue=4)
+    df = features.iloc[:10]
+    _, probabilities = scorer.manager.predict(df, use_cache=False)
+    # Primary says everything is fraud with probability 1
+    accepted = [scorer.submit(df, np.ones(10), np.ones(10, dtype=int), 0.001) for _ in range(6)]
+    assert accepted == [True] * 4 + [False] * 2
+    assert scorer.queue_depth() == 4
+    assert scorer.report()['dropped'] == 2
+
+    scorer.start()
+    try:
+        assert _wait(lambda: scorer.report()['scored_requests'] == 4)
+    finally:
+        scorer.stop()
+    report = scorer.report()
+    flagged = int(scorer.manager.decision_engine.is_fraud(probabilities[:, 1]).sum())
+    assert report['primary_only_fraud'] == 4 * (10 - flagged)
+    assert report['score_delta']['mean'] == pytest.approx(np.mean(probabilities[:, 1] - 1), abs=1e-6)
+
+
+def test_workers_wait_for_idle(features):
+    idle = threading.Event()
+    calls = []
+
+    def wait_for_idle(timeout):
+        calls.append(timeout)
+        idle.wait(timeout)
+
+    scorer = ShadowScorer.from_dir(MODEL_DIR, isolate=False, wait_for_idle=wait_for_idle,
+                                max_yield=5).start()
+    try:
+        scorer.submit(features.iloc[:5], np.zeros(5), np.zeros(5, dtype=int), 0.001)
+        assert _wait(lambda: calls)
+        time.sleep(0.1)
+        assert scorer.report()['scored_requests'] == 0
+        idle.set()
+        assert _wait(lambda: scorer.report()['scored_requests'] == 1)
+    finally:
+        scorer.stop()
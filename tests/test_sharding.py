@@ -0,0 +1,123 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_jobs import JobManager
+from data_utils import DataProcessor
+from sharding import HashRing, ShardRouter
+from stream_worker import partition_for, partitions_for
+
+
+def test_ring_resize_moves_only_to_new_shard():
+    user_ids = list(range(20000))
+    before = HashRing(4).shards_for(user_ids)
+    after = HashRing(5).shards_for(user_ids)
+
+    moved = before != after
+    assert (np.bincount(before, minlength=4) > 3000).all()
+    assert (after[moved] == 4).all()
+    assert 0.1 < moved.mean() < 0.3
+    assert HashRing(4).shard_for(123) == before[123]
+
+
+def test_stream_partitions_follow_the_ring():
+    user_ids = list(range(500)) + ['u-1', 'u-2']
+    ring = HashRing(3)
+    assert partitions_for(user_ids, 3).tolist() == ring.shards_for(user_ids).tolist()
+    assert [partition_for(u, 3) for u in user_ids] == ring.shards_for(user_ids).tolist()
+    assert partitions_for(user_ids, 1).tolist() == [0] * len(user_ids)
+
+
+def test_router_scores_in_order_and_rebalances(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 200
+    df = pd.DataFrame({
+        'Transaction_ID': np.arange(n),
+        'User_ID': rng.integers(0, 40, n),
+        'Transaction_Time': '05-01-2024 14:00',
+        'Transaction_Amount': rng.gamma(2.0, 500.0, n).round(2),
+        'Merchant_Category': 'Grocery',
+        'Transaction_Channel': 'UPI',
+        'Device_Type': 'Android',
+        'Location': 'Mumbai',
+        'Is_Fraudulent': 0
+    })
+
+    with ShardRouter(2) as router:
+        assert router.build(df) == df['User_ID'].nunique()
+        decisions = router.score_frame(df.drop(columns=['Is_Fraudulent']))
+        assert decisions['transaction_id'].tolist() == df['Transaction_ID'].tolist()
+        assert 'error' not in decisions.columns
+        # Uploaded batches read the per-user state without advancing it
+        again = router.score_frame(df.drop(columns=['Is_Fraudulent']))
+        assert again['fraud_probability'].tolist() == decisions['fraud_probability'].tolist()
+
+        moved = router.resize(3)
+        stats = router.stats()
+        assert moved > 0
+        assert sum(s['profiles'] for s in stats) == df['User_ID'].nunique()
+        assert all(s['profiles'] > 0 for s in stats)
+
+        single = router.score(df.drop(columns=['Is_Fraudulent']).head(3).to_dict('records'))
+        assert [d['transaction_id'] for d in single] == [0, 1, 2]
+        assert all('behavioral_anomalies' in d for d in single)
+
+        # Batch jobs score feature rows in the shards, in input order
+        features = DataProcessor().feature_engineering(df).drop(columns=['Is_Fraudulent'])
+        jobs = JobManager(None, jobs_dir=str(tmp_path / 'jobs'), chunk_size=64,
+                          shard_router=router).start()
+        job = jobs.submit(io.BytesIO(features.to_csv(index=False).encode()), 'batch.csv')
+        deadline = time.time() + 60
+        while jobs.get(job['id'])['state'] in ('queued', 'running'):
+            assert time.time() < deadline
+            time.sleep(0.05)
+        jobs.stop()
+        assert jobs.get(job['id'])['state'] == 'completed'
+        results = pd.read_csv(io.StringIO(''.join(jobs.iter_results(job['id']))))
+        assert results['Transaction_ID'].tolist() == features['Transaction_ID'].tolist()
+        assert results['fraud_probability'].between(0, 1).all()
+        assert set(results['risk_level']) <= {'LOW', 'MEDIUM', 'HIGH'}
+
+        predictions, probabilities, risk_levels = router.predict_frame(features.head(3))
+        assert probabilities.shape == (3, 2) and len(predictions) == len(risk_levels) == 3
+        with pytest.raises(ValueError, match='Location'):
+            router.predict_frame(features.head(3).drop(columns=['Location']))
+
+
+def test_shard_feature_state_survives_a_restart(tmp_path):
+    df = pd.DataFrame({
+        'User_ID': np.arange(30) % 6,
+        'Transaction_Time': '05-01-2024 14:00',
+        'Transaction_Amount': np.linspace(100.0, 3000.0, 30),
+        'Merchant_Category': 'Grocery',
+        'Transaction_Channel': 'UPI',
+        'Device_Type': 'Android',
+        'Location': 'Mumbai',
+        'Is_Fraudulent': 0
+    })
+    with ShardRouter(2, profile_dir=str(tmp_path)) as router:
+        router.build(df)
+        router.score(df.drop(columns=['Is_Fraudulent']).head(4).to_dict('records'))
+        before = router.score_frame(df.drop(columns=['Is_Fraudulent']))
+    with ShardRouter(2, profile_dir=str(tmp_path)) as router:
+        assert sum(s['feature_users'] for s in router.stats()) == 6
+        after = router.score_frame(df.drop(columns=['Is_Fraudulent']))
+        versions = router.reload_models()
+        assert sorted(versions) == [0, 1] and len(set(versions.values())) == 1
+
+        # A shard that fails to start during a resize is cleaned up
+        paths = router.model_paths
+        router.model_paths = ('models/missing.pkl',) + paths[1:]
+        with pytest.raises(RuntimeError, match='failed to start'):
+            router.resize(3)
+        router.model_paths = paths
+        assert sorted(router._shards) == [0, 1] and router.n_shards == 2
+        assert len(router.stats()) == 2
+    assert after['fraud_probability'].tolist() == before['fraud_probability'].tolist()
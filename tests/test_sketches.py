@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+
+from sketches import HyperLogLog, BloomFilter
+
+
+def _hashes(values):
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+def test_hyperloglog_estimate_and_merge():
+    a, b = HyperLogLog(p=14), HyperLogLog(p=14)
+    a.add_hashes(_hashes(np.arange(0, 60000)))
+    b.add_hashes(_hashes(np.arange(40000, 100000)))
+
+    assert abs(a.count() - 60000) / 60000 < 0.03
+    assert abs(a.merge(b).count() - 100000) / 100000 < 0.03
+
+    small = HyperLogLog(p=14)
+    small.add_hashes(_hashes(['a', 'b', 'a', 'c']))
+    assert round(small.count()) == 3
+
+
+def test_bloom_filter_counts_duplicates_across_batches():
+    bloom = BloomFilter(capacity=20000, error_rate=0.001)
+
+    assert bloom.add_and_count_duplicates(_hashes(np.arange(10000))) == 0
+    # 5000 repeats from the first batch, 100 repeats within this batch
+    batch = np.concatenate([
+        np.arange(5000, 15000),
+        np.arange(20000, 20100),
+        np.arange(20000, 20100)
+    ])
+    duplicates = bloom.add_and_count_duplicates(_hashes(batch))
+
+    assert 5100 <= duplicates <= 5100 + 20
+    assert bloom.contains(_hashes([1, 2, 3])).all()
@@ -0,0 +1,220 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import functools
+import glob
+import json
+import queue
+
+import pandas as pd
+import pytest
+
+from model_persistence import ModelManager
+from stream_worker import (
+    FeatureEnricher, FileTailSource, JsonlSink, QueueSink, QueueSource, StateLog, StreamWorker,
+    compact_state, init_enricher, partition_for, run_workers
+)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+
+
+def _transactions(n=30):
+    return [{
+        'Transaction_ID': 1000 + i,
+        'User_ID': i % 7,
+        'Transaction_Time': f'0{1 + i % 9}-01-2024 {i % 24:02d}:00',
+        'Transaction_Amount': 500.0 + 37 * i,
+        'Merchant_Category': 'Grocery',
+        'Transaction_Channel': 'UPI',
+        'Device_Type': 'Android',
+        'Location': 'Mumbai'
+    } for i in range(n)]
+
+
+@pytest.fixture(scope='module')
+def manager():
+    manager = ModelManager(cache_size=0)
+    assert manager.load_models()
+    return manager
+
+
+class FlakySink(QueueSink):
+    def __init__(self, decisions_queue, failures):
+        super().__init__(decisions_queue)
+        self.failures = failures
+
+    def write(self, decisions):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('sink unavailable')
+        super().write(decisions)
+
+
+def test_commits_only_after_sink_write(manager):
+    transactions = queue.Queue()
+    for t in _transactions() + [{'User_ID': 3}, None]:
+        transactions.put(t)
+    source, decisions = QueueSource(transactions), queue.Queue()
+
+    worker = StreamWorker(source, FlakySink(decisions, failures=1), manager, batch_size=8)
+    worker.max_sink_retries = 0
+    with pytest.raises(IOError):
+        worker.run()
+    assert source.committed == -1
+
+    worker.max_sink_retries = 2
+    worker.sink.failures = 1
+    worker.run()
+    written = []
+    while not decisions.empty():
+        written.extend(decisions.get())
+
+    assert worker.stats['sink_retries'] == 1
+    assert source.committed == 30
+    # The first, failed batch was never committed, so only later batches arrive
+    assert len(written) == 31 - 8
+    assert written[-1]['error'].startswith('Missing fields')
+    assert all(0.0 <= d['fraud_probability'] <= 1.0 for d in written[:-1])
+
+
+def test_file_tail_resumes_from_committed_offset(manager, tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    path.write_text(''.join(json.dumps(t) + '\n' for t in _transactions()))
+
+    def run():
+        source = FileTailSource(str(path), partition=1, n_partitions=2, follow=False)
+        sink = JsonlSink(str(tmp_path / 'decisions.jsonl'), partition=1)
+        StreamWorker(source, sink, manager, batch_size=4, partition=1).run()
+        source.close()
+        sink.close()
+        with open(sink.path) as f:
+            return [json.loads(line) for line in f]
+
+    first = run()
+    expected = [t['Transaction_ID'] for t in _transactions() if partition_for(t['User_ID'], 2) == 1]
+    assert [d['transaction_id'] for d in first] == expected
+    # Everything was committed, so a restart emits nothing new
+    assert len(run()) == len(first)
+
+
+class CrashingSource(FileTailSource):
+    """Dies between logging a batch and committing its offsets"""
+
+    def __init__(self, *args, crash_at_commit, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.crash_at_commit = crash_at_commit
+
+    def commit(self, offsets):
+        self.crash_at_commit -= 1
+        if self.crash_at_commit == 0:
+            raise RuntimeError('worker killed')
+        super().commit(offsets)
+
+
+def test_enricher_state_is_logged_with_the_committed_offsets(manager, tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    path.write_text(''.join(json.dumps(t) + '\n' for t in _transactions()))
+    state_dir = str(tmp_path / 'state')
+    os.makedirs(state_dir)
+
+    def run(source):
+        source.resume(compact_state(state_dir)['offsets'].get(0))
+        state_log = StateLog(os.path.join(state_dir, 'enricher.part0.log'))
+        worker = StreamWorker(source, QueueSink(queue.Queue()), manager,
+                              enricher=init_enricher(0, 1, state_dir=state_dir),
+                              batch_size=8, state_log=state_log)
+        try:
+            worker.run()
+        finally:
+            state_log.close()
+            source.close()
+        decisions = []
+        while not worker.sink.queue.empty():
+            decisions.extend(worker.sink.queue.get())
+        return decisions
+
+    with pytest.raises(RuntimeError):
+        run(CrashingSource(str(path), follow=False, crash_at_commit=2))
+    # The second batch was logged but its offsets never reached the offset file
+    assert FileTailSource(str(path)).committed > 0
+    decisions = run(FileTailSource(str(path), follow=False))
+    compact_state(state_dir)
+
+    # Batches after the last logged one are scored; every transaction is counted once
+    assert [d['transaction_id'] for d in decisions] == [t['Transaction_ID'] for t in _transactions()[16:]]
+    reference = FeatureEnricher()
+    reference.enrich(_transactions())
+    restored = init_enricher(0, 1, state_dir=state_dir)
+    assert sorted(restored.user_ids()) == sorted(reference.user_ids())
+    for user_id in reference.user_ids():
+        assert restored.user_stats(user_id) == pytest.approx(reference.user_stats(user_id))
+
+
+def test_each_line_is_scored_by_one_partition(manager, tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    lines = [json.dumps(t) for t in _transactions()] + ['not json', '{"Transaction_ID": 1}']
+    # The final line has no newline
+    lines.append(json.dumps(_transactions(31)[-1]))
+    path.write_text('\n'.join(lines))
+
+    decisions = []
+    for partition in range(3):
+        source = FileTailSource(str(path), partition=partition, n_partitions=3, follow=False)
+        sink = QueueSink(queue.Queue())
+        StreamWorker(source, sink, manager, batch_size=8, partition=partition).run()
+        source.close()
+        while not sink.queue.empty():
+            decisions.extend(sink.queue.get())
+
+    assert len(decisions) == len(lines)
+    errors = [d for d in decisions if 'error' in d]
+    assert len(errors) == 2 and {d['partition'] for d in errors} == {0}
+
+
+def test_enricher_state_follows_users_across_partition_counts(tmp_path):
+    reference = FeatureEnricher()
+    reference.seed(pd.read_csv(DATA_PATH).rename(columns={'user_id': 'User_ID', 'amount': 'Transaction_Amount'}))
+
+    state_dir = str(tmp_path / 'state')
+    os.makedirs(state_dir)
+    for partition in range(2):
+        enricher = init_enricher(partition, 2, seed_path=DATA_PATH)
+        enricher.save(os.path.join(state_dir, f'enricher.part{partition}.pkl'))
+
+    owners = {}
+    for partition in range(3):
+        enricher = init_enricher(partition, 3, state_dir=state_dir)
+        for user_id in enricher.user_ids():
+            assert user_id not in owners
+            owners[user_id] = partition
+            assert enricher.user_stats(user_id) == reference.user_stats(user_id)
+    assert set(owners) == set(reference.user_ids())
+    assert all(partition_for(user_id, 3) == p for user_id, p in owners.items())
+
+
+def test_changing_the_worker_count_re_emits_nothing(tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    transactions = _transactions(60)
+    state_dir = str(tmp_path / 'state')
+    source_factory = functools.partial(FileTailSource, str(path), follow=False)
+    sink_factory = functools.partial(JsonlSink, str(tmp_path / 'decisions.jsonl'))
+
+    path.write_text(''.join(json.dumps(t) + '\n' for t in transactions[:40]))
+    run_workers(source_factory, sink_factory, n_workers=1, batch_size=8, state_dir=state_dir)
+    with open(path, 'a') as f:
+        f.write(''.join(json.dumps(t) + '\n' for t in transactions[40:]))
+    for n_workers in (2, 3, 1):
+        run_workers(source_factory, sink_factory, n_workers=n_workers, batch_size=8,
+                    state_dir=state_dir)
+
+    decisions = []
+    for sink_path in glob.glob(str(tmp_path / 'decisions.part*.jsonl')):
+        with open(sink_path) as f:
+            decisions.extend(json.loads(line) for line in f)
+    assert sorted(d['transaction_id'] for d in decisions) == [t['Transaction_ID'] for t in transactions]
+    reference = FeatureEnricher()
+    reference.enrich(transactions)
+    restored = init_enricher(0, 1, state_dir=state_dir)
+    for user_id in reference.user_ids():
+        assert restored.user_stats(user_id) == pytest.approx(reference.user_stats(user_id))
@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+import pytest
+
+from data_utils import DataProcessor
+from synthetic_data import fit_profile, generate, generate_chunk
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_transaction_dataset.csv')
+
+
+@pytest.fixture(scope='module')
+def real():
+    return DataProcessor().load_data(DATA_PATH)
+
+
+@pytest.fixture(scope='module')
+def profile(real):
+    return fit_profile(real)
+
+
+def test_output_is_independent_of_worker_count(profile, tmp_path):
+    serial = generate(profile, 25000, str(tmp_path / 'serial.csv'), seed=3, chunk_size=10000, n_workers=1)
+    parallel = generate(profile, 25000, str(tmp_path / 'parallel.csv'), seed=3, chunk_size=10000, n_workers=2)
+    assert serial['rows'] == parallel['rows'] == 25000
+    with open(tmp_path / 'serial.csv', 'rb') as a, open(tmp_path / 'parallel.csv', 'rb') as b:
+        assert a.read() == b.read()
+
+    other = generate_chunk(profile, 4, 0, 0, 1000, 25000, 300)
+    assert not other.equals(generate_chunk(profile, 3, 0, 0, 1000, 25000, 300))
+
+
+def test_generated_data_matches_real_distributions(real, profile, tmp_path):
+    path = str(tmp_path / 'synthetic.csv')
+    generate(profile, 40000, path, seed=0, chunk_size=20000, n_workers=1)
+    processor = DataProcessor()
+    synthetic = processor.load_data(path)
+    assert synthetic['Transaction_ID'].is_monotonic_increasing
+    assert abs(synthetic['Is_Fraudulent'].mean() - real['Is_Fraudulent'].mean()) < 0.01
+    for column in ['Merchant_Category', 'Device_Type', 'Location', 'Transaction_Channel']:
+        assert set(synthetic[column]) <= set(real[column])
+        shares = pd.concat([real[column].value_counts(normalize=True),
+                            synthetic[column].value_counts(normalize=True)], axis=1).fillna(0)
+        assert (shares.iloc[:, 0] - shares.iloc[:, 1]).abs().max() < 0.02
+
+    fraud_median = synthetic.groupby('Is_Fraudulent')['Transaction_Amount'].median()
+    assert fraud_median[1] > 2 * fraud_median[0]
+    features = processor.feature_engineering(synthetic)
+    assert len(features) == len(synthetic)
+
+
+def test_unparsable_times_are_skipped(real):
+    broken = real.copy()
+    broken['Transaction_Time'] = broken['Transaction_Time'].astype(object)
+    broken.loc[broken.index[0], 'Transaction_Time'] = 'not a time'
+    profile = fit_profile(broken)
+    assert profile['rows_per_user'] * profile['n_template_users'] == pytest.approx(len(real) - 1)
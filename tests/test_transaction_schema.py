@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transaction_schema import SchemaValidationError, decode_transactions, validate_frame
+
+
+def _transaction(**overrides):
+    transaction = {
+        'User_ID': 7,
+        'Transaction_Amount': 2500.0,
+        'Merchant_Category': 'Travel',
+        'Transaction_Channel': 'UPI',
+        'Device_Type': 'Android',
+        'Location': 'Mumbai',
+        'Hour': 14,
+        'DayOfWeek': 2,
+        'Is_Weekend': 0,
+        'Is_Night': 0,
+        'User_Avg_Amount': 1200.0,
+        'User_Std_Amount': None,
+        'User_Transaction_Count': 12,
+        'Amount_Log': float(np.log1p(2500.0)),
+        'Amount_to_Avg_Ratio': 2500.0 / 1201.0
+    }
+    transaction.update(overrides)
+    return transaction
+
+
+def test_decode_writes_typed_columns():
+    df = decode_transactions([_transaction(), _transaction(Hour=3.0, User_Std_Amount=80)]).to_frame()
+
+    assert len(df) == 2
+    assert df['Hour'].dtype == np.int64 and df['Hour'].tolist() == [14, 3]
+    assert df['Transaction_Amount'].dtype == np.float64
+    assert np.isnan(df['User_Std_Amount'][0]) and df['User_Std_Amount'][1] == 80.0
+    assert df['Location'].tolist() == ['Mumbai', 'Mumbai']
+
+
+def test_decode_reports_each_bad_field():
+    bad = _transaction(Hour=25, Transaction_Amount='12', Is_Night=True)
+    del bad['Location']
+
+    with pytest.raises(SchemaValidationError) as info:
+        decode_transactions([_transaction(), bad])
+
+    details = {(e['index'], e['field']): e['message'] for e in info.value.errors}
+    assert details == {
+        (1, 'Transaction_Amount'): 'must be a number, got str',
+        (1, 'Location'): 'is required',
+        (1, 'Hour'): 'must be between 0 and 23',
+        (1, 'Is_Night'): 'must be an integer, got bool'
+    }
+    with pytest.raises(SchemaValidationError):
+        decode_transactions([])
+
+
+def test_validate_frame_checks_columns():
+    df = pd.DataFrame([_transaction(), _transaction()])
+    validate_frame(df)
+
+    with pytest.raises(SchemaValidationError) as info:
+        validate_frame(df.drop(columns=['Hour']).assign(DayOfWeek=[1, 9]))
+    assert info.value.errors[0]['field'] == 'Hour'
+
+
+def test_predict_endpoint_returns_400_for_invalid_input():
+    from app import app
+
+    client = app.test_client()
+    rv = client.post('/predict', json=_transaction(DayOfWeek=-1))
+    assert rv.status_code == 400
+    assert rv.get_json()['details'] == [
+        {'index': 0, 'field': 'DayOfWeek', 'message': 'must be between 0 and 6'}
+    ]
+
+    rv = client.post('/predict', data='{not json', content_type='application/json')
+    assert rv.status_code == 400
+
+    rv = client.post('/predict', json=_transaction(User_Std_Amount=300.0))
+    assert rv.status_code == 200
+    assert rv.get_json()['total_transactions'] == 1